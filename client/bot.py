@@ -9,6 +9,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import config
 from aiogram import Bot, Dispatcher
 from client import handlers
+from client.bridge import bridge
 
 # Configure Logging
 logging.basicConfig(
@@ -17,6 +18,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger("Delio.Client")
 
+def build_webhook_app(bot: Bot, dp: Dispatcher):
+    """aiohttp app receiving Telegram updates; each update is handled in the background."""
+    from aiohttp import web
+    from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=config.CLIENT_WEBHOOK_SECRET or None
+    ).register(app, path=config.CLIENT_WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    from aiohttp import web
+
+    runner = web.AppRunner(build_webhook_app(bot, dp))
+    await runner.setup()
+    site = web.TCPSite(runner, config.CLIENT_WEBHOOK_HOST, config.CLIENT_WEBHOOK_PORT)
+    await site.start()
+    await bot.set_webhook(
+        config.CLIENT_WEBHOOK_URL.rstrip("/") + config.CLIENT_WEBHOOK_PATH,
+        secret_token=config.CLIENT_WEBHOOK_SECRET or None,
+        drop_pending_updates=True
+    )
+    logger.info(f"✅ Webhook receiver on {config.CLIENT_WEBHOOK_HOST}:{config.CLIENT_WEBHOOK_PORT}{config.CLIENT_WEBHOOK_PATH}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
 async def main():
     logger.info("📡 Starting Delio Client...")
     
@@ -29,12 +62,16 @@ async def main():
     
     # Start
     try:
-        await bot.delete_webhook(drop_pending_updates=True)
-        logger.info("✅ Client connected to Telegram. Listening...")
-        await dp.start_polling(bot)
+        if config.CLIENT_WEBHOOK_URL:
+            await run_webhook(bot, dp)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            logger.info("✅ Client connected to Telegram. Listening...")
+            await dp.start_polling(bot)
     except Exception as e:
         logger.critical(f"❌ Client Error: {e}")
     finally:
+        await bridge.close()
         await bot.session.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+"""
+Kernel Bridge (Telegram client -> kernel HTTP API)
+- One shared keep-alive aiohttp session for the whole client process, instead
+  of a new pool and TCP handshake per message (aiohttp is already the client's
+  transport through aiogram; the kernel's uvicorn speaks HTTP/1.1 only)
+- At most CLIENT_BRIDGE_CONCURRENCY kernel runs in flight; up to
+  CLIENT_BRIDGE_MAX_WAITING more wait for a slot, beyond that BridgeBusy is
+  raised at once (backpressure instead of an unbounded pile of coroutines)
+- chat() follows the kernel's SSE stream (/v1/chat/stream) and yields its events
+"""
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import aiohttp
+import config
+
+logger = logging.getLogger("Delio.Client.Bridge")
+
+
+class BridgeBusy(Exception):
+    """All kernel slots are taken and the wait queue is full."""
+
+
+class KernelError(Exception):
+    """Non-200 answer from the kernel."""
+
+
+class KernelBridge:
+    def __init__(self, base_url: str = None, concurrency: int = None, max_waiting: int = None):
+        self.base_url = (base_url or config.KERNEL_API_URL).rstrip("/")
+        self.concurrency = concurrency or config.CLIENT_BRIDGE_CONCURRENCY
+        self.max_waiting = max_waiting if max_waiting is not None else config.CLIENT_BRIDGE_MAX_WAITING
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._keeper: Optional[asyncio.Task] = None
+        self._loop = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._in_flight = 0
+        self.counters = {"requests": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self._wait_total = 0.0
+
+    def _bind_loop(self):
+        # The pool and semaphore belong to one event loop (rebuilt if it changes).
+        # The old loop's keeper closes its session at that loop's shutdown; if the
+        # loop was not shut down that way, close it from here (best effort).
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._session is not None and not self._session.closed:
+                loop.create_task(self._close_session(self._session))
+            self._session = None
+            self._keeper = None
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._waiting = 0
+            self._in_flight = 0
+            self._loop = loop
+
+    def session(self) -> aiohttp.ClientSession:
+        self._bind_loop()
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.concurrency,
+                keepalive_timeout=config.LLM_POOL_KEEPALIVE_SECONDS,
+            )
+            headers = {"X-API-Key": config.KERNEL_API_KEY} if config.KERNEL_API_KEY else None
+            # The kernel sends an SSE keepalive every SSE_KEEPALIVE_SECONDS, so the
+            # read timeout only trips when the kernel goes silent
+            self._session = aiohttp.ClientSession(
+                base_url=self.base_url,
+                connector=connector,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=None, connect=10.0, sock_read=config.CLIENT_BRIDGE_READ_TIMEOUT),
+            )
+            if self._keeper is not None:
+                self._keeper.cancel()
+            self._keeper = asyncio.create_task(self._close_at_loop_exit(self._session))
+        return self._session
+
+    @staticmethod
+    async def _close_session(session: aiohttp.ClientSession):
+        try:
+            await session.close()
+        except Exception as e:
+            logger.debug(f"Stale bridge session not closed cleanly: {e}")
+
+    async def _close_at_loop_exit(self, session: aiohttp.ClientSession):
+        try:
+            await asyncio.Event().wait()
+        finally:
+            if not session.closed:
+                await self._close_session(session)
+
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        self._bind_loop()
+        if self._slots.locked() and self._waiting >= self.max_waiting:
+            self.counters["rejected"] += 1
+            raise BridgeBusy(f"{self.concurrency} kernel runs in flight, {self._waiting} waiting")
+        self._waiting += 1
+        t0 = time.perf_counter()
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        self._wait_total += time.perf_counter() - t0
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+    async def chat(self, payload: Dict[str, Any]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """POST /v1/chat/stream; yields (event, data) until the run ends (`done` / `error`)."""
+        async with self._slot():
+            self.counters["requests"] += 1
+            try:
+                async with self.session().post("/v1/chat/stream", json=payload) as resp:
+                    if resp.status != 200:
+                        raise KernelError(f"Kernel Error: {resp.status}\n{await resp.text()}")
+                    # Read to the end (the kernel closes the stream after done / error):
+                    # an unread body would close the connection instead of pooling it
+                    event = None
+                    async for raw in resp.content:
+                        line = raw.decode("utf-8").rstrip("\r\n")
+                        if line.startswith("event: "):
+                            event = line[len("event: "):]
+                        elif line.startswith("data: "):
+                            yield event, json.loads(line[len("data: "):])
+                self.counters["completed"] += 1
+            except Exception:
+                self.counters["failed"] += 1
+                raise
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._keeper is not None:
+            self._keeper.cancel()
+            await asyncio.gather(self._keeper, return_exceptions=True)
+            self._keeper = None
+
+    def stats(self) -> Dict[str, object]:
+        requests = self.counters["requests"]
+        return {
+            **self.counters,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "avg_wait_s": round(self._wait_total / requests, 4) if requests else 0.0,
+        }
+
+
+bridge = KernelBridge()
@@ -1,11 +1,10 @@
 from aiogram import Router, types
 from aiogram.filters import Command
-import httpx
 import logging
+from client.bridge import bridge, BridgeBusy, KernelError
 
 router = Router()
 logger = logging.getLogger("Delio.Client")
-API_URL = "http://localhost:8000/v1/chat"
 
 @router.message(Command("start"))
 async def cmd_start(message: types.Message):
@@ -22,21 +21,22 @@ async def handle_any_message(message: types.Message):
     status_msg = await message.answer("🤔 ...")
     
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(API_URL, json={
-                "user_id": user_id,
-                "message": text,
-                "message_id": status_msg.message_id,
-                "platform": "telegram"
-            }, timeout=120.0) # Long timeout for FSM
-            
-            if resp.status_code == 200:
-                # The response has already been sent to the user via RespondState in chunks.
-                # No need to edit again here.
-                pass
-            else:
-                await status_msg.edit_text(f"⚠️ Kernel Error: {resp.status_code}\n{resp.text}")
+        # The response itself reaches the user via RespondState (Telegram);
+        # the stream only tells us when the run is over and whether it failed.
+        async for event, data in bridge.chat({
+            "user_id": user_id,
+            "message": text,
+            "message_id": status_msg.message_id,
+            "platform": "telegram"
+        }):
+            if event == "error":
+                await status_msg.edit_text(f"⚠️ Kernel Error: {data.get('detail')}")
 
+    except KernelError as e:
+        await status_msg.edit_text(f"⚠️ {e}")
+    except BridgeBusy as e:
+        logger.warning(f"⏳ Kernel bridge saturated: {e}")
+        await status_msg.edit_text("⏳ Ядро перевантажене, спробуй за хвилину.")
     except Exception as e:
         logger.error(f"Client Bridge Error: {e}")
         await status_msg.edit_text(f"⚠️ **Connection Lost:** {str(e)}")
@@ -27,12 +27,88 @@ RATE_LIMIT_PERIOD = int(os.getenv("RATE_LIMIT_PERIOD", "60"))
 ADMIN_IDS = [int(x) for x in os.getenv("ADMIN_TELEGRAM_ID", "").split(',') if x.strip()]
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "1.0"))
+REDIS_RETRY_SECONDS = float(os.getenv("REDIS_RETRY_SECONDS", "30"))  # Redis is skipped this long after a failure
+
+# --- SHORT-TERM HISTORY (core/memory/redis_storage.py) ---
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "20"))
+HISTORY_TTL_SECONDS = int(os.getenv("HISTORY_TTL_SECONDS", "86400"))
+HISTORY_LOCAL_USERS = int(os.getenv("HISTORY_LOCAL_USERS", "1000"))  # Users kept in the in-process ring buffer
+HISTORY_LOCAL_TTL_SECONDS = float(os.getenv("HISTORY_LOCAL_TTL_SECONDS", "300"))  # Re-read from Redis after this
+
+# --- HEARTBEAT (core/heartbeat.py) ---
 HEARTBEAT_INTERVAL_MINUTES = int(os.getenv("HEARTBEAT_INTERVAL_MINUTES", "30"))
+HEARTBEAT_ACTIVE_HOURS = float(os.getenv("HEARTBEAT_ACTIVE_HOURS", "48"))  # Users seen within this get heartbeats
+HEARTBEAT_CONCURRENCY = int(os.getenv("HEARTBEAT_CONCURRENCY", "4"))  # FSM heartbeats running at once
+HEARTBEAT_SPREAD = float(os.getenv("HEARTBEAT_SPREAD", "0.8"))  # Share of the interval a round is spread over
+HEARTBEAT_DB_PATH = os.getenv("HEARTBEAT_DB_PATH", "data/heartbeat.db")
+# SKIP predictor before PLAN: "off", "shadow" (predict + measure agreement only), "on" (skip the LLM)
+HEARTBEAT_GATE = os.getenv("HEARTBEAT_GATE", "shadow").lower()
+HEARTBEAT_GATE_SKIP_RATE = float(os.getenv("HEARTBEAT_GATE_SKIP_RATE", "0.9"))  # Model SKIP rate needed to predict SKIP
+HEARTBEAT_GATE_MIN_SAMPLES = int(os.getenv("HEARTBEAT_GATE_MIN_SAMPLES", "5"))
+HEARTBEAT_GATE_HISTORY = int(os.getenv("HEARTBEAT_GATE_HISTORY", "20"))  # Model decisions kept per user
+HEARTBEAT_GATE_MAX_SKIPS = int(os.getenv("HEARTBEAT_GATE_MAX_SKIPS", "12"))  # Then one heartbeat goes to the LLM
+HEARTBEAT_GATE_DUE_MINUTES = int(os.getenv("HEARTBEAT_GATE_DUE_MINUTES", "60"))  # Reminders / tasks due this soon
+HEARTBEAT_GATE_TASKS_TTL = float(os.getenv("HEARTBEAT_GATE_TASKS_TTL", "60"))
 
 # --- CONCURRENCY CONFIG ---
 STATE_TRANSITION_TIMEOUT = int(os.getenv("STATE_TRANSITION_TIMEOUT", "60"))
 MAX_CONCURRENT_USERS = int(os.getenv("MAX_CONCURRENT_USERS", "500"))
 
+# --- MULTI-WORKER COORDINATION (core/coordination.py) ---
+# "local" = one worker; "redis" = session leases + shared FSM state across workers
+COORDINATION_BACKEND = os.getenv("COORDINATION_BACKEND", "local").lower()
+COORDINATION_REDIS_URL = os.getenv("COORDINATION_REDIS_URL", f"redis://{REDIS_HOST}:{REDIS_PORT}/0")
+SESSION_LEASE_TTL_MS = int(os.getenv("SESSION_LEASE_TTL_MS", "15000"))  # Renewed every TTL/3 while held
+SESSION_LEASE_POLL_MS = int(os.getenv("SESSION_LEASE_POLL_MS", "50"))  # Max backoff while another worker holds it
+SESSION_LEASE_WAIT_SECONDS = float(os.getenv("SESSION_LEASE_WAIT_SECONDS", "120"))
+SCHEDULER_LEADER_TTL_SECONDS = float(os.getenv("SCHEDULER_LEADER_TTL_SECONDS", "60"))
+
+# --- LLM PROVIDER POOLS (core/providers.py) ---
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+DEEPSEEK_MAX_CONCURRENCY = int(os.getenv("DEEPSEEK_MAX_CONCURRENCY", "16"))
+ANTHROPIC_MAX_CONCURRENCY = int(os.getenv("ANTHROPIC_MAX_CONCURRENCY", "8"))
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "64"))
+LLM_POOL_KEEPALIVE_SECONDS = float(os.getenv("LLM_POOL_KEEPALIVE_SECONDS", "60"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "")  # Empty = SDK default endpoint
+
+# --- PROVIDER RECORD / REPLAY (core/cassette.py) ---
+# "live" = real providers; "record" = live + every LLM / embedding call appended to
+# CASSETTE_PATH; "replay" = calls answered from CASSETTE_PATH, no network
+PROVIDER_MODE = os.getenv("PROVIDER_MODE", "live").lower()
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "data/cassettes/kernel.jsonl")
+CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", "1.0"))  # Replay: recorded latency x scale (0 = instant)
+
+# --- ASYNC JOBS / SSE (core/jobs.py) ---
+JOBS_MAX = int(os.getenv("JOBS_MAX", "1000"))  # Finished jobs kept for GET /v1/jobs/{id}
+JOBS_TTL_SECONDS = float(os.getenv("JOBS_TTL_SECONDS", "600"))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))  # Comment line on idle streams
+JOBS_REMOTE_POLL_SECONDS = float(os.getenv("JOBS_REMOTE_POLL_SECONDS", "0.25"))  # SSE of a job on another worker (Redis)
+
+# --- TELEGRAM CLIENT (client/) ---
+KERNEL_API_URL = os.getenv("KERNEL_API_URL", "http://localhost:8000")
+KERNEL_API_KEY = os.getenv("DELIO_API_KEY", "")
+CLIENT_BRIDGE_CONCURRENCY = int(os.getenv("CLIENT_BRIDGE_CONCURRENCY", "64"))  # Kernel runs in flight (= pool size)
+CLIENT_BRIDGE_MAX_WAITING = int(os.getenv("CLIENT_BRIDGE_MAX_WAITING", "256"))  # Then new messages get "busy"
+CLIENT_BRIDGE_READ_TIMEOUT = float(os.getenv("CLIENT_BRIDGE_READ_TIMEOUT", "60"))
+# Webhook mode when set (public HTTPS URL Telegram posts to); empty = long polling
+CLIENT_WEBHOOK_URL = os.getenv("CLIENT_WEBHOOK_URL", "")
+CLIENT_WEBHOOK_PATH = os.getenv("CLIENT_WEBHOOK_PATH", "/telegram/webhook")
+CLIENT_WEBHOOK_HOST = os.getenv("CLIENT_WEBHOOK_HOST", "0.0.0.0")
+CLIENT_WEBHOOK_PORT = int(os.getenv("CLIENT_WEBHOOK_PORT", "8081"))
+CLIENT_WEBHOOK_SECRET = os.getenv("CLIENT_WEBHOOK_SECRET", "")
+
+# --- INTENT ROUTER (core/router.py) ---
+INTENT_CACHE_SIZE = int(os.getenv("INTENT_CACHE_SIZE", "4096"))
+INTENT_LOCAL_MIN_CONFIDENCE = float(os.getenv("INTENT_LOCAL_MIN_CONFIDENCE", "0.8"))
+
+# --- STREAMING DELIVERY (core/streaming.py) ---
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))  # Telegram: ~1 edit/sec per chat
+STREAM_MIN_DELTA_CHARS = int(os.getenv("STREAM_MIN_DELTA_CHARS", "40"))
+
 # --- MODEL CONFIGURATION (Google GenAI SDK) ---
 GEMINI_API_VERSION = "v1alpha" 
 MODEL_FAST = "gemini-2.0-flash-lite"      # Tier 1: Super Cheap/Fast
@@ -42,6 +118,10 @@ MODEL_JUDGE = "claude-3-5-sonnet-latest"  # Tier 4: The Wise Judge
 
 # Synergy Mode: Gemini generates → DeepSeek analyzes/improves
 ENABLE_SYNERGY = os.getenv("ENABLE_SYNERGY", "true").lower() == "true"
+# "blocking": PLAN waits for the Critic. "optimistic": Actor answer is sent immediately,
+# REFLECT edits the message in place if the Critic materially changes it.
+CRITIC_MODE = os.getenv("CRITIC_MODE", "blocking").lower()
+CRITIC_PATCH_SIMILARITY = float(os.getenv("CRITIC_PATCH_SIMILARITY", "0.95"))  # Below = material change
 
 # Formatting Rules
 TELEGRAM_STYLE = """
@@ -108,5 +188,39 @@ def setup_logging():
 SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "data/delio_memory.db")
 CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "data/chroma_db")
 OBSIDIAN_ROOT = os.getenv("OBSIDIAN_ROOT", "/data/obsidian")
+OBSIDIAN_INDEX_PATH = os.getenv("OBSIDIAN_INDEX_PATH", "data/obsidian_index.db")
+OBSIDIAN_INDEX_REFRESH_SECONDS = float(os.getenv("OBSIDIAN_INDEX_REFRESH_SECONDS", "60"))
+OBSIDIAN_COLLECTION = os.getenv("OBSIDIAN_COLLECTION", "obsidian_knowledge")
+
+# --- PROFILE CACHE (core/memory/structured.py) ---
+PROFILE_CACHE_MAX_USERS = int(os.getenv("PROFILE_CACHE_MAX_USERS", "1000"))
+PROFILE_CACHE_MAX_BYTES = int(os.getenv("PROFILE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# --- MEMORY DECAY (StructuredMemory.apply_decay, daily at 03:00) ---
+MEMORY_DECAY_CHUNK_ROWS = int(os.getenv("MEMORY_DECAY_CHUNK_ROWS", "5000"))  # Rows per write transaction
+MEMORY_PRUNE_BELOW = float(os.getenv("MEMORY_PRUNE_BELOW", "0"))  # Delete decayed items below this confidence (0 = keep)
+
+# --- RETRIEVAL (core/memory/retrieval.py) ---
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "1200"))  # Memory block of the system prompt
+RETRIEVAL_RRF_K = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+
+# --- EMBEDDINGS (core/memory/embeddings.py) ---
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "data/embedding_cache.db")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "50000"))
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "10"))
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "100"))  # Gemini batch limit
+
+# --- POST-PROCESSING QUEUE (core/postprocess.py) ---
+POSTPROCESS_ASYNC = os.getenv("POSTPROCESS_ASYNC", "true").lower() == "true"
+POSTPROCESS_DB_PATH = os.getenv("POSTPROCESS_DB_PATH", "data/postprocess_queue.db")
+POSTPROCESS_WORKERS = int(os.getenv("POSTPROCESS_WORKERS", "4"))
+POSTPROCESS_MAX_ATTEMPTS = int(os.getenv("POSTPROCESS_MAX_ATTEMPTS", "3"))
+POSTPROCESS_POLL_SECONDS = float(os.getenv("POSTPROCESS_POLL_SECONDS", "1.0"))
+POSTPROCESS_JOB_TIMEOUT = float(os.getenv("POSTPROCESS_JOB_TIMEOUT", "120"))  # A hung job would block its whole lane
+
+# --- REMINDERS (core/notifications.py) ---
+REMINDERS_DB_PATH = os.getenv("REMINDERS_DB_PATH", "data/reminders.db")
+REMINDERS_SWEEP_SECONDS = float(os.getenv("REMINDERS_SWEEP_SECONDS", "60"))  # Pick up reminders queued on other workers
 
 logger = setup_logging()
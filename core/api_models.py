@@ -13,3 +13,40 @@ class ChatResponse(BaseModel):
     model_used: str
     tool_calls: Optional[list] = None
     lifecycle_status: str = "complete" # complete, processing, error
+
+class JobAccepted(BaseModel):
+    job_id: str
+    status: str = "running"
+    status_url: str
+    events_url: str
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str # running, complete, error
+    created_at: float
+    finished_at: Optional[float] = None
+    states: list = Field(default_factory=list) # FSM states entered so far
+    result: Optional[ChatResponse] = None
+    error: Optional[str] = None
+
+
+def response_from_context(context) -> ChatResponse:
+    """ChatResponse for a finished FSM run (ExecutionContext)."""
+    status = "complete"
+    msg = context.sent_response
+
+    # Fallback Logic
+    if not msg:
+        if context.errors:
+            msg = f"⚠️ Error: {context.errors}"
+            status = "error"
+        else:
+            msg = context.response or "⚠️ No response."
+            status = "processing" if not context.response else "complete"
+
+    return ChatResponse(
+        text=msg,
+        model_used=context.metadata.get("model_used", "Delio-FSM"),
+        tool_calls=context.tool_calls,
+        lifecycle_status=status
+    )
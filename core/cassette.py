@@ -0,0 +1,216 @@
+"""
+Provider Record / Replay (cassettes)
+- Recorder: live calls pass through; every LLM / embedding call is appended to
+  a JSONL cassette with its result (or error) and timing: total latency, and
+  for streams the offset of every chunk. Inbound messages are recorded too, so
+  a captured session can be driven again (scripts/bench_pipeline.py --cassette)
+- Player: no network; calls are answered from the cassette after the recorded
+  latency x CASSETTE_LATENCY_SCALE (0 = instant), streams chunk by chunk
+  * Matching: same request (hash of kind, model, contents, config) first, else
+    the next unused call of the same kind + model in recorded order (prompts
+    carry timestamps and retrieved memories, so they rarely repeat byte for
+    byte), else recorded calls are reused round robin (more load than captured)
+  * A recorded error is raised again (ReplayedError); a kind + model that was
+    never recorded raises CassetteMiss
+- Cassettes hold conversation content: keep them out of version control
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("Delio.Cassette")
+
+INBOUND = "message"  # Entry kind of a recorded process_request
+
+
+class CassetteMiss(Exception):
+    """The cassette has no call of this kind + model."""
+
+
+class ReplayedError(Exception):
+    """A call that failed while recording fails again on replay."""
+
+
+def _plain(obj: Any):
+    if hasattr(obj, "model_dump"):  # SDK config / content types (pydantic)
+        return obj.model_dump(exclude_none=True, mode="json")
+    return str(obj)
+
+
+def request_key(kind: str, model: str, request: Any) -> str:
+    raw = json.dumps([kind, model, request], default=_plain, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def load(path: str) -> List[Dict]:
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entries.append(json.loads(line))
+    return entries
+
+
+class Recorder:
+    mode = "record"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._started = time.monotonic()
+        self._seq = 0
+        self.counters = {"recorded": 0, "errors": 0, "inbound": 0}
+
+    def _write(self, entry: Dict):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+            logger.info(f"📼 Recording provider calls to {self.path}")
+        entry["seq"] = self._seq
+        self._seq += 1
+        # One line per call, flushed: a crash keeps everything recorded so far
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def _entry(self, kind: str, model: str, request: Any, t0: float) -> Dict:
+        return {
+            "kind": kind,
+            "model": model,
+            "key": request_key(kind, model, request),
+            "t": round(t0 - self._started, 4),
+            "latency": round(time.monotonic() - t0, 4),
+        }
+
+    async def call(self, kind: str, model: str, request: Any, live: Callable[[], Awaitable]) -> Any:
+        t0 = time.monotonic()
+        try:
+            result = await live()
+        except Exception as e:
+            self._write({**self._entry(kind, model, request, t0), "error": f"{type(e).__name__}: {e}"})
+            self.counters["errors"] += 1
+            raise
+        self._write({**self._entry(kind, model, request, t0), "result": result})
+        self.counters["recorded"] += 1
+        return result
+
+    async def stream(self, kind: str, model: str, request: Any,
+                     live: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        t0 = time.monotonic()
+        chunks = []
+        try:
+            async for chunk in live():
+                chunks.append([round(time.monotonic() - t0, 4), chunk])
+                yield chunk
+        except Exception as e:
+            self._write({**self._entry(kind, model, request, t0), "chunks": chunks,
+                         "error": f"{type(e).__name__}: {e}"})
+            self.counters["errors"] += 1
+            raise
+        self._write({**self._entry(kind, model, request, t0), "chunks": chunks})
+        self.counters["recorded"] += 1
+
+    def inbound(self, user_id: int, text: str, metadata: Dict):
+        """A message entering the kernel (process_request), for replaying the traffic itself."""
+        self._write({
+            "kind": INBOUND,
+            "t": round(time.monotonic() - self._started, 4),
+            "user_id": user_id,
+            "text": text,
+            "metadata": {k: v for k, v in metadata.items() if isinstance(v, (str, int, float, bool, type(None)))},
+        })
+        self.counters["inbound"] += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> Dict[str, object]:
+        return {"mode": self.mode, "path": self.path, **self.counters}
+
+
+class Player:
+    mode = "replay"
+
+    def __init__(self, path: str, latency_scale: float = 1.0, entries: List[Dict] = None):
+        self.path = path
+        self.latency_scale = latency_scale
+        self._exact: Dict[str, Deque[Dict]] = defaultdict(deque)
+        self._queued: Dict[Tuple[str, str], Deque[Dict]] = defaultdict(deque)
+        self._recorded: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+        self._reuse_cursor: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._used = set()  # id() of entries already served once
+        self.counters = {"calls": 0, "exact": 0, "fuzzy": 0, "reused": 0, "misses": 0}
+
+        entries = entries if entries is not None else load(path)
+        for entry in entries:
+            if entry["kind"] == INBOUND:
+                continue
+            call = (entry["kind"], entry["model"])
+            self._exact[entry["key"]].append(entry)
+            self._queued[call].append(entry)
+            self._recorded[call].append(entry)
+        logger.info(f"📼 Replaying {sum(map(len, self._recorded.values()))} provider calls from {path}")
+
+    def _next_unused(self, queue: Optional[Deque[Dict]]) -> Optional[Dict]:
+        while queue:
+            entry = queue.popleft()
+            if id(entry) not in self._used:
+                return entry
+        return None
+
+    def take(self, kind: str, model: str, request: Any) -> Dict:
+        self.counters["calls"] += 1
+        call = (kind, model)
+        entry = self._next_unused(self._exact.get(request_key(kind, model, request)))
+        if entry is not None:
+            self.counters["exact"] += 1
+        else:
+            entry = self._next_unused(self._queued.get(call))
+            if entry is not None:
+                self.counters["fuzzy"] += 1
+            elif self._recorded.get(call):
+                recorded = self._recorded[call]
+                entry = recorded[self._reuse_cursor[call] % len(recorded)]
+                self._reuse_cursor[call] += 1
+                self.counters["reused"] += 1
+            else:
+                self.counters["misses"] += 1
+                raise CassetteMiss(f"No recorded {kind} call for {model} in {self.path}")
+        self._used.add(id(entry))
+        return entry
+
+    async def _wait(self, seconds: float):
+        if seconds > 0 and self.latency_scale:
+            await asyncio.sleep(seconds * self.latency_scale)
+
+    async def call(self, kind: str, model: str, request: Any, live: Callable[[], Awaitable] = None) -> Any:
+        entry = self.take(kind, model, request)
+        await self._wait(entry["latency"])
+        if "error" in entry:
+            raise ReplayedError(entry["error"])
+        return entry["result"]
+
+    async def stream(self, kind: str, model: str, request: Any,
+                     live: Callable[[], AsyncIterator[str]] = None) -> AsyncIterator[str]:
+        entry = self.take(kind, model, request)
+        elapsed = 0.0
+        for offset, chunk in entry["chunks"]:
+            await self._wait(offset - elapsed)
+            elapsed = offset
+            yield chunk
+        await self._wait(entry["latency"] - elapsed)
+        if "error" in entry:
+            raise ReplayedError(entry["error"])
+
+    def close(self):
+        pass
+
+    def stats(self) -> Dict[str, object]:
+        return {"mode": self.mode, "path": self.path, "latency_scale": self.latency_scale, **self.counters}
@@ -24,6 +24,9 @@ class ExecutionContext:
     response: str = ""
     sent_response: str = "" # Final formatted response captured in RespondState
     
+    # Speculative work started early and joined in PLAN ("intent", "memory")
+    pending: Dict[str, Any] = field(default_factory=dict)
+
     # Execution markers
     errors: List[str] = field(default_factory=list)
     trace: List[str] = field(default_factory=list)
@@ -0,0 +1,353 @@
+"""
+Session Coordination (per-user serialization across kernel workers)
+- SessionLocks: per-process, per-user locks that exist only while held or awaited
+- LocalBackend: single worker; serialization comes from SessionLocks alone
+- RedisBackend: lease locks for N workers on any number of hosts
+  * SET NX PX lease per user, renewed every TTL/3 while held, released with a
+    compare-and-delete (Lua), so a crashed worker frees the user after one TTL
+  * Fencing token per acquisition (INCR); shared state writes carry it and are
+    rejected once a newer holder exists
+  * Shared state map (one HASH): non-IDLE users -> FSM state, for every worker
+- Coordinator: what the FSM, reminders and heartbeats use. The local lock is
+  always taken first, so at most one task per worker contends on Redis
+"""
+
+import asyncio
+import logging
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from itertools import count
+from typing import AsyncIterator, Dict, Optional
+
+import redis.asyncio as redis
+import config
+from core.metrics import SESSION_WAIT_SECONDS
+from core.state import State
+from core.state_guard import guard
+
+logger = logging.getLogger("Delio.Coordination")
+
+
+class _SessionEntry:
+    __slots__ = ("lock", "refs")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.refs = 0  # Holder + waiters
+
+
+class SessionLocks:
+    """
+    Per-user session locks that exist only while someone holds or waits for them.
+    The entry is created and removed without an await in between, so no global
+    meta-lock is needed on the single-threaded event loop.
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, _SessionEntry] = {}
+
+    @asynccontextmanager
+    async def hold(self, user_id: int) -> AsyncIterator[None]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            entry = self._entries[user_id] = _SessionEntry()
+        entry.refs += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.refs -= 1
+            if not entry.refs:
+                del self._entries[user_id]
+
+    def locked(self, user_id: int) -> bool:
+        entry = self._entries.get(user_id)
+        return entry is not None and entry.lock.locked()
+
+    def active(self) -> int:
+        return sum(1 for entry in self._entries.values() if entry.lock.locked())
+
+    def waiters(self) -> int:
+        return sum(entry.refs for entry in self._entries.values()) - self.active()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+@dataclass
+class Lease:
+    user_id: int
+    token: str
+    fence: int
+    lost: bool = False  # Set when a renewal finds the lease expired or taken over
+
+
+class LocalBackend:
+    """Single worker: the process-local lock is the whole guarantee."""
+
+    distributed = False
+
+    def __init__(self):
+        self._fences = count(1)
+
+    async def acquire(self, user_id: int, wait: bool = True) -> Optional[Lease]:
+        return Lease(user_id, "", next(self._fences))
+
+    async def release(self, lease: Lease):
+        pass
+
+    async def publish_state(self, lease: Lease, state: State) -> bool:
+        return True  # StateGuard is the state map
+
+    async def is_held(self, user_id: int) -> bool:
+        return False
+
+    async def try_lead(self, name: str, ttl_seconds: float) -> bool:
+        return True
+
+    async def close(self):
+        pass
+
+
+# KEYS[1] = lease, KEYS[2] = fence; ARGV = token, ttl_ms, fence_ttl_ms
+_ACQUIRE = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    local fence = redis.call('INCR', KEYS[2])
+    redis.call('PEXPIRE', KEYS[2], ARGV[3])
+    return fence
+end
+return 0
+"""
+
+# KEYS[1] = lease, KEYS[2] = states; ARGV = token, user_id
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    redis.call('HDEL', KEYS[2], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# KEYS[1] = lease; ARGV = token, ttl_ms
+_EXTEND = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS[1] = fence, KEYS[2] = states; ARGV = fence, user_id, state ('' = IDLE)
+_SET_STATE = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+if ARGV[3] == '' then
+    redis.call('HDEL', KEYS[2], ARGV[2])
+else
+    redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+end
+return 1
+"""
+
+# KEYS[1] = leader key; ARGV = worker id, ttl_ms
+_LEAD = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+if current == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+class RedisBackend:
+    distributed = True
+
+    def __init__(self, client=None, url: str = None, prefix: str = "delio", ttl_ms: int = None):
+        self.url = url or config.COORDINATION_REDIS_URL
+        self.client = client
+        self.prefix = prefix
+        self.ttl_ms = ttl_ms or config.SESSION_LEASE_TTL_MS
+        self.worker_id = uuid.uuid4().hex
+        self._scripts = {}
+        self._keepalive: Dict[str, asyncio.Task] = {}
+        self.counters = {"acquired": 0, "contended": 0, "lost": 0, "stale_writes": 0}
+
+    def _client(self):
+        if self.client is None:
+            self.client = redis.from_url(self.url, decode_responses=True,
+                                         socket_connect_timeout=config.REDIS_CONNECT_TIMEOUT)
+        return self.client
+
+    def _script(self, source: str):
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = self._client().register_script(source)
+        return script
+
+    def _lease_key(self, user_id: int) -> str:
+        return f"{self.prefix}:lease:{user_id}"
+
+    def _fence_key(self, user_id: int) -> str:
+        return f"{self.prefix}:fence:{user_id}"
+
+    @property
+    def _states_key(self) -> str:
+        return f"{self.prefix}:fsm_states"
+
+    async def acquire(self, user_id: int, wait: bool = True) -> Optional[Lease]:
+        """Take the user's lease; polls with jittered backoff while another worker holds it."""
+        token = uuid.uuid4().hex
+        keys = [self._lease_key(user_id), self._fence_key(user_id)]
+        # Fence keys outlive any lease by far, so tokens stay monotonic for live holders
+        args = [token, self.ttl_ms, max(self.ttl_ms * 100, 86_400_000)]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + config.SESSION_LEASE_WAIT_SECONDS
+        delay = 0.005
+        while True:
+            fence = await self._script(_ACQUIRE)(keys=keys, args=args)
+            if fence:
+                lease = Lease(user_id, token, int(fence))
+                self._keepalive[token] = asyncio.create_task(self._renew(lease))
+                self.counters["acquired"] += 1
+                return lease
+            if not wait:
+                return None
+            self.counters["contended"] += 1
+            if loop.time() >= deadline:
+                raise TimeoutError(f"Session lease for user {user_id} not acquired in {config.SESSION_LEASE_WAIT_SECONDS}s")
+            await asyncio.sleep(delay * (0.5 + random.random()))
+            delay = min(delay * 2, config.SESSION_LEASE_POLL_MS / 1000)
+
+    async def _renew(self, lease: Lease):
+        interval = self.ttl_ms / 3000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                extended = await self._script(_EXTEND)(keys=[self._lease_key(lease.user_id)],
+                                                       args=[lease.token, self.ttl_ms])
+            except Exception as e:
+                logger.error(f"❌ Lease renewal failed for user {lease.user_id}: {e}")
+                continue  # Retried until the TTL runs out; then the lease is lost
+            if not extended:
+                lease.lost = True
+                self.counters["lost"] += 1
+                logger.critical(f"🛑 Session lease of user {lease.user_id} lost (fence {lease.fence})")
+                return
+
+    async def release(self, lease: Lease):
+        task = self._keepalive.pop(lease.token, None)
+        if task:
+            task.cancel()
+        try:
+            await self._script(_RELEASE)(keys=[self._lease_key(lease.user_id), self._states_key],
+                                         args=[lease.token, lease.user_id])
+        except Exception as e:
+            # The lease expires on its own after one TTL
+            logger.error(f"❌ Lease release failed for user {lease.user_id}: {e}")
+
+    async def publish_state(self, lease: Lease, state: State) -> bool:
+        """Fenced write to the shared state map; False if a newer holder exists."""
+        written = await self._script(_SET_STATE)(
+            keys=[self._fence_key(lease.user_id), self._states_key],
+            args=[lease.fence, lease.user_id, "" if state == State.IDLE else state.name]
+        )
+        if not written:
+            self.counters["stale_writes"] += 1
+        return bool(written)
+
+    async def remote_state(self, user_id: int) -> State:
+        name = await self._client().hget(self._states_key, user_id)
+        return State[name] if name else State.IDLE
+
+    async def is_held(self, user_id: int) -> bool:
+        return bool(await self._client().exists(self._lease_key(user_id)))
+
+    async def try_lead(self, name: str, ttl_seconds: float) -> bool:
+        """Acquire or renew the `name` leadership for this worker."""
+        return bool(await self._script(_LEAD)(keys=[f"{self.prefix}:leader:{name}"],
+                                              args=[self.worker_id, int(ttl_seconds * 1000)]))
+
+    async def close(self):
+        for task in self._keepalive.values():
+            task.cancel()
+        self._keepalive.clear()
+        if self.client is not None:
+            await self.client.close()
+
+
+class Coordinator:
+    def __init__(self, backend=None):
+        self.backend = backend or LocalBackend()
+        self.sessions = SessionLocks()
+
+    @asynccontextmanager
+    async def session(self, user_id: int) -> AsyncIterator[Lease]:
+        """Exclusive session for the user across every worker sharing the backend."""
+        t0 = time.perf_counter()
+        async with self.sessions.hold(user_id):
+            lease = await self.backend.acquire(user_id)
+            SESSION_WAIT_SECONDS.observe(time.perf_counter() - t0, "ok")
+            try:
+                yield lease
+            finally:
+                await self.backend.release(lease)
+
+    @asynccontextmanager
+    async def try_session(self, user_id: int) -> AsyncIterator[Optional[Lease]]:
+        """Like session(), but yields None instead of waiting when the user is busy."""
+        if self.sessions.locked(user_id):
+            yield None
+            return
+        async with self.sessions.hold(user_id):
+            lease = await self.backend.acquire(user_id, wait=False)
+            try:
+                yield lease
+            finally:
+                if lease is not None:
+                    await self.backend.release(lease)
+
+    async def publish_state(self, lease: Lease, state: State) -> bool:
+        """False only when fenced out; a backend outage is logged, not fatal to the run."""
+        try:
+            return await self.backend.publish_state(lease, state)
+        except Exception as e:
+            logger.error(f"❌ State publish failed for user {lease.user_id}: {e}")
+            return True
+
+    async def is_busy(self, user_id: int) -> bool:
+        if self.sessions.locked(user_id) or guard.get_state(user_id) != State.IDLE:
+            return True
+        return await self.backend.is_held(user_id)
+
+    async def try_lead(self, name: str, ttl_seconds: float = None) -> bool:
+        try:
+            return await self.backend.try_lead(name, ttl_seconds or config.SCHEDULER_LEADER_TTL_SECONDS)
+        except Exception as e:
+            logger.error(f"❌ Leader election '{name}' failed: {e}")
+            return False
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "backend": "redis" if self.backend.distributed else "local",
+            "active_sessions": self.sessions.active(),
+            "lock_waiters": self.sessions.waiters(),
+            **getattr(self.backend, "counters", {}),
+        }
+
+
+def _backend_from_config():
+    if config.COORDINATION_BACKEND == "redis":
+        return RedisBackend()
+    return LocalBackend()
+
+
+coordinator = Coordinator(_backend_from_config())
@@ -12,6 +12,7 @@ from core.fsm import instance as fsm
 from core.state import State
 from core.context import ExecutionContext
 import config
+from aiogram.exceptions import TelegramRetryAfter
 
 # Import States
 from states.observe import ObserveState
@@ -30,6 +31,7 @@ import core.logger
 import core.tools
 import scheduler
 from core.state_guard import guard
+from core.postprocess import postprocess
 import memory_manager_v2 as mm2
 import memory_populator
 import model_control
@@ -53,13 +55,23 @@ class HeadlessBot:
             except Exception as e:
                 logger.error(f"Failed to send real message from HeadlessBot: {e}")
 
-    async def edit_message_text(self, text, chat_id, message_id, parse_mode=None):
-        logger.info(f"🤖 [HEADLESS BOT] Editing message {message_id} for {chat_id}")
+    async def edit_message_text(self, text, chat_id, message_id, parse_mode=None) -> bool:
+        """True if the edit went through (or there is no real bot). Flood control is re-raised for backoff."""
+        logger.debug(f"🤖 [HEADLESS BOT] Editing message {message_id} for {chat_id}")
+        if not self._real_bot:
+            return True
+        try:
+            await self._real_bot.edit_message_text(text, chat_id, message_id, parse_mode=parse_mode)
+            return True
+        except TelegramRetryAfter:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to edit real message from HeadlessBot: {e}")
+            return False
+
+    async def send_chat_action(self, chat_id, action="typing"):
         if self._real_bot:
-            try:
-                await self._real_bot.edit_message_text(text, chat_id, message_id, parse_mode=parse_mode)
-            except Exception as e:
-                logger.error(f"Failed to edit real message from HeadlessBot: {e}")
+            await self._real_bot.send_chat_action(chat_id, action=action)
 
     async def set_my_commands(self, commands):
         if self._real_bot:
@@ -76,19 +88,29 @@ def init_engine(real_bot=None):
     core.logger.setup_logging("logs/delio_api.json", level=config.LOG_LEVEL)
     
     # 2. Init Bot
+    if real_bot is not None:
+        from core.metrics import telegram_request_middleware
+        real_bot.session.middleware(telegram_request_middleware)
     bot = HeadlessBot(real_bot=real_bot)
     
     # 3. Register States
     fsm.register_handler(State.OBSERVE, ObserveState())
     fsm.register_handler(State.RETRIEVE, RetrieveState())
-    fsm.register_handler(State.PLAN, PlanState())
+    fsm.register_handler(State.PLAN, PlanState(bot))
     fsm.register_handler(State.DECIDE, DecideState())
     fsm.register_handler(State.ACT, ActState())
     fsm.register_handler(State.RESPOND, RespondState(bot))
-    fsm.register_handler(State.REFLECT, ReflectState(bot))
-    fsm.register_handler(State.MEMORY_WRITE, MemoryWriteState())
+    reflect_state = ReflectState(bot)
+    memory_write_state = MemoryWriteState()
+    fsm.register_handler(State.REFLECT, reflect_state)
+    fsm.register_handler(State.MEMORY_WRITE, memory_write_state)
     fsm.register_handler(State.DEEP_THINK, DeepThinkState(bot))
     fsm.register_handler(State.ERROR, ErrorState(bot))
+
+    # Post-processing jobs (workers are started by the server on startup)
+    postprocess.register("critic", reflect_state.review)
+    postprocess.register("reflect", reflect_state.post_process)
+    postprocess.register("memory_write", memory_write_state.persist)
     
     # 4. Memory V2
     db_path = config.SQLITE_DB_PATH
@@ -103,26 +125,32 @@ def init_engine(real_bot=None):
     logger.info("✅ Delio Headless Engine Initialized")
     _engine_initialized = True
 
-async def process_request(user_id: int, text: str, message_id: int = None, platform: str = "api") -> ExecutionContext:
+async def process_request(user_id: int, text: str, message_id: int = None, platform: str = "api",
+                          metadata: dict = None) -> ExecutionContext:
     """
     Process a request through the FSM and return the final ExecutionContext.
+    `metadata` (e.g. {"mode": "deep_think"}) is merged into the event metadata.
     """
     if not _engine_initialized:
         init_engine()
         
     logger.info(f"🚀 Processing API Request for {user_id}: {text[:20]}...")
+
+    from core.providers import providers
+    if providers.cassette is not None and providers.cassette.mode == "record":
+        providers.cassette.inbound(user_id, text, metadata or {})
     
-    # 1. Intent Classification (Phase 2)
+    # 1. Intent Classification (Phase 2) - speculative: runs concurrently with
+    # memory retrieval (OBSERVE prefetch) and is awaited by PLAN
     from core.router import router
-    intent = await router.classify(text)
-    logger.info(f"🚦 Intent Classified: {intent}")
+    intent_task = asyncio.create_task(router.classify(text))
 
     event_data = {
         "user_id": user_id,
         "type": "message",
         "text": text,
-        "intent": intent, # Pass to context
-        "metadata": {"platform": platform, "message_id": message_id}
+        "intent_task": intent_task, # Joined in PLAN
+        "metadata": {**(metadata or {}), "platform": platform, "message_id": message_id}
     }
     
     # Run FSM
@@ -3,18 +3,27 @@ import asyncio
 from core.state import State
 from core.context import ExecutionContext, trace_var
 from core.state_guard import guard
+from core.coordination import Coordinator, coordinator
+from core.notifications import reminders
+from core.heartbeat import activity
+from core.metrics import metrics, FSM_STATE_SECONDS
+from core.streaming import run_events_var
 
 MAX_TRANSITIONS = 20
 FSM_TIMEOUT_SECONDS = 90
 
 logger = logging.getLogger("Delio.FSM")
 
+
 class FSMController:
-    def __init__(self):
+    def __init__(self, coordinator: Coordinator = None):
         self.state_handlers = {}
         self.current_state = State.IDLE
-        self._session_locks = {}
-        self._meta_lock = asyncio.Lock()
+        self.coordinator = coordinator or Coordinator()
+
+    @property
+    def sessions(self):
+        return self.coordinator.sessions
 
     def register_handler(self, state: State, handler):
         self.state_handlers[state] = handler
@@ -28,13 +37,11 @@ class FSMController:
         count = guard.reset_all_states()
         logger.info(f"✅ Reset {count} users to IDLE.")
 
-    async def _get_session_lock(self, user_id: int) -> asyncio.Lock:
-        if user_id in self._session_locks:
-            return self._session_locks[user_id]
-        async with self._meta_lock:
-            if user_id not in self._session_locks:
-                self._session_locks[user_id] = asyncio.Lock()
-            return self._session_locks[user_id]
+    def active_sessions(self) -> int:
+        return self.sessions.active()
+
+    def lock_waiters(self) -> int:
+        return self.sessions.waiters()
 
     async def process_event(self, event_data: dict):
         """
@@ -48,26 +55,34 @@ class FSMController:
             intent=event_data.get("intent", "COMPLEX"),
             metadata=event_data.get("metadata", {})
         )
+        if event_data.get("intent_task") is not None:
+            context.pending["intent"] = event_data["intent_task"]
+        if context.event_type != "heartbeat":
+            activity.touch(user_id)  # Active-user index for the heartbeat fan-out
         
         # Set Trace Context
         token = trace_var.set(context.trace_id)
+        events = run_events_var.get()  # SSE / job clients following this run
         
         logger.info(f"🌀 FSM Starting process for user {user_id} (event: {context.event_type})")
         context.add_trace("START")
 
-        session_lock = await self._get_session_lock(user_id)
-
         # Initial transition
         try:
             # 🔒 SESSION LOCK: Prevent concurrent requests (double clicks, spam)
-            if session_lock.locked():
+            if self.sessions.locked(user_id):
                  logger.warning(f"⏳ User {user_id} session active. Waiting for lock...")
 
-            async with session_lock:
+            # Local lock first, then the user's lease (shared by all workers)
+            async with self.coordinator.session(user_id) as lease:
+                context.metadata["fencing_token"] = lease.fence
                 async with asyncio.timeout(FSM_TIMEOUT_SECONDS):
                     guard.force_idle(user_id) # Safe inside lock
                     await guard.enter(user_id, State.OBSERVE)
                     current_state = State.OBSERVE
+                    await self.coordinator.publish_state(lease, current_state)
+                    if events:
+                        events.emit("state", {"state": current_state.name})
                     
                     transitions_count = 0
                     
@@ -87,6 +102,12 @@ class FSMController:
                             if transitions_count > MAX_TRANSITIONS + 2:
                                 break
                         
+                        if lease.lost:
+                            # Another worker may own the user now: stop before any further side effects
+                            logger.critical(f"🛑 Session lease lost for user {user_id}, aborting in {current_state}")
+                            context.errors.append("Session lease lost")
+                            break
+
                         handler = self.state_handlers.get(current_state)
                         if not handler:
                             logger.error(f"❌ No handler for state: {current_state}")
@@ -99,10 +120,15 @@ class FSMController:
                         context.add_trace(current_state.name)
                         
                         try:
-                            next_state = await handler.execute(context)
+                            with FSM_STATE_SECONDS.track(current_state.name):
+                                next_state = await handler.execute(context)
                             # Enforce transition through Guard
                             await guard.enter(user_id, next_state)
                             current_state = next_state
+                            if not await self.coordinator.publish_state(lease, current_state):
+                                lease.lost = True  # Fenced out by a newer holder
+                            if events:
+                                events.emit("state", {"state": current_state.name})
                         except Exception as e:
                             logger.exception(f"💥 Error in state {current_state} for user {user_id}: {e}")
                             context.errors.append(str(e))
@@ -116,10 +142,23 @@ class FSMController:
             context.errors.append("Processing timed out")
 
         finally:
+            # Drop speculative work that was never joined (ERROR / timeout paths)
+            for task in context.pending.values():
+                if not isinstance(task, asyncio.Task):
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception() # Mark as retrieved
+            context.pending.clear()
             guard.force_idle(user_id)
+            # Deliver reminders that fired while the user was busy
+            reminders.on_idle(user_id)
             trace_var.reset(token)
             
         return context
 
 # Singleton instance for the system
-instance = FSMController()
+instance = FSMController(coordinator)
+metrics.gauge("delio_fsm_active_sessions", "Users with an FSM run holding their session lock", instance.active_sessions)
+metrics.gauge("delio_fsm_lock_waiters", "FSM events waiting for a user's session lock", instance.lock_waiters)
@@ -0,0 +1,338 @@
+"""
+Heartbeat Fan-out (active-user index + paced dispatcher)
+- ActivityIndex: last_seen per user, touched in memory by the FSM on every
+  user event and written behind to SQLite on each heartbeat tick (and shutdown)
+- HeartbeatDispatcher: spreads one round of heartbeats over a window of the
+  interval (evenly spaced slots with per-slot jitter, random order), runs at most
+  HEARTBEAT_CONCURRENCY FSM heartbeats at a time, and never starts a second
+  heartbeat for a user whose previous one is still pending
+- HeartbeatGate: pre-PLAN SKIP predictor from local signals (due reminders and
+  tasks, profile writes and messages since the last LLM heartbeat, the user's
+  historical SKIP rate). "shadow" only records agreement with the model's
+  decision; "on" ends the heartbeat in OBSERVE when nothing is actionable
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiosqlite
+import config
+from core.coordination import coordinator
+from core.metrics import metrics
+
+logger = logging.getLogger("Delio.Heartbeat")
+
+
+SYNC_OVERLAP_SECONDS = 60
+
+
+class ActivityIndex:
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or config.HEARTBEAT_DB_PATH
+        self._seen: Dict[int, float] = {}
+        self._dirty = set()
+        self._loaded = False
+        self._synced_at = 0.0  # Start of the last sync: later syncs read rows written since then
+
+    def touch(self, user_id: int, ts: float = None):
+        """O(1), no I/O: called on the hot path of every user event."""
+        self._seen[user_id] = ts or time.time()
+        self._dirty.add(user_id)
+
+    def last_seen(self, user_id: int) -> float:
+        return self._seen.get(user_id, 0.0)
+
+    def active_since(self, since: float) -> List[int]:
+        return [user_id for user_id, seen in self._seen.items() if seen > since]
+
+    async def sync(self, keep_seconds: float = None):
+        """
+        Merge rows written since the last sync (all recent ones the first time; other
+        workers' users included), then write back users touched here since then.
+        """
+        keep_seconds = keep_seconds or config.HEARTBEAT_ACTIVE_HOURS * 3600
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        now = time.time()
+        async with aiosqlite.connect(self.db_path) as conn:
+            if not self._loaded:
+                await conn.execute(
+                    "CREATE TABLE IF NOT EXISTS user_activity (user_id INTEGER PRIMARY KEY, last_seen REAL NOT NULL, "
+                    "synced_at REAL)"
+                )
+                async with conn.execute("PRAGMA table_info(user_activity)") as cursor:
+                    columns = {row[1] for row in await cursor.fetchall()}
+                if "synced_at" not in columns:  # Index files created before incremental reads
+                    await conn.execute("ALTER TABLE user_activity ADD COLUMN synced_at REAL")
+                await conn.execute("CREATE INDEX IF NOT EXISTS idx_user_activity_seen ON user_activity(last_seen)")
+                await conn.execute("CREATE INDEX IF NOT EXISTS idx_user_activity_synced ON user_activity(synced_at)")
+                self._loaded = True
+
+            # Overlap covers clock skew between workers; re-merging a row is harmless
+            since = self._synced_at - SYNC_OVERLAP_SECONDS if self._synced_at else 0.0
+            async with conn.execute(
+                "SELECT user_id, last_seen FROM user_activity WHERE last_seen > ? AND (? = 0 OR synced_at >= ?)",
+                (now - keep_seconds, since, since)
+            ) as cursor:
+                async for user_id, seen in cursor:
+                    # Newer local touches win
+                    if seen > self._seen.get(user_id, 0):
+                        self._seen[user_id] = seen
+
+            dirty, self._dirty = self._dirty, set()
+            if dirty:
+                await conn.executemany(
+                    "INSERT INTO user_activity (user_id, last_seen, synced_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen), "
+                    "synced_at = excluded.synced_at",
+                    [(user_id, self._seen[user_id], now) for user_id in dirty if user_id in self._seen]
+                )
+            await conn.commit()
+        self._synced_at = now
+
+        # Users inactive beyond the window are only kept on disk
+        cutoff = time.time() - keep_seconds
+        for user_id in [u for u, seen in self._seen.items() if seen <= cutoff]:
+            del self._seen[user_id]
+
+    def __len__(self):
+        return len(self._seen)
+
+
+ProcessEvent = Callable[[dict], Awaitable[object]]
+
+
+class HeartbeatDispatcher:
+    def __init__(self, index: ActivityIndex, process_event: Optional[ProcessEvent] = None, concurrency: int = None):
+        self.index = index
+        self._process_event = process_event
+        self._slots = asyncio.Semaphore(concurrency or config.HEARTBEAT_CONCURRENCY)
+        self._in_flight = set()  # Scheduled in a round and not finished yet
+        self._waiting = 0  # Slot reached, blocked on the concurrency cap
+        self._rounds = set()
+        self._durations: deque = deque(maxlen=512)
+        self._last_round_seconds = 0.0
+        self.counters = {"rounds": 0, "dispatched": 0, "completed": 0, "failed": 0, "skipped_busy": 0, "overlapped": 0}
+
+    @staticmethod
+    def plan(users: List[int], window: float) -> List[Tuple[float, int]]:
+        """(delay, user_id) pairs: one evenly spaced slot per user, jittered within its slot."""
+        users = list(users)
+        random.shuffle(users)
+        if not users:
+            return []
+        slot = window / len(users)
+        return [(i * slot + random.uniform(0, slot), user_id) for i, user_id in enumerate(users)]
+
+    def dispatch(self, window: float) -> Optional[asyncio.Task]:
+        """Start one heartbeat round spread across `window` seconds; returns the round task."""
+        users = self.index.active_since(time.time() - config.HEARTBEAT_ACTIVE_HOURS * 3600)
+        fresh = [user_id for user_id in users if user_id not in self._in_flight]
+        self.counters["rounds"] += 1
+        self.counters["overlapped"] += len(users) - len(fresh)
+        if len(fresh) < len(users):
+            logger.warning(f"⚠️ Heartbeat backlog: {len(users) - len(fresh)} users still pending from the previous round")
+        if not fresh:
+            return None
+
+        self._in_flight.update(fresh)
+        logger.debug(f"💓 Heartbeat round: {len(fresh)} users over {window:.0f}s")
+        task = asyncio.create_task(self._round(self.plan(fresh, window)))
+        self._rounds.add(task)
+        task.add_done_callback(self._rounds.discard)
+        return task
+
+    async def _round(self, plan: List[Tuple[float, int]]):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        beats = []
+        try:
+            for delay, user_id in sorted(plan):
+                wait = started + delay - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                beats.append(asyncio.create_task(self._beat(user_id)))
+            await asyncio.gather(*beats)
+        finally:
+            # Cancelled round: users not reached yet become eligible again
+            self._in_flight.difference_update(user_id for _, user_id in plan)
+        self._last_round_seconds = loop.time() - started
+
+    async def _beat(self, user_id: int):
+        self._waiting += 1
+        queued = True
+        try:
+            async with self._slots:
+                self._waiting -= 1
+                queued = False
+                if await coordinator.is_busy(user_id):
+                    self.counters["skipped_busy"] += 1
+                    return
+                process_event = self._process_event
+                if process_event is None:
+                    from core.fsm import instance as fsm
+                    process_event = fsm.process_event
+                self.counters["dispatched"] += 1
+                t0 = time.perf_counter()
+                try:
+                    await process_event({"user_id": user_id, "type": "heartbeat", "text": "SYSTEM_HEARTBEAT"})
+                    self.counters["completed"] += 1
+                except Exception as e:
+                    self.counters["failed"] += 1
+                    logger.error(f"❌ Heartbeat failed for user {user_id}: {e}")
+                self._durations.append(time.perf_counter() - t0)
+        finally:
+            if queued:
+                self._waiting -= 1
+            self._in_flight.discard(user_id)
+
+    def stats(self) -> Dict[str, object]:
+        durations = sorted(self._durations)
+        return {
+            **self.counters,
+            "active_users": len(self.index),
+            "backlog": len(self._in_flight),
+            "waiting_for_slot": self._waiting,
+            "avg_beat_seconds": round(sum(durations) / len(durations), 3) if durations else 0.0,
+            "p95_beat_seconds": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 3) if durations else 0.0,
+            "last_round_seconds": round(self._last_round_seconds, 3),
+        }
+
+
+class _GateHistory:
+    __slots__ = ("decisions", "last_run_at", "profile_version", "skipped_in_row")
+
+    def __init__(self, size: int):
+        self.decisions: deque = deque(maxlen=size)  # True = the model answered SKIP
+        self.last_run_at = 0.0  # Last heartbeat that reached the LLM
+        self.profile_version: Optional[int] = None
+        self.skipped_in_row = 0
+
+
+class HeartbeatGate:
+    def __init__(self, index: ActivityIndex, mode: str = None):
+        self.index = index
+        self.mode = (mode or config.HEARTBEAT_GATE).lower()
+        self._history: Dict[int, _GateHistory] = {}
+        self._due_tasks: Tuple[float, set] = (0.0, set())  # (loaded_at, user_ids with tasks due soon)
+        self.counters = {
+            "evaluated": 0, "predicted_skip": 0, "avoided_llm_calls": 0,
+            "shadow_agree": 0, "shadow_disagree": 0, "signal_errors": 0,
+        }
+
+    def _user(self, user_id: int) -> _GateHistory:
+        history = self._history.get(user_id)
+        if history is None:
+            history = self._history[user_id] = _GateHistory(config.HEARTBEAT_GATE_HISTORY)
+        return history
+
+    def forget_inactive(self) -> int:
+        """Drop history of users that fell out of the activity index (keeps the table bounded)."""
+        stale = [user_id for user_id in self._history if not self.index.last_seen(user_id)]
+        for user_id in stale:
+            del self._history[user_id]
+        return len(stale)
+
+    # --- Signals ---
+
+    async def _users_with_due_tasks(self) -> set:
+        # get_due_soon scans every pending task, so one scan serves a whole round
+        loaded_at, users = self._due_tasks
+        if time.monotonic() - loaded_at < config.HEARTBEAT_GATE_TASKS_TTL:
+            return users
+        import task_manager
+        due = await asyncio.to_thread(task_manager.task_system.get_due_soon, config.HEARTBEAT_GATE_DUE_MINUTES)
+        users = {task["user_id"] for task in due}
+        self._due_tasks = (time.monotonic(), users)
+        return users
+
+    async def _due_items(self, user_id: int) -> bool:
+        from core.notifications import reminders
+        if await reminders.due_within(user_id, config.HEARTBEAT_GATE_DUE_MINUTES * 60):
+            return True
+        return user_id in await self._users_with_due_tasks()
+
+    async def _profile_version(self, user_id: int) -> int:
+        from core.memory.funnel import funnel
+        return await funnel.structured.profile_version(user_id)
+
+    async def signals(self, user_id: int) -> Dict[str, object]:
+        history = self._user(user_id)
+        version = await self._profile_version(user_id)
+        decisions = history.decisions
+        return {
+            "due_items": await self._due_items(user_id),
+            "profile_changed": history.profile_version is not None and version != history.profile_version,
+            "new_messages": self.index.last_seen(user_id) > history.last_run_at,
+            "skip_rate": sum(decisions) / len(decisions) if decisions else None,
+            "samples": len(decisions),
+            "profile_version": version,
+        }
+
+    # --- Decisions ---
+
+    def predict(self, signals: Dict[str, object], skipped_in_row: int = 0) -> bool:
+        """True when nothing is actionable and the model almost always SKIPs for this user."""
+        if signals["due_items"] or signals["profile_changed"] or signals["new_messages"]:
+            return False
+        if signals["samples"] < config.HEARTBEAT_GATE_MIN_SAMPLES:
+            return False  # Not enough history to trust the skip rate
+        if skipped_in_row >= config.HEARTBEAT_GATE_MAX_SKIPS:
+            return False  # Periodic real run keeps the skip rate current
+        return signals["skip_rate"] >= config.HEARTBEAT_GATE_SKIP_RATE
+
+    async def should_skip(self, user_id: int, metadata: Dict) -> bool:
+        """Pre-PLAN check for a heartbeat; True = end it without calling the LLM."""
+        if self.mode not in ("on", "shadow"):
+            return False
+        history = self._user(user_id)
+        try:
+            signals = await self.signals(user_id)
+        except Exception as e:
+            # A blind gate must not silence the user
+            self.counters["signal_errors"] += 1
+            logger.warning(f"⚠️ Heartbeat gate signals unavailable for user {user_id}: {e}")
+            return False
+
+        skip = self.predict(signals, history.skipped_in_row)
+        self.counters["evaluated"] += 1
+        self.counters["predicted_skip"] += skip
+        metadata["heartbeat_gate"] = {"predicted_skip": skip, **signals}
+
+        if skip and self.mode == "on":
+            history.skipped_in_row += 1
+            self.counters["avoided_llm_calls"] += 1
+            logger.info(f"🤐 Heartbeat gated for user {user_id} (skip rate {signals['skip_rate']:.2f}, nothing actionable)")
+            return True
+        history.skipped_in_row = 0
+        history.last_run_at = time.time()
+        history.profile_version = signals["profile_version"]
+        return False
+
+    def record(self, user_id: int, model_skipped: bool, metadata: Dict):
+        """Model decision of a heartbeat that reached the LLM (DECIDE)."""
+        self._user(user_id).decisions.append(model_skipped)
+        gate = metadata.get("heartbeat_gate")
+        if gate is not None and self.mode == "shadow":
+            agree = gate["predicted_skip"] == model_skipped
+            self.counters["shadow_agree" if agree else "shadow_disagree"] += 1
+            if not agree:
+                logger.debug(f"🔍 Heartbeat gate disagreed for user {user_id}: predicted skip={gate['predicted_skip']}, model skip={model_skipped}")
+
+    def stats(self) -> Dict[str, object]:
+        shadow = self.counters["shadow_agree"] + self.counters["shadow_disagree"]
+        return {
+            **self.counters,
+            "mode": self.mode,
+            "shadow_agreement": round(self.counters["shadow_agree"] / shadow, 4) if shadow else 0.0,
+        }
+
+
+activity = ActivityIndex()
+heartbeat = HeartbeatDispatcher(activity)
+gate = HeartbeatGate(activity)
+metrics.gauge("delio_heartbeat_backlog", "Users whose heartbeat is scheduled or running", lambda: len(heartbeat._in_flight))
@@ -0,0 +1,254 @@
+"""
+Chat Jobs (background FSM runs for the HTTP API)
+- submit() starts the run in its own task with a RunEvents log bound to it, so
+  the request handler returns at once: 202 + job id, or an SSE stream that
+  follows the log (state transitions, response chunks, final result)
+- A dropped SSE connection does not cancel the run; the client can resume
+  with Last-Event-ID or poll GET /v1/jobs/{id}
+- Finished jobs are kept for JOBS_TTL_SECONDS (at most JOBS_MAX) in this worker
+- With COORDINATION_BACKEND=redis every job's status and event log are mirrored
+  to the coordination Redis (RedisJobStore), so GET /v1/jobs/{id} and the SSE
+  resume work on any worker; a job of another worker is served from there
+  (RemoteJob, polled every JOBS_REMOTE_POLL_SECONDS)
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import config
+from core.api_models import ChatRequest, JobStatus, response_from_context
+from core.coordination import coordinator
+from core.metrics import metrics
+from core.streaming import RunEvents, run_events_var
+
+logger = logging.getLogger("Delio.Jobs")
+
+
+def _frame(event_id: int, event: str, data: Dict) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class Job:
+    __slots__ = ("id", "user_id", "status", "created_at", "finished_at", "result", "error", "events", "task")
+
+    def __init__(self, user_id: int):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.status = "running"
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.result = None
+        self.error: Optional[str] = None
+        self.events = RunEvents()
+        self.task: Optional[asyncio.Task] = None
+
+    def to_status(self) -> JobStatus:
+        return JobStatus(
+            job_id=self.id,
+            status=self.status,
+            created_at=self.created_at,
+            finished_at=self.finished_at,
+            states=[data["state"] for event, data in self.events.events if event == "state"],
+            result=self.result,
+            error=self.error
+        )
+
+    async def sse(self, last_event_id: int = None) -> AsyncIterator[str]:
+        """Server-Sent Events from the event after `last_event_id` until the run ends."""
+        start = last_event_id + 1 if last_event_id is not None else 0
+        async for item in self.events.follow(start, config.SSE_KEEPALIVE_SECONDS):
+            if item is None:
+                yield ": keepalive\n\n"
+                continue
+            yield _frame(*item)
+
+
+class RedisJobStore:
+    """Job status (JSON) + event log (list) in Redis, expiring JOBS_TTL_SECONDS after the last write."""
+
+    def __init__(self, client, prefix: str = "delio"):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    async def save(self, job: Job):
+        meta = {
+            "user_id": job.user_id,
+            "status": job.status,
+            "created_at": job.created_at,
+            "finished_at": job.finished_at,
+            "result": job.result.model_dump() if job.result else None,
+            "error": job.error,
+        }
+        ttl = int(config.JOBS_TTL_SECONDS)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(self._key(job.id), json.dumps(meta, ensure_ascii=False), ex=ttl)
+            pipe.expire(f"{self._key(job.id)}:events", ttl)
+            await pipe.execute()
+
+    async def append(self, job_id: str, events: List[Tuple[str, Dict]]):
+        key = f"{self._key(job_id)}:events"
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, *[json.dumps([event, data], ensure_ascii=False) for event, data in events])
+            pipe.expire(key, int(config.JOBS_TTL_SECONDS))
+            await pipe.execute()
+
+    async def load(self, job_id: str) -> Optional[Dict]:
+        raw = await self.client.get(self._key(job_id))
+        return json.loads(raw) if raw else None
+
+    async def events(self, job_id: str, start: int = 0) -> List[Tuple[str, Dict]]:
+        return [tuple(json.loads(raw)) for raw in await self.client.lrange(f"{self._key(job_id)}:events", start, -1)]
+
+
+class RemoteJob:
+    """A job owned by another worker, read from the RedisJobStore."""
+
+    def __init__(self, job_id: str, meta: Dict, events: List[Tuple[str, Dict]], store: RedisJobStore):
+        self.id = job_id
+        self.meta = meta
+        self.events = events
+        self.store = store
+
+    def to_status(self) -> JobStatus:
+        return JobStatus(
+            job_id=self.id,
+            status=self.meta["status"],
+            created_at=self.meta["created_at"],
+            finished_at=self.meta["finished_at"],
+            states=[data["state"] for event, data in self.events if event == "state"],
+            result=self.meta["result"],
+            error=self.meta["error"]
+        )
+
+    async def sse(self, last_event_id: int = None) -> AsyncIterator[str]:
+        i = last_event_id + 1 if last_event_id is not None else 0
+        idle = 0.0
+        while True:
+            # Status first: once finished, the events read next are the complete log
+            meta = await self.store.load(self.id)
+            finished = meta is None or meta["status"] != "running"
+            events = await self.store.events(self.id, i)
+            for event, data in events:
+                yield _frame(i, event, data)
+                i += 1
+            if finished:
+                return
+            idle = 0.0 if events else idle + config.JOBS_REMOTE_POLL_SECONDS
+            if idle >= config.SSE_KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield ": keepalive\n\n"
+            await asyncio.sleep(config.JOBS_REMOTE_POLL_SECONDS)
+
+
+class JobManager:
+    def __init__(self, process_request: Callable[..., Awaitable] = None, store: RedisJobStore = None):
+        self._process_request = process_request
+        self._store = store
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "expired": 0, "mirror_errors": 0}
+
+    def store(self) -> Optional[RedisJobStore]:
+        """Shared store when workers coordinate through Redis (None: jobs live in this worker only)."""
+        if self._store is None and coordinator.backend.distributed:
+            self._store = RedisJobStore(coordinator.backend._client(), coordinator.backend.prefix)
+        return self._store
+
+    def submit(self, request: ChatRequest) -> Job:
+        self._prune()
+        job = Job(request.user_id)
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, request))
+        self.counters["submitted"] += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def lookup(self, job_id: str):
+        """A job of this worker, else one of another worker from the shared store (None if unknown)."""
+        job = self._jobs.get(job_id)
+        store = self.store()
+        if job is not None or store is None:
+            return job
+        meta = await store.load(job_id)
+        if meta is None:
+            return None
+        return RemoteJob(job_id, meta, await store.events(job_id), store)
+
+    async def _mirror(self, job: Job, store: RedisJobStore):
+        """Copy the job's events to the shared store as they are emitted, then its final status."""
+        try:
+            await store.save(job)
+            batch = []
+            async for event_id, event, data in job.events.follow():
+                batch.append((event, data))
+                if event_id + 1 == len(job.events.events):  # Caught up: one round-trip per burst
+                    await store.append(job.id, batch)
+                    batch = []
+            if batch:
+                await store.append(job.id, batch)
+            await store.save(job)
+        except Exception as e:
+            self.counters["mirror_errors"] += 1
+            logger.error(f"❌ Job {job.id} not mirrored to the shared store: {e}")
+
+    async def _run(self, job: Job, request: ChatRequest):
+        run_events_var.set(job.events)  # This task's context only: seen by the FSM and PLAN
+        process_request = self._process_request
+        if process_request is None:
+            from core.engine import process_request
+        store = self.store()
+        mirror = asyncio.create_task(self._mirror(job, store)) if store else None
+        job.events.emit("accepted", {"job_id": job.id})
+        try:
+            context = await process_request(
+                user_id=request.user_id,
+                text=request.message,
+                message_id=request.message_id,
+                platform=request.platform,
+                metadata=request.metadata
+            )
+            job.result = response_from_context(context)
+            job.status = "complete"
+            job.events.emit("done", job.result.model_dump())
+            self.counters["completed"] += 1
+        except Exception as e:
+            logger.error(f"❌ Job {job.id} failed for user {job.user_id}: {e}")
+            job.status = "error"
+            job.error = str(e)
+            job.events.emit("error", {"detail": str(e)})
+            self.counters["failed"] += 1
+        finally:
+            job.finished_at = time.time()
+            job.events.close()
+            if mirror is not None:
+                await mirror
+
+    def _prune(self):
+        """Drop finished jobs past their TTL, then the oldest finished ones over JOBS_MAX."""
+        cutoff = time.time() - config.JOBS_TTL_SECONDS
+        finished = [job for job in self._jobs.values() if job.finished_at is not None]
+        excess = len(self._jobs) - config.JOBS_MAX + 1
+        for job in finished:
+            if job.finished_at < cutoff or excess > 0:
+                del self._jobs[job.id]
+                excess -= 1
+                self.counters["expired"] += 1
+
+    def running(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.finished_at is None)
+
+    def stats(self) -> Dict[str, object]:
+        return {**self.counters, "running": self.running(), "retained": len(self._jobs)}
+
+
+jobs = JobManager()
+metrics.gauge("delio_jobs_running", "API chat jobs (async / SSE) still running", jobs.running)
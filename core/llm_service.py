@@ -2,21 +2,17 @@
 import logging
 import asyncio
 import config
-from typing import Tuple, Optional
+from typing import Awaitable, Callable, Tuple, Optional
 import os
 import json
 
 # Google GenAI SDK (required)
 try:
-    from google import genai
     from google.genai import types
 except ImportError as _e:
     raise ImportError(f"google-genai SDK is required: {_e}. Install with: pip install google-genai")
 
-try:
-    import anthropic
-except ImportError:
-    anthropic = None
+from core.providers import providers
 
 logger = logging.getLogger("Delio.LLMService")
 
@@ -41,12 +37,15 @@ async def call_actor(
     text: str,
     system_instruction: str,
     preferred_model: str = "gemini",
-    image_path: Optional[str] = None
+    image_path: Optional[str] = None,
+    on_partial: Optional[Callable[[str], Awaitable[None]]] = None
 ) -> Tuple[str, str]:
     """
     Primary Actor logic. 
     Supports Image input -> Gemini.
     Text input -> Gemini (or generic fallback).
+    on_partial: if set, the response is streamed and the callback receives
+    the accumulated text after every chunk. The full text is still returned.
     """
     try:
         # Determine real model name based on alias/preference
@@ -57,8 +56,6 @@ async def call_actor(
         
         logger.info(f"🎤 Calling Actor ({model_name}). Image: {image_path is not None}")
         
-        client = genai.Client(api_key=config.GEMINI_KEY)
-        
         # Prepare content list
         contents = []
         _uploaded_file_name = None
@@ -76,15 +73,8 @@ async def call_actor(
                     # For simple single-turn, passing PIL image or bytes is often faster/easier 
                     # but new SDK prefers types.Part or File object.
                     
-                    # Method A: Client File API
-                    uploaded_file = client.files.upload(file=image_path)
-                    
-                    # Wait for processing if video (images are usually instant)
-                    # But safer to check
-                    if uploaded_file.state == "PROCESSING":
-                        await asyncio.sleep(1)
-                        uploaded_file = client.files.get(name=uploaded_file.name)
-                        
+                    # Method A: Client File API (pooled client, waits while PROCESSING)
+                    uploaded_file = await providers.upload(image_path)
                     contents.append(uploaded_file)
                     _uploaded_file_name = uploaded_file.name
 
@@ -107,29 +97,37 @@ async def call_actor(
         # Ideally, we should pass history as actual chat history messages.
         # But for Phase 3.3 Task 007, we stick to the interface: user_raw_input + system_instruction.
         
-        response = await _retry_async(lambda: asyncio.to_thread(
-            client.models.generate_content,
-            model=model_name,
-            contents=contents,
-            config=types.GenerateContentConfig(
-                system_instruction=system_instruction,
-                temperature=0.7
-            )
-        ))
-        
-        if not response.text:
+        gen_config = types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            temperature=0.7
+        )
+
+        async def _stream() -> str:
+            accumulated = ""
+            async for delta in providers.generate_stream(model=model_name, contents=contents, gen_config=gen_config):
+                accumulated += delta
+                await on_partial(accumulated)
+            return accumulated
+
+        if on_partial:
+            response_text = await _retry_async(_stream)
+        else:
+            response_text = await _retry_async(lambda: providers.generate(
+                model=model_name,
+                contents=contents,
+                gen_config=gen_config
+            ))
+        
+        if not response_text:
             logger.warning(f"⚠️ Empty response from {model_name} for user {user_id}")
             return " Error: Empty response from model.", model_name
             
         # Cleanup uploaded file to avoid quota exhaustion
         if _uploaded_file_name:
-            try:
-                client.files.delete(name=_uploaded_file_name)
-            except Exception:
-                pass
+            await providers.delete_file(_uploaded_file_name)
 
-        logger.info(f"🤖 Raw response from {model_name}: {response.text[:1000]}...")
-        return response.text, model_name
+        logger.info(f"🤖 Raw response from {model_name}: {response_text[:1000]}...")
+        return response_text, model_name
 
     except Exception as e:
         logger.error(f"❌ Actor Error: {e}")
@@ -138,6 +136,19 @@ async def call_actor(
         raise e
 
 
+# Critic effectiveness counters (exposed via /health for tuning)
+critic_counters = {"runs": 0, "changed": 0, "patched": 0, "rejected": 0, "timeouts": 0, "errors": 0}
+
+
+def critic_stats() -> dict:
+    """Share of Critic runs that changed the Actor output."""
+    runs = critic_counters["runs"]
+    return {
+        **critic_counters,
+        "change_ratio": round(critic_counters["changed"] / runs, 4) if runs else 0.0,
+    }
+
+
 async def call_critic(
     user_query: str,
     actor_response: str,
@@ -147,17 +158,16 @@ async def call_critic(
     Critic logic (DeepSeek) to validate Actor response.
     """
     try:
-        # Lazy import openai
+        # Lazy check for openai (pooled AsyncOpenAI lives in core.providers)
         try:
-            from openai import OpenAI
+            import openai  # noqa: F401
         except ImportError:
             logger.warning("Optional dependency 'openai' not found. Skipping Critic phase.")
             return actor_response, "♊"
 
-        ds_client = OpenAI(api_key=config.DEEPSEEK_KEY, base_url="https://api.deepseek.com")
-        
         # Enforce a strict separator for parsing
         SEPARATOR = "@@@FINAL_RESPONSE@@@"
+        critic_counters["runs"] += 1
         
         synergy_prompt = f"""[ACTOR-CRITIC SYNERGY] 
 Ти — AID Critic (DeepSeek). Твоя задача — проаналізувати відповідь AID Actor (Gemini).
@@ -185,21 +195,15 @@ async def call_critic(
 ТВІЙ КРИТИЧНИЙ ВИСНОВОК:"""
 
         try:
-            response = await asyncio.wait_for(
-                asyncio.to_thread(
-                    ds_client.chat.completions.create,
-                    model="deepseek-chat",
-                    messages=[{"role": "user", "content": synergy_prompt}],
-                    temperature=0.3
-                ),
+            critic_output = await asyncio.wait_for(
+                providers.chat(synergy_prompt, model="deepseek-chat", temperature=0.3),
                 timeout=15.0
             )
         except asyncio.TimeoutError:
             logger.warning("⚠️ Critic timeout. Falling back to Actor response.")
+            critic_counters["timeouts"] += 1
             return actor_response, "♊⚠️ (Timeout)"
         
-        critic_output = response.choices[0].message.content
-        
         # --- ROBUST PARSING PROTOCOL ---
         if SEPARATOR in critic_output:
             final_part = critic_output.split(SEPARATOR)[-1].strip()
@@ -208,6 +212,7 @@ async def call_critic(
                 # Or give credit to Synergistic approach.
                 if final_part == actor_response.strip():
                      return final_part, "♊" # Validated, no change
+                critic_counters["changed"] += 1
                 return final_part, "♊+🐋"
         
         # Fallback for "VALIDATED" without separator (Legacy behavior support)
@@ -222,6 +227,7 @@ async def call_critic(
         
     except Exception as e:
         logger.warning(f"⚠️ Critic failed: {e}")
+        critic_counters["errors"] += 1
         return actor_response, "♊⚠️"
 
 async def call_judge(
@@ -238,8 +244,6 @@ async def call_judge(
             logger.warning("⚠️ Claude API Key missing. Skipping Judge.")
             return actor_response, "♊"
 
-        client = anthropic.AsyncAnthropic(api_key=config.ANTHROPIC_KEY)
-        
         prompt = f"""
         CONTEXT: You are the Wise Judge (Claude 3.5 Sonnet).
         GOAL: Review the Actor's response. Ensure it is helpful, accurate, and follows the Persona.
@@ -256,17 +260,13 @@ async def call_judge(
         - Return ONLY the final response text. No meta-commentary.
         """
         
-        message = await client.messages.create(
+        judge_output = await providers.claude(
+            prompt,
+            system="You are an AI Judge. Return only the refined response.",
             model=config.MODEL_JUDGE,
             max_tokens=1024,
-            temperature=0.5,
-            system="You are an AI Judge. Return only the refined response.",
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
+            temperature=0.5
         )
-        
-        judge_output = message.content[0].text
         return judge_output, "♊+🧠" # Brain for Claude
         
     except Exception as e:
@@ -300,15 +300,8 @@ OUTPUT JSON ONLY:
         # Use DeepSeek (Critic) to avoid self-evaluation bias (Actor is Gemini)
         if config.DEEPSEEK_KEY:
             try:
-                from openai import OpenAI
-                ds_client = OpenAI(api_key=config.DEEPSEEK_KEY, base_url="https://api.deepseek.com")
-                response = await asyncio.to_thread(
-                    ds_client.chat.completions.create,
-                    model="deepseek-chat",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.3
-                )
-                result = json.loads(response.choices[0].message.content)
+                content = await providers.chat(prompt, model="deepseek-chat", temperature=0.3)
+                result = json.loads(content)
                 if isinstance(result, list) and len(result) > 0:
                     return result[0]
                 return result
@@ -316,16 +309,14 @@ OUTPUT JSON ONLY:
                 logger.warning(f"⚠️ DeepSeek evaluation failed, falling back to Gemini: {ds_err}")
 
         # Fallback to Gemini
-        client = genai.Client(api_key=config.GEMINI_KEY)
-        response = await asyncio.to_thread(
-            client.models.generate_content,
+        response_text = await providers.generate(
             model=config.MODEL_FAST,
             contents=prompt,
-            config=types.GenerateContentConfig(
+            gen_config=types.GenerateContentConfig(
                 response_mime_type="application/json"
             )
         )
-        result = json.loads(response.text)
+        result = json.loads(response_text)
         if isinstance(result, list) and len(result) > 0:
             return result[0]
         return result
@@ -342,11 +333,6 @@ async def transcribe_audio(file_path: str) -> Optional[str]:
     Transcribes audio file using Gemini Flash (Fast).
     """
     try:
-        from google import genai
-        from google.genai import types
-        import os
-        client = genai.Client(api_key=config.GEMINI_KEY)
-        
         file_name = os.path.basename(file_path)
         logger.info(f"🎤 Uploading audio file: {file_name}")
         
@@ -354,27 +340,17 @@ async def transcribe_audio(file_path: str) -> Optional[str]:
              logger.error(f"❌ Audio file not found: {file_path}")
              return None
              
-        # Upload
-        audio_file = client.files.upload(file=file_path)
-        
-        # Wait for processing
-        max_wait = 30
-        waited = 0
-        while audio_file.state == "PROCESSING" and waited < max_wait:
-             await asyncio.sleep(1)
-             waited += 1
-             audio_file = client.files.get(name=audio_file.name)
+        # Upload (waits up to 30s while PROCESSING)
+        audio_file = await providers.upload(file_path, max_wait=30)
              
         if audio_file.state == "FAILED":
              raise ValueError(f"Audio processing failed: {audio_file.state}")
 
         # Generate transcription
-        response = await asyncio.to_thread(
-            client.models.generate_content,
+        return await providers.generate(
             model=config.MODEL_FAST,
             contents=[audio_file, "Please transcribe this audio file verbatim. If the audio is in Ukrainian, Russian, or Polish, transcribe it exactly in that language. Do not translate. Return ONLY the text."]
         )
-        return response.text
     except Exception as e:
         logger.error(f"Transcription Error: {e}")
         return None
@@ -401,59 +377,49 @@ Input Text:
         # Try DeepSeek first (cheaper/better for text logic)
         if config.DEEPSEEK_KEY:
             try:
-                from openai import OpenAI
-                ds_client = OpenAI(api_key=config.DEEPSEEK_KEY, base_url="https://api.deepseek.com")
-                response = await asyncio.to_thread(
-                    ds_client.chat.completions.create,
-                    model="deepseek-chat",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.3
-                )
-                return response.choices[0].message.content
+                return await providers.chat(prompt, model="deepseek-chat", temperature=0.3)
             except Exception as ds_err:
                 logger.warning(f"DeepSeek refine failed: {ds_err}. Falling back to Gemini.")
         
         # Fallback to Gemini
-        client = genai.Client(api_key=config.GEMINI_KEY)
-        response = await asyncio.to_thread(
-            client.models.generate_content,
+        return await providers.generate(
             model=config.MODEL_FAST,
             contents=prompt
         )
-        return response.text
         
     except Exception as e:
         logger.error(f"Refining Error: {e}")
         return raw_text # Fallback to raw
 
-async def extract_attributes(text: str) -> dict:
+async def extract_attributes(text: str, raise_errors: bool = False) -> dict:
     """
     Витягує атрибути користувача з тексту (ім'я, місто, професія тощо).
     Повертає dict {key: value} або {}.
+    raise_errors=True: помилка провайдера прокидається (повтор job-у), невалідний JSON = {}.
     """
     try:
-        client = genai.Client(api_key=config.GEMINI_KEY)
         prompt = f"""Extract personal attributes from this text. Return JSON only.
 Keys should be lowercase English (e.g. "name", "city", "profession", "age", "language").
 If no attributes found, return empty object {{}}.
 
 Text: "{text}"
 """
-        response = await asyncio.to_thread(
-            client.models.generate_content,
+        response_text = await providers.generate(
             model=config.MODEL_FAST,
             contents=prompt,
-            config=types.GenerateContentConfig(
+            gen_config=types.GenerateContentConfig(
                 response_mime_type="application/json"
             )
         )
-        result = json.loads(response.text)
+        result = json.loads(response_text)
         if isinstance(result, list) and len(result) > 0:
             return result[0]
         if isinstance(result, dict):
             return result
         return {}
     except Exception as e:
+        if raise_errors and not isinstance(e, json.JSONDecodeError):
+            raise
         logger.warning(f"⚠️ extract_attributes failed: {e}")
         return {}
 
@@ -470,10 +436,6 @@ async def call_deep_think(
     """
     try:
         from core.prompts.deep_think import DEEP_THINK_SYSTEM
-        from google import genai
-        from google.genai import types
-        
-        client = genai.Client(api_key=config.GEMINI_KEY)
         
         # Build analytical context
         full_instruction = f"{DEEP_THINK_SYSTEM}\n\n### [CONTEXT SUMMARY]\n{memory_summary}"
@@ -483,30 +445,25 @@ async def call_deep_think(
         # Prepare contents
         contents = []
         if image_path and os.path.exists(image_path):
-            uploaded_file = client.files.upload(file=image_path)
-            # Wait for processing
-            while uploaded_file.state == "PROCESSING":
-                await asyncio.sleep(1)
-                uploaded_file = client.files.get(name=uploaded_file.name)
+            uploaded_file = await providers.upload(image_path)
             contents.append(uploaded_file)
 
         contents.append(f"[QUERY]: {text}")
         
-        response = await asyncio.to_thread(
-            client.models.generate_content,
+        response_text = await providers.generate(
             model=config.MODEL_SMART, # Always use Pro for Deep Think
             contents=contents,
-            config=types.GenerateContentConfig(
+            gen_config=types.GenerateContentConfig(
                 system_instruction=full_instruction,
                 temperature=0.4, # Lower temperature for better logic
                 max_output_tokens=2048
             )
         )
         
-        if not response.text:
+        if not response_text:
              return "Error: Empty response in Deep Think", "Error"
              
-        return response.text, config.MODEL_SMART
+        return response_text, config.MODEL_SMART
         
     except Exception as e:
         logger.error(f"❌ Deep Think Error: {e}")
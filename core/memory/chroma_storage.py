@@ -2,7 +2,7 @@ import chromadb
 import logging
 import asyncio
 import uuid
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
 import os
 import config
@@ -17,6 +17,7 @@ class ChromaManager:
         self.db_path = db_path
         self.client = None
         self.collection = None
+        self.obsidian = None  # Written by scripts/obsidian_sync.py, read-only here
 
     def _init_sync(self):
         """Synchronous initialization"""
@@ -27,6 +28,7 @@ class ChromaManager:
                 name="delio_memories",
                 metadata={"hnsw:space": "cosine"}
             )
+            self.obsidian = self.client.get_or_create_collection(name=config.OBSIDIAN_COLLECTION)
             logger.info(f"✅ ChromaDB initialized at {self.db_path}")
         except Exception as e:
             logger.error(f"❌ ChromaDB init failed: {e}")
@@ -36,43 +38,53 @@ class ChromaManager:
         loop = asyncio.get_running_loop()
         await loop.run_in_executor(None, self._init_sync)
 
-    def _get_embedding_sync(self, text: str, task_type: str = "retrieval_document") -> List[float]:
-        """Calls Gemini API for embedding (Sync wrapper)"""
+    async def _get_embeddings(self, texts: List[str], task_type: str = "retrieval_document",
+                              raise_errors: bool = False) -> List[List[float]]:
+        """Batched + cached embeddings via the shared EmbeddingService"""
         try:
-            if not text: return []
-            
-            # Use Google GenAI SDK
-            from google import genai
-            client = genai.Client(api_key=config.GEMINI_KEY)
-            
-            result = client.models.embed_content(
-                model="models/gemini-embedding-001",
-                contents=text,
-                config={'task_type': task_type.upper()}
-            )
-            return result.embeddings[0].values
+            from core.memory.embeddings import embeddings
+            return await embeddings.embed(texts, task_type=task_type)
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"Embedding error: {e}")
-            return []
+            return [[] for _ in texts]
+
+    async def _get_embedding(self, text: str, task_type: str = "retrieval_document") -> List[float]:
+        return (await self._get_embeddings([text], task_type))[0]
 
     async def store_memory(self, user_id: int, text: str, metadata: dict = None):
         """Store a semantic memory"""
+        await self.store_memories(user_id, [(text, metadata)])
+
+    async def store_memories(self, user_id: int, items: List[Tuple[str, Optional[dict]]],
+                             ids: Optional[List[str]] = None, raise_errors: bool = False):
+        """
+        Store several memories with one embedding batch and one Chroma write.
+        With `ids` (one per item) the write is an upsert: a retried job cannot duplicate.
+        With `raise_errors` an embedding failure propagates instead of dropping the items.
+        """
         if not self.collection: return
-        
-        if metadata is None: metadata = {}
-        metadata["user_id"] = user_id
-        metadata["timestamp"] = datetime.now().isoformat()
-        
+
+        timestamp = datetime.now().isoformat()
+        vectors = await self._get_embeddings([text for text, _ in items], "retrieval_document", raise_errors)
+        item_ids = ids or [str(uuid.uuid4()) for _ in items]
+
+        documents, embeddings, metadatas, doc_ids = [], [], [], []
+        for (text, metadata), emb, doc_id in zip(items, vectors, item_ids):
+            if not emb: continue
+            metadata = dict(metadata or {})
+            metadata["user_id"] = user_id
+            metadata["timestamp"] = timestamp
+            documents.append(text)
+            embeddings.append(emb)
+            metadatas.append(metadata)
+            doc_ids.append(doc_id)
+        if not documents: return
+
         def _do_store():
-            emb = self._get_embedding_sync(text, "retrieval_document")
-            if not emb: return False
-            
-            self.collection.add(
-                documents=[text],
-                embeddings=[emb],
-                metadatas=[metadata],
-                ids=[str(uuid.uuid4())]
-            )
+            write = self.collection.upsert if ids else self.collection.add
+            write(documents=documents, embeddings=embeddings, metadatas=metadatas, ids=doc_ids)
             return True
 
         loop = asyncio.get_running_loop()
@@ -82,19 +94,31 @@ class ChromaManager:
         """Semantic search"""
         if not self.collection: return []
 
+        emb = await self._get_embedding(query, "retrieval_query")
+        if not emb: return []
+
+        hits = await self.query(self.collection, emb, limit, where={"user_id": user_id})
+        return [hit["text"] for hit in hits]
+
+    async def query(self, collection, embedding: List[float], limit: int, where: dict = None) -> List[dict]:
+        """Nearest neighbours by a precomputed query vector: [{id, text, metadata, distance}]"""
+        if collection is None or not embedding: return []
+
         def _do_search():
-            emb = self._get_embedding_sync(query, "retrieval_query")
-            if not emb: return []
-            
-            results = self.collection.query(
-                query_embeddings=[emb],
-                n_results=limit,
-                where={"user_id": user_id}
-            )
-            
-            if results and results['documents']:
-                return [doc for doc in results['documents'][0] if doc]
-            return []
+            kwargs = {"query_embeddings": [embedding], "n_results": limit}
+            if where:
+                kwargs["where"] = where
+            results = collection.query(**kwargs)
+            if not results or not results['documents']:
+                return []
+            return [
+                {"id": id_, "text": doc, "metadata": meta or {}, "distance": dist}
+                for id_, doc, meta, dist in zip(
+                    results['ids'][0], results['documents'][0],
+                    results['metadatas'][0], results['distances'][0]
+                )
+                if doc
+            ]
 
         loop = asyncio.get_running_loop()
         return await loop.run_in_executor(None, _do_search)
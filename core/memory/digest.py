@@ -6,6 +6,7 @@ from typing import Optional
 from datetime import datetime
 import config
 from core.memory.funnel import funnel
+from core.memory.structured import MemoryRow
 from core.prompts.digestion import DIGESTION_SYSTEM
 
 logger = logging.getLogger("Delio.Memory.Digest")
@@ -27,10 +28,8 @@ async def summarize_recent_history(user_id: int):
         history_text = "\n".join([f"{m['role'].upper()}: {m['content']}" for m in history])
         
         # 2. Call LLM (Gemini Flash for speed/cost)
-        from google import genai
         from google.genai import types
-        
-        client = genai.Client(api_key=config.GEMINI_KEY)
+        from core.providers import providers
         
         prompt = f"""
         RECENT CHAT LOG:
@@ -39,24 +38,26 @@ async def summarize_recent_history(user_id: int):
         Analyze this log and extract profile updates according to your instructions.
         """
         
-        response = await asyncio.to_thread(
-            client.models.generate_content,
+        response_text = await providers.generate(
             model=config.MODEL_FAST,
             contents=prompt,
-            config=types.GenerateContentConfig(
+            gen_config=types.GenerateContentConfig(
                 system_instruction=DIGESTION_SYSTEM,
                 response_mime_type="application/json"
             )
         )
         
         try:
-            data = json.loads(response.text)
+            data = json.loads(response_text)
         except json.JSONDecodeError:
             # Handle potential markdown wrapping
-            clean_text = response.text.replace("```json", "").replace("```", "").strip()
+            clean_text = response_text.replace("```json", "").replace("```", "").strip()
             data = json.loads(clean_text)
             
-        # 3. Update Structured Memory
+        # 3. Update Structured Memory (one transaction for facts + lessons)
+        source = {"source": "digestion_heartbeat"}
+        rows = []
+
         # Extract facts
         facts = data.get("extracted_facts", [])
         for fact in facts:
@@ -67,29 +68,18 @@ async def summarize_recent_history(user_id: int):
             
             if section and key and value:
                 logger.info(f"💾 Digested Fact: {section}.{key} = {value}")
-                await funnel.structured.set_memory(
-                    user_id=user_id,
-                    section=section,
-                    key=key,
-                    value=value,
-                    confidence=confidence,
-                    metadata={"source": "digestion_heartbeat"}
-                )
+                rows.append(MemoryRow(section, key, value, confidence, source))
         
         # Extract lessons (lessons_learned)
+        # We could save these to a specific 'lessons' table or feedback section
+        # For now, let's put them in 'feedback_signals'
         lessons = data.get("lessons_learned", [])
-        if lessons:
-            # We could save these to a specific 'lessons' table or feedback section
-            # For now, let's put them in 'feedback_signals'
-            for idx, lesson in enumerate(lessons):
-                 await funnel.structured.set_memory(
-                     user_id=user_id,
-                     section="feedback_signals",
-                     key=f"lesson_{datetime.now().strftime('%Y%m%d')}_{idx}",
-                     value=lesson,
-                     confidence=0.7,
-                     metadata={"source": "digestion_heartbeat"}
-                 )
+        for idx, lesson in enumerate(lessons):
+            rows.append(MemoryRow(
+                "feedback_signals", f"lesson_{datetime.now().strftime('%Y%m%d')}_{idx}", lesson, 0.7, source
+            ))
+
+        await funnel.structured.set_many(user_id, rows)
 
         logger.info(f"✅ Digestion complete for user {user_id}. Facts updated: {len(facts)}")
         return data
@@ -0,0 +1,227 @@
+"""
+Embedding Service (batched + cached)
+- Coalesces concurrent requests into one batched embed_content call per
+  (model, task_type) within a short window (EMBED_BATCH_WINDOW_MS)
+- Persistent on-disk cache keyed by (model, task_type, sha256(text)), LRU-evicted
+- Cache hits never touch the network
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import aiosqlite
+import config
+from core.providers import providers
+
+logger = logging.getLogger("Delio.Memory.Embeddings")
+
+DEFAULT_MODEL = "models/gemini-embedding-001"
+
+
+def cache_key(model: str, task_type: str, text: str) -> str:
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}|{task_type.lower()}|{digest}"
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingCache:
+    """SQLite vector cache with LRU eviction (last_used timestamp)."""
+
+    def __init__(self, db_path: str, max_entries: int):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._count: Optional[int] = None
+
+    async def _get_conn(self) -> aiosqlite.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = await aiosqlite.connect(self.db_path)
+            await self._conn.execute("PRAGMA journal_mode=WAL;")
+            await self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            await self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embedding_lru ON embedding_cache(last_used)")
+            await self._conn.commit()
+            async with self._conn.execute("SELECT COUNT(*) FROM embedding_cache") as cursor:
+                (self._count,) = await cursor.fetchone()
+        return self._conn
+
+    async def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        conn = await self._get_conn()
+        placeholders = ",".join("?" * len(keys))
+        async with conn.execute(
+            f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})", keys
+        ) as cursor:
+            rows = await cursor.fetchall()
+        if rows:
+            await conn.execute(
+                f"UPDATE embedding_cache SET last_used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                [time.time()] + [key for key, _ in rows]
+            )
+            await conn.commit()
+        return {key: _unpack(blob) for key, blob in rows}
+
+    async def put_many(self, items: Dict[str, List[float]]):
+        if not items:
+            return
+        conn = await self._get_conn()
+        now = time.time()
+        await conn.executemany(
+            "INSERT OR REPLACE INTO embedding_cache (key, vector, last_used) VALUES (?, ?, ?)",
+            [(key, _pack(vector), now) for key, vector in items.items()]
+        )
+        self._count += len(items)
+        if self._count > self.max_entries:
+            async with conn.execute("SELECT COUNT(*) FROM embedding_cache") as cursor:
+                (self._count,) = await cursor.fetchone()
+            overflow = self._count - self.max_entries
+            if overflow > 0:
+                await conn.execute(
+                    "DELETE FROM embedding_cache WHERE key IN "
+                    "(SELECT key FROM embedding_cache ORDER BY last_used LIMIT ?)",
+                    (overflow,)
+                )
+                self._count -= overflow
+        await conn.commit()
+
+    async def close(self):
+        if self._conn:
+            await self._conn.close()
+            self._conn = None
+
+
+class EmbeddingService:
+    def __init__(self, cache_path: str = None, max_entries: int = None,
+                 window_ms: float = None, batch_max: int = None):
+        self.cache = EmbeddingCache(
+            cache_path or config.EMBED_CACHE_PATH,
+            max_entries or config.EMBED_CACHE_MAX_ENTRIES
+        )
+        self.window = (window_ms if window_ms is not None else config.EMBED_BATCH_WINDOW_MS) / 1000
+        self.batch_max = batch_max or config.EMBED_BATCH_MAX
+        self._loop = None
+        self._batches: Dict[Tuple[str, str], Dict[str, asyncio.Future]] = {}
+        self._timers: Dict[Tuple[str, str], asyncio.TimerHandle] = {}
+        self.counters = {"texts": 0, "cache_hits": 0, "batches": 0, "api_texts": 0, "errors": 0}
+
+    def _bind_loop(self):
+        # Pending futures belong to one event loop (tests run one loop per test)
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._batches = {}
+            self._timers = {}
+
+    def stats(self) -> Dict[str, float]:
+        texts = self.counters["texts"]
+        return {
+            **self.counters,
+            "hit_ratio": round(self.counters["cache_hits"] / texts, 4) if texts else 0.0,
+        }
+
+    async def embed(self, texts: List[str], task_type: str = "retrieval_document",
+                    model: str = DEFAULT_MODEL) -> List[List[float]]:
+        """One vector per text ([] for empty text). Raises if the provider call fails."""
+        self._bind_loop()
+        results: List[Optional[List[float]]] = [[] if not text else None for text in texts]
+        keys = {i: cache_key(model, task_type, text) for i, text in enumerate(texts) if text}
+        self.counters["texts"] += len(keys)
+
+        try:
+            cached = await self.cache.get_many(list(set(keys.values())))
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding cache read failed: {e}")
+            cached = {}
+        for i, key in keys.items():
+            if key in cached:
+                results[i] = cached[key]
+                self.counters["cache_hits"] += 1
+
+        misses = [i for i in keys if results[i] is None]
+        if misses:
+            futures = [self._submit(model, task_type, texts[i]) for i in misses]
+            # Futures are shared with other callers: our cancellation must not cancel theirs
+            vectors = await asyncio.gather(*[asyncio.shield(future) for future in futures])
+            for i, vector in zip(misses, vectors):
+                results[i] = vector
+        return results
+
+    async def embed_one(self, text: str, task_type: str = "retrieval_document",
+                        model: str = DEFAULT_MODEL) -> List[float]:
+        return (await self.embed([text], task_type=task_type, model=model))[0]
+
+    def _submit(self, model: str, task_type: str, text: str) -> asyncio.Future:
+        """Join the open batch for (model, task_type); identical texts share one future."""
+        batch_key = (model, task_type)
+        batch = self._batches.get(batch_key)
+        if batch is None:
+            batch = self._batches[batch_key] = {}
+            self._timers[batch_key] = self._loop.call_later(
+                self.window, lambda: asyncio.ensure_future(self._flush(batch_key))
+            )
+        future = batch.get(text)
+        if future is None:
+            future = batch[text] = self._loop.create_future()
+        if len(batch) >= self.batch_max:
+            asyncio.ensure_future(self._flush(batch_key))
+        return future
+
+    async def _flush(self, batch_key: Tuple[str, str]):
+        batch = self._batches.pop(batch_key, None)
+        timer = self._timers.pop(batch_key, None)
+        if timer:
+            timer.cancel()
+        if not batch:
+            return
+
+        model, task_type = batch_key
+        texts = list(batch)
+        self.counters["batches"] += 1
+        self.counters["api_texts"] += len(texts)
+        try:
+            vectors = await providers.embed(texts, model=model, task_type=task_type)
+            if len(vectors) != len(texts):
+                raise RuntimeError(f"Embedding count mismatch: {len(vectors)} for {len(texts)} texts")
+        except Exception as e:
+            self.counters["errors"] += 1
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        else:
+            for text, vector in zip(texts, vectors):
+                if not batch[text].done():
+                    batch[text].set_result(vector)
+        finally:
+            # Cancelled flush (loop shutdown, timeout): nobody may wait forever
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(RuntimeError("Embedding batch was cancelled"))
+        try:
+            await self.cache.put_many({cache_key(model, task_type, t): v for t, v in zip(texts, vectors)})
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding cache write failed: {e}")
+
+
+embeddings = EmbeddingService()
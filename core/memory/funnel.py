@@ -2,8 +2,7 @@ import logging
 import asyncio
 import sys
 import os
-import time as _time
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 import config
 
 # Ensure legacy path is available for imports
@@ -15,6 +14,9 @@ from core.state_guard import guard, Action
 from core.memory.structured import StructuredMemory
 from core.memory.redis_storage import RedisManager
 from core.memory.chroma_storage import ChromaManager
+from core.memory.obsidian_index import ObsidianIndex
+from core.memory.retrieval import RetrievalEngine
+from core.metrics import FUNNEL_LEG_SECONDS, timed
 
 logger = logging.getLogger("Delio.MemoryFunnel")
 
@@ -24,8 +26,8 @@ class ContextFunnel:
         self.redis = RedisManager(config.REDIS_HOST, config.REDIS_PORT)
         self.chroma = ChromaManager(config.CHROMA_DB_PATH)
         self._init_done = False
-        self._obsidian_index = None  # Cached file list: [(path, mtime)]
-        self._obsidian_index_time = 0  # Timestamp of last index
+        self._obsidian_index = None  # Persistent BM25 index (ObsidianIndex)
+        self.retrieval = RetrievalEngine(self.chroma, keyword_search=self._search_obsidian)
 
     async def initialize(self):
         """Async initialization of all backends"""
@@ -39,63 +41,51 @@ class ContextFunnel:
         except Exception as e:
             logger.error(f"❌ ContextFunnel init failed: {e}")
 
-    def _refresh_obsidian_index(self):
-        """Rebuild file index if stale (>60s) or missing."""
-        now = _time.time()
-        if self._obsidian_index is not None and (now - self._obsidian_index_time) < 60:
-            return
-        index = []
-        for root, dirs, files in os.walk(config.OBSIDIAN_ROOT):
-            for file in files:
-                if file.endswith(".md"):
-                    index.append(os.path.join(root, file))
-        self._obsidian_index = index
-        self._obsidian_index_time = now
-
-    async def _search_obsidian(self, query: str) -> List[str]:
-        """Simple keyword search in Obsidian Vault with cached file index"""
+    def _get_obsidian_index(self) -> ObsidianIndex:
+        if self._obsidian_index is None or self._obsidian_index.root != config.OBSIDIAN_ROOT:
+            self._obsidian_index = ObsidianIndex(
+                config.OBSIDIAN_ROOT,
+                config.OBSIDIAN_INDEX_PATH,
+                refresh_seconds=config.OBSIDIAN_INDEX_REFRESH_SECONDS
+            )
+        return self._obsidian_index
+
+    async def _search_obsidian(self, query: str, k: int = 3) -> List[Tuple[str, float, str]]:
+        """BM25 top-k search in the Obsidian Vault (incremental inverted index): [(path, score, snippet)]"""
         if not os.path.exists(config.OBSIDIAN_ROOT) or len(query) < 3:
             return []
 
         try:
-            def scan():
-                self._refresh_obsidian_index()
-                found = []
-                query_lower = query.lower()
-                keywords = [k for k in query_lower.split() if len(k) > 3]
-                if not keywords: return []
-
-                for path in self._obsidian_index:
-                    try:
-                        file = os.path.basename(path)
-                        with open(path, "r", encoding="utf-8") as f:
-                            content = f.read()
-                            content_lower = content.lower()
-
-                            score = 0
-                            if query_lower in file.lower(): score += 5
-                            for k in keywords:
-                                if k in content_lower: score += 1
-
-                            if score > 0:
-                                snippet = content[:500].replace("\n", " ")
-                                found.append(f"🕸️ [Obsidian] [[{file}]]: {snippet}...")
-                                if len(found) >= 3: return found
-                    except: continue
-                return found
-
-            return await asyncio.to_thread(scan)
+            # The vault walk runs in refresh_obsidian_index (scheduler), not per search
+            return await asyncio.to_thread(self._get_obsidian_index().search, query, k)
         except Exception as e:
             logger.warning(f"Obsidian search error: {e}")
             return []
 
+    async def refresh_obsidian_index(self, force: bool = False):
+        """Delta re-index of the Obsidian Vault by (mtime, size), off the event loop"""
+        if not os.path.exists(config.OBSIDIAN_ROOT):
+            return
+        try:
+            await asyncio.to_thread(self._get_obsidian_index().refresh, force)
+        except Exception as e:
+            logger.warning(f"Obsidian index refresh error: {e}")
+
+    async def prefetch_context(self, user_id: int, raw_input: str) -> asyncio.Task:
+        """
+        Speculative retrieval, started in OBSERVE (StateGuard prefetch matrix).
+        The guard check runs now; the fetch runs as a background task that
+        RETRIEVE adopts and PLAN awaits, concurrently with intent classification.
+        """
+        await guard.assert_allowed(user_id, Action.MEM_RETRIEVE, prefetch=True)
+        return asyncio.create_task(self._fetch(user_id, raw_input))
+
     async def aggregate_context(self, user_id: int, raw_input: str) -> Dict[str, Any]:
         """
         Gathers context from all 3 layers:
         1. Short-term (Redis) - Recent chat history
-        2. Long-term (ChromaDB) - Semantic search
+        2. Long-term (RetrievalEngine) - Chroma memories + Obsidian chunks + BM25, fused
         3. Structured (StructuredMemory) - 9-Section profile
-        4. Obsidian (File Search) - Keyword match
         """
         if not self._init_done:
             await self.initialize()
@@ -107,6 +97,13 @@ class ContextFunnel:
             logger.warning(f"⚠️ Memory fetch blocked by guard: {e}")
             return {"short_term": [], "long_term_memories": [], "structured_profile": {}}
 
+        return await self._fetch(user_id, raw_input)
+
+    async def _fetch(self, user_id: int, raw_input: str) -> Dict[str, Any]:
+        """Fetch all layers in parallel. Permission must be checked by the caller."""
+        if not self._init_done:
+            await self.initialize()
+
         logger.debug(f"🌪️ Funneling context for user {user_id}...")
         
         context_data = {
@@ -119,15 +116,14 @@ class ContextFunnel:
         # Parallel Fetching for Speed
         try:
             results = await asyncio.gather(
-                self.redis.get_history(user_id, limit=10),
-                self.chroma.search(user_id, raw_input, limit=5),
-                self.structured.get_all_memory(user_id, min_confidence=0.4),
-                self._search_obsidian(raw_input),
+                timed(FUNNEL_LEG_SECONDS, self.redis.get_history(user_id, limit=10), "short_term"),
+                timed(FUNNEL_LEG_SECONDS, self.retrieval.retrieve(user_id, raw_input), "retrieval"),
+                timed(FUNNEL_LEG_SECONDS, self.structured.get_all_memory(user_id, min_confidence=0.4), "structured"),
                 return_exceptions=True
             )
             
             # Unpack results
-            short_term, long_term, full_memory, obsidian_hits = results
+            short_term, long_term, full_memory = results
 
             if isinstance(short_term, list):
                 context_data["short_term"] = short_term
@@ -137,12 +133,7 @@ class ContextFunnel:
             if isinstance(long_term, list):
                 context_data["long_term_memories"] = long_term
             else:
-                logger.error(f"Chroma fetch failed: {long_term}")
-
-            # Merge Obsidian hits into long_term_memories
-            if isinstance(obsidian_hits, list) and obsidian_hits:
-                logger.info(f"🕸️ Found {len(obsidian_hits)} Obsidian matches")
-                context_data["long_term_memories"].extend(obsidian_hits)
+                logger.error(f"Retrieval failed: {long_term}")
 
             if isinstance(full_memory, dict):
                 # Extract specific sections for context
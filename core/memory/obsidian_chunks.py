@@ -0,0 +1,251 @@
+"""
+Header-aware chunk indexer for the Obsidian vault (vector side of scripts/obsidian_sync.py).
+
+- Notes are split by headings, then into paragraph windows of <= CHUNK_CHARS
+- Chunk IDs are stable: hash(path) + hash(chunk text); unchanged chunks are never re-embedded
+- Vectors of identical chunk text are reused (renames, moved notes, duplicates)
+- Initial scan: bounded parallel, batched embedding + resumable JSON checkpoint
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("Delio.ObsidianChunks")
+
+CHUNK_CHARS = 1500
+EMBED_BATCH = 32
+CHECKPOINT_EVERY = 25  # files between checkpoint flushes during the initial scan
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+
+@dataclass
+class Chunk:
+    id: str
+    text: str
+    content_hash: str
+    heading: str
+    position: int
+
+
+def _sha(text: str, n: int = 16) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:n]
+
+
+def _windows(paragraphs: List[str], limit: int) -> List[str]:
+    """Greedy paragraph packing; a single oversized paragraph is cut by characters."""
+    windows, current = [], ""
+    for para in paragraphs:
+        while len(para) > limit:
+            if current:
+                windows.append(current)
+                current = ""
+            windows.append(para[:limit])
+            para = para[limit:]
+        if current and len(current) + len(para) + 2 > limit:
+            windows.append(current)
+            current = ""
+        current = f"{current}\n\n{para}" if current else para
+    if current:
+        windows.append(current)
+    return windows
+
+
+def split_note(path: str, content: str, limit: int = CHUNK_CHARS) -> List[Chunk]:
+    """Split a note into heading sections, then paragraph windows. Each chunk carries its heading trail."""
+    title = os.path.splitext(os.path.basename(path))[0]
+    sections: List[Tuple[str, List[str]]] = []
+    trail: List[Tuple[int, str]] = []
+    lines: List[str] = []
+
+    def close_section():
+        body = "\n".join(lines).strip()
+        if body:
+            heading = " > ".join([title] + [h for _, h in trail])
+            paragraphs = [p.strip() for p in re.split(r"\n\s*\n", body) if p.strip()]
+            sections.append((heading, paragraphs))
+
+    for line in content.splitlines():
+        match = HEADING_RE.match(line)
+        if match:
+            close_section()
+            lines = []
+            level = len(match.group(1))
+            trail = [(lvl, h) for lvl, h in trail if lvl < level] + [(level, match.group(2))]
+        else:
+            lines.append(line)
+    close_section()
+
+    path_key = _sha(path, 12)
+    chunks, seen = [], {}
+    for heading, paragraphs in sections:
+        for window in _windows(paragraphs, limit - len(heading) - 2):
+            text = f"{heading}\n\n{window}"
+            content_hash = _sha(text)
+            # Identical chunks in one note get an occurrence suffix to keep IDs unique
+            occurrence = seen.get(content_hash, 0)
+            seen[content_hash] = occurrence + 1
+            chunk_id = f"{path_key}:{content_hash}" + (f":{occurrence}" if occurrence else "")
+            chunks.append(Chunk(chunk_id, text, content_hash, heading, len(chunks)))
+    return chunks
+
+
+class ChunkIndexer:
+    def __init__(self, collection, embed_fn: EmbedFn, root: str, checkpoint_path: str,
+                 workers: int = 4, batch_size: int = EMBED_BATCH):
+        self.collection = collection
+        self.embed_fn = embed_fn
+        self.root = root
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers
+        self.batch_size = batch_size
+        self._db_lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self._checkpoint: Dict[str, List[float]] = self._load_checkpoint()
+        self._unsaved = 0
+        self.stats = {"files": 0, "embedded": 0, "reused": 0, "deleted": 0}
+
+    # --- Checkpoint ---
+
+    def _load_checkpoint(self) -> Dict[str, List[float]]:
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("files", {})
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_checkpoint(self):
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "files": self._checkpoint}, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def _mark(self, path: str, signature: Optional[List[float]], flush: bool = True):
+        with self._checkpoint_lock:
+            if signature is None:
+                self._checkpoint.pop(path, None)
+            else:
+                self._checkpoint[path] = signature
+            self._unsaved += 1
+            if flush or self._unsaved >= CHECKPOINT_EVERY:
+                self._save_checkpoint()
+                self._unsaved = 0
+
+    # --- Indexing ---
+
+    def _existing_ids(self, path: str) -> List[str]:
+        with self._db_lock:
+            return self.collection.get(where={"path": path}, include=[])["ids"]
+
+    def _reusable_vectors(self, hashes: List[str]) -> Dict[str, List[float]]:
+        if not hashes:
+            return {}
+        with self._db_lock:
+            found = self.collection.get(where={"content_hash": {"$in": hashes}}, include=["embeddings", "metadatas"])
+        vectors = {}
+        for meta, emb in zip(found["metadatas"] or [], found["embeddings"] if found["embeddings"] is not None else []):
+            vectors.setdefault(meta["content_hash"], [float(x) for x in emb])
+        return vectors
+
+    def index_file(self, path: str, flush: bool = True) -> Tuple[int, int]:
+        """Sync one note: embed new chunks, drop stale ones. Returns (embedded, deleted)."""
+        try:
+            st = os.stat(path)
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return 0, self.remove_file(path)
+
+        chunks = split_note(path, content)
+        existing = set(self._existing_ids(path))
+        new = [c for c in chunks if c.id not in existing]
+        stale = list(existing - {c.id for c in chunks})
+
+        reused = self._reusable_vectors(sorted({c.content_hash for c in new}))
+        to_embed = [c for c in new if c.content_hash not in reused]
+        vectors = dict(reused)
+        for i in range(0, len(to_embed), self.batch_size):
+            batch = to_embed[i:i + self.batch_size]
+            for chunk, vector in zip(batch, self.embed_fn([c.text for c in batch])):
+                vectors[chunk.content_hash] = vector
+
+        ready = [c for c in new if vectors.get(c.content_hash)]
+        with self._db_lock:
+            if ready:
+                self.collection.upsert(
+                    ids=[c.id for c in ready],
+                    documents=[c.text for c in ready],
+                    embeddings=[vectors[c.content_hash] for c in ready],
+                    metadatas=[{
+                        "path": path,
+                        "heading": c.heading,
+                        "position": c.position,
+                        "content_hash": c.content_hash,
+                    } for c in ready]
+                )
+            if stale:
+                self.collection.delete(ids=stale)
+
+        self.stats["files"] += 1
+        self.stats["embedded"] += len(to_embed)
+        self.stats["reused"] += len(new) - len(to_embed)
+        self.stats["deleted"] += len(stale)
+        # Only checkpoint a fully embedded file, so a failed batch is retried next scan
+        self._mark(path, [st.st_mtime, st.st_size] if len(ready) == len(new) else None, flush)
+        return len(to_embed), len(stale)
+
+    def remove_file(self, path: str) -> int:
+        ids = self._existing_ids(path)
+        if ids:
+            with self._db_lock:
+                self.collection.delete(ids=ids)
+        self.stats["deleted"] += len(ids)
+        self._mark(path, None)
+        return len(ids)
+
+    def move_file(self, src: str, dest: str):
+        # Index the destination first so identical chunks reuse the old vectors
+        self.index_file(dest)
+        self.remove_file(src)
+
+    def initial_scan(self) -> Dict[str, int]:
+        """Resumable full sync: only files changed since the checkpoint are processed."""
+        on_disk = {}
+        for root, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for file in files:
+                if file.endswith(".md"):
+                    path = os.path.join(root, file)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    on_disk[path] = [st.st_mtime, st.st_size]
+
+        for path in [p for p in self._checkpoint if p not in on_disk]:
+            self.remove_file(path)
+
+        changed = [p for p, sig in on_disk.items() if self._checkpoint.get(p) != sig]
+        logger.info(f"🔎 Initial scan: {len(changed)}/{len(on_disk)} notes changed since checkpoint")
+
+        def work(path):
+            try:
+                self.index_file(path, flush=False)
+            except Exception as e:
+                logger.error(f"Failed to index {path}: {e}")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(work, changed))
+        with self._checkpoint_lock:
+            self._save_checkpoint()
+            self._unsaved = 0
+        return dict(self.stats)
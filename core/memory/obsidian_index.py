@@ -0,0 +1,267 @@
+"""
+Obsidian Vault Inverted Index (SQLite FTS5 + BM25)
+Shared by ContextFunnel (search) and scripts/obsidian_sync.py (watcher updates).
+
+- Ukrainian-aware tokenization: apostrophe folding, stopwords, light suffix stemming (UA/RU/EN)
+- Incremental: only files whose (mtime, size) changed are re-indexed
+- Ranking: FTS5 bm25() with a title boost; snippets are cut around the densest hit window
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("Delio.Memory.ObsidianIndex")
+
+MAX_NOTE_CHARS = 200_000
+REFRESH_WRITE_BATCH = 200  # Notes written per (short) hold of the index lock during refresh
+SNIPPET_CHARS = 500
+TITLE_WEIGHT = 5.0  # Old scorer: filename match = +5
+
+WORD_RE = re.compile(r"[\w'’ʼ]+", re.UNICODE)
+APOSTROPHES = str.maketrans("", "", "'’ʼ")
+
+STOPWORDS = {
+    # UA
+    "і", "й", "та", "але", "що", "це", "як", "в", "у", "на", "з", "із", "зі", "до", "від", "по", "за",
+    "не", "так", "ти", "я", "ми", "ви", "він", "вона", "воно", "вони", "мені", "мене", "мій", "моя",
+    "є", "був", "була", "бути", "для", "про", "чи", "або", "ж", "же", "би", "б", "цей", "ця", "ці",
+    "той", "та", "яка", "який", "які", "там", "тут", "де", "коли", "щоб", "вже", "ще", "його", "її",
+    # RU
+    "и", "в", "во", "не", "что", "он", "на", "с", "со", "как", "а", "то", "все", "она", "так", "его",
+    "но", "да", "ты", "к", "у", "же", "вы", "за", "бы", "по", "только", "ее", "мне", "было", "вот",
+    # EN
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "is", "are", "be", "it", "this",
+    "that", "with", "as", "at", "by", "from", "my", "your", "what", "how", "i", "you", "me",
+}
+
+# Longest match wins; reflexive endings are stripped before inflection endings
+REFLEXIVE = ("ся", "сь")
+CYRILLIC_SUFFIXES = frozenset({
+    "ування", "ювання", "ськими", "ського", "ському", "остями", "ості", "ість", "ення", "ання",
+    "іння", "ання", "ами", "ями", "ові", "еві", "єві", "ого", "ому", "ими", "ему", "ої", "ій",
+    "ий", "их", "ім", "ах", "ях", "ів", "їв", "ою", "ею", "єю", "ам", "ям", "ом", "ем",
+    "ла", "ло", "ли", "ая", "яя", "ое", "ее", "ые", "ых", "ов", "ев", "ий", "ой", "ей",
+    "а", "я", "о", "е", "у", "ю", "і", "ї", "и", "ь", "й", "в",
+})
+SUFFIX_LENGTHS = sorted({len(s) for s in CYRILLIC_SUFFIXES}, reverse=True)
+ENGLISH_SUFFIXES = ("ing", "ed", "s")
+MIN_STEM = 3
+
+
+@lru_cache(maxsize=200_000)
+def stem(word: str) -> str:
+    if word.isascii():
+        for suffix in ENGLISH_SUFFIXES:
+            if word.endswith(suffix) and not word.endswith("ss") and len(word) - len(suffix) >= MIN_STEM:
+                return word[:-len(suffix)]
+        return word
+    for suffix in REFLEXIVE:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            word = word[:-len(suffix)]
+            break
+    for length in SUFFIX_LENGTHS:
+        if len(word) - length >= MIN_STEM and word[-length:] in CYRILLIC_SUFFIXES:
+            return word[:-length]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case, fold apostrophes (пам'ять -> память), drop stopwords, stem."""
+    tokens = []
+    for match in WORD_RE.finditer(text.lower()):
+        word = match.group().translate(APOSTROPHES).strip("_")
+        if len(word) < 2 or word in STOPWORDS or word.isdigit():
+            continue
+        tokens.append(stem(word))
+    return tokens
+
+
+def snippet(content: str, stems: set, width: int = SNIPPET_CHARS) -> str:
+    """Window of `width` chars with the most query hits (falls back to the note start)."""
+    hits = [m.start() for m in WORD_RE.finditer(content)
+            if stem(m.group().lower().translate(APOSTROPHES)) in stems]
+    start = 0
+    if hits:
+        best, lo = 0, 0
+        for hi in range(len(hits)):
+            while hits[hi] - hits[lo] > width:
+                lo += 1
+            if hi - lo + 1 > best:
+                best, start = hi - lo + 1, hits[lo]
+        start = max(0, start - width // 5)
+        # Do not cut a word in half
+        space = content.rfind(" ", 0, start)
+        start = space + 1 if space != -1 and start - space < 40 else start
+    return content[start:start + width].replace("\n", " ").strip()
+
+
+class ObsidianIndex:
+    def __init__(self, root: str, db_path: str, refresh_seconds: float = 60):
+        self.root = root
+        self.db_path = db_path
+        self.refresh_seconds = refresh_seconds
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()  # The connection: searches and write batches
+        self._refresh_lock = threading.Lock()  # One vault walk at a time
+        self._last_refresh = 0.0
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS notes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    path TEXT NOT NULL UNIQUE,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    content TEXT NOT NULL
+                )
+            """)
+            # Postings live in FTS5; rowid = notes.id
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(title, body)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    # --- Updates ---
+
+    @staticmethod
+    def _read_note(path: str) -> Optional[str]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read(MAX_NOTE_CHARS)
+        except (OSError, UnicodeDecodeError) as e:
+            logger.debug(f"Skip {path}: {e}")
+            return None
+
+    def _index_file(self, conn: sqlite3.Connection, path: str, mtime: float, size: int):
+        content = self._read_note(path)
+        if content is not None:
+            self._write_note(conn, path, mtime, size, content)
+
+    def _write_note(self, conn: sqlite3.Connection, path: str, mtime: float, size: int, content: str):
+        title = os.path.splitext(os.path.basename(path))[0]
+        self._remove(conn, path)
+        cursor = conn.execute(
+            "INSERT INTO notes (path, mtime, size, content) VALUES (?, ?, ?, ?)",
+            (path, mtime, size, content)
+        )
+        conn.execute(
+            "INSERT INTO notes_fts (rowid, title, body) VALUES (?, ?, ?)",
+            (cursor.lastrowid, " ".join(tokenize(title)), " ".join(tokenize(content)))
+        )
+
+    def update_file(self, path: str):
+        """Index (or re-index) a single note. Used by the vault watcher."""
+        if not path.endswith(".md"):
+            return
+        with self._lock:
+            conn = self._get_conn()
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                self._remove(conn, path)
+            else:
+                self._index_file(conn, path, st.st_mtime, st.st_size)
+            conn.commit()
+
+    def remove_file(self, path: str):
+        with self._lock:
+            conn = self._get_conn()
+            self._remove(conn, path)
+            conn.commit()
+
+    def _remove(self, conn: sqlite3.Connection, path: str):
+        row = conn.execute("SELECT id FROM notes WHERE path = ?", (path,)).fetchone()
+        if row:
+            conn.execute("DELETE FROM notes_fts WHERE rowid = ?", (row[0],))
+            conn.execute("DELETE FROM notes WHERE id = ?", (row[0],))
+
+    def refresh(self, force: bool = False) -> Tuple[int, int]:
+        """
+        Delta update by (mtime, size). Returns (indexed, removed).
+        The walk, stats and reads run without the index lock (searches keep going);
+        the lock is held only to write each batch of changed notes.
+        """
+        if not force and time.time() - self._last_refresh < self.refresh_seconds:
+            return 0, 0
+        with self._refresh_lock:
+            # Callers that waited behind a walk must not repeat it
+            now = time.time()
+            if not force and now - self._last_refresh < self.refresh_seconds:
+                return 0, 0
+            with self._lock:
+                known: Dict[str, Tuple[float, int]] = {
+                    path: (mtime, size)
+                    for path, mtime, size in self._get_conn().execute("SELECT path, mtime, size FROM notes")
+                }
+            indexed = 0
+            seen = set()
+            batch = []
+            for root, dirs, files in os.walk(self.root):
+                dirs[:] = [d for d in dirs if not d.startswith(".")]  # .obsidian, .trash
+                for file in files:
+                    if not file.endswith(".md"):
+                        continue
+                    path = os.path.join(root, file)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    seen.add(path)
+                    if known.get(path) != (st.st_mtime, st.st_size):
+                        content = self._read_note(path)
+                        if content is not None:
+                            batch.append((path, st.st_mtime, st.st_size, content))
+                            indexed += 1
+                    if len(batch) >= REFRESH_WRITE_BATCH:
+                        self._write_batch(batch, [])
+                        batch = []
+            removed = [path for path in known if path not in seen]
+            self._write_batch(batch, removed)
+            self._last_refresh = now
+        if indexed or removed:
+            logger.info(f"🕸️ Obsidian index updated: {indexed} indexed, {len(removed)} removed")
+        return indexed, len(removed)
+
+    def _write_batch(self, notes: List[Tuple[str, float, int, str]], removed: List[str]):
+        with self._lock:
+            conn = self._get_conn()
+            for path, mtime, size, content in notes:
+                self._write_note(conn, path, mtime, size, content)
+            for path in removed:
+                self._remove(conn, path)
+            conn.commit()
+
+    # --- Queries ---
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[str, float, str]]:
+        """Top-k notes by BM25: [(path, score, snippet)]. Higher score = better."""
+        stems = sorted(set(tokenize(query)))
+        if not stems:
+            return []
+        match = " OR ".join(f'"{s}"' for s in stems)
+        with self._lock:
+            conn = self._get_conn()
+            rows = conn.execute(
+                "SELECT n.path, bm25(notes_fts, ?, 1.0) AS rank, n.content "
+                "FROM notes_fts f JOIN notes n ON n.id = f.rowid "
+                "WHERE notes_fts MATCH ? ORDER BY rank LIMIT ?",
+                (TITLE_WEIGHT, match, k)
+            ).fetchall()
+        stem_set = set(stems)
+        return [(path, -rank, snippet(content, stem_set)) for path, rank, content in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
@@ -1,69 +1,206 @@
+"""
+Short-Term History (Redis + local ring buffer)
+- A turn (user + assistant message, trim, TTL) is written in one MULTI/EXEC pipeline
+- Messages use a compact JSON codec (short keys, raw UTF-8); the legacy format is still read
+- Every user's recent messages are mirrored in an in-process ring buffer, so the
+  funnel reads history without a network hop. Each write bumps `history:{uid}:v`;
+  with a distributed coordinator (several workers) a read first GETs that version
+  and only trusts the ring if it matches, otherwise the ring is trusted for
+  HISTORY_LOCAL_TTL_SECONDS
+- When Redis is down, reads and writes continue against the ring buffer; the
+  messages that did not reach Redis are pushed with the next successful write
+"""
+
 import redis.asyncio as redis
 import logging
 import json
-from typing import List, Dict, Optional
-import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+import config
+from core.coordination import coordinator
 
 logger = logging.getLogger("Delio.Memory.Redis")
 
+ROLE_CODES = {"user": "u", "assistant": "a", "system": "s"}
+ROLE_NAMES = {code: role for role, code in ROLE_CODES.items()}
+
+
+def encode_message(role: str, content: str, model: str = None) -> str:
+    data = {"r": ROLE_CODES.get(role, role), "c": content}
+    if model:
+        data["m"] = model
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode_message(raw: str) -> Dict:
+    data = json.loads(raw)
+    if "r" not in data:  # Legacy {"role", "content", "model"} entries
+        return data
+    return {"role": ROLE_NAMES.get(data["r"], data["r"]), "content": data["c"], "model": data.get("m")}
+
+
+class _Ring:
+    __slots__ = ("messages", "loaded_at", "pending", "version")
+
+    def __init__(self, size: int):
+        self.messages: Deque[Dict] = deque(maxlen=size)
+        self.loaded_at = 0.0  # 0 = not known to match Redis
+        self.pending = 0  # Trailing messages that did not reach Redis
+        self.version = 0  # history:{uid}:v the messages match
+
+
 class RedisManager:
     def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0):
         self.redis_url = f"redis://{host}:{port}/{db}"
         self.client: Optional[redis.Redis] = None
-        
+        self.max_messages = config.HISTORY_MAX_MESSAGES
+        self._rings: "OrderedDict[int, _Ring]" = OrderedDict()
+        self._down_until = 0.0
+        self.counters = {"local_reads": 0, "redis_reads": 0, "writes": 0, "degraded_ops": 0, "resyncs": 0}
+
     async def connect(self):
         """Initialize Redis connection pool"""
         if not self.client:
-            self.client = redis.from_url(self.redis_url, decode_responses=True)
+            self.client = redis.from_url(
+                self.redis_url, decode_responses=True,
+                socket_connect_timeout=config.REDIS_CONNECT_TIMEOUT
+            )
             try:
                 await self.client.ping()
                 logger.info(f"✅ Redis connected at {self.redis_url}")
             except Exception as e:
-                logger.error(f"❌ Redis connection failed: {e}")
-                self.client = None
+                # Client is kept: it reconnects on its own once Redis is back
+                logger.error(f"❌ Redis connection failed: {e}. Short-term memory runs in-process until it recovers")
+                self._mark_down()
 
     async def close(self):
         if self.client:
             await self.client.close()
 
-    async def append_history(self, user_id: int, role: str, content: str, model: str = None):
-        """Append a message to the user's short-term history list"""
-        if not self.client:
-            logger.warning(f"⚠️ Redis unavailable — short-term memory disabled for user {user_id}")
+    # --- Availability ---
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None and time.monotonic() >= self._down_until
+
+    def _mark_down(self):
+        # Skip Redis for a while instead of paying a connect timeout on every message
+        self._down_until = time.monotonic() + config.REDIS_RETRY_SECONDS
+        self.counters["degraded_ops"] += 1
+
+    # --- Ring buffer ---
+
+    def _ring(self, user_id: int) -> _Ring:
+        ring = self._rings.get(user_id)
+        if ring is None:
+            ring = self._rings[user_id] = _Ring(self.max_messages)
+            while len(self._rings) > config.HISTORY_LOCAL_USERS:
+                _, evicted = self._rings.popitem(last=False)
+                if evicted.pending:
+                    logger.warning("⚠️ Evicted un-synced short-term history (Redis down too long)")
+        self._rings.move_to_end(user_id)
+        return ring
+
+    def _ring_is_fresh(self, ring: _Ring) -> bool:
+        # Single worker: bounded staleness if another process writes the same user's history
+        if ring.pending:
+            return True
+        return bool(ring.loaded_at) and time.monotonic() - ring.loaded_at < config.HISTORY_LOCAL_TTL_SECONDS
+
+    async def _ring_matches_redis(self, user_id: int, ring: _Ring) -> bool:
+        # Several workers: one GET of the version instead of the whole list
+        if not ring.loaded_at:
+            return False
+        version = await self.client.get(f"history:{user_id}:v")
+        return int(version or 0) == ring.version
+
+    # --- Writes ---
+
+    async def append_turn(self, user_id: int, messages: Sequence[Tuple]):
+        """Append (role, content[, model]) messages in one MULTI/EXEC: RPUSH + LTRIM + EXPIRE."""
+        if not messages:
+            return
+        ring = self._ring(user_id)
+        for role, content, *rest in messages:
+            ring.messages.append({"role": role, "content": content, "model": rest[0] if rest else None})
+        resync = ring.pending > 0
+        ring.pending = min(ring.pending + len(messages), len(ring.messages))
+
+        if not self.available:
+            self.counters["degraded_ops"] += 1
             return
-        
+
         key = f"history:{user_id}"
-        message = {
-            "role": role,
-            "content": content,
-            "model": model  # Optional metadata
-        }
-        
+        # New messages plus whatever was written during an outage
+        payload = [ring.messages[i] for i in range(-ring.pending, 0)]
         try:
-            # Push to right (end)
-            await self.client.rpush(key, json.dumps(message))
-            # Trim to max 20 items to keep it lightweight (Process logic handles loading specific amount)
-            await self.client.ltrim(key, -20, -1)
-            # Set TTL (e.g., 24 hours)
-            await self.client.expire(key, 86400)
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.rpush(key, *[encode_message(m["role"], m["content"], m.get("model")) for m in payload])
+                pipe.ltrim(key, -self.max_messages, -1)
+                pipe.expire(key, config.HISTORY_TTL_SECONDS)
+                pipe.incr(f"{key}:v")
+                pipe.expire(f"{key}:v", config.HISTORY_TTL_SECONDS)
+                version = (await pipe.execute())[3]
         except Exception as e:
-            logger.error(f"Redis append error: {e}")
+            logger.error(f"Redis append error: {e}. Keeping history in-process")
+            self._mark_down()
+            return
+        self.counters["writes"] += 1
+        if resync:
+            self.counters["resyncs"] += 1
+            logger.info(f"♻️ {len(payload) - len(messages)} buffered messages of user {user_id} flushed to Redis")
+        ring.pending = 0
+        if ring.loaded_at and version == ring.version + 1:
+            ring.loaded_at = time.monotonic()
+        else:
+            ring.loaded_at = 0.0  # Another worker wrote in between: re-read on next get
+        ring.version = version
+
+    async def append_history(self, user_id: int, role: str, content: str, model: str = None):
+        """Append a message to the user's short-term history list"""
+        await self.append_turn(user_id, [(role, content, model)])
+
+    # --- Reads ---
 
     async def get_history(self, user_id: int, limit: int = 10) -> List[Dict]:
-        """Get recent conversation history"""
-        if not self.client:
-            logger.warning(f"⚠️ Redis unavailable — returning empty history for user {user_id}")
-            return []
-        
+        """Get recent conversation history (ring buffer first, Redis on miss)"""
+        ring = self._ring(user_id)
         key = f"history:{user_id}"
         try:
-            # Get last N items
-            items = await self.client.lrange(key, -limit, -1)
-            return [json.loads(i) for i in items]
+            if not self.available or ring.pending:
+                fresh = True
+            elif coordinator.backend.distributed:
+                fresh = await self._ring_matches_redis(user_id, ring)
+            else:
+                fresh = self._ring_is_fresh(ring)
+            if fresh:
+                self.counters["local_reads"] += 1
+                return list(ring.messages)[-limit:] if limit > 0 else []
+
+            # Fill the whole ring, then serve the last N items
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.lrange(key, -self.max_messages, -1)
+                pipe.get(f"{key}:v")
+                items, version = await pipe.execute()
         except Exception as e:
-            logger.error(f"Redis fetch error: {e}")
-            return []
+            logger.error(f"Redis fetch error: {e}. Serving in-process history")
+            self._mark_down()
+            return list(ring.messages)[-limit:] if limit > 0 else []
+        self.counters["redis_reads"] += 1
+        ring.messages.clear()
+        ring.messages.extend(decode_message(i) for i in items)
+        ring.loaded_at = time.monotonic()
+        ring.version = int(version or 0)
+        return list(ring.messages)[-limit:] if limit > 0 else []
 
     async def clear_history(self, user_id: int):
-        if not self.client: return
-        await self.client.delete(f"history:{user_id}")
+        self._rings.pop(user_id, None)
+        if not self.available: return
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(f"history:{user_id}")
+            pipe.incr(f"history:{user_id}:v")  # Other workers' rings stop matching
+            await pipe.execute()
+
+    def stats(self) -> Dict:
+        return {**self.counters, "users_cached": len(self._rings), "redis_available": self.available}
@@ -0,0 +1,165 @@
+"""
+Unified Retrieval (delio_memories + obsidian_knowledge + Obsidian BM25)
+- The query is embedded once and both Chroma collections are searched in parallel
+- Vector and keyword rankings are merged with reciprocal-rank fusion (RRF)
+- Near-identical chunks are collapsed, then the result is cut to a token budget
+  (this list becomes the memory block of PlanState._build_system_instruction)
+"""
+
+import asyncio
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger("Delio.Memory.Retrieval")
+
+CHARS_PER_TOKEN = 3  # Conservative for Cyrillic text
+DEDUP_JACCARD = 0.8
+SHINGLE = 3
+OBSIDIAN_PREFIX = "🕸️ [Obsidian]"
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# (path, score, snippet) as returned by ObsidianIndex.search
+KeywordSearch = Callable[[str, int], Awaitable[List[Tuple[str, float, str]]]]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _shingles(text: str) -> set:
+    words = WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)}
+
+
+def near_duplicate(a: set, b: set) -> bool:
+    """Shingle Jaccard >= DEDUP_JACCARD, or one text contained in the other."""
+    if not a or not b:
+        return False
+    common = len(a & b)
+    return common / len(a | b) >= DEDUP_JACCARD or common == min(len(a), len(b))
+
+
+@dataclass
+class Candidate:
+    key: str
+    text: str
+    source: str  # "memory" | "obsidian"
+    path: Optional[str] = None
+    score: float = 0.0
+    ranks: Dict[str, int] = field(default_factory=dict)
+
+    def render(self) -> str:
+        if self.source == "obsidian":
+            return f"{OBSIDIAN_PREFIX} [[{os.path.basename(self.path)}]]: {self.text}..."
+        return self.text
+
+
+def rrf_merge(rankings: Dict[str, List[Candidate]], k: int) -> List[Candidate]:
+    """Reciprocal-rank fusion: score = sum(1 / (k + rank)) over the rankings an item appears in."""
+    merged: Dict[str, Candidate] = {}
+    for name, ranking in rankings.items():
+        for rank, candidate in enumerate(ranking, start=1):
+            item = merged.setdefault(candidate.key, candidate)
+            item.score += 1.0 / (k + rank)
+            item.ranks[name] = rank
+    return sorted(merged.values(), key=lambda c: c.score, reverse=True)
+
+
+def dedupe(candidates: List[Candidate]) -> List[Candidate]:
+    kept: List[Tuple[Candidate, set]] = []
+    for candidate in candidates:
+        shingles = _shingles(candidate.text)
+        if any(near_duplicate(shingles, other) for _, other in kept):
+            continue
+        kept.append((candidate, shingles))
+    return [c for c, _ in kept]
+
+
+def fit_budget(lines: List[str], budget: int) -> List[str]:
+    """Keep lines in rank order while they fit; the first line that does not fit is truncated."""
+    result, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line)
+        if used + cost <= budget:
+            result.append(line)
+            used += cost
+            continue
+        remaining = (budget - used - 1) * CHARS_PER_TOKEN
+        if remaining >= 200:
+            result.append(line[:remaining - 3].rstrip() + "...")
+        break
+    return result
+
+
+class RetrievalEngine:
+    def __init__(self, chroma, keyword_search: Optional[KeywordSearch] = None):
+        self.chroma = chroma
+        self.keyword_search = keyword_search
+
+    async def _embed_query(self, query: str) -> List[float]:
+        from core.memory.embeddings import embeddings
+        try:
+            return await embeddings.embed_one(query, task_type="retrieval_query")
+        except Exception as e:
+            logger.error(f"Query embedding failed: {e}")
+            return []
+
+    async def _vector_memories(self, user_id: int, emb: List[float], k: int) -> List[Candidate]:
+        hits = await self.chroma.query(self.chroma.collection, emb, k, where={"user_id": user_id})
+        return [Candidate(key=f"m:{' '.join(h['text'].lower().split())}", text=h["text"], source="memory")
+                for h in hits]
+
+    async def _vector_obsidian(self, emb: List[float], k: int) -> List[Candidate]:
+        hits = await self.chroma.query(self.chroma.obsidian, emb, k)
+        candidates, seen = [], set()
+        for hit in hits:
+            path = hit["metadata"].get("path")
+            if not path or path in seen:
+                continue  # Best chunk per note; the note is the fusion unit
+            seen.add(path)
+            candidates.append(Candidate(key=f"o:{path}", text=hit["text"], source="obsidian", path=path))
+        return candidates
+
+    async def _keyword(self, query: str, k: int) -> List[Candidate]:
+        if not self.keyword_search:
+            return []
+        hits = await self.keyword_search(query, k)
+        return [Candidate(key=f"o:{path}", text=text, source="obsidian", path=path) for path, _score, text in hits]
+
+    async def retrieve(self, user_id: int, query: str, top_k: int = None, budget: int = None) -> List[str]:
+        """Fused, de-duplicated, budgeted context lines (best first)."""
+        top_k = top_k or config.RETRIEVAL_TOP_K
+        budget = budget if budget is not None else config.RETRIEVAL_TOKEN_BUDGET
+
+        # Keyword search does not need the vector, so it overlaps the embedding call
+        keyword = asyncio.ensure_future(self._keyword(query, top_k))
+        emb = await self._embed_query(query) if query else []
+        names = ("memories", "obsidian", "keyword")
+        results = await asyncio.gather(
+            self._vector_memories(user_id, emb, top_k) if emb else asyncio.sleep(0, []),
+            self._vector_obsidian(emb, top_k) if emb else asyncio.sleep(0, []),
+            keyword,
+            return_exceptions=True
+        )
+        rankings = {}
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.error(f"Retrieval leg '{name}' failed: {result}")
+            elif result:
+                rankings[name] = result
+
+        fused = dedupe(rrf_merge(rankings, config.RETRIEVAL_RRF_K))[:top_k]
+        lines = fit_budget([c.render() for c in fused], budget)
+        logger.debug(
+            f"🔀 Retrieval: {', '.join(f'{n}={len(r)}' for n, r in rankings.items()) or 'no hits'} "
+            f"-> {len(lines)} lines (~{sum(map(estimate_tokens, lines))} tokens)"
+        )
+        return lines
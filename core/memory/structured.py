@@ -13,15 +13,29 @@ Sections:
 8. behavior_discipline - Execution consistency
 9. trust_communication - Trust level & preferred mode
 10. feedback_signals - What works/doesn't work
+
+Decay: apply_decay() lowers the confidence of items not confirmed within their
+section TTL, for all users, with set-based UPDATEs in bounded chunks
+(expired rows are located via the (ttl_days, last_confirmed) index).
+
+Profile cache: decoded profiles are kept in-process (LRU over users, bounded by
+an estimated byte size) and patched on set_memory. Every write bumps
+user_memory_versions.version, so a reader in another process detects a stale
+entry with one primary-key lookup instead of re-reading the profile.
 """
 
 import aiosqlite
+import asyncio
 import json
 import logging
-from datetime import datetime
-from typing import Dict, Any, Optional
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional, Tuple
 import os
 import uuid
+import config
 
 logger = logging.getLogger("Delio.Memory.Structured")
 
@@ -40,14 +54,118 @@ TTL_MAP = {
 }
 
 DEFAULT_CONFIDENCE = 0.5
+DECAY_FLOOR = 0.1  # Decay never lowers confidence below this
+DECAY_MAX_STEP = 0.3  # Largest decrease per run
+ROW_OVERHEAD_BYTES = 200  # Rough per-item cost of the decoded dicts
+
+class MemoryRow(NamedTuple):
+    """One set_many item"""
+    section: str
+    key: str
+    value: Any
+    confidence: float = DEFAULT_CONFIDENCE
+    metadata: Optional[Dict] = None
+
+
+def _encode(value: Any) -> str:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return json.dumps({"value": value})
+
+
+def _decode(value: str) -> Any:
+    try: return json.loads(value)
+    except: return value
+
+
+class ProfileCache:
+    """LRU of decoded full profiles: user_id -> (version, profile, estimated bytes)"""
+
+    def __init__(self, max_users: int, max_bytes: int):
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[int, Tuple[int, Dict[str, Dict], int]]" = OrderedDict()
+        self.bytes = 0
+        self.counters = {"hits": 0, "misses": 0, "patches": 0, "evictions": 0}
+
+    def get(self, user_id: int, version: int) -> Optional[Dict[str, Dict]]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] != version:
+            self.counters["misses"] += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.counters["hits"] += 1
+        return entry[1]
+
+    def put(self, user_id: int, version: int, profile: Dict[str, Dict], size: int):
+        self.discard(user_id)
+        self._entries[user_id] = (version, profile, size)
+        self.bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_users or self.bytes > self.max_bytes):
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.bytes -= evicted
+            self.counters["evictions"] += 1
+
+    def patch(self, user_id: int, old_version: int, new_version: int,
+              updates: List[Tuple[str, str, Dict[str, Any], int]]):
+        """Apply written (section, key, item, size) rows to the cached profile;
+        drop the entry if it missed a write from elsewhere. Overwritten items
+        give back their estimated size."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return
+        version, profile, current = entry
+        if version != old_version:
+            self.discard(user_id)
+            return
+        profile = dict(profile)
+        touched, delta = {}, 0
+        for section, key, item, size in updates:
+            items = touched.setdefault(section, dict(profile.get(section, {})))
+            old = items.get(key)
+            if old is not None:
+                delta -= len(json.dumps(old['value'])) + ROW_OVERHEAD_BYTES
+            items[key] = item
+            delta += size
+        # Same order as the SQL read: sections by name, items by confidence desc
+        for section, items in touched.items():
+            profile[section] = dict(sorted(items.items(), key=lambda kv: -kv[1]['confidence']))
+        profile = dict(sorted(profile.items()))
+        self._entries[user_id] = (new_version, profile, current + delta)
+        self._entries.move_to_end(user_id)
+        self.bytes += delta
+        self.counters["patches"] += 1
+        self._evict()
+
+    def discard(self, user_id: int):
+        entry = self._entries.pop(user_id, None)
+        if entry:
+            self.bytes -= entry[2]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "users": len(self._entries),
+            "bytes": self.bytes,
+            "hit_ratio": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
 
 class StructuredMemory:
     """Manages structured 9-section user memory with confidence scoring (Async)"""
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, cache_max_users: int = None, cache_max_bytes: int = None):
         self.db_path = db_path
         self._conn = None
         self._ensure_dir()
+        self.cache = ProfileCache(
+            cache_max_users or config.PROFILE_CACHE_MAX_USERS,
+            cache_max_bytes or config.PROFILE_CACHE_MAX_BYTES
+        )
 
     def _ensure_dir(self):
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
@@ -80,6 +198,19 @@ class StructuredMemory:
             )
         ''')
 
+        # Decay scans expired items per TTL class in last_confirmed order
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_user_memory_v2_decay ON user_memory_v2(ttl_days, last_confirmed)"
+        )
+
+        # Bumped on every write; lets other processes detect stale cached profiles
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS user_memory_versions (
+                user_id INTEGER PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+
         await db.execute('''
             CREATE TABLE IF NOT EXISTS memory_snapshots (
                 id TEXT PRIMARY KEY,
@@ -109,13 +240,8 @@ class StructuredMemory:
             if not row:
                 return None
 
-            try:
-                value_data = json.loads(row['value'])
-            except:
-                value_data = row['value']
-
             return {
-                'value': value_data,
+                'value': _decode(row['value']),
                 'confidence': row['confidence'],
                 'last_confirmed': row['last_confirmed'],
                 'ttl_days': row['ttl_days'],
@@ -126,18 +252,23 @@ class StructuredMemory:
     async def set_memory(self, user_id: int, section: str, key: str, value: Any,
                    confidence: float = DEFAULT_CONFIDENCE, metadata: Optional[Dict] = None):
         """Set or update memory item"""
-        now = datetime.now().isoformat()
-        ttl_days = TTL_MAP.get(section, 90)
+        await self.set_many(user_id, [MemoryRow(section, key, value, confidence, metadata)])
 
-        # Serialize value
-        if isinstance(value, (dict, list)):
-            value_str = json.dumps(value)
-        else:
-            value_str = json.dumps({"value": value})
+    async def set_many(self, user_id: int, rows: Iterable[Tuple]):
+        """
+        Upsert a batch of (section, key, value[, confidence[, metadata]]) rows
+        in one transaction (one executemany, one commit, one version bump).
+        """
+        rows = [MemoryRow(*row) for row in rows]
+        if not rows:
+            return
+        now = datetime.now().isoformat()
+        encoded = [_encode(row.value) for row in rows]
 
         db = await self._get_conn()
+        old_version = await self._get_version(user_id)
         # Upsert logic
-        await db.execute('''
+        await db.executemany('''
             INSERT INTO user_memory_v2
             (user_id, section, key, value, confidence, last_confirmed, ttl_days, created_at, updated_at, metadata)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
@@ -147,37 +278,154 @@ class StructuredMemory:
                 last_confirmed=excluded.last_confirmed,
                 updated_at=excluded.updated_at,
                 metadata=excluded.metadata
-        ''', (
-            user_id, section, key, value_str, confidence, now, ttl_days, now, now,
-            json.dumps(metadata) if metadata else None
-        ))
+        ''', [
+            (user_id, row.section, row.key, value_str, row.confidence, now, TTL_MAP.get(row.section, 90), now, now,
+             json.dumps(row.metadata) if row.metadata else None)
+            for row, value_str in zip(rows, encoded)
+        ])
+        await db.execute('''
+            INSERT INTO user_memory_versions (user_id, version) VALUES (?, 1)
+            ON CONFLICT(user_id) DO UPDATE SET version = version + 1
+        ''', (user_id,))
         await db.commit()
-        logger.debug(f"💾 Memory set: {section}.{key} (Conf: {confidence})")
+        new_version = await self._get_version(user_id)
+        # Write-through; a concurrent writer elsewhere shows up as a version gap and drops the entry
+        self.cache.patch(user_id, old_version, new_version, [
+            (row.section, row.key, {'value': _decode(value_str), 'confidence': row.confidence},
+             len(value_str) + ROW_OVERHEAD_BYTES)
+            for row, value_str in zip(rows, encoded)
+        ])
+        if len(rows) == 1:
+            logger.debug(f"💾 Memory set: {rows[0].section}.{rows[0].key} (Conf: {rows[0].confidence})")
+        else:
+            logger.debug(f"💾 Memory set: {len(rows)} items for user {user_id}")
 
-    async def get_all_memory(self, user_id: int, min_confidence: float = 0.0) -> Dict[str, Dict]:
-        """Get all memory sections for a user"""
+    async def _get_version(self, user_id: int) -> int:
+        db = await self._get_conn()
+        async with db.execute(
+            "SELECT version FROM user_memory_versions WHERE user_id = ?", (user_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return row['version'] if row else 0
+
+    async def profile_version(self, user_id: int) -> int:
+        """Bumped on every write to the user's profile (cheap change detection)."""
+        return await self._get_version(user_id)
+
+    async def _load_profile(self, user_id: int) -> Tuple[Dict[str, Dict], int]:
+        """Full decoded profile (all confidences) and its estimated size in bytes"""
         db = await self._get_conn()
         async with db.execute('''
-            SELECT section, key, value, confidence, last_confirmed
+            SELECT section, key, value, confidence
             FROM user_memory_v2
-            WHERE user_id = ? AND confidence >= ?
+            WHERE user_id = ?
             ORDER BY section, confidence DESC
-        ''', (user_id, min_confidence)) as cursor:
+        ''', (user_id,)) as cursor:
             rows = await cursor.fetchall()
 
-            result = {}
-            for row in rows:
-                section = row['section']
-                if section not in result: result[section] = {}
+        result, size = {}, 0
+        for row in rows:
+            section = row['section']
+            if section not in result: result[section] = {}
+            result[section][row['key']] = {
+                'value': _decode(row['value']),
+                'confidence': row['confidence']
+            }
+            size += len(row['value'] or "") + ROW_OVERHEAD_BYTES
+        return result, size
+
+    async def get_all_memory(self, user_id: int, min_confidence: float = 0.0) -> Dict[str, Dict]:
+        """Get all memory sections for a user (served from the profile cache when current)"""
+        version = await self._get_version(user_id)
+        profile = self.cache.get(user_id, version)
+        if profile is None:
+            profile, size = await self._load_profile(user_id)
+            self.cache.put(user_id, version, profile, size)
+
+        # Fresh containers per call: callers may mutate the result
+        result = {}
+        for section, items in profile.items():
+            kept = {k: dict(v) for k, v in items.items() if v['confidence'] >= min_confidence}
+            if kept:
+                result[section] = kept
+        return result
+
+    async def apply_decay(self, now: Optional[datetime] = None, chunk_size: int = None,
+                          prune_below: float = None) -> Dict[str, Any]:
+        """
+        TTL decay for all users (daily job). An item older than its ttl_days loses
+        min(0.3, days_passed / ttl_days * 0.1) confidence, floored at 0.1
+        (same rule as legacy MemoryDecay). Decayed items below `prune_below` are deleted.
+
+        Expired rows are found on the (ttl_days, last_confirmed) index, then
+        processed in rowid order, `chunk_size` rows per short transaction, so
+        each table page is rewritten about once and the write lock is released
+        between chunks.
+        """
+        now = now or datetime.now()
+        chunk_size = chunk_size or config.MEMORY_DECAY_CHUNK_ROWS
+        prune_below = config.MEMORY_PRUNE_BELOW if prune_below is None else prune_below
+        now_iso = now.isoformat()
+        stats = {"candidates": 0, "decayed": 0, "pruned": 0, "chunks": 0}
+        started = time.perf_counter()
+
+        db = await self._get_conn()
+        candidates = array("q")
+        async with db.execute("SELECT DISTINCT ttl_days FROM user_memory_v2 WHERE ttl_days > 0") as cursor:
+            ttl_classes = [row[0] for row in await cursor.fetchall()]
+        for ttl in ttl_classes:
+            # days_passed > ttl  <=>  last_confirmed <= now - (ttl + 1) days
+            cutoff = (now - timedelta(days=ttl + 1)).isoformat()
+            # Rows already at the floor can only change by being pruned
+            async with db.execute(
+                "SELECT rowid FROM user_memory_v2 WHERE ttl_days = ? AND last_confirmed <= ? "
+                "AND (confidence > ? OR confidence < ?)",
+                (ttl, cutoff, DECAY_FLOOR, prune_below)
+            ) as cursor:
+                candidates.extend(row[0] for row in await cursor.fetchall())
+        candidates = sorted(candidates)
+        stats["candidates"] = len(candidates)
+
+        # Re-checked per chunk: an item confirmed since the scan is left alone
+        days_passed = "CAST(julianday(?) - julianday(last_confirmed) AS INTEGER)"
+        chunk_rows = "rowid IN (SELECT value FROM json_each(?))"
+        for i in range(0, len(candidates), chunk_size):
+            ids = json.dumps(candidates[i:i + chunk_size])
+            cursor = await db.execute(f'''
+                UPDATE user_memory_v2
+                SET confidence = MAX(?, confidence - MIN(?, {days_passed} * 0.1 / ttl_days)),
+                    updated_at = ?
+                WHERE {chunk_rows} AND {days_passed} > ttl_days AND confidence > ?
+                RETURNING user_id
+            ''', (DECAY_FLOOR, DECAY_MAX_STEP, now_iso, now_iso, ids, now_iso, DECAY_FLOOR))
+            decayed_users = [row[0] for row in await cursor.fetchall()]
+            decayed = len(decayed_users)
+            touched = set(decayed_users)
+            if prune_below > 0:
+                cursor = await db.execute(
+                    f"DELETE FROM user_memory_v2 WHERE {chunk_rows} AND {days_passed} > ttl_days AND confidence < ? "
+                    "RETURNING user_id",
+                    (ids, now_iso, prune_below)
+                )
+                pruned_users = [row[0] for row in await cursor.fetchall()]
+                stats["pruned"] += len(pruned_users)
+                touched.update(pruned_users)
+            if touched:
+                # Cached profiles of changed users become stale (see ProfileCache)
+                await db.executemany('''
+                    INSERT INTO user_memory_versions (user_id, version) VALUES (?, 1)
+                    ON CONFLICT(user_id) DO UPDATE SET version = version + 1
+                ''', [(user_id,) for user_id in sorted(touched)])
+            await db.commit()
 
-                try: val = json.loads(row['value'])
-                except: val = row['value']
+            stats["decayed"] += decayed
+            stats["chunks"] += 1
+            await asyncio.sleep(0)  # Let request-path writes in between chunks
 
-                result[section][row['key']] = {
-                    'value': val,
-                    'confidence': row['confidence']
-                }
-            return result
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        logger.info(f"📉 Memory decay: {stats['decayed']} items decayed, {stats['pruned']} pruned "
+                    f"({stats['candidates']} expired, {stats['chunks']} chunks, {stats['seconds']}s)")
+        return stats
 
     async def create_snapshot(self, user_id: int) -> str:
         """Create a full snapshot of user memory"""
@@ -1,6 +1,6 @@
 import logging
 import asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import config
 
@@ -15,6 +15,11 @@ class MemoryWriter:
         from core.memory.funnel import funnel
         return funnel.structured, funnel.redis, funnel.chroma
 
+    @property
+    def structured(self):
+        """Direct StructuredMemory access for tools (update_profile)."""
+        return self._get_backends()[0]
+
     async def initialize(self):
         """Lazy init via funnel"""
         if self._init_done: return
@@ -24,15 +29,23 @@ class MemoryWriter:
 
     async def append_history(self, user_id: int, role: str, content: str, model: str = None):
         """Write to short-term memory (Redis)"""
+        await self.append_turn(user_id, [(role, content, model)])
+
+    async def append_turn(self, user_id: int, messages: List[Tuple]):
+        """Write several (role, content[, model]) messages to short-term memory in one round-trip"""
         if not self._init_done: await self.initialize()
         try:
             _, redis, _ = self._get_backends()
-            await redis.append_history(user_id, role, content, model)
+            await redis.append_turn(user_id, messages)
         except Exception as e:
             logger.error(f"Redis write failed: {e}")
 
-    async def save_semantic_memory(self, user_id: int, user_input: str, bot_response: str, metadata: dict = None):
-        """Write to vector memory (Chroma)"""
+    async def save_semantic_memory(self, user_id: int, user_input: str, bot_response: str, metadata: dict = None,
+                                   memory_id: str = None, raise_errors: bool = False):
+        """
+        Write to vector memory (Chroma).
+        `memory_id` makes the write idempotent (post-processing retries); `raise_errors` propagates failures.
+        """
         if not self._init_done: await self.initialize()
         try:
             _, _, chroma = self._get_backends()
@@ -40,14 +53,19 @@ class MemoryWriter:
             # 1. User Input
             meta_user = metadata.copy() if metadata else {}
             meta_user.update({"role": "user", "type": "interaction"})
-            await chroma.store_memory(user_id, user_input, meta_user)
 
             # 2. Bot Response
             meta_bot = metadata.copy() if metadata else {}
             meta_bot.update({"role": "assistant", "type": "interaction"})
-            await chroma.store_memory(user_id, bot_response, meta_bot)
+
+            # One embedding batch for both texts
+            ids = [f"{memory_id}:user", f"{memory_id}:assistant"] if memory_id else None
+            await chroma.store_memories(user_id, [(user_input, meta_user), (bot_response, meta_bot)],
+                                        ids=ids, raise_errors=raise_errors)
 
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"Chroma write failed: {e}")
 
     async def save_lesson(self, user_id: int, trigger: str, observation: str, correction: str):
@@ -81,20 +99,24 @@ class MemoryWriter:
         """
         Update user profile attribute (Structured Memory -> core_identity or misc)
         """
+        await self.update_attributes(user_id, {key: value}, confidence)
+
+    async def update_attributes(self, user_id: int, attributes: Dict[str, Any], confidence: float = 0.8,
+                                raise_errors: bool = False):
+        """Update several core_identity attributes in one transaction"""
+        if not attributes: return
         if not self._init_done: await self.initialize()
         try:
             structured, _, _ = self._get_backends()
             section = "core_identity"
 
-            await structured.set_memory(
-                user_id,
-                section=section,
-                key=key,
-                value=value,
-                confidence=confidence
-            )
-            logger.info(f"💾 Attribute '{key}' updated for user {user_id}")
+            await structured.set_many(user_id, [
+                (section, key, value, confidence) for key, value in attributes.items()
+            ])
+            logger.info(f"💾 Attributes {list(attributes)} updated for user {user_id}")
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"Structured attribute write failed: {e}")
 
     async def close(self):
@@ -0,0 +1,175 @@
+"""
+Metrics Registry (Prometheus text exposition, no client dependency)
+- Histograms: per-labelset bucket counters; observe() is a bisect + 3 increments,
+  no locks (the kernel records from a single event loop)
+- Gauges: callbacks evaluated at scrape time only (sync or async), so hot
+  paths pay nothing for queue depths and session counts
+- render() produces the text served on GET /metrics
+"""
+
+import inspect
+import logging
+import time
+from asyncio import CancelledError
+from bisect import bisect_left
+from typing import Awaitable, Callable, Dict, List, Sequence, Tuple, Union
+
+logger = logging.getLogger("Delio.Metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Track:
+    """Times a block; the last label (outcome) is ok / error / cancelled."""
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: "Histogram", labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            outcome = "ok"
+        elif issubclass(exc_type, (CancelledError, GeneratorExit)):
+            outcome = "cancelled"
+        else:
+            outcome = "error"
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels, outcome)
+        return False
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # labels -> [bucket counts..., +Inf, sum]
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            if len(labels) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def track(self, *labels: str) -> _Track:
+        """`with histogram.track(...)`: duration with the outcome appended as the last label."""
+        return _Track(self, labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, hits in zip(self.buckets, series):
+                cumulative += hits
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+GaugeValue = Union[float, Dict[Tuple[str, ...], float]]
+GaugeCallback = Callable[[], Union[GaugeValue, Awaitable[GaugeValue]]]
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, callback: GaugeCallback, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    async def render(self) -> List[str]:
+        value = self.callback()
+        if inspect.isawaitable(value):
+            value = await value
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        if isinstance(value, dict):
+            for labels, v in sorted(value.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {v}")
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Union[Histogram, Gauge]] = {}
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        if name not in self._metrics:
+            self._metrics[name] = Histogram(name, help, labelnames, buckets)
+        return self._metrics[name]
+
+    def gauge(self, name: str, help: str, callback: GaugeCallback, labelnames: Sequence[str] = ()) -> Gauge:
+        # Re-registration replaces the callback (e.g. a rebuilt singleton)
+        self._metrics[name] = Gauge(name, help, callback, labelnames)
+        return self._metrics[name]
+
+    async def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            if isinstance(metric, Gauge):
+                try:
+                    lines.extend(await metric.render())
+                except Exception as e:
+                    logger.warning(f"⚠️ Gauge {metric.name} failed: {e}")
+            else:
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# --- Latency histograms (recorded at the call sites) ---
+FSM_STATE_SECONDS = metrics.histogram(
+    "delio_fsm_state_seconds", "Duration of one FSM state handler", ("state", "outcome"))
+LLM_CALL_SECONDS = metrics.histogram(
+    "delio_llm_call_seconds", "Duration of one LLM provider call", ("provider", "model", "outcome"))
+EMBEDDING_CALL_SECONDS = metrics.histogram(
+    "delio_embedding_call_seconds", "Duration of one embedding batch call", ("model", "outcome"))
+FUNNEL_LEG_SECONDS = metrics.histogram(
+    "delio_funnel_leg_seconds", "Duration of one memory funnel leg", ("leg", "outcome"))
+TELEGRAM_CALL_SECONDS = metrics.histogram(
+    "delio_telegram_call_seconds", "Duration of one Telegram Bot API request", ("method", "outcome"))
+SESSION_WAIT_SECONDS = metrics.histogram(
+    "delio_session_wait_seconds", "Wait for a user's session (local lock + lease) before the FSM run", ("outcome",))
+
+
+async def timed(histogram: Histogram, awaitable: Awaitable, *labels: str):
+    """Await `awaitable` under histogram.track(*labels) (for asyncio.gather legs)."""
+    with histogram.track(*labels):
+        return await awaitable
+
+
+async def telegram_request_middleware(make_request, bot, method):
+    """aiogram session middleware: bot.session.middleware(telegram_request_middleware)."""
+    with TELEGRAM_CALL_SECONDS.track(getattr(method, "__api_method__", type(method).__name__)):
+        return await make_request(bot, method)
@@ -0,0 +1,266 @@
+"""
+Durable Reminders (SQLite, aiosqlite) + per-user pending-notification queue
+- Every reminder is persisted before it is scheduled; on start() the future
+  ones are re-added to APScheduler and the overdue ones are delivered, so a
+  restart no longer loses them.
+- The table is the shared per-user queue: a reminder that fires while the
+  user is busy is marked 'queued'. The FSM calls on_idle() after every run;
+  it is a set lookup, and only users known to have queued rows are drained
+  (SQLite is not touched per message). Rows queued on another worker are
+  picked up by sweep() (scheduler, every REMINDERS_SWEEP_SECONDS).
+- Every worker restores on start (timers are per process); delivery holds the
+  user's session (core/coordination.py) and claims the row ('sending') with
+  UPDATE ... RETURNING, so a reminder is sent once. The row is deleted only
+  after a successful send; a failed send puts it back to 'queued'.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import aiosqlite
+import config
+from core.coordination import coordinator
+from core.metrics import metrics
+from core.state import State
+from core.state_guard import guard
+
+logger = logging.getLogger("Delio.Notifications")
+
+SENDING_STALE_SECONDS = 300  # A 'sending' claim older than this died with its worker
+
+
+class ReminderCenter:
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or config.REMINDERS_DB_PATH
+        self.scheduler = None
+        self.bot = None
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._draining = set()
+        self._queued_users = set()  # Users with 'queued' rows (hint; the table is the truth)
+        self._tasks = set()
+        self.counters = {"scheduled": 0, "delivered": 0, "queued": 0, "restored": 0, "failed": 0}
+        self._latency_total = 0.0
+
+    def attach(self, scheduler=None, bot=None):
+        """Wire in the APScheduler instance (timers) and the bot (delivery)."""
+        if scheduler is not None:
+            self.scheduler = scheduler
+        if bot is not None:
+            self.bot = bot
+
+    async def _get_conn(self) -> aiosqlite.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = await aiosqlite.connect(self.db_path)
+            await self._conn.execute("PRAGMA journal_mode=WAL;")
+            await self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS reminders (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    run_at REAL NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'scheduled',
+                    created_at REAL NOT NULL,
+                    claimed_at REAL
+                )
+            """)
+            async with self._conn.execute("PRAGMA table_info(reminders)") as cursor:
+                columns = {row[1] for row in await cursor.fetchall()}
+            if "claimed_at" not in columns:  # Databases created before 'sending' claims
+                await self._conn.execute("ALTER TABLE reminders ADD COLUMN claimed_at REAL")
+            await self._conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_status ON reminders(status, run_at)")
+            await self._conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_user ON reminders(user_id, run_at)")
+            await self._conn.commit()
+        return self._conn
+
+    async def close(self):
+        if self._conn:
+            await self._conn.close()
+            self._conn = None
+
+    # --- Scheduling ---
+
+    def _schedule(self, reminder_id: int, run_at: float):
+        self.scheduler.add_job(
+            self.fire,
+            'date',
+            run_date=datetime.fromtimestamp(run_at),
+            args=[reminder_id],
+            id=f"reminder_{reminder_id}",
+            replace_existing=True,
+            misfire_grace_time=None  # A late reminder is still delivered
+        )
+
+    async def add(self, user_id: int, text: str, run_at: datetime) -> int:
+        """Persist a reminder, then arm its timer; returns the reminder id."""
+        if self.scheduler is None:
+            raise RuntimeError("Reminder scheduler is not initialized")
+        conn = await self._get_conn()
+        cursor = await conn.execute(
+            "INSERT INTO reminders (user_id, text, run_at, created_at) VALUES (?, ?, ?, ?)",
+            (user_id, text, run_at.timestamp(), time.time())
+        )
+        await conn.commit()
+        self._schedule(cursor.lastrowid, run_at.timestamp())
+        self.counters["scheduled"] += 1
+        return cursor.lastrowid
+
+    async def start(self):
+        """Restore persisted reminders (every worker): re-arm future ones, deliver overdue and queued ones."""
+        conn = await self._get_conn()
+        now = time.time()
+        await conn.execute(
+            "UPDATE reminders SET status = 'queued' WHERE status = 'sending' AND claimed_at < ?",
+            (now - SENDING_STALE_SECONDS,)
+        )
+        await conn.execute("UPDATE reminders SET status = 'queued' WHERE status = 'scheduled' AND run_at <= ?", (now,))
+        await conn.commit()
+        async with conn.execute(
+            "SELECT id, user_id, run_at, status FROM reminders ORDER BY run_at, id"
+        ) as cursor:
+            rows = await cursor.fetchall()
+        for reminder_id, user_id, run_at, status in rows:
+            if status == 'scheduled':
+                self._schedule(reminder_id, run_at)
+        for user_id in {user_id for _, user_id, _, status in rows if status == 'queued'}:
+            self._queued_users.add(user_id)
+            self._spawn(self.drain(user_id))
+        self.counters["restored"] += len(rows)
+        if rows:
+            logger.info(f"♻️ Restored {len(rows)} reminders from {self.db_path}")
+
+    async def due_within(self, user_id: int, seconds: float) -> int:
+        """Reminders of the user that are queued or due within `seconds`."""
+        conn = await self._get_conn()
+        async with conn.execute(
+            "SELECT COUNT(*) FROM reminders WHERE user_id = ? AND (status = 'queued' OR run_at <= ?)",
+            (user_id, time.time() + seconds)
+        ) as cursor:
+            return (await cursor.fetchone())[0]
+
+    # --- Delivery ---
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def fire(self, reminder_id: int):
+        """Timer callback: queue the reminder for its user, deliver now if they are IDLE."""
+        conn = await self._get_conn()
+        async with conn.execute(
+            "UPDATE reminders SET status = 'queued' WHERE id = ? AND status = 'scheduled' RETURNING user_id",
+            (reminder_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        await conn.commit()
+        if not row:
+            return  # Already queued or delivered (another worker's timer)
+        user_id = row[0]
+        self._queued_users.add(user_id)
+        if user_id in self._draining or not await self.drain(user_id):
+            self.counters["queued"] += 1
+            logger.info(f"⏳ User {user_id} busy (State: {guard.get_state(user_id)}). Reminder {reminder_id} queued until IDLE.")
+
+    def on_idle(self, user_id: int):
+        """FSM hook (user returned to IDLE): drain the user's queued reminders in the background."""
+        if user_id not in self._queued_users or user_id in self._draining:
+            return
+        self._spawn(self.drain(user_id))
+
+    async def sweep(self):
+        """Scheduler job (every worker): learn about rows queued on other workers, drain idle users."""
+        conn = await self._get_conn()
+        async with conn.execute("SELECT DISTINCT user_id FROM reminders WHERE status = 'queued'") as cursor:
+            users = {row[0] for row in await cursor.fetchall()}
+        self._queued_users |= users
+        for user_id in users:
+            if guard.get_state(user_id) == State.IDLE:
+                self.on_idle(user_id)
+
+    async def _next_queued(self, user_id: int) -> Optional[int]:
+        conn = await self._get_conn()
+        async with conn.execute(
+            "SELECT id FROM reminders WHERE user_id = ? AND status = 'queued' ORDER BY run_at, id LIMIT 1",
+            (user_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def drain(self, user_id: int) -> bool:
+        """Deliver every queued reminder of the user under NOTIFY; False if the user is busy."""
+        async with coordinator.try_session(user_id) as lease:
+            if lease is None or not guard.try_enter_notify(user_id):
+                return False
+            self._draining.add(user_id)
+            try:
+                while (reminder_id := await self._next_queued(user_id)) is not None:
+                    if not await self._deliver(reminder_id):
+                        break  # Stays 'queued': retried on the next IDLE or restart
+                else:
+                    self._queued_users.discard(user_id)
+                return True
+            finally:
+                self._draining.discard(user_id)
+                guard.force_idle(user_id)
+
+    async def _deliver(self, reminder_id: int) -> bool:
+        """Claim, send, then delete. False if the send failed (the row is back to 'queued')."""
+        if not self.bot:
+            logger.warning("⚠️ Bot instance not set, cannot send reminder.")
+            return False  # Stays persisted; delivered after the next restart
+        conn = await self._get_conn()
+        # Claim before sending: another worker draining the same user gets nothing
+        async with conn.execute(
+            "UPDATE reminders SET status = 'sending', claimed_at = ? WHERE id = ? AND status = 'queued' "
+            "RETURNING user_id, text, run_at",
+            (time.time(), reminder_id)
+        ) as cursor:
+            row = await cursor.fetchone()
+        await conn.commit()
+        if not row:
+            return True
+        user_id, text, run_at = row
+
+        msg = f"🔔 **Нагадування:**\n{text}"
+        try:
+            await self.bot.send_message(user_id, msg)
+        except Exception as e:
+            self.counters["failed"] += 1
+            logger.error(f"❌ Failed to send reminder to {user_id}: {e}")
+            await conn.execute("UPDATE reminders SET status = 'queued', claimed_at = NULL WHERE id = ?", (reminder_id,))
+            await conn.commit()
+            return False
+
+        await conn.execute("DELETE FROM reminders WHERE id = ?", (reminder_id,))
+        await conn.commit()
+        self.counters["delivered"] += 1
+        self._latency_total += max(0.0, time.time() - run_at)
+        logger.info(f"🔔 Reminder sent to {user_id}")
+        try:
+            import old_memory as memory
+            memory.save_interaction(user_id, "[SYSTEM_EVENT: Reminder Triggered]", msg, "System/Scheduler")
+        except Exception as mem_e:
+            logger.error(f"Failed to record reminder in memory: {mem_e}")
+        return True
+
+    async def waiting_users(self) -> int:
+        conn = await self._get_conn()
+        async with conn.execute("SELECT COUNT(DISTINCT user_id) FROM reminders WHERE status = 'queued'") as cursor:
+            return (await cursor.fetchone())[0]
+
+    async def stats(self) -> Dict[str, object]:
+        delivered = self.counters["delivered"]
+        return {
+            **self.counters,
+            "waiting_users": await self.waiting_users(),
+            "avg_delivery_lag_s": round(self._latency_total / delivered, 3) if delivered else 0.0,
+        }
+
+
+reminders = ReminderCenter()
+metrics.gauge("delio_reminders_waiting_users", "Users with reminders queued until they are IDLE", reminders.waiting_users)
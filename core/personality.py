@@ -6,15 +6,17 @@ logger = logging.getLogger("Delio.Personality")
 
 class PersonalityEngine:
     @staticmethod
-    def get_system_instructions() -> str:
+    def get_system_instructions(stage_info: dict = None, include_age: bool = True) -> str:
         """
         Constructs the System Prompt by combining the Base Persona 
         with Dynamic Life Stage traits.
+        include_age=False keeps the text stable for the whole life stage (prompt prefix caching).
         """
         base_prompt = config.SYSTEM_PROMPT
         
         # 1. Get Life Stage
-        stage_info = AgeService.get_life_stage(config.persona_config)
+        if stage_info is None:
+            stage_info = AgeService.get_life_stage(config.persona_config)
         
         # 2. Inject Dynamic Context
         stage_name = stage_info.get("name", "Unknown").upper()
@@ -22,10 +24,10 @@ class PersonalityEngine:
         traits = stage_info.get("data", {}).get("traits", "Neutral")
         verbosity = stage_info.get("data", {}).get("verbosity", "Normal")
         
+        age_line = f"• **System Age**: {age_days} days.\n" if include_age else ""
         dynamic_context = f"""
 ### [DYNAMIC PERSONA: ACTIVE]
-• **System Age**: {age_days} days.
-• **Life Stage**: {stage_name}.
+{age_line}• **Life Stage**: {stage_name}.
 • **Traits**: {traits}.
 • **Verbosity Mode**: {verbosity}.
 
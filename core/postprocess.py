@@ -0,0 +1,221 @@
+"""
+Durable Post-Processing Queue (SQLite, aiosqlite)
+Work that runs after the answer is delivered (reflection, embeddings, attribute
+extraction) is persisted here and executed by a worker pool, so the FSM releases
+the user's session lock right after RESPOND.
+
+- Per-user order: users are partitioned into worker lanes (user_id % workers),
+  each lane executes its jobs strictly in enqueue order.
+- Durability: jobs survive restarts; 'running' jobs are re-queued on start().
+- Retries: failed jobs (or jobs exceeding POSTPROCESS_JOB_TIMEOUT, which would
+  otherwise block their lane) are retried with backoff, then parked as 'dead'.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import aiosqlite
+import config
+from core.context import ExecutionContext, trace_var
+from core.metrics import metrics
+
+logger = logging.getLogger("Delio.PostProcess")
+
+Handler = Callable[[ExecutionContext], Awaitable[None]]
+
+# Context fields carried into the background job
+PAYLOAD_FIELDS = ("user_id", "event_type", "raw_input", "intent", "trace_id", "response", "sent_response", "errors")
+
+
+def _serialize(context: ExecutionContext, pending: Optional[Dict[str, Any]] = None) -> str:
+    payload = {name: getattr(context, name) for name in PAYLOAD_FIELDS}
+    payload["metadata"] = context.metadata
+    if pending:
+        payload["pending"] = pending
+    return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def _restore(payload: str) -> ExecutionContext:
+    data = json.loads(payload)
+    return ExecutionContext(**{k: v for k, v in data.items() if k in PAYLOAD_FIELDS or k in ("metadata", "pending")})
+
+
+class PostProcessQueue:
+    def __init__(self, db_path: str = None, workers: int = None):
+        self.db_path = db_path or config.POSTPROCESS_DB_PATH
+        self.workers = workers or config.POSTPROCESS_WORKERS
+        self._handlers: Dict[str, Handler] = {}
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._tasks = []
+        self._wakeups = []
+        self.counters = {"enqueued": 0, "processed": 0, "retried": 0, "dead": 0}
+        self._last_lag = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def register(self, kind: str, handler: Handler):
+        self._handlers[kind] = handler
+
+    async def _get_conn(self) -> aiosqlite.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = await aiosqlite.connect(self.db_path)
+            await self._conn.execute("PRAGMA journal_mode=WAL;")
+            await self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS post_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    enqueued_at REAL NOT NULL,
+                    available_at REAL NOT NULL,
+                    error TEXT
+                )
+            """)
+            await self._conn.execute("CREATE INDEX IF NOT EXISTS idx_post_jobs_status ON post_jobs(status, id)")
+            await self._conn.commit()
+        return self._conn
+
+    async def start(self):
+        """Recover interrupted jobs and spawn the worker lanes."""
+        if self.running:
+            return
+        conn = await self._get_conn()
+        cursor = await conn.execute("UPDATE post_jobs SET status = 'pending' WHERE status = 'running'")
+        await conn.commit()
+        if cursor.rowcount:
+            logger.warning(f"♻️ Re-queued {cursor.rowcount} interrupted post-processing jobs")
+
+        self._wakeups = [asyncio.Event() for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(lane)) for lane in range(self.workers)]
+        logger.info(f"📬 Post-processing queue started ({self.workers} workers, db={self.db_path})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._conn:
+            await self._conn.close()
+            self._conn = None
+
+    async def submit(self, kind: str, context: ExecutionContext, pending: Dict[str, Any] = None) -> int:
+        """Persist a job for `context`; returns the job id. `pending` (JSON) is restored as context.pending."""
+        if kind not in self._handlers:
+            raise ValueError(f"No post-processing handler for '{kind}'")
+        conn = await self._get_conn()
+        now = time.time()
+        cursor = await conn.execute(
+            "INSERT INTO post_jobs (user_id, kind, payload, enqueued_at, available_at) VALUES (?, ?, ?, ?, ?)",
+            (context.user_id or 0, kind, _serialize(context, pending), now, now)
+        )
+        await conn.commit()
+        self.counters["enqueued"] += 1
+        if self._wakeups:
+            self._wakeups[self._lane(context.user_id or 0)].set()
+        return cursor.lastrowid
+
+    def _lane(self, user_id: int) -> int:
+        return user_id % self.workers
+
+    async def _claim(self, lane: int):
+        """Head of the lane (oldest pending job). Returns None if empty or not yet due."""
+        conn = await self._get_conn()
+        async with conn.execute(
+            "SELECT id, user_id, kind, payload, attempts, enqueued_at, available_at FROM post_jobs "
+            "WHERE status = 'pending' AND user_id % ? = ? ORDER BY id LIMIT 1",
+            (self.workers, lane)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None or row[6] > time.time():
+            return None
+        await conn.execute("UPDATE post_jobs SET status = 'running' WHERE id = ?", (row[0],))
+        await conn.commit()
+        return row
+
+    async def _worker(self, lane: int):
+        wakeup = self._wakeups[lane]
+        while True:
+            try:
+                job = await self._claim(lane)
+            except Exception as e:
+                logger.error(f"❌ Post-processing claim failed (lane {lane}): {e}")
+                job = None
+            if job is None:
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=config.POSTPROCESS_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job):
+        job_id, user_id, kind, payload, attempts, enqueued_at, _ = job
+        conn = await self._get_conn()
+        context = _restore(payload)
+        context.metadata["job_attempts"] = attempts  # Lets handlers skip non-idempotent steps on a retry
+        token = trace_var.set(context.trace_id)
+        try:
+            await asyncio.wait_for(self._handlers[kind](context), timeout=config.POSTPROCESS_JOB_TIMEOUT)
+            await conn.execute("DELETE FROM post_jobs WHERE id = ?", (job_id,))
+            self.counters["processed"] += 1
+            self._last_lag = time.time() - enqueued_at
+            logger.debug(f"📭 Job {job_id} ({kind}) for user {user_id} done, lag {self._last_lag:.2f}s")
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                e = TimeoutError(f"timed out after {config.POSTPROCESS_JOB_TIMEOUT}s")
+            attempts += 1
+            if attempts >= config.POSTPROCESS_MAX_ATTEMPTS:
+                logger.error(f"💀 Job {job_id} ({kind}) for user {user_id} failed permanently: {e}")
+                await conn.execute(
+                    "UPDATE post_jobs SET status = 'dead', attempts = ?, error = ? WHERE id = ?",
+                    (attempts, str(e), job_id)
+                )
+                self.counters["dead"] += 1
+            else:
+                delay = 2 ** attempts
+                logger.warning(f"⚠️ Job {job_id} ({kind}) failed (attempt {attempts}): {e}. Retrying in {delay}s")
+                await conn.execute(
+                    "UPDATE post_jobs SET status = 'pending', attempts = ?, error = ?, available_at = ? WHERE id = ?",
+                    (attempts, str(e), time.time() + delay, job_id)
+                )
+                self.counters["retried"] += 1
+        finally:
+            await conn.commit()
+            trace_var.reset(token)
+
+    async def depth(self) -> int:
+        conn = await self._get_conn()
+        async with conn.execute("SELECT COUNT(*) FROM post_jobs WHERE status IN ('pending', 'running')") as cursor:
+            return (await cursor.fetchone())[0]
+
+    async def stats(self) -> Dict[str, Any]:
+        """Queue depth and lag (age of the oldest unfinished job)."""
+        conn = await self._get_conn()
+        async with conn.execute(
+            "SELECT COUNT(*), MIN(enqueued_at) FROM post_jobs WHERE status IN ('pending', 'running')"
+        ) as cursor:
+            depth, oldest = await cursor.fetchone()
+        async with conn.execute("SELECT COUNT(*) FROM post_jobs WHERE status = 'dead'") as cursor:
+            (dead,) = await cursor.fetchone()
+        return {
+            **self.counters,
+            "depth": depth,
+            "dead_letters": dead,
+            "lag_seconds": round(time.time() - oldest, 3) if oldest else 0.0,
+            "last_job_lag_seconds": round(self._last_lag, 3),
+            "workers": len(self._tasks),
+        }
+
+
+postprocess = PostProcessQueue()
+metrics.gauge("delio_postprocess_queue_depth", "Unfinished post-processing jobs", postprocess.depth)
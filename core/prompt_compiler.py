@@ -0,0 +1,238 @@
+"""
+System Prompt Compiler (PlanState)
+- Static prefix: identity, rules, tool schemas, persona, Telegram style.
+  Built once and memoized; rebuilt only when the tool registry, the persona
+  or the life stage changes.
+- Dynamic suffix: per-user / per-turn sections (role, profile, memories,
+  lessons, tool outputs, signals), always appended AFTER the prefix so the
+  provider's prefix (context) cache can hit across users and PLAN passes.
+- Token accounting per section (estimate) for /health.
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import config
+from core.context import ExecutionContext
+from core.life_cycle import AgeService
+from core.memory.retrieval import estimate_tokens
+from core.tool_registry import registry
+
+logger = logging.getLogger("Delio.PromptCompiler")
+
+CRITIC_CONTEXT_CHARS = 2000  # call_critic truncates its instruction to this size
+
+RULES = [
+    "Ти працюєш згідно зі своєю конституцією (FSM State Machine).\n",
+    "### RULES OF ENGAGEMENT (STRICT):",
+    "1. **FORMATTING**: Use Telegram Markdown. Use `*bold*` for bold. NEVER use `**` or `__`. Use `_italic_`.",
+    "2. **VERBOSITY**: Do not overwhelm. If the answer is long, provide the Key Insight and say 'Тисни /more для деталей'.",
+    "3. **ANTI-BOMBARDMENT**: Ask MAXIMUM 1 question per response. Never ask 3-4 questions at once.",
+    "4. **MATURITY**: Act as a Senior Partner. Don't ask 'Can I help?'. Assume the goal and act.",
+    "5. **STRATEGIC MEMORY**: Whenever the user provides important facts about their goals, skills, identity, or life level, IMMEDIATELY use the `update_profile` tool to evolve your internal model. Don't just say 'I remembered it'.",
+]
+
+
+@dataclass
+class CompiledPrompt:
+    prefix: str
+    dynamic: str
+    sections: Dict[str, int] = field(default_factory=dict)  # section -> estimated tokens
+    prefix_cached: bool = False
+
+    @property
+    def text(self) -> str:
+        return f"{self.prefix}\n{self.dynamic}" if self.dynamic else self.prefix
+
+    @property
+    def tokens(self) -> int:
+        return sum(self.sections.values())
+
+    def critic_view(self) -> str:
+        """Rules + per-turn context: what the Critic needs within its truncation window."""
+        return "\n".join([*RULES, self.dynamic])[:CRITIC_CONTEXT_CHARS]
+
+
+class PromptCompiler:
+    def __init__(self):
+        self._prefix: Optional[Tuple[tuple, str, Dict[str, int]]] = None  # (key, text, section tokens)
+        self._stage: Optional[Tuple[int, dict]] = None  # (age_days, stage_info)
+        self.counters = {"compiles": 0, "prefix_builds": 0}
+        self._section_totals: Dict[str, int] = {}
+
+    # --- Static prefix ---
+
+    def _life_stage(self) -> dict:
+        # Life stage can only change when the age (in days) changes
+        age = AgeService.get_age_days()
+        if self._stage is None or self._stage[0] != age:
+            self._stage = (age, AgeService.get_life_stage(config.persona_config))
+        return self._stage[1]
+
+    def _prefix_key(self, stage: dict) -> tuple:
+        bot_name = config.yaml_config.get('bot', {}).get('name', 'Delio')
+        return (registry.version, stage.get("name"), bot_name, config.SYSTEM_PROMPT, config.TELEGRAM_STYLE)
+
+    def _build_prefix(self, stage: dict) -> Tuple[str, Dict[str, int]]:
+        from core.personality import PersonalityEngine
+
+        sections: List[Tuple[str, List[str]]] = []
+        bot_name = config.yaml_config.get('bot', {}).get('name', 'Delio')
+        sections.append(("rules", [f"Ти — {bot_name}, персональний AI-асистент (AID).", *RULES]))
+
+        tools = registry.get_definitions()
+        if tools:
+            lines = [
+                "\n### ДОСТУПНІ ІНСТРУМЕНТИ (TOOLS):",
+                "Якщо тобі потрібно виконати дію, виклич інструмент, повернувши JSON у форматі:",
+                "```json\n{\"tool_calls\": [{\"name\": \"tool_name\", \"arguments\": {\"arg1\": \"val1\"}}]}\n```",
+            ]
+            for t in tools:
+                lines.append(f"- **{t['name']}**: {t['description']}")
+                lines.append(f"  Params: {json.dumps(t['parameters'])}")
+            sections.append(("tools", lines))
+
+        try:
+            persona = PersonalityEngine.get_system_instructions(stage, include_age=False)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to generate Persona: {e}")
+            persona = config.SYSTEM_PROMPT
+        sections.append(("persona", ["\n### ТВОЇ ОСНОВНІ ІНСТРУКЦІЇ:", persona]))
+        sections.append(("style", ["\n" + config.TELEGRAM_STYLE]))
+
+        texts = {name: "\n".join(lines) for name, lines in sections}
+        return "\n".join(texts.values()), {name: estimate_tokens(text) for name, text in texts.items()}
+
+    def prefix(self) -> Tuple[str, Dict[str, int], bool]:
+        """(text, section tokens, served_from_cache)"""
+        stage = self._life_stage()
+        key = self._prefix_key(stage)
+        if self._prefix and self._prefix[0] == key:
+            return self._prefix[1], self._prefix[2], True
+        text, sections = self._build_prefix(stage)
+        self._prefix = (key, text, sections)
+        self.counters["prefix_builds"] += 1
+        logger.info(f"🧱 System prompt prefix rebuilt: ~{sum(sections.values())} tokens ({sections})")
+        return text, sections, False
+
+    # --- Dynamic suffix ---
+
+    def _dynamic_sections(self, context: ExecutionContext) -> List[Tuple[str, List[str]]]:
+        mem = context.memory_context
+        sections: List[Tuple[str, List[str]]] = []
+
+        stage = self._life_stage()
+        sections.append(("age", [f"\n### [СТАН СИСТЕМИ]\n• **System Age**: {stage.get('age', 0)} days."]))
+
+        # --- DYNAMIC ROLE INJECTION ---
+        custom_role = context.metadata.get("custom_role_prompt")
+        role_name = context.metadata.get("role_name", "Custom")
+        if custom_role:
+            sections.append(("role", [
+                f"\n### 🎭 [ACTIVE ROLE OVERRIDE: {role_name.upper()}]",
+                f"INSTRUCTION: {custom_role}",
+                "IMPORTANT: This role is your PRIMARY directive for this specific request. Prioritize its tone and task over general persona traits, but keep using technical tools (memory, obsidian) if needed.\n",
+            ]))
+
+        lines = ["\n### ВАШ ПРОФІЛЬ ТА КОНТЕКСТ ЖИТТЯ:"]
+        structured = mem.get("structured_profile", {})
+        for section, items in structured.items():
+            if items:
+                items_str = ", ".join([f"{k}: {v.get('value')}" for k, v in items.items()])
+                lines.append(f"• **{section.title()}**: {items_str}")
+        sections.append(("profile", lines))
+
+        memories = mem.get("long_term_memories", [])
+        if memories:
+            sections.append(("memories", ["\n### ВАЖЛИВІ ФАКТИ З МИНУЛИХ РОЗМОВ:", *[f"• {m}" for m in memories]]))
+
+        # --- ACTIVE REFLECTION (Task-012) ---
+        # Read lessons from structured memory (feedback_signals section)
+        try:
+            feedback = structured.get("feedback_signals", {})
+            lesson_items = sorted(
+                [(k, v) for k, v in feedback.items() if k.startswith("lesson_")],
+                key=lambda x: x[0],
+                reverse=True
+            )[:3]
+            lines = []
+            for idx, (key, data) in enumerate(lesson_items):
+                val = data.get("value", {})
+                if isinstance(val, dict):
+                    critique = val.get("observation", val.get("critique", ""))
+                    correction = val.get("correction", "")
+                else:
+                    critique = str(val)
+                    correction = ""
+                if critique:
+                    lines.append(f"{idx+1}. Issue: {critique} -> Fix: {correction}")
+            if lines:
+                sections.append(("lessons", [
+                    "\n### ⚠️ CRITICAL LEARNINGS FROM PAST MISTAKES:", *lines, "DO NOT REPEAT THESE ERRORS."
+                ]))
+        except Exception:
+            pass
+
+        # --- TOOL OUTPUTS (If returning from ACT) ---
+        if context.tool_outputs:
+            lines = ["\n### РЕЗУЛЬТАТИ ВИКОНАННЯ ІНСТРУМЕНТІВ:"]
+            for output in context.tool_outputs:
+                name = output.get("name")
+                res = output.get("output") or output.get("error")
+                lines.append(f"• Tool '{name}': {res}")
+            sections.append(("tool_outputs", lines))
+
+        # --- IMAGE CONTEXT ---
+        if context.metadata.get("image_path"):
+            lines = [
+                "\n### [СИГНАЛ: ЗОБРАЖЕННЯ]",
+                "Користувач надіслав зображення. Аналізуй його першочергово та надай детальну відповідь на основі візуальних даних.",
+                "ФОРМАТ ВІДПОВІДІ (ОБОВ'ЯЗКОВО розділяй подвійним переносом рядка):",
+                "1. [Короткий візуальний опис]",
+                "\n\n2. [Твоя інтерпретація, філософський зв'язок або імпровізація]",
+                "\n\n3. [Заклик до дії або стратегічна порада]",
+            ]
+            if context.raw_input and "[IMAGE UPLOAD]" in context.raw_input:
+                # If it's a raw upload without specific question beyond caption
+                lines.append("Мета користувача: Дізнатись, що на фото та почути твою думку.")
+            sections.append(("image", lines))
+
+        # --- HEARTBEAT CONTEXT ---
+        if context.event_type == "heartbeat":
+            sections.append(("heartbeat", [
+                "\n### [СИГНАЛ: HEARTBEAT CHECK-IN]",
+                "Цей запит ініційовано автоматично (Proactive Heartbeat). Твоя задача — перевірити контекст користувача (цілі, час, нагадування).",
+                "1. Якщо є щось КРИТИЧНО ВАЖЛИВЕ або КОРИСНЕ (нагадування, мотивація, питання по цілі) — напиши це.",
+                "2. Якщо нічого важливого немає — просто виведи слово 'SKIP'.",
+                "3. НЕ вітайся, якщо в цьому немає потреби. НЕ пиши 'Як справи?', якщо немає контексту.",
+                "Bias towards SILENCE (SKIP). Speak only when valuable.",
+            ]))
+        return sections
+
+    # --- Public API ---
+
+    def compile(self, context: ExecutionContext) -> CompiledPrompt:
+        prefix, prefix_sections, cached = self.prefix()
+        texts = {name: "\n".join(lines) for name, lines in self._dynamic_sections(context)}
+        sections = {**prefix_sections, **{name: estimate_tokens(text) for name, text in texts.items()}}
+
+        self.counters["compiles"] += 1
+        for name, tokens in sections.items():
+            self._section_totals[name] = self._section_totals.get(name, 0) + tokens
+        logger.debug(f"🧾 Prompt ~{sum(sections.values())} tokens (prefix cached: {cached}): {sections}")
+        return CompiledPrompt(prefix, "\n".join(texts.values()), sections, cached)
+
+    def stats(self) -> Dict[str, object]:
+        compiles = self.counters["compiles"]
+        return {
+            **self.counters,
+            "prefix_hit_ratio": round(1 - self.counters["prefix_builds"] / compiles, 4) if compiles else 0.0,
+            "avg_tokens_per_section": {
+                name: round(total / compiles, 1) for name, total in self._section_totals.items()
+            } if compiles else {},
+        }
+
+
+prompt_compiler = PromptCompiler()
@@ -0,0 +1,317 @@
+"""
+Provider Client Registry
+Long-lived native async clients for every LLM provider used by the kernel.
+
+Every LLM call site (llm_service, router, digest, Chroma embeddings) goes through
+the `providers` singleton instead of building a fresh SDK client per request:
+- One keep-alive HTTP pool per provider (HTTP/2 when `h2` is installed)
+- Native async SDK calls (no `asyncio.to_thread` on the default threadpool)
+- Per-provider concurrency limits (bounded in-flight requests)
+- Latency histograms per provider / model / outcome (core/metrics.py)
+- PROVIDER_MODE=record / replay: calls are captured to / served from a
+  cassette (core/cassette.py) behind the same primitives
+"""
+
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+import config
+from core.cassette import Player, Recorder
+from core.metrics import LLM_CALL_SECONDS, EMBEDDING_CALL_SECONDS
+
+try:
+    from google import genai
+    from google.genai import types
+except ImportError as _e:
+    raise ImportError(f"google-genai SDK is required: {_e}. Install with: pip install google-genai")
+
+try:
+    import h2  # noqa: F401 (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger("Delio.Providers")
+
+GEMINI = "gemini"
+DEEPSEEK = "deepseek"
+ANTHROPIC = "anthropic"
+
+
+class ProviderRegistry:
+    """
+    Owns one SDK client + HTTP pool + concurrency semaphore per provider.
+    Clients are bound to the running event loop; if the loop changes
+    (scripts calling asyncio.run twice, test loops) they are rebuilt lazily.
+    A keeper task closes a loop's pools when that loop shuts down (asyncio.run
+    cancels leftover tasks), while their sockets can still be closed.
+    With a cassette (Recorder / Player) every primitive goes through it; a
+    Player never builds an SDK client.
+    """
+
+    def __init__(self, cassette=None):
+        self.cassette = cassette
+        self._loop = None
+        self._clients: Dict[str, Any] = {}
+        self._http: Dict[str, httpx.AsyncClient] = {}
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self._keeper: Optional[asyncio.Task] = None
+
+    # --- Lifecycle ---
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._loop is not None:
+                logger.debug("🔁 Event loop changed — rebuilding provider clients")
+            if self._http:
+                # The old loop's keeper did not run (loop not shut down via asyncio.run)
+                loop.create_task(self._close_pools(self._clients, self._http))
+            self._clients = {}
+            self._http = {}
+            self._limits = {}
+            self._keeper = None
+            self._loop = loop
+
+    async def _close_pools(self, clients: Dict[str, Any], http: Dict[str, httpx.AsyncClient]):
+        if GEMINI in clients:
+            try:
+                await clients[GEMINI].aio.aclose()
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to close Gemini client: {e}")
+        for client in list(http.values()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to close provider pool: {e}")
+        clients.clear()
+        http.clear()
+
+    async def _close_at_loop_exit(self, clients: Dict[str, Any], http: Dict[str, httpx.AsyncClient]):
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self._close_pools(clients, http)
+
+    def _max_concurrency(self, provider: str) -> int:
+        return {
+            GEMINI: config.GEMINI_MAX_CONCURRENCY,
+            DEEPSEEK: config.DEEPSEEK_MAX_CONCURRENCY,
+            ANTHROPIC: config.ANTHROPIC_MAX_CONCURRENCY,
+        }.get(provider, 8)
+
+    def _http_client(self, provider: str) -> httpx.AsyncClient:
+        self._bind_loop()
+        if self._keeper is None:
+            self._keeper = asyncio.create_task(self._close_at_loop_exit(self._clients, self._http))
+        if provider not in self._http:
+            limits = httpx.Limits(
+                max_connections=config.LLM_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=config.LLM_POOL_MAX_CONNECTIONS,
+                keepalive_expiry=config.LLM_POOL_KEEPALIVE_SECONDS,
+            )
+            transport = httpx.AsyncHTTPTransport(http2=HTTP2_AVAILABLE, limits=limits)
+            self._http[provider] = httpx.AsyncClient(
+                transport=transport,
+                timeout=httpx.Timeout(config.LLM_REQUEST_TIMEOUT, connect=10.0),
+            )
+        return self._http[provider]
+
+    def gemini(self) -> "genai.Client":
+        self._bind_loop()
+        if GEMINI not in self._clients:
+            http = self._http_client(GEMINI)
+            # An explicit transport tells google-genai to use our httpx pool instead of
+            # spinning up its own aiohttp session
+            http_options = types.HttpOptions(
+                httpx_async_client=http,
+                async_client_args={"transport": http._transport},
+            )
+            if config.GEMINI_BASE_URL:
+                http_options.base_url = config.GEMINI_BASE_URL
+            self._clients[GEMINI] = genai.Client(api_key=config.GEMINI_KEY, http_options=http_options)
+        return self._clients[GEMINI]
+
+    def deepseek(self):
+        self._bind_loop()
+        if DEEPSEEK not in self._clients:
+            from openai import AsyncOpenAI
+            self._clients[DEEPSEEK] = AsyncOpenAI(
+                api_key=config.DEEPSEEK_KEY,
+                base_url=config.DEEPSEEK_BASE_URL,
+                http_client=self._http_client(DEEPSEEK),
+                max_retries=0,  # Retries are owned by callers (_retry_async / fallbacks)
+            )
+        return self._clients[DEEPSEEK]
+
+    def anthropic(self):
+        self._bind_loop()
+        if ANTHROPIC not in self._clients:
+            import anthropic
+            self._clients[ANTHROPIC] = anthropic.AsyncAnthropic(
+                api_key=config.ANTHROPIC_KEY,
+                http_client=self._http_client(ANTHROPIC),
+            )
+        return self._clients[ANTHROPIC]
+
+    @asynccontextmanager
+    async def slot(self, provider: str):
+        """Per-provider concurrency limit. Waiters queue instead of opening new sockets."""
+        self._bind_loop()
+        sem = self._limits.get(provider)
+        if sem is None:
+            sem = self._limits[provider] = asyncio.Semaphore(self._max_concurrency(provider))
+        async with sem:
+            yield
+
+    async def close(self):
+        """Close pooled connections (call on kernel shutdown)."""
+        await self._close_pools(self._clients, self._http)
+        if self._keeper is not None:
+            self._keeper.cancel()
+            await asyncio.gather(self._keeper, return_exceptions=True)
+            self._keeper = None
+        self._clients = {}
+        self._http = {}
+        self._limits = {}
+        if self.cassette is not None:
+            self.cassette.close()
+
+    def stats(self) -> Dict[str, object]:
+        return self.cassette.stats() if self.cassette is not None else {"mode": "live"}
+
+    async def _call(self, kind: str, model: str, request: Any, live):
+        if self.cassette is None:
+            return await live()
+        return await self.cassette.call(kind, model, request, live)
+
+    def _stream(self, kind: str, model: str, request: Any, live) -> AsyncIterator[str]:
+        if self.cassette is None:
+            return live()
+        return self.cassette.stream(kind, model, request, live)
+
+    # --- Call primitives (used by every LLM call site) ---
+
+    async def generate(self, model: str, contents: Any, gen_config: Optional[types.GenerateContentConfig] = None) -> str:
+        """Gemini generate_content. Returns response text ('' if empty)."""
+        async def live():
+            response = await self.gemini().aio.models.generate_content(model=model, contents=contents, config=gen_config)
+            return response.text or ""
+
+        async with self.slot(GEMINI):
+            with LLM_CALL_SECONDS.track(GEMINI, model):
+                return await self._call("generate", model, {"contents": contents, "config": gen_config}, live)
+
+    async def generate_stream(self, model: str, contents: Any,
+                              gen_config: Optional[types.GenerateContentConfig] = None) -> AsyncIterator[str]:
+        """Gemini generate_content_stream. Yields text deltas; holds a slot until exhausted."""
+        async def live():
+            stream = await self.gemini().aio.models.generate_content_stream(model=model, contents=contents, config=gen_config)
+            async for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+
+        async with self.slot(GEMINI):
+            with LLM_CALL_SECONDS.track(GEMINI, model):
+                async for delta in self._stream("generate_stream", model, {"contents": contents, "config": gen_config}, live):
+                    yield delta
+
+    async def embed(self, texts: List[str], model: str = "models/gemini-embedding-001",
+                    task_type: str = "retrieval_document") -> List[List[float]]:
+        """Gemini embed_content for a batch of texts. Returns one vector per text."""
+        if not texts:
+            return []
+
+        async def live():
+            result = await self.gemini().aio.models.embed_content(
+                model=model,
+                contents=texts,
+                config={'task_type': task_type.upper()}
+            )
+            return [e.values for e in result.embeddings]
+
+        async with self.slot(GEMINI):
+            with EMBEDDING_CALL_SECONDS.track(model):
+                return await self._call("embed", model, {"texts": texts, "task_type": task_type}, live)
+
+    async def chat(self, prompt: str, model: str = "deepseek-chat", temperature: float = 0.3) -> str:
+        """DeepSeek (OpenAI-compatible) single-turn chat completion. Returns message content."""
+        async def live():
+            response = await self.deepseek().chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature
+            )
+            return response.choices[0].message.content or ""
+
+        async with self.slot(DEEPSEEK):
+            with LLM_CALL_SECONDS.track(DEEPSEEK, model):
+                return await self._call("chat", model, {"prompt": prompt, "temperature": temperature}, live)
+
+    async def claude(self, prompt: str, system: str, model: str, max_tokens: int = 1024,
+                     temperature: float = 0.5) -> str:
+        """Anthropic messages.create. Returns first text block."""
+        async def live():
+            message = await self.anthropic().messages.create(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                system=system,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            return message.content[0].text
+
+        request = {"prompt": prompt, "system": system, "max_tokens": max_tokens, "temperature": temperature}
+        async with self.slot(ANTHROPIC):
+            with LLM_CALL_SECONDS.track(ANTHROPIC, model):
+                return await self._call("claude", model, request, live)
+
+    async def upload(self, path: str, max_wait: int = 30):
+        """
+        Upload a file to the Gemini File API and wait until it leaves PROCESSING
+        (raises if it has not after `max_wait` s). A slot is held per API call,
+        not while polling. Callers check `state` (e.g. FAILED).
+        """
+        async def live():
+            client = self.gemini()
+            async with self.slot(GEMINI):
+                uploaded = await client.aio.files.upload(file=path)
+            waited = 0
+            while uploaded.state == "PROCESSING" and waited < max_wait:
+                await asyncio.sleep(1)
+                waited += 1
+                async with self.slot(GEMINI):
+                    uploaded = await client.aio.files.get(name=uploaded.name)
+            if uploaded.state == "PROCESSING":
+                raise TimeoutError(f"Gemini file {uploaded.name} still PROCESSING after {max_wait}s")
+            # What generate() and callers need (JSON for cassettes)
+            return {"name": uploaded.name, "uri": uploaded.uri, "mime_type": uploaded.mime_type,
+                    "state": getattr(uploaded.state, "value", uploaded.state)}
+
+        uploaded = types.File(**await self._call("upload", "files", {"path": os.path.basename(path)}, live))
+        logger.debug(f"📤 Uploaded {os.path.basename(path)} as {uploaded.name}")
+        return uploaded
+
+    async def delete_file(self, name: str):
+        if isinstance(self.cassette, Player):
+            return
+        try:
+            await self.gemini().aio.files.delete(name=name)
+        except Exception:
+            pass
+
+
+def _cassette_from_config():
+    if config.PROVIDER_MODE == "record":
+        return Recorder(config.CASSETTE_PATH)
+    if config.PROVIDER_MODE == "replay":
+        return Player(config.CASSETTE_PATH, latency_scale=config.CASSETTE_LATENCY_SCALE)
+    return None
+
+
+# Singleton
+providers = ProviderRegistry(_cassette_from_config())
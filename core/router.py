@@ -1,48 +1,208 @@
 import logging
 import asyncio
+import re
 import config
-from google import genai
-from typing import Literal
+from collections import OrderedDict
+from typing import Dict, Literal, Optional, Tuple
+from core.providers import providers
 
 logger = logging.getLogger("Delio.Router")
 
+# Intents that skip the Critic and fragmentation (lightweight answer path)
+SIMPLE_INTENTS = ("SIMPLE", "GREETING", "UTILITY")
+
+Intent = Literal["SIMPLE", "COMPLEX", "GREETING", "UTILITY"]
+
+# --- Local feature lexicons (UA / RU / EN) ---
+# Openers: a message starting with one of these is a greeting
+GREETING_WORDS = {
+    "привіт", "привіти", "привітик", "вітаю", "хей", "салют", "здоров", "здоровенькі",
+    "добрий", "доброго", "добраніч", "дякую", "дяки", "спасибі", "спасибо", "привет", "здравствуй",
+    "пока", "бувай", "hi", "hello", "hey", "yo", "thanks", "thx", "bye", "morning", "gm", "gn",
+    "👋", "🙏",
+}
+
+# Yes / no / ok: a greeting only on their own ("ок", "так, дякую"), never as an
+# opener ("ні, це неправильно", "ok do it" are answers to the bot)
+ACK_WORDS = {"ок", "окей", "ага", "так", "ні", "ok", "okay", "good", "👍"}
+
+# Stems that imply tools, memory writes or multi-step reasoning
+COMPLEX_STEMS = (
+    # Reminders / scheduling
+    "нагада", "нагаду", "напомн", "remind", "schedule", "розклад", "календар",
+    # Search / fresh data
+    "пошук", "знайди", "загугли", "погугли", "search", "google", "новин", "news", "курс ", "погод", "weather",
+    # Notes / Obsidian / files
+    "нотатк", "замітк", "obsidian", "запиши", "збережи", "файл",
+    # Profile / memory
+    "запам'ятай", "запамятай", "запомни", "remember", "профіль", "ціль",
+    # Deep reasoning
+    "проаналізуй", "аналіз", "стратег", "порівняй", "розпиши", "поясни чому",
+    "analy", "strategy", "compare", "step by step", "крок за кроком",
+)
+
+# Short stems matched as whole words only ("profile", "notebook", "шкода", "комета" are not hits)
+COMPLEX_WORDS_RE = re.compile(
+    r"\b(?:notes?|files?|code|goals?|курс[иу]?|мет[аиу]|план[иу]?|код[аиуі]?)\b", re.UNICODE
+)
+
+SMALL_TALK_PHRASES = (
+    "як справи", "як ти", "як життя", "що нового", "шо там", "как дела", "как ты",
+    "how are you", "what's up", "whats up", "good morning", "good night", "доброго ранку",
+    "добрий вечір", "на добраніч",
+)
+
+URL_RE = re.compile(r"https?://|www\.")
+WORD_RE = re.compile(r"[\w'’]+|[^\w\s]", re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    """Cache key: lower-case, collapsed whitespace, trailing punctuation stripped."""
+    text = " ".join((text or "").lower().split())
+    return text.rstrip(" .!?…,;)")
+
+
+def cache_key(text: str) -> str:
+    """normalize() plus the question marks the classifier counts (0, 1 or 2+)."""
+    return normalize(text) + "?" * min((text or "").count("?"), 2)
+
+
+class LocalIntentClassifier:
+    """
+    Tier 1: rule/feature-based classifier. Zero network, microseconds per call.
+    Returns (intent, confidence); intent is None when the input is ambiguous.
+    """
+
+    def classify(self, text: str) -> Tuple[Optional[Intent], float]:
+        norm = normalize(text)
+        if not norm:
+            return "SIMPLE", 1.0
+
+        # 1. Slash-commands are handled by utility paths
+        if norm.startswith("/"):
+            return "UTILITY", 1.0
+
+        # 2. Attachments, links and explicit tool/reasoning keywords need the full pipeline
+        if "[image upload]" in norm or URL_RE.search(norm):
+            return "COMPLEX", 0.95
+        if any(stem in norm for stem in COMPLEX_STEMS) or COMPLEX_WORDS_RE.search(norm):
+            return "COMPLEX", 0.9
+
+        tokens = WORD_RE.findall(norm)
+        words = [t for t in tokens if t[0].isalnum()]
+        questions = text.count("?")
+
+        # 3. Greetings / acknowledgements / small talk openers
+        if len(words) <= 5 and any(norm.startswith(p) for p in SMALL_TALK_PHRASES):
+            return "GREETING", 0.9
+        if len(words) <= 4 and tokens:
+            if tokens[0] in GREETING_WORDS:
+                return "GREETING", 0.95
+            if all(t in GREETING_WORDS or t in ACK_WORDS or t in ",.!" for t in tokens):
+                return "GREETING", 0.95
+
+        # 4. Length features
+        if len(norm) > 280 or questions >= 2 or norm.count(". ") >= 3:
+            return "COMPLEX", 0.85
+        if len(words) <= 3 and questions == 0:
+            return "SIMPLE", 0.8
+
+        # Ambiguous: medium-length questions or statements
+        return None, 0.0
+
+
 class IntentRouter:
-    def __init__(self):
-        self.client = genai.Client(api_key=config.GEMINI_KEY)
+    """
+    Tiered intent router:
+    1. LRU cache on normalized text
+    2. LocalIntentClassifier (confident decisions only)
+    3. Gemini Flash as a fallback for ambiguous input
+    """
+
+    def __init__(self, cache_size: int = None, min_confidence: float = None):
         self.model = config.MODEL_FAST # Usually Gemini 1.5 Flash
-        
-    async def classify(self, text: str) -> Literal["SIMPLE", "COMPLEX"]:
+        self.local = LocalIntentClassifier()
+        self.cache_size = cache_size or config.INTENT_CACHE_SIZE
+        self.min_confidence = min_confidence if min_confidence is not None else config.INTENT_LOCAL_MIN_CONFIDENCE
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self.counters: Dict[str, int] = {"total": 0, "cache": 0, "local": 0, "llm": 0, "llm_errors": 0}
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        intent = self._cache.get(key)
+        if intent is not None:
+            self._cache.move_to_end(key)
+        return intent
+
+    def _cache_put(self, key: str, intent: str):
+        self._cache[key] = intent
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """Share of requests that avoided the remote classification call."""
+        total = self.counters["total"]
+        avoided = self.counters["cache"] + self.counters["local"]
+        return {
+            **self.counters,
+            "cache_entries": len(self._cache),
+            "avoided_ratio": round(avoided / total, 4) if total else 0.0,
+        }
+
+    async def classify(self, text: str) -> Intent:
         """
         Classifies user intent into SIMPLE (direct answer) or COMPLEX (requires tools/critic).
+        GREETING / UTILITY are SIMPLE sub-types decided locally.
         """
+        self.counters["total"] += 1
+        key = cache_key(text)
+
+        cached = self._cache_get(key)
+        if cached is not None:
+            self.counters["cache"] += 1
+            return cached
+
+        intent, confidence = self.local.classify(text)
+        if intent is not None and confidence >= self.min_confidence:
+            self.counters["local"] += 1
+            logger.debug(f"⚡ Local intent: {intent} ({confidence:.2f})")
+            self._cache_put(key, intent)
+            return intent
+
+        intent = await self._classify_remote(text)
+        if intent is not None:
+            self._cache_put(key, intent)
+            return intent
+        return "COMPLEX" # Fallback to safe mode (not cached: retry LLM next time)
+
+    async def _classify_remote(self, text: str) -> Optional[Intent]:
         prompt = f"""
         Analyze the following user message and classify it as either SIMPLE or COMPLEX.
-        
+
         - SIMPLE: Basic greeting, small talk, simple question that doesn't need external data or deep reasoning.
         - COMPLEX: Needs search, reminders, file access, multi-step planning, or strategic advice.
-        
+
         User message: "{text}"
-        
+
         Return ONLY the word: SIMPLE or COMPLEX.
         """
-        
+
+        self.counters["llm"] += 1
         try:
-            # We use a synchronous call in the first version, or wrap in thread
-            # Better to use the async version of the SDK if available or run_in_executor
-            # But for simplicity and speed (Flash is fast), simple call:
-            response = await asyncio.to_thread(
-                self.client.models.generate_content,
+            # Native async call on the shared pooled Gemini client
+            response_text = await providers.generate(
                 model=self.model,
                 contents=prompt
             )
-            
-            result = response.text.strip().upper()
+
+            result = response_text.strip().upper()
             if "COMPLEX" in result:
                 return "COMPLEX"
             return "SIMPLE"
-            
+
         except Exception as e:
+            self.counters["llm_errors"] += 1
             logger.error(f"Router Classification Error: {e}")
-            return "COMPLEX" # Fallback to safe mode
+            return None
 
 router = IntentRouter()
@@ -19,17 +19,17 @@ class Action(Enum):
 
 class StateGuard:
     """
-    State transition validator. Locking is owned by FSM (_session_locks).
+    State transition validator. Locking is owned by FSM (SessionLocks).
     StateGuard only validates transitions and checks permissions — no per-user locks.
     """
     def __init__(self):
-        self._user_states = {} # user_id -> State
+        self._user_states = {} # user_id -> State, non-IDLE users only (absent = IDLE)
 
         # Canonical Transitions
         self._allowed_transitions = {
             State.IDLE: [State.OBSERVE, State.NOTIFY],
             State.NOTIFY: [State.IDLE, State.ERROR],
-            State.OBSERVE: [State.RETRIEVE, State.PLAN, State.ERROR],
+            State.OBSERVE: [State.RETRIEVE, State.PLAN, State.IDLE, State.ERROR],
             State.RETRIEVE: [State.PLAN, State.DEEP_THINK, State.ERROR],
             State.DEEP_THINK: [State.DECIDE, State.ERROR],
             State.PLAN: [State.DECIDE, State.ERROR],
@@ -53,9 +53,23 @@ class StateGuard:
             Action.SYSTEM_NOTIFICATION: [State.NOTIFY]
         }
 
+        # Prefetch Matrix (Action -> States that may START it speculatively).
+        # Read-only actions only: the work runs concurrently, but its result is
+        # consumed after the FSM has reached the canonical state (RETRIEVE -> PLAN).
+        self._prefetch_matrix = {
+            Action.MEM_RETRIEVE: [State.OBSERVE],
+        }
+
     def get_state(self, user_id: int) -> State:
         return self._user_states.get(user_id, State.IDLE)
 
+    def _set_state(self, user_id: int, state: State):
+        # IDLE is the default, so it is never stored: the table holds only in-flight users
+        if state == State.IDLE:
+            self._user_states.pop(user_id, None)
+        else:
+            self._user_states[user_id] = state
+
 
     def set_bot(self, bot_instance):
         """Set bot instance for critical alerts."""
@@ -80,7 +94,7 @@ class StateGuard:
         # ANY state can transition to ERROR
         if next_state == State.ERROR:
             logger.warning(f"⚠️ Emergency transition to ERROR for {user_id} from {current_state}")
-            self._user_states[user_id] = next_state
+            self._set_state(user_id, next_state)
             return
 
         allowed = self._allowed_transitions.get(current_state, [])
@@ -92,17 +106,22 @@ class StateGuard:
             raise RuntimeError(msg)
 
         logger.debug(f"➡️ StateGuard [{user_id}]: {current_state.name} -> {next_state.name}")
-        self._user_states[user_id] = next_state
+        self._set_state(user_id, next_state)
 
-    async def assert_allowed(self, user_id: int, action: Action):
+    async def assert_allowed(self, user_id: int, action: Action, prefetch: bool = False):
         """
         Verify if an action is allowed in the user's current state.
+        prefetch=True additionally accepts the sanctioned speculative phase
+        (see _prefetch_matrix); the check must run before the work is scheduled.
         Caller (FSM) must hold the session lock for this user_id.
         """
         current_state = self.get_state(user_id)
         allowed_states = self._side_effect_matrix.get(action, [])
+        if prefetch:
+            allowed_states = allowed_states + self._prefetch_matrix.get(action, [])
         if current_state not in allowed_states:
-            msg = f"🛡️ STATE GUARD BLOCK [{user_id}]: Action {action.name} is FORBIDDEN in {current_state.name}"
+            phase = "PREFETCH " if prefetch else ""
+            msg = f"🛡️ STATE GUARD BLOCK [{user_id}]: {phase}Action {action.name} is FORBIDDEN in {current_state.name}"
             logger.critical(msg)
             await self._send_alert(user_id, PermissionError(msg), f"Action Blocked: {action.name}")
             raise PermissionError(msg)
@@ -123,11 +142,11 @@ class StateGuard:
         Reset the guard to IDLE for a specific user.
         Must be called within FSM session lock.
         """
-        self._user_states[user_id] = State.IDLE
+        self._user_states.pop(user_id, None)
 
     def reset_all_states(self) -> int:
         """
-        CRASH AMNESIA: Resets all users to IDLE.
+        CRASH AMNESIA: Resets all users to IDLE; returns how many were not IDLE.
         Thread-unsafe (only call on startup).
         """
         count = len(self._user_states)
@@ -0,0 +1,256 @@
+"""
+Progressive delivery of streamed LLM output to Telegram.
+
+- VisibleText / visible_text(): what may be shown of a partial response
+  (tool-call JSON suppressed); VisibleText scans only what each chunk added
+- StreamingEditor: edits the placeholder message as tokens arrive, rate-limited
+  to Telegram's per-chat edit limits, on its own task (latest text wins) so the
+  token loop never waits for Telegram. The final text is still sent by RESPOND.
+- RunEvents: ordered event log of one FSM run (state transitions, response
+  chunks, final result) read by SSE clients; bound to the run via run_events_var
+"""
+
+import asyncio
+import bisect
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import config
+
+logger = logging.getLogger("Delio.Streaming")
+
+TELEGRAM_TEXT_LIMIT = 4096
+CURSOR = " ▌"
+
+FENCE = "```"
+TOOL_CALLS_MARKER = '{"tool_calls"'
+
+
+class VisibleText:
+    """
+    Strips tool-call JSON from a growing partial response:
+    1. Complete ```json blocks (same rule as PlanState._cleanup_response)
+    2. An unterminated ``` fence (may still turn out to be a json block)
+    3. A raw {"tool_calls" object and everything after it, or a prefix of it at the very end
+    Text before `_pos` is resolved (`parts`, never changes); each update scans
+    from there, so a streamed response costs O(n) instead of O(n) per chunk.
+    A partial that does not extend the previous one (retried stream) starts over.
+    """
+
+    def __init__(self):
+        self.resets = 0
+        self.reset()
+
+    def reset(self):
+        self.parts: List[str] = []   # Resolved visible text
+        self._offsets: List[int] = []  # Start of each part in the resolved text
+        self.stable_len = 0
+        self.tail = ""               # Visible but unresolved (trailing backticks)
+        self.stopped = False         # Tool-call JSON started: nothing after it is shown
+        self._pos = 0                # partial[:_pos] is resolved
+        self._fence_from = 0         # Where the search for a closing fence resumes
+        self._seen = 0
+        self._last = ""
+
+    def _resolve(self, piece: str):
+        if piece:
+            self._offsets.append(self.stable_len)
+            self.parts.append(piece)
+            self.stable_len += len(piece)
+
+    def update(self, partial: str) -> "VisibleText":
+        if len(partial) < self._seen or not partial.startswith(self._last, self._seen - len(self._last)):
+            self.reset()
+            self.resets += 1
+        self._seen, self._last = len(partial), partial[-32:]
+
+        i, self.tail = self._pos, ""
+        while not self.stopped:
+            fence = partial.find(FENCE, i)
+            marker = partial.find(TOOL_CALLS_MARKER, i, fence if fence != -1 else len(partial))
+            if marker != -1:
+                self._resolve(partial[i:marker])
+                i, self.stopped = marker, True
+            elif fence == -1:
+                # Plain text to the end: hold back a possible marker prefix / fence start
+                hold = len(partial)
+                brace = partial.rfind("{", i)
+                if brace != -1 and TOOL_CALLS_MARKER.startswith(partial[brace:].replace(" ", "")):
+                    hold = brace
+                end = hold
+                while end > i and partial[end - 1] == "`":
+                    end -= 1
+                self._resolve(partial[i:end])
+                self.tail = partial[end:hold]
+                i = end
+                break
+            else:
+                close = partial.find(FENCE, max(fence + len(FENCE), self._fence_from))
+                if close == -1:
+                    self._resolve(partial[i:fence])
+                    i = fence
+                    self._fence_from = max(fence + len(FENCE), len(partial) - len(FENCE) + 1)
+                    break
+                end = close + len(FENCE)
+                self._resolve(partial[i:fence] if partial.startswith(FENCE + "json", fence) else partial[i:end])
+                i, self._fence_from = end, 0
+        self._pos = i
+        return self
+
+    def suffix(self, start: int) -> str:
+        """Resolved text from offset `start` (cheap for a recent offset)."""
+        if start >= self.stable_len:
+            return ""
+        k = bisect.bisect_right(self._offsets, start) - 1
+        return self.parts[k][start - self._offsets[k]:] + "".join(self.parts[k + 1:])
+
+    @property
+    def text(self) -> str:
+        return ("".join(self.parts) + self.tail).strip()
+
+
+def visible_text(partial: str) -> str:
+    """One-shot VisibleText."""
+    return VisibleText().update(partial).text
+
+
+class StreamingEditor:
+    """
+    Forwards partial text to a single placeholder message via edit_message_text.
+    push() only records the latest text; edits run on the editor's task, at most
+    one per `interval` seconds (or Telegram's retry_after). Partial edits are
+    plain text (half-written Markdown is rejected by Telegram). close() before
+    the final text is sent, so a late partial edit cannot overwrite it.
+    """
+
+    def __init__(self, bot, chat_id: int, message_id: int, interval: float = None, min_delta: int = None):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.interval = interval if interval is not None else config.STREAM_EDIT_INTERVAL
+        self.min_delta = min_delta if min_delta is not None else config.STREAM_MIN_DELTA_CHARS
+        self.edits = 0
+        self.shown = ""
+        self.visible = VisibleText()
+        self._next_edit_at = 0.0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._editing = False
+        self._closed = False
+
+    async def push(self, partial: str):
+        """Called with the accumulated response text after every streamed chunk. Never waits for Telegram."""
+        if self._closed:
+            return
+        self.visible.update(partial)
+        self._wakeup.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            delay = self._next_edit_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)  # Pushes meanwhile only replace the text
+            self._editing = True
+            try:
+                await self._edit()
+            finally:
+                self._editing = False
+            if self._closed:
+                return
+
+    async def _edit(self):
+        text = self.visible.text[:TELEGRAM_TEXT_LIMIT - len(CURSOR)]
+        if not text or text == self.shown or abs(len(text) - len(self.shown)) < self.min_delta:
+            return
+        now = time.monotonic()
+        self._next_edit_at = now + self.interval
+        try:
+            ok = await self.bot.edit_message_text(text + CURSOR, self.chat_id, self.message_id)
+        except Exception as e:
+            # Flood control: respect Telegram's retry_after if present
+            retry_after = getattr(e, "retry_after", None)
+            if retry_after:
+                self._next_edit_at = now + float(retry_after)
+            logger.debug(f"Stream edit skipped: {e}")
+            return
+        if ok is False:
+            return
+        self.shown = text
+        self.edits += 1
+
+    async def close(self):
+        """Stop editing: an edit in flight is awaited, a pending one dropped."""
+        self._closed = True
+        if self._task is None:
+            return
+        if not self._editing:
+            self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+class RunEvents:
+    """
+    Append-only event log of one run. Any number of subscribers follow it from
+    an event id (SSE Last-Event-ID), so a reconnecting client misses nothing.
+    """
+
+    def __init__(self):
+        self.events: List[Tuple[str, Dict[str, Any]]] = []
+        self.closed = False
+        self._changed = asyncio.Event()
+        self._visible = VisibleText()
+        self._resets = 0
+        self._sent = 0  # Offset of the resolved visible text already emitted
+
+    def emit(self, event: str, data: Dict[str, Any]):
+        if self.closed:
+            return
+        self.events.append((event, data))
+        self._changed.set()
+
+    def close(self):
+        self.closed = True
+        self._changed.set()
+
+    def push_partial(self, partial: str):
+        """on_partial sink: emits newly resolved visible text as a delta (a reset if the stream restarted)."""
+        visible = self._visible.update(partial)
+        if visible.resets != self._resets:
+            self._resets = visible.resets
+            text = visible.suffix(0)
+            self._sent = len(text.rstrip())
+            self.emit("chunk", {"text": text.strip(), "reset": True})
+            return
+        new = visible.suffix(self._sent)
+        if not self._sent:
+            stripped = new.lstrip()
+            self._sent, new = len(new) - len(stripped), stripped
+        delta = new.rstrip()  # Trailing whitespace goes out with the text that follows it
+        if delta:
+            self.emit("chunk", {"delta": delta})
+            self._sent += len(delta)
+
+    async def follow(self, start: int = 0, keepalive: float = None) -> AsyncIterator[Optional[Tuple[int, str, Dict[str, Any]]]]:
+        """Yields (id, event, data) from `start` until closed; None every `keepalive` idle seconds."""
+        i = start
+        while True:
+            while i < len(self.events):
+                event, data = self.events[i]
+                yield i, event, data
+                i += 1
+            if self.closed:
+                return
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), keepalive)
+            except asyncio.TimeoutError:
+                yield None
+
+
+# Event log of the run executing in the current task (None outside API streaming / jobs)
+run_events_var: ContextVar[Optional[RunEvents]] = ContextVar("run_events", default=None)
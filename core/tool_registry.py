@@ -25,11 +25,13 @@ class BaseTool(ABC):
 class ToolRegistry:
     def __init__(self):
         self._tools: Dict[str, BaseTool] = {}
+        self.version = 0  # Bumped on every change; invalidates cached prompt prefixes
 
     def register(self, tool: BaseTool):
         if tool.definition.name in self._tools:
             logger.warning(f"Overwriting tool '{tool.definition.name}' in registry.")
         self._tools[tool.definition.name] = tool
+        self.version += 1
         logger.debug(f"Registered tool: {tool.definition.name}")
         
     def get_tool(self, name: str) -> Optional[BaseTool]:
@@ -35,34 +35,41 @@ class ProfileTool(BaseTool):
                         "type": "number",
                         "description": "Level of certainty (0.1 to 1.0). Default: 0.8",
                         "default": 0.8
+                    },
+                    "updates": {
+                        "type": "array",
+                        "description": "Several updates at once (saved in one write). Items use the same fields: section, key, value, confidence.",
+                        "items": {"type": "object"}
                     }
                 },
-                "required": ["section", "key", "value"]
+                "required": []
             },
             requires_confirmation=False
         )
 
     async def execute(self, **kwargs) -> str:
         user_id = kwargs.get("user_id")
-        section = kwargs.get("section")
-        key = kwargs.get("key")
-        value = kwargs.get("value")
-        confidence = kwargs.get("confidence", 0.8)
+        updates = list(kwargs.get("updates") or [])
+        if kwargs.get("section"):
+            updates.append(kwargs)
 
         if not user_id:
             return "❌ Error: user_id missing."
 
+        rows = [
+            (u.get("section"), u.get("key"), u.get("value"), float(u.get("confidence", 0.8)))
+            for u in updates
+            if u.get("section") and u.get("key") and u.get("value") is not None
+        ]
+        if not rows:
+            return "❌ Error: section, key and value are required."
+
         try:
             # We bypass the limited update_attribute and call structured directly for flexibility
-            await writer.structured.set_memory(
-                user_id=user_id,
-                section=section,
-                key=key,
-                value=value,
-                confidence=float(confidence)
-            )
-            logger.info(f"💾 Profile Updated: {section}.{key} = {value} (User: {user_id})")
-            return f"✅ Profile updated: {section} -> {key} is now set."
+            await writer.structured.set_many(user_id, rows)
+            for section, key, value, _ in rows:
+                logger.info(f"💾 Profile Updated: {section}.{key} = {value} (User: {user_id})")
+            return "✅ Profile updated: " + ", ".join(f"{section} -> {key}" for section, key, _, _ in rows) + " is now set."
         except Exception as e:
             logger.error(f"Profile tool failure: {e}")
             return f"❌ Failed to update profile: {str(e)}"
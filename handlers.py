@@ -21,8 +21,7 @@ async def cmd_start(message: types.Message):
         user_id = message.from_user.id
         from core.state_guard import guard
         # Acquire session lock before resetting to avoid corrupting active FSM cycle
-        session_lock = await fsm._get_session_lock(user_id)
-        async with session_lock:
+        async with fsm.coordinator.session(user_id):
             guard.force_idle(user_id)
         core.cache_context(user_id, []) # Reset short-term legacy
         
@@ -129,18 +128,13 @@ async def cmd_retry(message: types.Message):
     """Retries the last user message."""
     user_id = message.from_user.id
     
-    # 1. Fetch last user message from Redis short-term memory
-    import config
-    from core.memory.redis_storage import RedisManager
-    
-    # Use config values
-    manager = RedisManager(config.REDIS_HOST, config.REDIS_PORT)
-    await manager.connect()
+    # 1. Fetch last user message from short-term memory (ring buffer / Redis)
+    from core.memory.funnel import funnel
     
     try:
+        await funnel.initialize()
         # Get last 5 to be safe
-        raw_history = await manager.client.lrange(f"history:{user_id}", -5, -1)
-        history = [json.loads(i) for i in raw_history]
+        history = await funnel.redis.get_history(user_id, limit=5)
         
         # Find last 'user' message
         last_input = None
@@ -169,8 +163,6 @@ async def cmd_retry(message: types.Message):
     except Exception as e:
         logger.error(f"Retry failed: {e}")
         await message.answer("❌ Не вдалося відновити контекст.")
-    finally:
-        await manager.close()
 
 @router.message(Command("memory"))
 async def cmd_memory(message: types.Message):
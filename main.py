@@ -24,6 +24,8 @@ async def main():
     
     # Init Bot
     bot = Bot(token=config.TG_TOKEN)
+    from core.metrics import telegram_request_middleware
+    bot.session.middleware(telegram_request_middleware)
     dp = Dispatcher()
     
     # Register Routers
@@ -1,4 +1,5 @@
 import asyncio
+import functools
 import logging
 import sqlite3
 import json
@@ -15,13 +16,37 @@ from apscheduler.triggers.cron import CronTrigger
 from core.fsm import instance as fsm
 from core.state import State
 from core.state_guard import guard
+from core.notifications import reminders
+from core.heartbeat import activity, heartbeat, gate
+from core.coordination import coordinator
 
 logger = logging.getLogger(__name__)
 
-# TODO: Switch to SQLite JobStore for persistence:
-# scheduler = AsyncIOScheduler(jobstores={'default': SQLAlchemyJobStore(url='sqlite:///data/jobs.sqlite')})
+# Cron jobs are re-added on every start; user reminders persist in core/notifications.py
 scheduler = AsyncIOScheduler()
 bot_instance = None # Global ref
+is_leader = False  # With several workers only the leader runs the cron jobs
+
+
+async def renew_leadership():
+    """Take or keep scheduler leadership (cron jobs only; reminders are restored by every worker)."""
+    global is_leader
+    was_leader = is_leader
+    is_leader = await coordinator.try_lead("scheduler")
+    if is_leader and not was_leader:
+        logger.info("👑 Scheduler leadership acquired")
+    elif was_leader and not is_leader:
+        logger.warning("⚠️ Scheduler leadership lost")
+
+
+def leader_only(job):
+    """Cron job wrapper: a no-op on workers that are not the scheduler leader."""
+    @functools.wraps(job)
+    async def run(*args, **kwargs):
+        if not is_leader:
+            return None
+        return await job(*args, **kwargs)
+    return run
 
 async def safe_send_message(user_id: int, text: str, model_tag: str = "System", audio_path: str = None):
     """
@@ -32,7 +57,10 @@ async def safe_send_message(user_id: int, text: str, model_tag: str = "System",
         logger.warning(f"⚠️ Cannot send message to {user_id}: Bot instance not set")
         return False
 
-    if guard.try_enter_notify(user_id):
+    async with coordinator.try_session(user_id) as lease:
+        if lease is None or not guard.try_enter_notify(user_id):
+            logger.info(f"⏳ User {user_id} busy. Message queued/delayed.")
+            return False
         try:
             if audio_path:
                  from aiogram.types import FSInputFile
@@ -55,9 +83,6 @@ async def safe_send_message(user_id: int, text: str, model_tag: str = "System",
             return False
         finally:
             guard.force_idle(user_id)
-    else:
-        logger.info(f"⏳ User {user_id} busy. Message queued/delayed.")
-        return False
 
 async def digest_daily_logs():
     """
@@ -97,61 +122,80 @@ async def apply_memory_decay_all_users():
     Runs daily at 3:00 AM
     """
     logger.info("🧹 Starting Memory Decay Cycle...")
-    # disabled due to missing modules
-    pass
+    try:
+        from core.memory.funnel import funnel
+        await funnel.initialize()
+        await funnel.structured.apply_decay()
+    except Exception as e:
+        logger.error(f"❌ Memory decay failed: {e}")
 
-async def trigger_heartbeat():
+async def refresh_obsidian_index():
+    """Keep the Obsidian BM25 index current, so searches never walk the vault."""
+    from core.memory.funnel import funnel
+    await funnel.refresh_obsidian_index(force=True)
+
+async def trigger_heartbeat(spread: bool = True):
     """
     Periodic heartbeat that enters the FSM for autonomous background tasks.
-    Only triggers for active users who are currently IDLE.
+    Users seen within HEARTBEAT_ACTIVE_HOURS are spread across the interval with
+    jitter and a concurrency cap (core/heartbeat.py); busy users are skipped.
+    Returns the round task (None if nobody is due).
     """
-    # 1. Get Active Users (Last 48h)
-    users = []
     try:
-        # Use bot_data.db from config if possible
-        db_path = "/root/ai_assistant/data/bot_data.db"
-        
-        # Connect
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Query routing_events for user activity
-        since = (datetime.now() - timedelta(hours=48)).strftime('%Y-%m-%d %H:%M:%S')
-        sql = "SELECT DISTINCT user_id FROM routing_events WHERE timestamp > ?"
-        cursor.execute(sql, (since,))
-        
-        users = [r[0] for r in cursor.fetchall()]
-        conn.close()
+        await activity.sync()
     except Exception as e:
-        logger.error(f"❌ Failed to fetch users for heartbeat: {e}")
-        return
-
-    if not users:
-        return
-
-    logger.debug(f"💓 Heartbeat candidates: {len(users)}")
-
-    for user_id in users:
-        # 2. Check State (Skip if busy)
-        state = guard.get_state(user_id)
-        if state != State.IDLE:
-            continue
-            
-        # 3. Trigger FSM via Background Task
-        # We launch it as a background task so heartbeat job doesn't block
-        asyncio.create_task(fsm.process_event({
-            "user_id": user_id,
-            "type": "heartbeat",
-            "text": "SYSTEM_HEARTBEAT"
-        }))
+        logger.error(f"❌ Failed to sync active users for heartbeat: {e}")
+        return None
+    gate.forget_inactive()
 
+    window = config.HEARTBEAT_INTERVAL_MINUTES * 60 * config.HEARTBEAT_SPREAD if spread else 0
+    return heartbeat.dispatch(window)
 
 
 def init_scheduler(bot=None):
     """Initialize and start the scheduler"""
     global bot_instance
     bot_instance = bot
+    reminders.attach(scheduler, bot)
     try:
+        # Every worker re-arms its reminder timers; claims dedupe delivery
+        scheduler.add_job(
+            reminders.start,
+            'date',
+            run_date=datetime.now(),
+            id="reminders_restore",
+            replace_existing=True
+        )
+
+        # Reminders queued on other workers (on_idle only knows this worker's)
+        scheduler.add_job(
+            reminders.sweep,
+            'interval',
+            seconds=config.REMINDERS_SWEEP_SECONDS,
+            id="reminders_sweep",
+            replace_existing=True
+        )
+
+        # Leader election (renewed every TTL/3)
+        scheduler.add_job(
+            renew_leadership,
+            'interval',
+            seconds=config.SCHEDULER_LEADER_TTL_SECONDS / 3,
+            next_run_time=datetime.now(),
+            id="scheduler_leader",
+            replace_existing=True
+        )
+
+        # Obsidian index delta walk (every worker: the index file lives on its host)
+        scheduler.add_job(
+            refresh_obsidian_index,
+            'interval',
+            seconds=config.OBSIDIAN_INDEX_REFRESH_SECONDS,
+            next_run_time=datetime.now(),
+            id="obsidian_index",
+            replace_existing=True
+        )
+
         # Schedule Daily Digest at 4:00 AM
         # scheduler.add_job(
         #     digest_daily_logs,
@@ -169,16 +213,16 @@ def init_scheduler(bot=None):
         # )
         
         # Schedule Memory Decay (03:00 AM - before daily digest)
-        # scheduler.add_job(
-        #     apply_memory_decay_all_users,
-        #     CronTrigger(hour=3, minute=0),
-        #     id="memory_decay",
-        #     replace_existing=True
-        # )
+        scheduler.add_job(
+            leader_only(apply_memory_decay_all_users),
+            CronTrigger(hour=3, minute=0),
+            id="memory_decay",
+            replace_existing=True
+        )
         
         # Schedule a real FSM heartbeat using config
         scheduler.add_job(
-            trigger_heartbeat,
+            leader_only(trigger_heartbeat),
             CronTrigger(minute=f"*/{config.HEARTBEAT_INTERVAL_MINUTES}"),
             id="fsm_heartbeat",
             replace_existing=True
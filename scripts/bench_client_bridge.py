@@ -0,0 +1,200 @@
+"""
+Load test: synthetic Telegram updates through the client's webhook receiver and
+kernel bridge, end to end, without Telegram or a real kernel.
+
+- A stub kernel (aiohttp, separate process) answers /v1/chat/stream with a
+  short SSE run (`--kernel-ms` of simulated FSM work) and counts the TCP
+  connections it sees
+- The Telegram Bot API is replaced by an in-process session (sendMessage etc.)
+- `--senders` concurrent posters push `--updates` webhook updates; reported:
+  webhook accept rate, end-to-end updates/sec, kernel connections, bridge stats
+- `--per-message` replays the previous bridge (new httpx client per message)
+
+    python scripts/bench_client_bridge.py --updates 2000 --senders 100 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import aiohttp
+import httpx
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendMessage
+from aiogram.types import Chat, Message
+
+import config
+from client import handlers
+from client.bot import build_webhook_app
+from client.bridge import KernelBridge
+
+
+class FakeTelegramSession(BaseSession):
+    """Bot API stand-in: sendMessage returns a Message, everything else succeeds."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self._message_id = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls += 1
+        if isinstance(method, SendMessage):
+            self._message_id += 1
+            return Message(message_id=self._message_id, date=datetime.now(),
+                           chat=Chat(id=method.chat_id, type="private"), text=method.text)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+class StubKernel:
+    def __init__(self, work_ms: float):
+        self.work_ms = work_ms
+        self.peers = set()
+
+    async def chat_stream(self, request: web.Request):
+        self.peers.add(request.transport.get_extra_info("peername"))
+        payload = await request.json()
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        events = [("accepted", {}), ("state", {"state": "OBSERVE"}), ("state", {"state": "PLAN"})]
+        for i, (event, data) in enumerate(events):
+            await resp.write(f"id: {i}\nevent: {event}\ndata: {json.dumps(data)}\n\n".encode())
+        await asyncio.sleep(self.work_ms / 1000)
+        done = {"text": f"echo {payload['message']}", "model_used": "stub", "lifecycle_status": "complete"}
+        await resp.write(f"id: 3\nevent: done\ndata: {json.dumps(done)}\n\n".encode())
+        await resp.write_eof()
+        return resp
+
+    async def connections(self, request: web.Request):
+        return web.json_response({"connections": len(self.peers)})
+
+
+def _run_kernel(work_ms: float, port):
+    async def serve():
+        kernel = StubKernel(work_ms)
+        app = web.Application()
+        app.router.add_post("/v1/chat/stream", kernel.chat_stream)
+        app.router.add_get("/connections", kernel.connections)
+        _, port.value = await _serve(app)
+        await asyncio.Event().wait()
+    asyncio.run(serve())
+
+
+class PerMessageBridge(KernelBridge):
+    """Previous bridge: a new httpx.AsyncClient (pool + TCP handshake) per message, no bound."""
+
+    async def chat(self, payload):
+        self.counters["requests"] += 1
+        try:
+            async with httpx.AsyncClient(base_url=self.base_url, timeout=120.0) as client:
+                async with client.stream("POST", "/v1/chat/stream", json=payload) as resp:
+                    event = None
+                    async for line in resp.aiter_lines():
+                        if line.startswith("event: "):
+                            event = line[len("event: "):]
+                        elif line.startswith("data: "):
+                            yield event, json.loads(line[len("data: "):])
+            self.counters["completed"] += 1
+        except Exception:
+            self.counters["failed"] += 1
+            raise
+
+
+def _update(update_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+            "text": f"message {update_id}",
+        },
+    }
+
+
+async def _serve(app: web.Application) -> (web.AppRunner, int):
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, site._server.sockets[0].getsockname()[1]
+
+
+async def main(args):
+    port = multiprocessing.Value("i", 0)
+    kernel = multiprocessing.Process(target=_run_kernel, args=(args.kernel_ms, port), daemon=True)
+    kernel.start()
+    while not port.value:
+        await asyncio.sleep(0.05)
+    kernel_url = f"http://127.0.0.1:{port.value}"
+
+    bridge_cls = PerMessageBridge if args.per_message else KernelBridge
+    handlers.bridge = bridge_cls(base_url=kernel_url, concurrency=args.concurrency, max_waiting=args.updates)
+    session = FakeTelegramSession()
+    bot = Bot(token="42:TEST", session=session)
+    dp = Dispatcher()
+    dp.include_router(handlers.router)
+    webhook_runner, webhook_port = await _serve(build_webhook_app(bot, dp))
+    url = f"http://127.0.0.1:{webhook_port}{config.CLIENT_WEBHOOK_PATH}"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": config.CLIENT_WEBHOOK_SECRET} if config.CLIENT_WEBHOOK_SECRET else {}
+
+    queue = asyncio.Queue()
+    for i in range(args.updates):
+        queue.put_nowait(_update(i + 1, 1000 + i % args.users))
+
+    async def sender(client):
+        while not queue.empty():
+            async with client.post(url, json=queue.get_nowait(), headers=headers) as resp:
+                resp.raise_for_status()
+
+    # Telegram side on aiohttp: keeps the loader's own cost off the measured bridge
+    t0 = time.perf_counter()
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=args.senders)) as client:
+        await asyncio.gather(*(sender(client) for _ in range(args.senders)))
+        accepted = time.perf_counter() - t0
+        stats = handlers.bridge.counters
+        while stats["completed"] + stats["failed"] + stats["rejected"] < args.updates:
+            await asyncio.sleep(0.01)
+        wall = time.perf_counter() - t0
+        async with client.get(f"{kernel_url}/connections") as resp:
+            connections = (await resp.json())["connections"]
+
+    print(f"{bridge_cls.__name__}  updates={args.updates}  senders={args.senders}  "
+          f"bridge_concurrency={args.concurrency}  kernel={args.kernel_ms}ms")
+    print(f"webhook accepted  {args.updates / accepted:8.1f} updates/s  ({accepted:.2f}s)")
+    print(f"end-to-end        {args.updates / wall:8.1f} updates/s  ({wall:.2f}s)")
+    print(f"kernel TCP connections={connections}  telegram API calls={session.calls}")
+    print(f"bridge {handlers.bridge.stats()}")
+
+    await handlers.bridge.close()
+    await webhook_runner.cleanup()
+    kernel.terminate()
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)  # client.bot configures INFO on import
+    parser = argparse.ArgumentParser(description="Webhook + kernel bridge throughput with synthetic updates")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--senders", type=int, default=100, help="Concurrent webhook posters (Telegram side)")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=64, help="Bridge in-flight kernel runs")
+    parser.add_argument("--kernel-ms", type=float, default=50.0, help="Simulated kernel run time")
+    parser.add_argument("--per-message", action="store_true", help="Previous bridge: new HTTP client per message")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,96 @@
+"""
+Benchmark: per-call client overhead (legacy per-call SDK clients vs pooled registry).
+
+Runs against a local stub provider, so the numbers are pure client-side overhead
+(client construction, TLS/TCP setup, threadpool hops) plus the configured stub delay.
+
+    python scripts/bench_llm_clients.py --calls 500 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+from scripts.stub_provider import StubProvider
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def _run(label, call, calls, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with sem:
+            t0 = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    t_start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    wall = time.perf_counter() - t_start
+    print(f"{label:<28} p50={_percentile(latencies, 50):7.2f}ms  p99={_percentile(latencies, 99):7.2f}ms  "
+          f"mean={statistics.mean(latencies):7.2f}ms  rps={calls / wall:8.1f}")
+
+
+async def main(args):
+    stub = StubProvider(latency_ms=args.stub_latency_ms)
+    await stub.start()
+
+    config.DEEPSEEK_KEY = config.DEEPSEEK_KEY or "stub-key"
+    config.GEMINI_KEY = config.GEMINI_KEY or "stub-key"
+    config.DEEPSEEK_BASE_URL = stub.url
+    config.GEMINI_BASE_URL = stub.url
+
+    from openai import OpenAI
+    from google import genai
+    from google.genai import types
+    from core.providers import providers
+
+    # --- Legacy: new sync client per call + asyncio.to_thread (pre-registry behaviour) ---
+    async def legacy_deepseek():
+        client = OpenAI(api_key=config.DEEPSEEK_KEY, base_url=stub.url)
+        await asyncio.to_thread(
+            client.chat.completions.create,
+            model="deepseek-chat",
+            messages=[{"role": "user", "content": "ping"}],
+        )
+
+    async def legacy_gemini():
+        client = genai.Client(api_key=config.GEMINI_KEY, http_options=types.HttpOptions(base_url=stub.url))
+        await asyncio.to_thread(client.models.generate_content, model=config.MODEL_FAST, contents="ping")
+
+    # --- Pooled: shared async clients from core.providers ---
+    async def pooled_deepseek():
+        await providers.chat("ping")
+
+    async def pooled_gemini():
+        await providers.generate(model=config.MODEL_FAST, contents="ping")
+
+    print(f"Stub latency: {args.stub_latency_ms}ms | calls={args.calls} | concurrency={args.concurrency}")
+    await _run("deepseek legacy (per-call)", legacy_deepseek, args.calls, args.concurrency)
+    await _run("deepseek pooled", pooled_deepseek, args.calls, args.concurrency)
+    await _run("gemini legacy (per-call)", legacy_gemini, args.calls, args.concurrency)
+    await _run("gemini pooled", pooled_gemini, args.calls, args.concurrency)
+    print(f"Stub connections opened: {stub.connections} for {stub.requests} requests")
+
+    await providers.close()
+    await stub.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM client overhead benchmark")
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0)
+    asyncio.run(main(parser.parse_args()))
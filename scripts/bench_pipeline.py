@@ -0,0 +1,496 @@
+"""
+Offline load test of the whole kernel pipeline (OBSERVE -> ... -> MEMORY_WRITE).
+
+Nothing leaves the machine: Gemini / DeepSeek are a local StubProvider with a
+latency profile per role, Redis and Chroma are in-process stand-ins
+(scripts/stub_backends.py), and every SQLite file lives in a temp directory.
+The kernel code under test is the real one: router, funnel, prompt compiler,
+FSM, tools, post-processing queue.
+
+- `--users` simulated users each send `--messages` messages (closed loop,
+  exponential think time) drawn from `--mix` (text / tool / deep_think);
+  with `--heartbeat-rate` probability per message a heartbeat arrives at a
+  random point of the think time + next message, like the heartbeat fan-out,
+  and contends with the message for the session lock (count fixed by seed)
+- `--entry engine` calls core.engine.process_request, `--entry http` posts
+  to /v1/chat of the FastAPI app (in-process ASGI transport)
+- Latency profiles: `--profile actor=lognormal:600:0.5@80` = median 600ms to
+  the first token, sigma 0.5, then 80 tokens/s; `--scale 0.1` shrinks all
+- Reported: throughput, end-to-end percentiles per message kind, per-state
+  percentiles (delio_fsm_state_seconds), session lock wait
+  (delio_session_wait_seconds), provider calls per role
+- Each run is saved as JSON under `--results`; `--compare` checks it against
+  the latest earlier run of the same workload (or a given file) and exits 1
+  on a regression beyond `--tolerance`
+- `--cassette` replays captured traffic instead (PROVIDER_MODE=record, see
+  core/cassette.py): provider calls are answered from the cassette with the
+  recorded latency x `--scale`, and its recorded messages are sent per user in
+  the recorded order and spacing (`--users` / `--messages` / `--mix` unused)
+
+    python scripts/bench_pipeline.py --users 50 --messages 10
+    python scripts/bench_pipeline.py --entry http --scale 0.1 --compare
+    python scripts/bench_pipeline.py --cassette data/cassettes/kernel.jsonl --compare
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+import config
+from scripts.stub_backends import StubCollection, StubRedis
+from scripts.stub_provider import LatencyProfile, StubProvider, model_of
+
+TOOL_MARKER = "[bench:tool]"
+HEARTBEAT_MARKER = "HEARTBEAT CHECK-IN"  # Heartbeat section of the compiled prompt
+
+DEFAULT_PROFILES = {
+    "router": "lognormal:250:0.4",       # MODEL_FAST: intent router, post-processing extraction
+    "actor": "lognormal:600:0.5@80",     # MODEL_BALANCED
+    "critic": "lognormal:900:0.5@60",    # DeepSeek chat: critic, evaluation
+    "deep_think": "lognormal:2500:0.4@40",  # MODEL_SMART
+    "embeddings": "lognormal:60:0.3",
+    "redis": "uniform:0.5:0.5",
+    "chroma": "lognormal:8:0.5",
+}
+
+MESSAGES = {
+    "text": [
+        "Привіт! Як справи?",
+        "Допоможи скласти план на тиждень: спорт, робота над проєктом і читання",
+        "What should I focus on today if I slept badly?",
+        "Поясни різницю між процесом і потоком простими словами",
+        "Нагадай, які в мене цілі на цей місяць і що з них я вже зробив",
+        "Дякую, це було корисно",
+    ],
+    "tool": [
+        f"Котра зараз година? {TOOL_MARKER}",
+        f"What time is it where you are? {TOOL_MARKER}",
+    ],
+    "deep_think": [
+        "Проаналізуй мої цілі та звички і запропонуй стратегію на квартал",
+        "Think through the trade-offs of switching jobs this year given my profile",
+    ],
+}
+
+LOREM = ("Ось короткий план: почни з найважливішого завдання, зроби перерву, потім перейди до "
+         "дрібниць. Якщо втомишся, запиши думки і повернись до них завтра. ").split()
+
+TOOL_REPLY = 'Зараз перевірю.\n```json\n{"tool_calls": [{"name": "get_time", "args": {}}]}\n```'
+MIN_SAMPLES = 20  # Per kind / state, for a p95 to be compared
+
+EVALUATION_REPLY = '{"score": 9, "critique": "OK", "correction": ""}'
+
+
+def _role_of(path: str, request: dict) -> str:
+    if "embedContent" in path or "EmbedContents" in path:
+        return "embeddings"
+    if "/chat/completions" in path:
+        return "critic"
+    return {config.MODEL_FAST: "router", config.MODEL_SMART: "deep_think"}.get(model_of(path), "actor")
+
+
+def _replier(words: int):
+    text = " ".join(LOREM[i % len(LOREM)] for i in range(words))
+
+    def reply(role: str, request: dict) -> str:
+        body = json.dumps(request, ensure_ascii=False)
+        # JSON-only prompts of the post-processing jobs (reflection, attribute extraction)
+        if "AI Quality Assurance Supervisor" in body:
+            return EVALUATION_REPLY
+        if "Extract personal attributes" in body:
+            return "{}"
+        if role == "router":
+            return "COMPLEX"
+        if role == "critic":
+            return "✅ VALIDATED"
+        if role == "actor":
+            if HEARTBEAT_MARKER in body:
+                return "SKIP"
+            if TOOL_MARKER in body and "Tool 'get_time'" not in body:
+                return TOOL_REPLY
+        return text
+    return reply
+
+
+def _percentiles(values) -> dict:
+    if not values:
+        return {"n": 0}
+    ordered = sorted(values)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "n": len(ordered),
+        "p50": round(pct(50) * 1000, 2),
+        "p95": round(pct(95) * 1000, 2),
+        "p99": round(pct(99) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 2),
+    }
+
+
+class Samples:
+    """Raw observations of the given histograms (the registry only keeps buckets)."""
+
+    def __init__(self, *histograms):
+        self.values = defaultdict(list)
+        for histogram in histograms:
+            self._hook(histogram)
+
+    def _hook(self, histogram):
+        observe = histogram.observe
+
+        def recording(value, *labels):
+            self.values[(histogram.name,) + labels].append(value)
+            observe(value, *labels)
+        histogram.observe = recording
+
+    def by_label(self, name: str, index: int = 0) -> dict:
+        grouped = defaultdict(list)
+        for key, values in self.values.items():
+            if key[0] == name:
+                grouped[key[1 + index]].extend(values)
+        return grouped
+
+
+def _sandbox(args) -> str:
+    """Point every file the kernel writes at a temp dir; stub keys; quiet logs."""
+    root = tempfile.mkdtemp(prefix="delio-bench-")
+    os.makedirs(os.path.join(root, "data"), exist_ok=True)
+    for name, rel in (
+        ("SQLITE_DB_PATH", "data/delio_memory.db"), ("CHROMA_DB_PATH", "data/chroma_db"),
+        ("OBSIDIAN_ROOT", "obsidian"), ("OBSIDIAN_INDEX_PATH", "data/obsidian_index.db"),
+        ("EMBED_CACHE_PATH", "data/embedding_cache.db"), ("POSTPROCESS_DB_PATH", "data/postprocess_queue.db"),
+        ("REMINDERS_DB_PATH", "data/reminders.db"), ("HEARTBEAT_DB_PATH", "data/heartbeat.db"),
+    ):
+        setattr(config, name, os.path.join(root, rel))
+    config.GEMINI_KEY = config.DEEPSEEK_KEY = "stub-key"
+    config.ANTHROPIC_KEY = None
+    config.TG_TOKEN = config.TG_TOKEN or "42:TEST"
+    config.COORDINATION_BACKEND = "local"
+    if args.cassette:
+        config.PROVIDER_MODE = "replay"
+        config.CASSETTE_PATH = args.cassette
+        config.CASSETTE_LATENCY_SCALE = args.scale
+    config.LOG_LEVEL = "INFO" if args.verbose else "WARNING"
+    logging.getLogger("Delio").setLevel(config.LOG_LEVEL)  # config set it up at import
+    os.chdir(root)  # Relative paths (logs/, data/notes) land in the sandbox too
+    return root
+
+
+def _workload(args) -> dict:
+    """What must match for two runs to be comparable."""
+    keys = ("users", "messages", "mix", "think_ms", "heartbeat_rate", "reply_words", "entry", "scale", "profile", "seed",
+            "cassette")
+    return {key: getattr(args, key) for key in keys}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+
+async def run(args) -> dict:
+    profiles = {role: LatencyProfile.parse(spec) for role, spec in DEFAULT_PROFILES.items()}
+    for spec in args.profile:
+        role, _, value = spec.partition("=")
+        profiles[role] = LatencyProfile.parse(value)
+    for profile in profiles.values():
+        profile.ms *= args.scale
+        if profile.tokens_per_s:
+            profile.tokens_per_s /= args.scale
+
+    stub = None
+    if not args.cassette:
+        stub = StubProvider(reply=_replier(args.reply_words), profiles=profiles, role_of=_role_of, seed=args.seed)
+        await stub.start()
+        config.GEMINI_BASE_URL = config.DEEPSEEK_BASE_URL = stub.url
+
+    # Kernel imports after the config overrides: singletons read paths at import time
+    from core.engine import init_engine, process_request
+    from core.fsm import instance as fsm
+    from core.memory.embeddings import embeddings
+    from core.memory.funnel import funnel
+    from core.cassette import INBOUND, load
+    from core.metrics import FSM_STATE_SECONDS, SESSION_WAIT_SECONDS
+    from core.notifications import reminders
+    from core.postprocess import postprocess
+    from core.providers import providers
+
+    samples = Samples(FSM_STATE_SECONDS, SESSION_WAIT_SECONDS)
+    funnel.redis.client = StubRedis(profiles["redis"], seed=args.seed)
+    funnel.chroma._init_sync = lambda: None
+    funnel.chroma.collection = StubCollection(profiles["chroma"], seed=args.seed)
+    funnel.chroma.obsidian = StubCollection(profiles["chroma"], seed=args.seed + 1)
+    init_engine()
+    await funnel.initialize()
+    if config.POSTPROCESS_ASYNC:
+        await postprocess.start()
+
+    if args.entry == "http":
+        import httpx
+        from server import app
+        headers = {"X-API-Key": os.getenv("DELIO_API_KEY")} if os.getenv("DELIO_API_KEY") else {}
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://kernel",
+                                   headers=headers, timeout=None)
+
+        async def send(user_id, text, metadata):
+            resp = await client.post("/v1/chat", json={"user_id": user_id, "message": text,
+                                                       "platform": "bench", "metadata": metadata})
+            resp.raise_for_status()
+            return resp.json().get("model_used", "")
+    else:
+        client = None
+
+        async def send(user_id, text, metadata):
+            context = await process_request(user_id, text, platform="bench", metadata=metadata)
+            return context.metadata.get("model_used", "")
+
+    mix = {}
+    for part in args.mix.split(","):
+        kind, _, weight = part.partition("=")
+        mix[kind] = float(weight)
+    kinds, weights = zip(*mix.items())
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    heartbeats = []
+
+    async def timed(kind, call):
+        t0 = time.perf_counter()
+        try:
+            model_used = await call
+            if "Error" in str(model_used):
+                errors[kind] += 1
+        except Exception as e:
+            errors[kind] += 1
+            if args.verbose:
+                print(f"{kind} failed: {e}")
+        latencies[kind].append(time.perf_counter() - t0)
+
+    async def heartbeat(user_id, delay):
+        await asyncio.sleep(delay)
+        event = {"user_id": user_id, "type": "heartbeat", "text": "SYSTEM_HEARTBEAT"}
+        await timed("heartbeat", fsm.process_event(event))
+
+    async def user(user_id):
+        rng = random.Random(args.seed * 100003 + user_id)
+        for _ in range(args.messages):
+            think = rng.expovariate(1000 / args.think_ms) if args.think_ms else 0
+            if rng.random() < args.heartbeat_rate:
+                delay = rng.uniform(0, think + args.think_ms / 1000)
+                heartbeats.append(asyncio.create_task(heartbeat(user_id, delay)))
+            await asyncio.sleep(think)
+            kind = rng.choices(kinds, weights)[0]
+            metadata = {"mode": "deep_think"} if kind == "deep_think" else {}
+            await timed(kind, send(user_id, rng.choice(MESSAGES[kind]), metadata))
+
+    recorded = defaultdict(list)
+    if args.cassette:
+        for entry in load(args.cassette):
+            if entry["kind"] == INBOUND:
+                recorded[entry["user_id"]].append(entry)
+
+    async def recorded_user(user_id):
+        rng = random.Random(args.seed * 100003 + user_id)
+        last = None
+        for entry in recorded[user_id]:
+            gap = (entry["t"] - last) * args.scale if last is not None else 0
+            last = entry["t"]
+            if rng.random() < args.heartbeat_rate:
+                heartbeats.append(asyncio.create_task(heartbeat(user_id, rng.uniform(0, gap + args.think_ms / 1000))))
+            await asyncio.sleep(gap)
+            metadata = entry.get("metadata") or {}
+            kind = "deep_think" if metadata.get("mode") == "deep_think" else "text"
+            await timed(kind, send(user_id, entry["text"], metadata))
+
+    t0 = time.perf_counter()
+    if recorded:
+        await asyncio.gather(*(recorded_user(user_id) for user_id in recorded))
+    else:
+        await asyncio.gather(*(user(10_000 + i) for i in range(args.users)))
+    await asyncio.gather(*heartbeats)
+    wall = time.perf_counter() - t0
+
+    # Deferred reflect / memory jobs: drained, not part of the measured window
+    while postprocess.running and await postprocess.depth():
+        await asyncio.sleep(0.05)
+
+    messages = sum(len(v) for kind, v in latencies.items() if kind != "heartbeat")
+    lock_wait = [v for values in samples.by_label(SESSION_WAIT_SECONDS.name).values() for v in values]
+    result = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "workload": _workload(args),
+        },
+        "throughput": {
+            "wall_s": round(wall, 3),
+            "messages": messages,
+            "heartbeats": len(heartbeats),
+            "messages_per_s": round(messages / wall, 2),
+        },
+        "latency_ms": {"all": _percentiles([v for kind, values in latencies.items() if kind != "heartbeat"
+                                            for v in values]),
+                       **{kind: _percentiles(values) for kind, values in sorted(latencies.items())}},
+        "states_ms": {state: _percentiles(values)
+                      for state, values in sorted(samples.by_label(FSM_STATE_SECONDS.name).items())},
+        "lock_wait_ms": {**_percentiles(lock_wait), "total_s": round(sum(lock_wait), 3)},
+        "provider_calls": dict(sorted(stub.calls.items())) if stub else providers.stats(),
+        "errors": dict(errors),
+    }
+
+    if client is not None:
+        await client.aclose()
+    await postprocess.stop()
+    await reminders.close()
+    await embeddings.cache.close()
+    await funnel.structured.close()
+    await funnel.close()
+    await providers.close()
+    if stub:
+        await stub.stop()
+    return result
+
+
+def _print(result: dict):
+    t = result["throughput"]
+    w = result["meta"]["workload"]
+    if w.get("cassette"):
+        print(f"cassette={w['cassette']} entry={w['entry']} scale={w['scale']}")
+    else:
+        print(f"users={w['users']} messages/user={w['messages']} mix={w['mix']} entry={w['entry']} scale={w['scale']}")
+    print(f"throughput {t['messages_per_s']:8.2f} messages/s  ({t['messages']} messages, "
+          f"{t['heartbeats']} heartbeats in {t['wall_s']:.2f}s)")
+    print(f"\n{'end-to-end':<14}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    for kind, p in result["latency_ms"].items():
+        if p["n"]:
+            print(f"{kind:<14}{p['n']:>6}{p['p50']:>10.1f}{p['p95']:>10.1f}{p['p99']:>10.1f}{p['max']:>10.1f}")
+    print(f"\n{'state':<14}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    for state, p in result["states_ms"].items():
+        print(f"{state:<14}{p['n']:>6}{p['p50']:>10.1f}{p['p95']:>10.1f}{p['p99']:>10.1f}{p['max']:>10.1f}")
+    lw = result["lock_wait_ms"]
+    if lw["n"]:
+        print(f"\nlock wait     {lw['n']:>6}{lw['p50']:>10.1f}{lw['p95']:>10.1f}{lw['p99']:>10.1f}{lw['max']:>10.1f}"
+              f"  total={lw['total_s']}s")
+    print(f"\nprovider calls {result['provider_calls']}  errors {result['errors'] or 0}")
+
+
+def _find_baseline(results_dir: str, workload: dict, exclude: str) -> str:
+    for path in sorted(glob.glob(os.path.join(results_dir, "pipeline_*.json")), reverse=True):
+        if path == exclude:
+            continue
+        with open(path) as f:
+            if json.load(f)["meta"]["workload"] == workload:
+                return path
+    return ""
+
+
+def compare(result: dict, baseline: dict, tolerance: float, floor_ms: float) -> list:
+    """
+    Regressions beyond `tolerance` (relative): throughput down, per-state p95,
+    end-to-end p50 or lock wait p95 up. Latencies must also grow by more than
+    `floor_ms` (sub-ms states are noise) and have MIN_SAMPLES on both sides.
+    End-to-end p95 (and heartbeats) are shown but not gated: they swing with
+    which messages happen to queue behind a heartbeat.
+    """
+    regressions = []
+
+    def check(label, now, before, higher_is_better=False, floor=floor_ms, gate=True):
+        if not before or now is None:
+            return
+        change = (now - before) / before
+        worse = -change if higher_is_better else change
+        flag = "REGRESSION" if gate and worse > tolerance and abs(now - before) > floor else ""
+        print(f"{label:<28}{before:>12.2f}{now:>12.2f}{change * 100:>+9.1f}%  {flag}")
+        if flag:
+            regressions.append(label)
+
+    print(f"\n{'metric':<28}{'baseline':>12}{'now':>12}{'change':>10}")
+    check("messages/s", result["throughput"]["messages_per_s"], baseline["throughput"]["messages_per_s"], True, 0)
+    for name, p in result["latency_ms"].items():
+        before = baseline["latency_ms"].get(name, {})
+        if min(p["n"], before.get("n", 0)) >= MIN_SAMPLES:
+            check(f"{name} p50 ms", p["p50"], before["p50"], gate=name != "heartbeat")  # ~ lock wait
+            check(f"{name} p95 ms", p["p95"], before["p95"], gate=False)
+    for name, p in result["states_ms"].items():
+        before = baseline["states_ms"].get(name, {})
+        if min(p["n"], before.get("n", 0)) >= MIN_SAMPLES:
+            check(f"{name} p95 ms", p["p95"], before["p95"])
+    if min(result["lock_wait_ms"]["n"], baseline["lock_wait_ms"]["n"]) >= MIN_SAMPLES:
+        check("lock wait p95 ms", result["lock_wait_ms"]["p95"], baseline["lock_wait_ms"]["p95"])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of the full FSM pipeline with stub providers")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=5, help="Messages per user")
+    parser.add_argument("--mix", default="text=75,tool=15,deep_think=10", help="kind=weight,...")
+    parser.add_argument("--think-ms", type=float, default=2000.0, help="Mean user think time (exponential)")
+    parser.add_argument("--heartbeat-rate", type=float, default=0.25, help="Heartbeats per message (0 = off)")
+    parser.add_argument("--reply-words", type=int, default=60)
+    parser.add_argument("--entry", choices=("engine", "http"), default="engine")
+    parser.add_argument("--profile", action="append", default=[], metavar="ROLE=SPEC",
+                        help=f"Latency profile override; roles: {', '.join(DEFAULT_PROFILES)}")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every simulated latency")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--results", default=os.path.join(ROOT, "data", "bench"), help="Where run results are kept")
+    parser.add_argument("--compare", nargs="?", const="latest", metavar="RESULT.json",
+                        help="Compare with a result file (default: latest earlier run of the same workload)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative change flagged as a regression")
+    parser.add_argument("--floor-ms", type=float, default=10.0, help="Smallest latency growth flagged")
+    parser.add_argument("--cassette", metavar="CASSETTE.jsonl",
+                        help="Replay recorded provider calls and messages (latency x --scale)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    if args.cassette:
+        args.cassette = os.path.abspath(args.cassette)
+
+    results_dir = os.path.abspath(args.results)
+    compare_path = os.path.abspath(args.compare) if args.compare not in (None, "latest") else args.compare
+    _sandbox(args)
+    result = asyncio.run(run(args))
+    _print(result)
+
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"\nsaved {path}")
+
+    if compare_path == "latest":
+        compare_path = _find_baseline(results_dir, result["meta"]["workload"], exclude=path)
+        if not compare_path:
+            print("no earlier run of this workload to compare with")
+            return
+    if compare_path:
+        with open(compare_path) as f:
+            baseline = json.load(f)
+        if baseline["meta"]["workload"] != result["meta"]["workload"]:
+            print("⚠️ baseline workload differs; numbers are not directly comparable")
+        print(f"baseline {compare_path} ({baseline['meta'].get('commit')})")
+        regressions = compare(result, baseline, args.tolerance, args.floor_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
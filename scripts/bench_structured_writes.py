@@ -0,0 +1,65 @@
+"""
+Benchmark: StructuredMemory write throughput (one commit per row vs set_many).
+
+Writes the same rows into a fresh temporary database twice: once through
+set_memory (a commit and WAL fsync per row), once through set_many in batches.
+
+    python scripts/bench_structured_writes.py --rows 2000 --batch 20
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.memory.structured import StructuredMemory, MemoryRow, TTL_MAP
+
+
+def _rows(count):
+    sections = list(TTL_MAP)
+    return [
+        MemoryRow(sections[i % len(sections)], f"key_{i}", {"value": f"fact number {i}"}, 0.5 + (i % 5) / 10)
+        for i in range(count)
+    ]
+
+
+async def _run(label, db_path, write):
+    memory = StructuredMemory(db_path)
+    await memory.init_db()
+    t0 = time.perf_counter()
+    written = await write(memory)
+    wall = time.perf_counter() - t0
+    await memory.close()
+    print(f"{label:<24} rows={written:6d}  wall={wall * 1000:9.1f}ms  rows/sec={written / wall:10.1f}")
+    return written / wall
+
+
+async def main(args):
+    rows = _rows(args.rows)
+
+    async def single(memory):
+        for row in rows:
+            await memory.set_memory(1, row.section, row.key, row.value, row.confidence)
+        return len(rows)
+
+    async def bulk(memory):
+        for i in range(0, len(rows), args.batch):
+            await memory.set_many(1, rows[i:i + args.batch])
+        return len(rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"rows={args.rows} | batch={args.batch}")
+        single_rps = await _run("set_memory (per row)", os.path.join(tmp, "single", "m.db"), single)
+        bulk_rps = await _run(f"set_many (x{args.batch})", os.path.join(tmp, "bulk", "m.db"), bulk)
+        print(f"speedup: {bulk_rps / single_rps:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="StructuredMemory write throughput benchmark")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,108 @@
+"""
+Stress test: kernel per-user tables under a million distinct user IDs.
+
+Every simulated user runs one FSM-shaped session (session lock held across
+OBSERVE -> ... -> IDLE transitions); `--concurrency` sessions are in flight at
+once. Memory is sampled with tracemalloc at each checkpoint, first for the
+previous layout (one asyncio.Lock + one state entry kept per user ever seen),
+then for SessionLocks + the non-IDLE StateGuard table.
+
+    python scripts/bench_user_tables.py --users 1000000 --concurrency 1000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.coordination import SessionLocks
+from core.state import State
+from core.state_guard import StateGuard
+
+PATH = (State.OBSERVE, State.RETRIEVE, State.PLAN, State.DECIDE, State.RESPOND, State.REFLECT, State.MEMORY_WRITE)
+
+
+class _KeepIdleGuard(StateGuard):
+    """Previous StateGuard layout: IDLE users stay in the table."""
+
+    def _set_state(self, user_id, state):
+        self._user_states[user_id] = state
+
+    def force_idle(self, user_id):
+        self._user_states[user_id] = State.IDLE
+
+
+class UnboundedTables:
+    """Previous layout: one lock per user ever seen, never evicted."""
+
+    def __init__(self):
+        self.locks = {}
+        self.guard = _KeepIdleGuard()
+
+    def hold(self, user_id):
+        lock = self.locks.get(user_id)
+        if lock is None:
+            lock = self.locks[user_id] = asyncio.Lock()
+        return lock
+
+    def sizes(self):
+        return len(self.locks), len(self.guard._user_states)
+
+
+class BoundedTables:
+    def __init__(self):
+        self.sessions = SessionLocks()
+        self.guard = StateGuard()
+
+    def hold(self, user_id):
+        return self.sessions.hold(user_id)
+
+    def sizes(self):
+        return len(self.sessions), len(self.guard._user_states)
+
+
+async def _session(tables, user_id):
+    async with tables.hold(user_id):
+        tables.guard.force_idle(user_id)
+        for state in PATH:
+            await tables.guard.enter(user_id, state)
+            await asyncio.sleep(0)
+        await tables.guard.enter(user_id, State.IDLE)
+    tables.guard.force_idle(user_id)
+
+
+async def _run(label, tables, users, concurrency, checkpoints):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    next_user = 0
+    for checkpoint in checkpoints:
+        while next_user < checkpoint:
+            batch = range(next_user, min(next_user + concurrency, checkpoint))
+            await asyncio.gather(*(_session(tables, 1_000_000_000 + uid) for uid in batch))
+            next_user = batch.stop
+        current = tracemalloc.get_traced_memory()[0] - base
+        locks, states = tables.sizes()
+        print(f"{label:<10} users={checkpoint:8d}  retained={current / 2**20:8.1f}MiB  "
+              f"lock_entries={locks:8d}  state_entries={states:8d}")
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    print(f"{label:<10} wall={time.perf_counter() - t0:6.1f}s  peak={peak / 2**20:.1f}MiB")
+
+
+async def main(args):
+    checkpoints = sorted({max(1, args.users * i // 4) for i in range(1, 5)})
+    print(f"users={args.users} | concurrency={args.concurrency}")
+    await _run("unbounded", UnboundedTables(), args.users, args.concurrency, checkpoints)
+    await _run("bounded", BoundedTables(), args.users, args.concurrency, checkpoints)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-user kernel table memory under many distinct users")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,106 @@
+"""
+Benchmark: FSM-shaped sessions per second vs. kernel worker count (Redis coordination).
+
+Each worker is a separate process with its own Coordinator(RedisBackend). Workers
+pull events for `--users` users (so the same user regularly arrives at two
+workers at once), take the user's lease, publish OBSERVE, simulate the state
+handlers with `--work-ms` of awaiting, publish IDLE and release. Mutual exclusion
+is checked with a per-user INCR/DECR counter kept in Redis.
+
+    python scripts/bench_workers.py --workers 1 2 4 8 --events 4000 --users 200
+    (needs a redis-server; COORDINATION_REDIS_URL or --url)
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import redis.asyncio as redis
+import config
+from core.coordination import Coordinator, RedisBackend
+from core.state import State
+
+PREFIX = "bench"
+
+
+async def _worker(url: str, events: int, users: int, concurrency: int, work_ms: float, result):
+    client = redis.from_url(url, decode_responses=True)
+    coordinator = Coordinator(RedisBackend(client=client, prefix=PREFIX))
+    overlaps = 0
+
+    async def session():
+        nonlocal overlaps
+        user_id = random.randrange(users)
+        async with coordinator.session(user_id) as lease:
+            if await client.incr(f"{PREFIX}:inside:{user_id}") > 1:
+                overlaps += 1
+            await coordinator.publish_state(lease, State.OBSERVE)
+            await asyncio.sleep(work_ms / 1000)
+            await coordinator.publish_state(lease, State.IDLE)
+            await client.decr(f"{PREFIX}:inside:{user_id}")
+
+    queue = asyncio.Queue()
+    for _ in range(events):
+        queue.put_nowait(None)
+
+    async def runner():
+        while not queue.empty():
+            queue.get_nowait()
+            await session()
+
+    await asyncio.gather(*(runner() for _ in range(concurrency)))
+    result.put((overlaps, coordinator.backend.counters["contended"]))
+    await client.close()
+
+
+def _process(url, events, users, concurrency, work_ms, result):
+    asyncio.run(_worker(url, events, users, concurrency, work_ms, result))
+
+
+async def _reset(url: str):
+    client = redis.from_url(url, decode_responses=True)
+    keys = [key async for key in client.scan_iter(f"{PREFIX}:*")]
+    if keys:
+        await client.delete(*keys)
+    await client.close()
+
+
+def run(workers: int, args) -> None:
+    asyncio.run(_reset(args.url))
+    result = multiprocessing.Queue()
+    per_worker = args.events // workers
+    procs = [
+        multiprocessing.Process(target=_process, args=(args.url, per_worker, args.users, args.concurrency, args.work_ms, result))
+        for _ in range(workers)
+    ]
+    t0 = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    totals = [result.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    wall = time.perf_counter() - t0
+    overlaps = sum(o for o, _ in totals)
+    contended = sum(c for _, c in totals)
+    print(f"workers={workers:2d}  events={per_worker * workers:6d}  wall={wall:6.2f}s  "
+          f"throughput={per_worker * workers / wall:8.1f}/s  contended_polls={contended:6d}  overlaps={overlaps}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Session throughput vs worker count with Redis session leases")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--events", type=int, default=4000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50, help="In-flight sessions per worker")
+    parser.add_argument("--work-ms", type=float, default=20.0, help="Simulated handler time per session")
+    parser.add_argument("--url", default=config.COORDINATION_REDIS_URL)
+    args = parser.parse_args()
+    print(f"url={args.url} | users={args.users} | concurrency/worker={args.concurrency} | work={args.work_ms}ms")
+    for n in args.workers:
+        run(n, args)
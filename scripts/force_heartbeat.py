@@ -62,20 +62,15 @@ async def main():
     guard._user_states = {999999: State.IDLE}
 
     
-    # 3. Create a fake active user if none exists
-    import sqlite3
-    conn = sqlite3.connect('data/chat_history.db')
-    cursor = conn.cursor()
-    cursor.execute("CREATE TABLE IF NOT EXISTS messages (user_id INTEGER, timestamp TEXT)")
-    # Insert a user active just now
-    from datetime import datetime
-    cursor.execute("INSERT INTO messages (user_id, timestamp) VALUES (?, ?)", (999999, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-    conn.commit()
-    conn.close()
+    # 3. Mark a fake user as active
+    from core.heartbeat import activity
+    activity.touch(999999)
 
-    # 4. Trigger
+    # 4. Trigger (no spreading: run the round right away)
     logger.info("💓 Invoking trigger_heartbeat()...")
-    await trigger_heartbeat()
+    round_task = await trigger_heartbeat(spread=False)
+    if round_task:
+        await round_task
     
     logger.info("✅ Test Complete")
 
@@ -9,7 +9,9 @@ import chromadb
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from google import genai
-from config import GEMINI_KEY, MODEL_FAST
+from config import GEMINI_KEY, MODEL_FAST, OBSIDIAN_INDEX_PATH
+from core.memory.obsidian_index import ObsidianIndex
+from core.memory.obsidian_chunks import ChunkIndexer
 
 # Setup Logging
 logging.basicConfig(
@@ -26,32 +28,35 @@ logger = logging.getLogger("Delio.ObsidianSync")
 OBSIDIAN_PATH = "/data/obsidian"
 CHROMA_PATH = "/root/ai_assistant/data/chroma_db"
 COLLECTION_NAME = "obsidian_knowledge"
+INDEX_PATH = os.path.join("/root/ai_assistant", OBSIDIAN_INDEX_PATH)
+CHECKPOINT_PATH = "/root/ai_assistant/data/obsidian_sync_checkpoint.json"
+EMBED_MODEL = "models/gemini-embedding-001"
+SCAN_WORKERS = 4 # Bounded parallelism for the initial scan
 
 class ObsidianHandler(FileSystemEventHandler):
-    def __init__(self, chroma_client, gemini_client):
+    def __init__(self, chroma_client, gemini_client, keyword_index: ObsidianIndex = None):
         self.collection = chroma_client.get_or_create_collection(name=COLLECTION_NAME)
         self.gemini = gemini_client
+        self.keyword_index = keyword_index # Shared BM25 index (ContextFunnel reads it)
+        self.chunks = ChunkIndexer(
+            self.collection, self._embed_batch, OBSIDIAN_PATH, CHECKPOINT_PATH, workers=SCAN_WORKERS
+        )
         self.last_processed = {} # path -> timestamp (for debounce)
 
-    def _get_embedding(self, text):
-        models_to_try = ["models/gemini-embedding-001"]
-        
-        for model in models_to_try:
-            try:
-                # Use Gemini for embeddings
-                result = self.gemini.models.embed_content(
-                    model=model,
-                    contents=text,
-                    config={
-                        'task_type': 'RETRIEVAL_DOCUMENT'
-                    }
-                )
-                return result.embeddings[0].values
-            except Exception as e:
-                logger.warning(f"Embedding failed with {model}: {e}")
-        
-        logger.error("All embedding models failed.")
-        return None
+    def _embed_batch(self, texts):
+        """One embed_content call per batch of chunks"""
+        try:
+            result = self.gemini.models.embed_content(
+                model=EMBED_MODEL,
+                contents=texts,
+                config={
+                    'task_type': 'RETRIEVAL_DOCUMENT'
+                }
+            )
+            return [e.values for e in result.embeddings]
+        except Exception as e:
+            logger.warning(f"Embedding failed with {EMBED_MODEL}: {e}")
+            return [None] * len(texts)
 
     def _process_file(self, file_path):
         # 1. Debounce (2 seconds)
@@ -64,37 +69,28 @@ class ObsidianHandler(FileSystemEventHandler):
             return
 
         logger.info(f"📄 Processing: {file_path}")
+        self.last_processed[file_path] = now
+
+        if self.keyword_index:
+            try:
+                self.keyword_index.update_file(file_path)
+            except Exception as e:
+                logger.error(f"Keyword index update failed for {file_path}: {e}")
         
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-
-            if not content.strip():
-                return
-
-            # Chunking (Simple max chars)
-            # For V1, we just take the first 8000 chars aka "The Abstract"
-            # Ideally -> split by headers
-            truncated_content = content[:8000]
-
-            embedding = self._get_embedding(truncated_content)
-            
-            if embedding:
-                # ID = filename
-                file_id = os.path.basename(file_path)
-                
-                self.collection.upsert(
-                    ids=[file_id],
-                    documents=[truncated_content],
-                    embeddings=[embedding],
-                    metadatas=[{"path": file_path, "last_modified": str(now)}]
-                )
-                logger.info(f"✅ Indexed: {file_id}")
-                self.last_processed[file_path] = now
-
+            embedded, deleted = self.chunks.index_file(file_path)
+            logger.info(f"✅ Indexed: {file_path} ({embedded} chunks embedded, {deleted} removed)")
         except Exception as e:
             logger.error(f"Failed to process {file_path}: {e}")
 
+    def _remove_file(self, file_path):
+        if not file_path.endswith(".md"):
+            return
+        if self.keyword_index:
+            self.keyword_index.remove_file(file_path)
+        removed = self.chunks.remove_file(file_path)
+        logger.info(f"🗑️ Removed: {file_path} ({removed} chunks)")
+
     def on_modified(self, event):
         if not event.is_directory:
             self._process_file(event.src_path)
@@ -103,6 +99,15 @@ class ObsidianHandler(FileSystemEventHandler):
         if not event.is_directory:
             self._process_file(event.src_path)
 
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self._remove_file(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._process_file(event.dest_path)
+            self._remove_file(event.src_path)
+
 def main():
     # Ensure dirs
     os.makedirs(OBSIDIAN_PATH, exist_ok=True)
@@ -115,19 +120,21 @@ def main():
     logger.info("🔌 Connecting to Gemini...")
     gemini_client = genai.Client(api_key=GEMINI_KEY)
 
+    # Shared keyword index: full delta sync first, then watcher updates
+    keyword_index = ObsidianIndex(OBSIDIAN_PATH, INDEX_PATH)
+    indexed, removed = keyword_index.refresh(force=True)
+    logger.info(f"🕸️ Keyword index ready ({indexed} indexed, {removed} removed)")
+
     # Setup Watchdog
-    event_handler = ObsidianHandler(chroma_client, gemini_client)
+    event_handler = ObsidianHandler(chroma_client, gemini_client, keyword_index)
     observer = Observer()
     observer.schedule(event_handler, OBSIDIAN_PATH, recursive=True)
     
     logger.info(f"👁️ Obsidian Watcher started on {OBSIDIAN_PATH}. Initial scan incoming...")
     
-    # Initial Scan
-    for root, dirs, files in os.walk(OBSIDIAN_PATH):
-        for file in files:
-            if file.endswith(".md"):
-                file_path = os.path.join(root, file)
-                event_handler._process_file(file_path)
+    # Initial Scan (parallel, resumes from the checkpoint)
+    stats = event_handler.chunks.initial_scan()
+    logger.info(f"✅ Initial scan done: {stats}")
     
     observer.start()
 
@@ -0,0 +1,171 @@
+"""
+In-process stand-ins for the memory backends, with simulated service time.
+Used by the offline pipeline benchmark (scripts/bench_pipeline.py).
+
+- StubRedis: the slice of redis.asyncio the short-term history uses (PING,
+  MULTI/EXEC pipeline of RPUSH + LTRIM + EXPIRE, LRANGE, DEL); one sampled
+  round trip per command / pipeline
+- StubCollection: a Chroma collection (add / upsert / query) kept in memory; it sleeps
+  in the calling thread, like the real client inside run_in_executor
+
+    funnel.redis.client = StubRedis(LatencyProfile(ms=0.3))
+    funnel.chroma.collection = StubCollection(LatencyProfile(ms=8))
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from scripts.stub_provider import LatencyProfile
+
+
+class _Pipeline:
+    def __init__(self, redis: "StubRedis"):
+        self._redis = redis
+        self._ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def rpush(self, key, *values):
+        self._ops.append(("rpush", key, values))
+
+    def ltrim(self, key, start, end):
+        self._ops.append(("ltrim", key, (start, end)))
+
+    def expire(self, key, seconds):
+        self._ops.append(("expire", key, ()))
+
+    def incr(self, key):
+        self._ops.append(("incr", key, ()))
+
+    def set(self, key, value, ex=None):
+        self._ops.append(("set", key, (value,)))
+
+    def get(self, key):
+        self._ops.append(("get", key, ()))
+
+    def lrange(self, key, start, end):
+        self._ops.append(("lrange", key, (start, end)))
+
+    def delete(self, key):
+        self._ops.append(("delete", key, ()))
+
+    async def execute(self):
+        await self._redis._round_trip()
+        results = []
+        for op, key, args in self._ops:
+            if op == "rpush":
+                items = self._redis.lists[key]
+                items.extend(args)
+                results.append(len(items))
+            elif op == "ltrim":
+                start, end = args
+                self._redis.lists[key] = self._redis.lists[key][slice(start, None if end == -1 else end + 1)]
+                results.append(True)
+            elif op == "set":
+                self._redis.values[key] = args[0]
+                results.append(True)
+            elif op == "incr":
+                self._redis.values[key] = str(int(self._redis.values.get(key, 0)) + 1)
+                results.append(int(self._redis.values[key]))
+            elif op == "get":
+                results.append(self._redis.values.get(key))
+            elif op == "lrange":
+                start, end = args
+                results.append(self._redis.lists.get(key, [])[slice(start, None if end == -1 else end + 1)])
+            elif op == "delete":
+                found = self._redis.lists.pop(key, None) is not None or self._redis.values.pop(key, None) is not None
+                results.append(1 if found else 0)
+            else:
+                results.append(True)
+        self._ops.clear()
+        return results
+
+
+class StubRedis:
+    def __init__(self, profile: LatencyProfile = None, seed: int = 0):
+        self.profile = profile or LatencyProfile()
+        self.rng = random.Random(seed)
+        self.lists: Dict[str, List[str]] = defaultdict(list)
+        self.values: Dict[str, str] = {}
+        self.commands = 0
+
+    async def _round_trip(self):
+        self.commands += 1
+        delay = self.profile.sample(self.rng)
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def ping(self):
+        await self._round_trip()
+        return True
+
+    def pipeline(self, transaction: bool = True) -> _Pipeline:
+        return _Pipeline(self)
+
+    async def lrange(self, key, start, end):
+        await self._round_trip()
+        items = self.lists.get(key, [])
+        return items[slice(start, None if end == -1 else end + 1)]
+
+    async def get(self, key):
+        await self._round_trip()
+        return self.values.get(key)
+
+    async def delete(self, key):
+        await self._round_trip()
+        return 1 if self.lists.pop(key, None) is not None else 0
+
+    async def close(self):
+        pass
+
+
+class StubCollection:
+    """Chroma collection stand-in: newest documents first, metadata filter on equality."""
+
+    def __init__(self, profile: LatencyProfile = None, seed: int = 0):
+        self.profile = profile or LatencyProfile()
+        self.rng = random.Random(seed)
+        self.docs: List[dict] = []
+        self.calls = 0
+        self._lock = threading.Lock()  # Called from the default executor's threads
+
+    def _service_time(self):
+        with self._lock:
+            self.calls += 1
+            delay = self.profile.sample(self.rng)
+        if delay:
+            time.sleep(delay)
+
+    def add(self, documents, embeddings, metadatas, ids):
+        self._service_time()
+        with self._lock:
+            for id_, doc, meta in zip(ids, documents, metadatas):
+                self.docs.append({"id": id_, "text": doc, "metadata": meta})
+
+    def upsert(self, documents, embeddings, metadatas, ids):
+        self._service_time()
+        with self._lock:
+            replaced = set(ids)
+            self.docs = [d for d in self.docs if d["id"] not in replaced]
+            for id_, doc, meta in zip(ids, documents, metadatas):
+                self.docs.append({"id": id_, "text": doc, "metadata": meta})
+
+    def query(self, query_embeddings, n_results, where=None):
+        self._service_time()
+        with self._lock:
+            hits = [d for d in reversed(self.docs)
+                    if not where or all(d["metadata"].get(k) == v for k, v in where.items())][:n_results]
+        return {
+            "ids": [[d["id"] for d in hits]],
+            "documents": [[d["text"] for d in hits]],
+            "metadatas": [[d["metadata"] for d in hits]],
+            "distances": [[0.1 * i for i in range(len(hits))]],
+        }
@@ -0,0 +1,215 @@
+"""
+Local Stub LLM Provider (HTTP/1.1 keep-alive)
+Speaks just enough of the Gemini REST and OpenAI-compatible (DeepSeek) wire
+formats for the SDKs to parse a response. Used by the offline benchmarks.
+
+    stub = StubProvider(latency_ms=5)
+    await stub.start()
+    config.DEEPSEEK_BASE_URL = stub.url
+    config.GEMINI_BASE_URL = stub.url
+
+Per-role timing: `role_of(path, request)` names the caller (router, actor...),
+`profiles[role]` is its LatencyProfile and `reply` may be a callable
+(role, request) -> text. Sampling is seeded, so runs are repeatable.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import random
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Union
+
+logger = logging.getLogger("Delio.StubProvider")
+
+_MODEL_RE = re.compile(r"models/([^:/]+):")
+
+
+def model_of(path: str) -> Optional[str]:
+    """Gemini model name from a REST path (/v1beta/models/<model>:generateContent)."""
+    match = _MODEL_RE.search(path)
+    return match.group(1) if match else None
+
+
+@dataclass
+class LatencyProfile:
+    """
+    Simulated service time of one call: `ms` to the first byte, drawn from
+    `dist` (fixed | uniform: ms +- ms*spread | lognormal: median ms, sigma spread),
+    then one word per 1/tokens_per_s (0 = the whole reply at once).
+    """
+    ms: float = 0.0
+    dist: str = "fixed"
+    spread: float = 0.5
+    tokens_per_s: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyProfile":
+        """'400' | 'lognormal:400:0.6' | 'uniform:20:0.5@80' (@ = tokens/s)."""
+        spec, _, rate = spec.partition("@")
+        parts = spec.split(":")
+        if len(parts) == 1:
+            return cls(ms=float(parts[0]), tokens_per_s=float(rate or 0))
+        profile = cls(dist=parts[0], ms=float(parts[1]), tokens_per_s=float(rate or 0))
+        if len(parts) > 2:
+            profile.spread = float(parts[2])
+        if profile.dist not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {profile.dist}")
+        return profile
+
+    def sample(self, rng: random.Random) -> float:
+        """Seconds to the first byte."""
+        if self.dist == "uniform":
+            ms = rng.uniform(self.ms * (1 - self.spread), self.ms * (1 + self.spread))
+        elif self.dist == "lognormal":
+            ms = self.ms * math.exp(rng.gauss(0.0, self.spread))
+        else:
+            ms = self.ms
+        return max(ms, 0.0) / 1000
+
+    def per_token(self) -> float:
+        return 1 / self.tokens_per_s if self.tokens_per_s else 0.0
+
+
+class StubProvider:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0,
+                 reply: Union[str, Callable[[str, dict], str]] = "OK",
+                 profiles: Dict[str, LatencyProfile] = None,
+                 role_of: Callable[[str, dict], str] = None, seed: int = 0):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.reply = reply
+        self.profiles = profiles or {}
+        self.role_of = role_of
+        self.seed = seed
+        self._rngs: Dict[str, random.Random] = {}
+        self.requests = 0
+        self.calls = Counter()  # role -> requests
+        self.connections = 0
+        self._server = None
+        self._writers = set()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"🧪 Stub provider listening on {self.url}")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            # Server.close() leaves keep-alive connections open; drop them explicitly
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            await asyncio.sleep(0)
+
+    def _profile(self, role: str) -> LatencyProfile:
+        return self.profiles.get(role) or self.profiles.get("default") or LatencyProfile(ms=self.latency_ms)
+
+    def _rng(self, role: str) -> random.Random:
+        # One stream per role: the n-th actor call gets the same delay in every
+        # run, whatever the interleaving with other roles
+        rng = self._rngs.get(role)
+        if rng is None:
+            rng = self._rngs[role] = random.Random(f"{self.seed}:{role}")
+        return rng
+
+    def _reply_for(self, role: str, request: dict) -> str:
+        return self.reply(role, request) if callable(self.reply) else self.reply
+
+    def _stream_events(self, reply: str) -> list:
+        """Gemini :streamGenerateContent?alt=sse - one event per word of the reply."""
+        words = reply.split(" ")
+        events = []
+        for i, word in enumerate(words):
+            delta = word if i == len(words) - 1 else word + " "
+            chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": delta}]}}]}
+            events.append(f"data: {json.dumps(chunk)}\r\n\r\n".encode())
+        return events
+
+    def _body_for(self, path: str, request: dict, reply: str) -> dict:
+        if ":embedContent" in path or ":batchEmbedContents" in path:
+            n = len(request.get("requests", [])) or 1
+            return {"embeddings": [{"values": [0.1] * 8} for _ in range(n)]}
+        if ":generateContent" in path:
+            return {
+                "candidates": [{
+                    "content": {"role": "model", "parts": [{"text": reply}]},
+                    "finishReason": "STOP"
+                }]
+            }
+        # OpenAI-compatible chat completion
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": 0,
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                _method, path, _ver = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        k, v = line.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                length = int(headers.get("content-length", "0"))
+                raw = await reader.readexactly(length) if length else b""
+                try:
+                    request = json.loads(raw) if raw else {}
+                except ValueError:
+                    request = {}
+
+                role = self.role_of(path, request) if self.role_of else "default"
+                profile = self._profile(role)
+                reply = self._reply_for(role, request)
+                delay = profile.sample(self._rng(role))
+                self.requests += 1
+                self.calls[role] += 1
+
+                if ":streamGenerateContent" in path:
+                    chunks, content_type = self._stream_events(reply), b"text/event-stream"
+                else:
+                    # Unstreamed: the whole generation time is paid before the first byte
+                    delay += len(reply.split()) * profile.per_token()
+                    body = json.dumps(self._body_for(path, request, reply)).encode()
+                    chunks, content_type = [body], b"application/json"
+                if delay:
+                    await asyncio.sleep(delay)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: " + content_type + b"\r\n"
+                    b"Connection: keep-alive\r\n"
+                    + f"Content-Length: {sum(map(len, chunks))}\r\n\r\n".encode()
+                )
+                for i, chunk in enumerate(chunks):
+                    if i and profile.tokens_per_s:
+                        await writer.drain()
+                        await asyncio.sleep(profile.per_token())
+                    writer.write(chunk)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
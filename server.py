@@ -1,12 +1,14 @@
 import os
 import uvicorn
-from fastapi import FastAPI, HTTPException, Request, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request, Depends, Header
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import APIKeyHeader
 import logging
+from typing import Optional
 import config
-from core.api_models import ChatRequest, ChatResponse
+from core.api_models import ChatRequest, ChatResponse, JobAccepted, JobStatus, response_from_context
 from core.engine import process_request, init_engine
+from core.jobs import jobs
 from core.fsm import instance as fsm
 
 from aiogram import Bot
@@ -40,19 +42,65 @@ async def startup_event():
         init_engine(real_bot=real_bot)
         # CRASH AMNESIA: Reset states
         await fsm.force_reset_all_users()
+        if config.POSTPROCESS_ASYNC:
+            from core.postprocess import postprocess
+            await postprocess.start()
         logger.info("✅ Engine Initialized successfully")
     except Exception as e:
         logger.critical(f"❌ Failed to initialize engine: {e}")
         raise e
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    from core.postprocess import postprocess
+    await postprocess.stop()
+    from core.notifications import reminders
+    await reminders.close()
+    from core.heartbeat import activity
+    await activity.sync()
+    from core.coordination import coordinator
+    await coordinator.backend.close()
+    from core.providers import providers
+    await providers.close()
+    logger.info("🔌 Provider pools closed")
+
 @app.get("/health")
 async def health_check():
+    from core.router import router
+    from core.llm_service import critic_stats
+    from core.postprocess import postprocess
+    from core.memory.embeddings import embeddings
+    from core.prompt_compiler import prompt_compiler
+    from core.memory.funnel import funnel
+    from core.notifications import reminders
+    from core.heartbeat import heartbeat, gate
+    from core.coordination import coordinator
+    from core.providers import providers
     return {
         "status": "ok", 
         "version": "4.0.0-Headless",
-        "service": "Delio Kernel"
+        "service": "Delio Kernel",
+        "router": router.stats(),  # avoided_ratio = share of messages classified without an LLM call
+        "critic": critic_stats(),  # change_ratio = share of Critic runs that changed the answer
+        "postprocess": await postprocess.stats() if config.POSTPROCESS_ASYNC else {"enabled": False},  # depth / lag of deferred reflect + memory jobs
+        "embeddings": embeddings.stats(),  # hit_ratio = share of texts served from the vector cache
+        "prompt": prompt_compiler.stats(),  # avg_tokens_per_section = where system prompt tokens go
+        "profile_cache": funnel.structured.cache.stats(),  # hit_ratio = profiles served without a table scan
+        "short_term": funnel.redis.stats(),  # local_reads = history served from the in-process ring buffer
+        "reminders": await reminders.stats(),  # avg_delivery_lag_s = time from due to delivered (incl. busy users)
+        "heartbeat": heartbeat.stats(),  # backlog = users whose heartbeat from a previous tick is still pending
+        "heartbeat_gate": gate.stats(),  # avoided_llm_calls / shadow_agreement with the model's SKIP decision
+        "coordination": coordinator.stats(),  # contended / lost = lease waits on other workers / leases that expired mid-run
+        "jobs": jobs.stats(),  # running = async / SSE chat runs not finished yet
+        "providers": providers.stats()  # record / replay: exact / fuzzy / reused / misses = how replayed calls matched
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition: latency histograms + queue / session gauges."""
+    from core.metrics import metrics
+    return PlainTextResponse(await metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/v1/chat", response_model=ChatResponse, dependencies=[Depends(verify_api_key)])
 async def chat_endpoint(request: ChatRequest):
     try:
@@ -60,36 +108,46 @@ async def chat_endpoint(request: ChatRequest):
             user_id=request.user_id,
             text=request.message,
             message_id=request.message_id,
-            platform=request.platform
+            platform=request.platform,
+            metadata=request.metadata
         )
         
-        # Determine Status
-        status = "complete"
-        msg = context.sent_response
-        
-        # Fallback Logic
-        if not msg:
-            if context.errors:
-                msg = f"⚠️ Error: {context.errors}"
-                status = "error"
-            else:
-                msg = context.response or "⚠️ No response."
-                status = "processing" if not context.response else "complete"
-
-        # Model used
-        model_used = context.metadata.get("model_used", "Delio-FSM")
-
-        return ChatResponse(
-            text=msg,
-            model_used=model_used,
-            tool_calls=context.tool_calls,
-            lifecycle_status=status
-        )
+        return response_from_context(context)
         
     except Exception as e:
         logger.error(f"❌ API Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # No proxy buffering
+
+@app.post("/v1/chat/stream", dependencies=[Depends(verify_api_key)])
+async def chat_stream_endpoint(request: ChatRequest):
+    """SSE: `state` per FSM transition, `chunk` per streamed response delta, then `done` / `error`."""
+    job = jobs.submit(request)
+    return StreamingResponse(job.sse(), media_type="text/event-stream",
+                             headers={**SSE_HEADERS, "X-Job-Id": job.id})
+
+@app.post("/v1/jobs", status_code=202, response_model=JobAccepted, dependencies=[Depends(verify_api_key)])
+async def submit_job(request: ChatRequest):
+    """Accept a run (e.g. DEEP_THINK) without holding the connection; poll or follow its events."""
+    job = jobs.submit(request)
+    return JobAccepted(job_id=job.id, status_url=f"/v1/jobs/{job.id}", events_url=f"/v1/jobs/{job.id}/events")
+
+@app.get("/v1/jobs/{job_id}", response_model=JobStatus, dependencies=[Depends(verify_api_key)])
+async def get_job(job_id: str):
+    job = await jobs.lookup(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_status()
+
+@app.get("/v1/jobs/{job_id}/events", dependencies=[Depends(verify_api_key)])
+async def job_events(job_id: str, last_event_id: Optional[int] = Header(None)):
+    """SSE of a job; resumes after Last-Event-ID on reconnect."""
+    job = await jobs.lookup(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return StreamingResponse(job.sse(last_event_id), media_type="text/event-stream", headers=SSE_HEADERS)
+
 if __name__ == "__main__":
     uvicorn.run(
         "server:app", 
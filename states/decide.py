@@ -2,6 +2,7 @@ import logging
 from states.base import BaseState
 from core.state import State
 from core.context import ExecutionContext
+from core.heartbeat import gate
 
 logger = logging.getLogger("Delio.Decide")
 
@@ -22,7 +23,9 @@ class DecideState(BaseState):
 
             # STRICT FILTER: Any response starting with SKIP is a SKIP.
             # Covers "SKIP", "SKIP: No changes", "SKIP.", leading markdown, etc.
-            if resp_clean.lstrip("*_#>- ").startswith("SKIP"):
+            skipped = resp_clean.lstrip("*_#>- ").startswith("SKIP")
+            gate.record(context.user_id, skipped, context.metadata)
+            if skipped:
                 logger.info(f"🤐 Heartbeat SKIPPED for user {context.user_id}")
                 return State.IDLE
             
@@ -6,6 +6,7 @@ from states.base import BaseState
 from core.state import State
 from core.context import ExecutionContext
 from core import llm_service
+from states.retrieve import join_speculative
 
 logger = logging.getLogger("Delio.DeepThink")
 
@@ -24,6 +25,8 @@ class DeepThinkState(BaseState):
                 logger.warning(f"Failed to send typing action: {e}")
 
         try:
+            await join_speculative(context)
+
             # 1. Prepare Memory Summary
             mem = context.memory_context
             mem_summary = self._format_memory_summary(mem)
@@ -61,7 +64,7 @@ class DeepThinkState(BaseState):
         # Identity
         identity = mem.get("structured_profile", {}).get("core_identity", {})
         if identity:
-             summary.append(f"Identity: {', '.join([f'{k}:{v.get('value')}' for k,v in identity.items()])}")
+             summary.append("Identity: " + ", ".join(f"{k}:{v.get('value')}" for k, v in identity.items()))
              
         # Recent Facts
         recent = mem.get("long_term_memories", [])[:3]
@@ -5,6 +5,8 @@ from core.context import ExecutionContext
 
 logger = logging.getLogger("Delio.Error")
 
+CRITIC_REJECTION_TEXT = "⚠️ Моя внутрішня система безпеки (Critic) заблокувала цю відповідь. Спробуйте перефразувати."
+
 class ErrorState(BaseState):
     def __init__(self, bot=None):
         self.bot = bot
@@ -21,7 +23,7 @@ class ErrorState(BaseState):
                 # If we have specific safe error messages, we can use them
                 is_critic_rejection = any("Critic rejected" in str(e) for e in context.errors)
                 if is_critic_rejection:
-                    error_msg = "⚠️ Моя внутрішня система безпеки (Critic) заблокувала цю відповідь. Спробуйте перефразувати."
+                    error_msg = CRITIC_REJECTION_TEXT
                 
                 await self.bot.send_message(context.user_id, error_msg)
             except Exception as e:
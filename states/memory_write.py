@@ -3,44 +3,67 @@ from states.base import BaseState
 from core.state import State
 from core.context import ExecutionContext
 from core.state_guard import guard, Action
+from core.postprocess import postprocess
 
 logger = logging.getLogger("Delio.MemoryWrite")
 
 class MemoryWriteState(BaseState):
     async def execute(self, context: ExecutionContext) -> State:
+        # Permission is checked here, in the canonical state, also for the deferred part
         await guard.assert_allowed(context.user_id, Action.MEMORY_WRITE)
+        if context.metadata.get("critic_queued"):
+            # The critic job writes history and long-term memory once the answer is final
+            return State.IDLE
         try:
-            from core.memory.writer import writer
-            import core.llm_service as llm
-            
             logger.debug(f"💾 Saving memory V2 for user {context.user_id}")
             
             # 1. Short-Term History (Redis) - Async
-            # Allows next turn to see this interaction
-            await writer.append_history(context.user_id, "user", context.raw_input)
-            await writer.append_history(context.user_id, "assistant", context.response, context.metadata.get("model_used"))
-            
-            # 2. Long-Term Vector (Chroma) - Async
-            # Make sure we don't block too long on embeddings if possible, 
-            # but writer.save_semantic_memory handles it via threadpool
-            await writer.save_semantic_memory(
-                context.user_id,
-                context.raw_input,
-                context.response,
-                context.metadata
-            )
+            # Stays inline: the next turn's RETRIEVE must see this interaction
+            await self.append_history(context)
             
-            # 3. Fact Extraction (SQLite)
-            # Only run for longer inputs to save tokens/time
-            if len(context.raw_input) > 15:
-                attributes = await llm.extract_attributes(context.raw_input)
-                if attributes:
-                    logger.info(f"🧩 Extracted attributes: {attributes}")
-                    for key, value in attributes.items():
-                        await writer.update_attribute(context.user_id, key, value)
+            # 2-3. Embeddings + fact extraction: off the critical path when the queue runs
+            if postprocess.running:
+                await postprocess.submit("memory_write", context)
+            else:
+                await self.persist(context, raise_errors=False)
 
         except Exception as e:
             logger.error(f"❌ Error in MemoryWriteState: {e}")
             context.errors.append(str(e))
             
         return State.IDLE
+
+    async def append_history(self, context: ExecutionContext):
+        """The user message and the final answer, in one Redis round-trip."""
+        from core.memory.writer import writer
+        await writer.append_turn(context.user_id, [
+            ("user", context.raw_input),
+            ("assistant", context.response, context.metadata.get("model_used")),
+        ])
+
+    async def persist(self, context: ExecutionContext, raise_errors: bool = True):
+        """
+        Long-term writes. As a post-processing job (default) every failure raises so
+        the queue retries; the Chroma write is keyed by trace_id, so a retry overwrites
+        instead of duplicating. Inline (raise_errors=False) failures are only logged.
+        """
+        from core.memory.writer import writer
+        import core.llm_service as llm
+
+        # 2. Long-Term Vector (Chroma) - Async
+        await writer.save_semantic_memory(
+            context.user_id,
+            context.raw_input,
+            context.response,
+            context.metadata,
+            memory_id=context.trace_id,
+            raise_errors=raise_errors
+        )
+        
+        # 3. Fact Extraction (SQLite)
+        # Only run for longer inputs to save tokens/time
+        if len(context.raw_input) > 15:
+            attributes = await llm.extract_attributes(context.raw_input, raise_errors=raise_errors)
+            if attributes:
+                logger.info(f"🧩 Extracted attributes: {attributes}")
+                await writer.update_attributes(context.user_id, attributes, raise_errors=raise_errors)
@@ -1,6 +1,11 @@
+import logging
 from states.base import BaseState
 from core.state import State
 from core.context import ExecutionContext
+from core.memory.funnel import funnel
+from core.heartbeat import gate
+
+logger = logging.getLogger("Delio.Observe")
 
 class ObserveState(BaseState):
     async def execute(self, context: ExecutionContext) -> State:
@@ -9,5 +14,16 @@ class ObserveState(BaseState):
         if not context.raw_input:
             context.errors.append("Empty input in OBSERVE")
             return State.ERROR
-            
+
+        # Idle heartbeat: nothing actionable -> end before RETRIEVE / PLAN (no LLM calls)
+        if context.event_type == "heartbeat" and await gate.should_skip(context.user_id, context.metadata):
+            return State.IDLE
+
+        # Speculative retrieval: the memory fetch does not depend on the intent,
+        # so it runs concurrently with classification. RETRIEVE adopts it, PLAN awaits it.
+        try:
+            context.pending["memory"] = await funnel.prefetch_context(context.user_id, context.raw_input)
+        except PermissionError as e:
+            logger.warning(f"⚠️ Memory prefetch denied, RETRIEVE will fetch: {e}")
+
         return State.RETRIEVE
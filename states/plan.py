@@ -1,5 +1,4 @@
 import logging
-import asyncio
 import config
 import json
 import re
@@ -8,7 +7,10 @@ from states.base import BaseState
 from core.state import State
 from core.context import ExecutionContext
 from core import llm_service
-from core.tool_registry import registry
+from core.prompt_compiler import prompt_compiler, CompiledPrompt
+from core.router import SIMPLE_INTENTS
+from states.retrieve import join_speculative
+from core.streaming import StreamingEditor, run_events_var
 
 logger = logging.getLogger("Delio.Plan")
 
@@ -27,21 +29,35 @@ class PlanState(BaseState):
                 logger.warning(f"Failed to send typing action: {e}")
 
         try:
+            # 0. Join speculative work (intent + memory started before RETRIEVE)
+            await join_speculative(context)
+
             # 1. Build context-aware system instruction
-            system_instruction = self._build_system_instruction(context)
+            prompt = self._build_system_instruction(context)
+            system_instruction = prompt.text
             
             # 2. ACTOR PHASE (Gemini)
             preferred = context.metadata.get("preferred_model", "gemini")
             
+            # Streaming: progressively edit the placeholder message
+            editor = self._streaming_editor(context)
+
             # Use new service adapter
             try:
-                resp_text, model_used = await llm_service.call_actor(
-                    user_id=context.user_id,
-                    text=context.raw_input,
-                    system_instruction=system_instruction,
-                    preferred_model=preferred,
-                    image_path=context.metadata.get("image_path")
-                )
+                try:
+                    resp_text, model_used = await llm_service.call_actor(
+                        user_id=context.user_id,
+                        text=context.raw_input,
+                        system_instruction=system_instruction,
+                        preferred_model=preferred,
+                        image_path=context.metadata.get("image_path"),
+                        on_partial=self._partial_sink(editor)
+                    )
+                finally:
+                    if editor:
+                        await editor.close()  # No partial edit may land after RESPOND's final text
+                if editor and editor.edits:
+                    context.metadata["streamed"] = True
             except Exception as actor_err:
                 logger.error(f"⚠️ Actor Call Failed: {actor_err}")
                 
@@ -63,7 +79,7 @@ class PlanState(BaseState):
                          fallback_resp, fallback_model = await llm_service.call_critic(
                              user_query=context.raw_input,
                              actor_response="[SYSTEM ERROR: Primary Model Failed. Please answer the user directly based on the query.]",
-                             instruction=system_instruction
+                             instruction=prompt.critic_view()
                          )
                          if "@@@FINAL_RESPONSE@@@" in fallback_resp:
                              resp_text = fallback_resp.split("@@@FINAL_RESPONSE@@@")[-1].strip()
@@ -79,12 +95,23 @@ class PlanState(BaseState):
                      model_used = "💀 Dead"
             
             # 3. CRITIC PHASE (DeepSeek validation)
-            # Skip Critic if intent is SIMPLE (Phase 2 Optimistic Flow)
-            if config.ENABLE_SYNERGY and "Error" not in model_used and context.intent != "SIMPLE":
+            # Skip Critic if intent is SIMPLE/GREETING/UTILITY (Phase 2 Optimistic Flow)
+            if config.ENABLE_SYNERGY and "Error" not in model_used and context.intent not in SIMPLE_INTENTS \
+                    and self._critic_can_defer(context, resp_text):
+                # Optimistic Critic: deliver the Actor answer now; REFLECT hands the review
+                # to a post-processing job (outside the session lock) that patches if needed
+                context.pending["critic"] = {
+                    "actor_response": resp_text,
+                    "instruction": prompt.critic_view()[:2000],  # call_critic reads no more
+                }
+                context.metadata["critic_pending"] = True
+                final_text = resp_text
+                context.metadata["model_used"] = "♊"
+            elif config.ENABLE_SYNERGY and "Error" not in model_used and context.intent not in SIMPLE_INTENTS:
                 validated_resp, synergy_label = await llm_service.call_critic(
                     user_query=context.raw_input,
                     actor_response=resp_text,
-                    instruction=system_instruction
+                    instruction=prompt.critic_view()
                 )
                 
                 final_text = validated_resp
@@ -92,7 +119,7 @@ class PlanState(BaseState):
             else:
                 final_text = resp_text
                 # Icon mapping
-                icon = "☂️" if context.intent == "SIMPLE" else "♊"
+                icon = "☂️" if context.intent in SIMPLE_INTENTS else "♊"
                 if "pro" in model_used.lower(): icon = "🎓"
                 elif "deepseek" in model_used.lower(): icon = "🐋"
                 context.metadata["model_used"] = icon
@@ -140,127 +167,43 @@ class PlanState(BaseState):
             context.errors.append(str(e))
             return State.ERROR
 
-    def _build_system_instruction(self, context: ExecutionContext) -> str:
-        # (Same as before, keep consolidated)
-        mem = context.memory_context
-        instruction_parts = [
-            f"Ти — {config.yaml_config.get('bot', {}).get('name', 'Delio')}, персональний AI-асистент (AID).",
-            "Ти працюєш згідно зі своєю конституцією (FSM State Machine).\n",
-            "### RULES OF ENGAGEMENT (STRICT):",
-            "1. **FORMATTING**: Use Telegram Markdown. Use `*bold*` for bold. NEVER use `**` or `__`. Use `_italic_`.",
-            "2. **VERBOSITY**: Do not overwhelm. If the answer is long, provide the Key Insight and say 'Тисни /more для деталей'.",
-            "3. **ANTI-BOMBARDMENT**: Ask MAXIMUM 1 question per response. Never ask 3-4 questions at once.",
-            "4. **MATURITY**: Act as a Senior Partner. Don't ask 'Can I help?'. Assume the goal and act.",
-            "5. **STRATEGIC MEMORY**: Whenever the user provides important facts about their goals, skills, identity, or life level, IMMEDIATELY use the `update_profile` tool to evolve your internal model. Don't just say 'I remembered it'.",
-        ]
-        
-        # --- DYNAMIC ROLE INJECTION ---
-        custom_role = context.metadata.get("custom_role_prompt")
-        role_name = context.metadata.get("role_name", "Custom")
-        if custom_role:
-            instruction_parts.append(f"\n### 🎭 [ACTIVE ROLE OVERRIDE: {role_name.upper()}]")
-            instruction_parts.append(f"INSTRUCTION: {custom_role}")
-            instruction_parts.append("IMPORTANT: This role is your PRIMARY directive for this specific request. Prioritize its tone and task over general persona traits, but keep using technical tools (memory, obsidian) if needed.\n")
-            
-        instruction_parts.append("\n### ВАШ ПРОФІЛЬ ТА КОНТЕКСТ ЖИТТЯ:")
-        
-        structured = mem.get("structured_profile", {})
-        for section, items in structured.items():
-            if items:
-                items_str = ", ".join([f"{k}: {v.get('value')}" for k, v in items.items()])
-                instruction_parts.append(f"• **{section.title()}**: {items_str}")
-        
-        memories = mem.get("long_term_memories", [])
-        if memories:
-            instruction_parts.append("\n### ВАЖЛИВІ ФАКТИ З МИНУЛИХ РОЗМОВ:")
-            for m in memories:
-                instruction_parts.append(f"• {m}")
-
-        # --- TOOL DEFINITIONS ---
-        tools = registry.get_definitions()
-        if tools:
-            instruction_parts.append("\n### ДОСТУПНІ ІНСТРУМЕНТИ (TOOLS):")
-            instruction_parts.append("Якщо тобі потрібно виконати дію, виклич інструмент, повернувши JSON у форматі:")
-            instruction_parts.append("```json\n{\"tool_calls\": [{\"name\": \"tool_name\", \"arguments\": {\"arg1\": \"val1\"}}]}\n```")
-            for t in tools:
-                instruction_parts.append(f"- **{t['name']}**: {t['description']}")
-                instruction_parts.append(f"  Params: {json.dumps(t['parameters'])}")
-
-        # --- TOOL OUTPUTS (If returning from ACT) ---
+    def _critic_can_defer(self, context: ExecutionContext, actor_text: str) -> bool:
+        """Optimistic Critic needs a message to patch and no tool calls to validate."""
+        return (
+            config.CRITIC_MODE == "optimistic"
+            and bool(context.metadata.get("message_id"))
+            and not self._extract_tool_calls(actor_text)
+        )
+
+    def _streaming_editor(self, context: ExecutionContext):
+        """Editor for the Telegram placeholder, or None when streaming is not possible."""
+        message_id = context.metadata.get("message_id")
+        if not (config.STREAM_RESPONSES and self.bot and message_id and context.event_type == "message"):
+            return None
+        return StreamingEditor(self.bot, context.user_id, message_id)
+
+    def _partial_sink(self, editor: StreamingEditor = None):
+        """on_partial callback: the Telegram editor and/or the SSE event log of this run."""
+        events = run_events_var.get() if config.STREAM_RESPONSES else None
+        if not events:
+            return editor.push if editor else None
+
+        async def push(partial: str):
+            events.push_partial(partial)
+            if editor:
+                await editor.push(partial)
+        return push
+
+    def _build_system_instruction(self, context: ExecutionContext) -> CompiledPrompt:
+        """Memoized static prefix + per-turn sections (see core.prompt_compiler)."""
+        compiled = prompt_compiler.compile(context)
+        context.metadata["prompt_tokens"] = compiled.tokens
+
+        # Important: Clear tool_outputs and tool_calls so we don't re-process them in the next loop iteration
         if context.tool_outputs:
-            instruction_parts.append("\n### РЕЗУЛЬТАТИ ВИКОНАННЯ ІНСТРУМЕНТІВ:")
-            for output in context.tool_outputs:
-                name = output.get("name")
-                res = output.get("output") or output.get("error")
-                instruction_parts.append(f"• Tool '{name}': {res}")
-            
-            # Important: Clear tool_outputs and tool_calls so we don't re-process them in the next loop iteration
             context.tool_outputs = []
             context.tool_calls = []
-
-        # --- IMAGE CONTEXT ---
-        if context.metadata.get("image_path"):
-            instruction_parts.append("\n### [СИГНАЛ: ЗОБРАЖЕННЯ]")
-            instruction_parts.append("Користувач надіслав зображення. Аналізуй його першочергово та надай детальну відповідь на основі візуальних даних.")
-            instruction_parts.append("ФОРМАТ ВІДПОВІДІ (ОБОВ'ЯЗКОВО розділяй подвійним переносом рядка):")
-            instruction_parts.append("1. [Короткий візуальний опис]")
-            instruction_parts.append("\n\n2. [Твоя інтерпретація, філософський зв'язок або імпровізація]")
-            instruction_parts.append("\n\n3. [Заклик до дії або стратегічна порада]")
-            
-            if context.raw_input and "[IMAGE UPLOAD]" in context.raw_input:
-                # If it's a raw upload without specific question beyond caption
-                instruction_parts.append("Мета користувача: Дізнатись, що на фото та почути твою думку.")
-
-        # --- HEARTBEAT CONTEXT ---
-        if context.event_type == "heartbeat":
-            instruction_parts.append("\n### [СИГНАЛ: HEARTBEAT CHECK-IN]")
-            instruction_parts.append("Цей запит ініційовано автоматично (Proactive Heartbeat). Твоя задача — перевірити контекст користувача (цілі, час, нагадування).")
-            instruction_parts.append("1. Якщо є щось КРИТИЧНО ВАЖЛИВЕ або КОРИСНЕ (нагадування, мотивація, питання по цілі) — напиши це.")
-            instruction_parts.append("2. Якщо нічого важливого немає — просто виведи слово 'SKIP'.")
-            instruction_parts.append("3. НЕ вітайся, якщо в цьому немає потреби. НЕ пиши 'Як справи?', якщо немає контексту.")
-            instruction_parts.append("Bias towards SILENCE (SKIP). Speak only when valuable.")
-
-        instruction_parts.append("\n### ТВОЇ ОСНОВНІ ІНСТРУКЦІЇ:")
-
-        # --- ACTIVE REFLECTION (Task-012) ---
-        # Read lessons from structured memory (feedback_signals section)
-        try:
-            feedback = structured.get("feedback_signals", {})
-            lesson_items = sorted(
-                [(k, v) for k, v in feedback.items() if k.startswith("lesson_")],
-                key=lambda x: x[0],
-                reverse=True
-            )[:3]
-            if lesson_items:
-                instruction_parts.append("\n### ⚠️ CRITICAL LEARNINGS FROM PAST MISTAKES:")
-                for idx, (key, data) in enumerate(lesson_items):
-                    val = data.get("value", {})
-                    if isinstance(val, dict):
-                        critique = val.get("observation", val.get("critique", ""))
-                        correction = val.get("correction", "")
-                    else:
-                        critique = str(val)
-                        correction = ""
-                    if critique:
-                        instruction_parts.append(f"{idx+1}. Issue: {critique} -> Fix: {correction}")
-                if any(critique for _, data in lesson_items):
-                    instruction_parts.append("DO NOT REPEAT THESE ERRORS.")
-        except Exception:
-            pass
-            
-            
-        # --- DYNAMIC PERSONA INJECTION (Phase 5) ---
-        try:
-            from core.personality import PersonalityEngine
-            dynamic_instruction = PersonalityEngine.get_system_instructions()
-            instruction_parts.append(dynamic_instruction)
-        except Exception as e:
-            logger.warning(f"⚠️ Failed to generate Persona: {e}")
-            instruction_parts.append(config.SYSTEM_PROMPT)
-
-        instruction_parts.append("\n" + config.TELEGRAM_STYLE)
-        
-        return "\n".join(instruction_parts)
+        return compiled
 
     def _extract_tool_calls(self, text: str) -> List[Dict[str, Any]]:
         """Extracts tool calls from JSON blocks in the text."""
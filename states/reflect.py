@@ -1,7 +1,11 @@
+import difflib
 import logging
+import config
 from states.base import BaseState
 from core.state import State
 from core.context import ExecutionContext
+from core.postprocess import postprocess
+from states.error import CRITIC_REJECTION_TEXT
 
 logger = logging.getLogger("Delio.Reflect")
 
@@ -15,12 +19,49 @@ class ReflectState(BaseState):
         
         if context.errors:
             logger.warning(f"Cycle finished with {len(context.errors)} errors: {context.errors}")
+
+        # Optimistic Critic: the Actor answer is already sent. The review runs as a job,
+        # after the session lock is released, and that one job also does reflect, history
+        # and long-term memory, so they see the final answer and keep the lane's per-user
+        # order. Without the queue it runs inline.
+        critic = context.pending.pop("critic", None)
+        if critic is not None and postprocess.running:
+            context.metadata["critic_queued"] = True
+            await postprocess.submit("critic", context, pending={"critic": critic})
+            return State.MEMORY_WRITE
+        if critic is not None and not await self._apply_critic(context, critic):
+            return State.IDLE  # Rejected: the delivered answer was replaced by the notice
             
         # If we just executed tools, we need to PLAN again to summarize results
         if context.tool_outputs:
             logger.info("📡 Tool outputs found. Routing back to PLAN for integration.")
             return State.PLAN
-            
+
+        # Evaluation / lessons / digestion: off the critical path when the queue runs
+        if postprocess.running:
+            await postprocess.submit("reflect", context)
+        else:
+            await self.post_process(context)
+
+        return State.MEMORY_WRITE
+
+    async def review(self, context: ExecutionContext):
+        """
+        Post-processing job: deferred Critic review, then history, reflection and
+        long-term memory of the final answer. A retry (persist raised) re-runs the
+        review but does not append the history turn again.
+        """
+        if not await self._apply_critic(context, context.pending.pop("critic")):
+            return  # Rejected: like the blocking ERROR path, nothing is reflected or remembered
+        from states.memory_write import MemoryWriteState
+        memory = MemoryWriteState()
+        if not context.metadata.get("job_attempts"):
+            await memory.append_history(context)
+        await self.post_process(context)
+        await memory.persist(context)
+
+    async def post_process(self, context: ExecutionContext):
+        """Active reflection on a delivered answer. Runs inline or as a post-processing job."""
         # ACTIVE REFLECTION (Task-012)
         # Only reflect on final responses (no tool outputs pending)
         if context.response and len(context.response) > 10:
@@ -44,12 +85,7 @@ class ReflectState(BaseState):
 
                         warning_text = f"⚠️ *КОРЕКЦІЯ ТА ПОПЕРЕДЖЕННЯ*\n\n{correction}\n\n_Попередня відповідь була видалена або змінена через низьку достовірність._"
 
-                        await self.bot.edit_message_text(
-                            text=warning_text,
-                            chat_id=context.user_id,
-                            message_id=msg_id,
-                            parse_mode="Markdown"
-                        )
+                        await self._correct_message(context, warning_text)
 
                     # 3. Store lessons
                     if score < 7:
@@ -76,4 +112,67 @@ class ReflectState(BaseState):
             except Exception as e:
                 logger.error(f"❌ Digestion during reflection failed: {e}")
 
-        return State.MEMORY_WRITE
+    async def _edit(self, context: ExecutionContext, text: str, parse_mode: str = None) -> bool:
+        # HeadlessBot reports a failed edit as False, aiogram's Bot raises
+        try:
+            result = await self.bot.edit_message_text(
+                text=text,
+                chat_id=context.user_id,
+                message_id=context.metadata.get("message_id"),
+                parse_mode=parse_mode
+            )
+        except Exception as e:
+            logger.warning(f"Edit of message {context.metadata.get('message_id')} failed: {e}")
+            return False
+        return result is not False
+
+    async def _correct_message(self, context: ExecutionContext, text: str) -> bool:
+        """Optimistic correction: edit the already delivered answer in place. False if nothing was edited."""
+        if await self._edit(context, text, parse_mode="Markdown"):
+            return True
+        logger.warning("Markdown edit failed. Fallback to plain text.")
+        return await self._edit(context, text)
+
+    async def _apply_critic(self, context: ExecutionContext, critic: dict) -> bool:
+        """Patch the delivered answer if the Critic materially changed it. False if it was rejected."""
+        import core.llm_service as llm
+        validated, label = await llm.call_critic(
+            user_query=context.raw_input,
+            actor_response=critic["actor_response"],
+            instruction=critic["instruction"]
+        )
+
+        # Same rule as the blocking Critic, which routes these to ERROR
+        if "⚠️" in label and "(Timeout)" not in label:
+            logger.warning(f"⛔ Delivered answer rejected by Critic. User: {context.user_id}")
+            llm.critic_counters["rejected"] += 1
+            context.errors.append("Critic rejected the response (Potential Safety/Logic Issue)")
+            if not await self._edit(context, CRITIC_REJECTION_TEXT):
+                logger.error("❌ Critic rejection edit failed")
+                return False
+            context.sent_response = CRITIC_REJECTION_TEXT
+            context.metadata["model_used"] = label
+            return False
+
+        if label != "♊+🐋":
+            logger.debug(f"🐋 Critic kept Actor answer ({label})")
+            return True
+
+        from states.plan import PlanState
+        patched = PlanState()._cleanup_response(validated)
+        similarity = difflib.SequenceMatcher(None, context.response.strip(), patched.strip()).ratio()
+        if not patched or similarity >= config.CRITIC_PATCH_SIMILARITY:
+            logger.debug(f"🐋 Critic change is cosmetic ({similarity:.2f}). Not patching.")
+            return True
+
+        logger.info(f"🩹 Critic changed the answer ({similarity:.2f}). Patching message {context.metadata.get('message_id')}")
+        text = f"{patched}\n\n🐋"
+        if not await self._correct_message(context, text):
+            logger.error("❌ Critic patch failed: the user still sees the Actor answer")
+            return True
+
+        llm.critic_counters["patched"] += 1
+        context.response = patched
+        context.sent_response = text
+        context.metadata["model_used"] = label
+        return True
@@ -7,6 +7,9 @@ from core.state_guard import guard, Action
 
 logger = logging.getLogger("Delio.Respond")
 
+# Telegram message limit minus room for the signature
+STREAM_FINAL_LIMIT = 4000
+
 class RespondState(BaseState):
     def __init__(self, bot):
         self.bot = bot
@@ -40,10 +43,13 @@ class RespondState(BaseState):
             is_command = context.raw_input.startswith("/")
             is_short = len(raw_response) < 800
             is_simple = context.intent in ["GREETING", "UTILITY"]
+            # Streamed / pending Critic: keep one message so it can be finalized or patched by edit
+            is_streamed = bool(context.metadata.get("streamed") or context.metadata.get("critic_pending")) \
+                and len(raw_response) < STREAM_FINAL_LIMIT
 
-            if is_command or is_short or is_simple:
+            if is_command or is_short or is_simple or is_streamed:
                 chunks = [raw_response.strip()]
-                logger.info(f"⚡ Skipping fragmentation for UX (is_command={is_command}, is_short={is_short}, is_simple={is_simple})")
+                logger.info(f"⚡ Skipping fragmentation for UX (is_command={is_command}, is_short={is_short}, is_simple={is_simple}, is_streamed={is_streamed})")
             else:
                 # Split by double newlines to find logical "Thoughts"
                 chunks = [c.strip() for c in raw_response.split("\n\n") if c.strip()]
@@ -99,8 +105,8 @@ class RespondState(BaseState):
                     logger.error("❌ Failed to send response chunk after retries.")
                     return State.ERROR
 
-                # Delay between fragments (simulating thought)
-                if i < len(chunks) - 1:
+                # Delay between fragments (simulating thought; not when streaming)
+                if i < len(chunks) - 1 and not (context.metadata.get("streamed") or context.metadata.get("critic_pending")):
                     delay = 2 if i == 0 else 1.5
                     await asyncio.sleep(delay)
             
@@ -1,3 +1,4 @@
+import inspect
 import logging
 from states.base import BaseState
 from core.state import State
@@ -7,24 +8,48 @@ from core.state_guard import guard, Action
 
 logger = logging.getLogger("Delio.Retrieve")
 
+
+async def join_speculative(context: ExecutionContext):
+    """
+    Join point of the speculative pipeline (top of PLAN / DEEP_THINK).
+    Awaits intent classification and the memory fetch, which ran concurrently.
+    """
+    intent = context.pending.pop("intent", None)
+    if intent is not None:
+        try:
+            context.intent = await intent
+        except Exception as e:
+            logger.error(f"❌ Intent classification failed, using COMPLEX: {e}")
+            context.intent = "COMPLEX"
+        logger.info(f"🚦 Intent Classified: {context.intent}")
+
+    memory = context.pending.pop("memory", None)
+    if memory is not None:
+        try:
+            funnel_data = await memory if inspect.isawaitable(memory) else memory
+        except Exception as e:
+            raise RuntimeError(f"Retrieve failure: {e}") from e
+
+        # Update ExecutionContext with new data structure
+        context.memory_context = funnel_data
+
+        # Extract Life Level if available (for routing/planning)
+        # Section: life_level, Key: current
+        life_level_data = funnel_data.get("structured_profile", {}).get("life_level", {})
+        context.metadata["life_level"] = life_level_data.get("current", {}).get("value", "?")
+
+
 class RetrieveState(BaseState):
     async def execute(self, context: ExecutionContext) -> State:
         logger.debug(f"🧠 Aggregating context for user {context.user_id}")
         
         try:
-            # Use the new ContextFunnel singleton
-            funnel_data = await funnel.aggregate_context(
-                user_id=context.user_id,
-                raw_input=context.raw_input
-            )
-            
-            # Update ExecutionContext with new data structure
-            context.memory_context = funnel_data
-            
-            # Extract Life Level if available (for routing/planning)
-            # Section: life_level, Key: current
-            life_level_data = funnel_data.get("structured_profile", {}).get("life_level", {})
-            context.metadata["life_level"] = life_level_data.get("current", {}).get("value", "?")
+            # Adopt the OBSERVE prefetch if it was granted; otherwise fetch here
+            if "memory" not in context.pending:
+                context.pending["memory"] = await funnel.aggregate_context(
+                    user_id=context.user_id,
+                    raw_input=context.raw_input
+                )
             
             # --- CONDITIONAL ROUTING ---
             if context.metadata.get("mode") == "deep_think":
@@ -0,0 +1,34 @@
+"""
+Runtime databases live in temp dirs during tests, never in data/.
+"""
+import os
+import tempfile
+
+import pytest_asyncio
+
+DB_PATHS = {
+    "SQLITE_DB_PATH": "delio_memory.db",
+    "CHROMA_DB_PATH": "chroma_db",
+    "OBSIDIAN_INDEX_PATH": "obsidian_index.db",
+    "EMBED_CACHE_PATH": "embedding_cache.db",
+    "POSTPROCESS_DB_PATH": "postprocess_queue.db",
+    "HEARTBEAT_DB_PATH": "heartbeat.db",
+    "REMINDERS_DB_PATH": "reminders.db",
+}
+
+# Before `config` is imported: module-level singletons read their paths at import
+_session_dir = tempfile.mkdtemp(prefix="delio-tests-")
+for name, file in DB_PATHS.items():
+    os.environ[name] = os.path.join(_session_dir, file)
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def runtime_db_paths(tmp_path, monkeypatch):
+    """Per-test DB paths; the reminders connection (opened by FSM runs) is closed on teardown."""
+    import config
+    from core.notifications import reminders
+    for name, file in DB_PATHS.items():
+        monkeypatch.setattr(config, name, str(tmp_path / file))
+    monkeypatch.setattr(reminders, "db_path", config.REMINDERS_DB_PATH)
+    yield
+    await reminders.close()
@@ -0,0 +1,74 @@
+import json
+import random
+import time
+import pytest
+from unittest.mock import patch
+import config
+from core.memory.redis_storage import RedisManager
+from core.providers import ProviderRegistry
+from scripts.stub_backends import StubCollection, StubRedis
+from scripts.stub_provider import LatencyProfile, StubProvider, model_of
+
+
+def test_latency_profile_parse_and_sample():
+    profile = LatencyProfile.parse("lognormal:400:0.6@80")
+    assert (profile.dist, profile.ms, profile.spread, profile.tokens_per_s) == ("lognormal", 400, 0.6, 80)
+    assert LatencyProfile.parse("25").sample(random.Random(1)) == 0.025
+
+    a = [profile.sample(random.Random(7)) for _ in range(3)]
+    b = [profile.sample(random.Random(7)) for _ in range(3)]
+    assert a == b  # Seeded: repeatable runs
+
+    uniform = LatencyProfile.parse("uniform:100:0.5")
+    rng = random.Random(3)
+    assert all(0.05 <= uniform.sample(rng) <= 0.15 for _ in range(100))
+    with pytest.raises(ValueError):
+        LatencyProfile.parse("gamma:10")
+
+
+@pytest.mark.asyncio
+async def test_stub_provider_roles_replies_and_token_pacing():
+    def role_of(path, request):
+        return {config.MODEL_FAST: "router"}.get(model_of(path), "actor")
+
+    def reply(role, request):
+        return "COMPLEX" if role == "router" else "one two three four"
+
+    stub = StubProvider(reply=reply, role_of=role_of,
+                        profiles={"actor": LatencyProfile(tokens_per_s=50), "router": LatencyProfile()})
+    await stub.start()
+    registry = ProviderRegistry()
+    try:
+        with patch('config.GEMINI_KEY', "k"), patch('config.GEMINI_BASE_URL', stub.url):
+            assert await registry.generate(model=config.MODEL_FAST, contents="ping") == "COMPLEX"
+            t0 = time.perf_counter()
+            deltas = [d async for d in registry.generate_stream(model=config.MODEL_BALANCED, contents="ping")]
+            elapsed = time.perf_counter() - t0
+    finally:
+        await registry.close()
+        await stub.stop()
+
+    assert "".join(deltas) == "one two three four"
+    assert elapsed >= 0.06  # 3 gaps between 4 words at 50 tokens/s
+    assert stub.calls == {"router": 1, "actor": 1}
+
+
+@pytest.mark.asyncio
+async def test_stub_redis_backs_short_term_history():
+    manager = RedisManager()
+    manager.client = StubRedis()
+    await manager.append_turn(1, [("user", "hi"), ("assistant", "hello", "m")])
+
+    manager._rings.clear()  # Force the read through to the stand-in
+    history = await manager.get_history(1)
+    assert [m["content"] for m in history] == ["hi", "hello"]
+    assert manager.counters["redis_reads"] == 1 and manager.client.commands == 2  # MULTI/EXEC + LRANGE
+
+
+def test_stub_collection_filters_newest_first():
+    collection = StubCollection()
+    collection.add(documents=["a", "b", "c"], embeddings=[[0.1]] * 3,
+                   metadatas=[{"user_id": 1}, {"user_id": 2}, {"user_id": 1}], ids=["1", "2", "3"])
+    result = collection.query(query_embeddings=[[0.1]], n_results=5, where={"user_id": 1})
+    assert result["documents"] == [["c", "a"]]
+    assert json.dumps(result)  # Chroma-shaped, plain data
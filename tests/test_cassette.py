@@ -0,0 +1,120 @@
+import time
+import pytest
+from unittest.mock import patch
+import config
+from core.cassette import CassetteMiss, Player, Recorder, ReplayedError, load
+from core.providers import ProviderRegistry
+from scripts.stub_provider import LatencyProfile, StubProvider
+
+
+async def _record(path, stub):
+    registry = ProviderRegistry(Recorder(path))
+    with patch('config.GEMINI_KEY', "k"), patch('config.GEMINI_BASE_URL', stub.url), \
+            patch('config.DEEPSEEK_KEY', "k"), patch('config.DEEPSEEK_BASE_URL', stub.url):
+        text = await registry.generate(model=config.MODEL_FAST, contents="ping")
+        deltas = [d async for d in registry.generate_stream(model=config.MODEL_BALANCED, contents="ping")]
+        vectors = await registry.embed(["a", "b"])
+        chat = await registry.chat("check this")
+    stats = registry.stats()
+    await registry.close()
+    return text, deltas, vectors, chat, stats
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay_without_network(tmp_path):
+    path = str(tmp_path / "kernel.jsonl")
+    stub = StubProvider(reply="one two three", profiles={"default": LatencyProfile(tokens_per_s=200)})
+    await stub.start()
+    try:
+        recorded = await _record(path, stub)
+    finally:
+        await stub.stop()
+
+    assert recorded[4] == {"mode": "record", "path": path, "recorded": 4, "errors": 0, "inbound": 0}
+    stream_entry = [e for e in load(path) if e["kind"] == "generate_stream"][0]
+    assert [chunk for _, chunk in stream_entry["chunks"]] == recorded[1]
+    assert stream_entry["latency"] >= stream_entry["chunks"][-1][0]
+
+    # Stub is down and no keys: every call must come from the cassette
+    registry = ProviderRegistry(Player(path, latency_scale=0))
+    with patch('config.GEMINI_KEY', None), patch('config.DEEPSEEK_KEY', None):
+        assert await registry.generate(model=config.MODEL_FAST, contents="ping") == recorded[0]
+        assert [d async for d in registry.generate_stream(model=config.MODEL_BALANCED, contents="ping")] == recorded[1]
+        assert await registry.embed(["a", "b"]) == recorded[2]
+        assert await registry.chat("check this") == recorded[3]
+    assert registry.stats()["exact"] == 4 and registry.stats()["misses"] == 0
+
+
+@pytest.mark.asyncio
+async def test_replay_matching_fuzzy_reuse_and_miss():
+    recorder = Recorder("unused")
+    recorder._write = lambda entry: entries.append(entry)
+    entries = []
+
+    async def live():
+        return f"reply {len(entries)}"
+
+    await recorder.call("generate", "m", {"contents": "hello at 10:00"}, live)
+    await recorder.call("generate", "m", {"contents": "bye at 10:01"}, live)
+    player = Player("unused", latency_scale=0, entries=entries)
+
+    assert await player.call("generate", "m", {"contents": "bye at 10:01"}) == "reply 1"      # exact
+    assert await player.call("generate", "m", {"contents": "hello at 11:30"}) == "reply 0"    # next unused
+    assert await player.call("generate", "m", {"contents": "again"}) == "reply 0"             # round robin
+    with pytest.raises(CassetteMiss):
+        await player.call("chat", "deepseek-chat", {"prompt": "x"})
+
+    stats = player.stats()
+    assert (stats["exact"], stats["fuzzy"], stats["reused"], stats["misses"]) == (1, 1, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_recorded_error_and_latency_are_replayed(tmp_path):
+    path = str(tmp_path / "kernel.jsonl")
+    recorder = Recorder(path)
+
+    async def failing():
+        raise RuntimeError("503 overloaded")
+
+    with pytest.raises(RuntimeError):
+        await recorder.call("chat", "deepseek-chat", {"prompt": "x"}, failing)
+    recorder.inbound(7, "hi", {"mode": "deep_think", "intent_task": object()})
+    recorder.close()
+
+    entries = load(path)
+    entries[0]["latency"] = 0.2
+    assert entries[1] == {"kind": "message", "t": entries[1]["t"], "user_id": 7, "text": "hi",
+                          "metadata": {"mode": "deep_think"}, "seq": 1}
+
+    player = Player(path, latency_scale=0.25, entries=entries)
+    t0 = time.perf_counter()
+    with pytest.raises(ReplayedError, match="503 overloaded"):
+        await player.call("chat", "deepseek-chat", {"prompt": "x"})
+    assert 0.04 <= time.perf_counter() - t0 < 0.2  # 0.2s recorded x 0.25
+
+
+@pytest.mark.asyncio
+async def test_upload_records_state_and_raises_while_processing(tmp_path):
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock, MagicMock
+
+    path = str(tmp_path / "kernel.jsonl")
+    client = MagicMock()
+    client.aio.files.upload = AsyncMock(return_value=SimpleNamespace(
+        name="files/a", uri="u", mime_type="audio/ogg", state="FAILED"))
+    registry = ProviderRegistry(Recorder(path))
+    with patch.object(registry, "gemini", return_value=client):
+        uploaded = await registry.upload("/tmp/a.ogg")
+    await registry.close()
+    assert uploaded.state == "FAILED"
+    assert load(path)[0]["result"]["state"] == "FAILED"
+
+    player = ProviderRegistry(Player(path, latency_scale=0))
+    assert (await player.upload("/tmp/a.ogg")).state == "FAILED"
+
+    client.aio.files.upload = AsyncMock(return_value=SimpleNamespace(
+        name="files/b", uri="u", mime_type="audio/ogg", state="PROCESSING"))
+    registry = ProviderRegistry()
+    with patch.object(registry, "gemini", return_value=client):
+        with pytest.raises(TimeoutError, match="PROCESSING"):
+            await registry.upload("/tmp/b.ogg", max_wait=0)
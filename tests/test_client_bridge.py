@@ -0,0 +1,106 @@
+import asyncio
+import json
+import pytest
+from aiohttp import web
+from client.bridge import BridgeBusy, KernelBridge, KernelError
+
+
+class StubKernel:
+    def __init__(self, status: int = 200):
+        self.status = status
+        self.peers = set()
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def chat_stream(self, request: web.Request):
+        self.peers.add(request.transport.get_extra_info("peername"))
+        payload = await request.json()
+        if self.status != 200:
+            return web.Response(status=self.status, text="kernel down")
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        await resp.write(b'id: 0\nevent: state\ndata: {"state": "OBSERVE"}\n\n: keepalive\n\n')
+        await self.release.wait()
+        done = json.dumps({"text": payload["message"]})
+        await resp.write(f"id: 1\nevent: done\ndata: {done}\n\n".encode())
+        await resp.write_eof()
+        return resp
+
+
+async def _serve(kernel: StubKernel):
+    app = web.Application()
+    app.router.add_post("/v1/chat/stream", kernel.chat_stream)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+
+async def _drain(bridge, message="hi"):
+    return [event async for event in bridge.chat({"user_id": 1, "message": message})]
+
+
+@pytest.mark.asyncio
+async def test_chat_yields_events_over_one_pooled_connection():
+    kernel = StubKernel()
+    runner, url = await _serve(kernel)
+    bridge = KernelBridge(base_url=url, concurrency=4)
+    try:
+        first = await _drain(bridge, "a")
+        await _drain(bridge, "b")
+        await _drain(bridge, "c")
+    finally:
+        await bridge.close()
+        await runner.cleanup()
+
+    assert first == [("state", {"state": "OBSERVE"}), ("done", {"text": "a"})]
+    assert len(kernel.peers) == 1  # Keep-alive reuse across messages
+    assert bridge.stats()["completed"] == 3
+
+
+@pytest.mark.asyncio
+async def test_backpressure_rejects_beyond_wait_queue():
+    kernel = StubKernel()
+    kernel.release.clear()
+    runner, url = await _serve(kernel)
+    bridge = KernelBridge(base_url=url, concurrency=1, max_waiting=1)
+    try:
+        running = asyncio.create_task(_drain(bridge))
+        queued = asyncio.create_task(_drain(bridge))
+        while bridge.stats()["waiting"] < 1:
+            await asyncio.sleep(0.01)
+        with pytest.raises(BridgeBusy):
+            await _drain(bridge)
+        kernel.release.set()
+        await asyncio.gather(running, queued)
+    finally:
+        await bridge.close()
+        await runner.cleanup()
+
+    stats = bridge.stats()
+    assert stats["rejected"] == 1 and stats["completed"] == 2 and stats["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_kernel_error_status_raises():
+    runner, url = await _serve(StubKernel(status=503))
+    bridge = KernelBridge(base_url=url, concurrency=2)
+    try:
+        with pytest.raises(KernelError):
+            await _drain(bridge)
+    finally:
+        await bridge.close()
+        await runner.cleanup()
+    assert bridge.stats()["failed"] == 1
+
+
+def test_loop_change_closes_the_old_session():
+    bridge = KernelBridge(base_url="http://127.0.0.1:1")
+
+    async def build():
+        return bridge.session()
+
+    old = asyncio.run(build())
+    assert old.closed
+    assert asyncio.run(build()) is not old
@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from core.memory.embeddings import EmbeddingService
+from core.memory.chroma_storage import ChromaManager
+
+
+def _fake_embed():
+    async def embed(texts, model, task_type):
+        return [[float(len(t)), 1.0] for t in texts]
+    return AsyncMock(side_effect=embed)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_coalesce_into_one_batch(tmp_path):
+    service = EmbeddingService(cache_path=str(tmp_path / "e.db"), window_ms=20)
+    fake = _fake_embed()
+    with patch('core.memory.embeddings.providers.embed', fake):
+        results = await asyncio.gather(
+            service.embed_one("alpha", "retrieval_query"),
+            service.embed_one("beta", "retrieval_query"),
+            service.embed(["alpha", "gamma", ""], "retrieval_query"),
+        )
+    fake.assert_awaited_once()
+    assert sorted(fake.await_args.args[0]) == ["alpha", "beta", "gamma"]
+    assert results[0] == [5.0, 1.0]
+    assert results[2] == [[5.0, 1.0], [5.0, 1.0], []]
+    await service.cache.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_text(tmp_path):
+    service = EmbeddingService(cache_path=str(tmp_path / "e.db"), window_ms=20)
+    with patch('core.memory.embeddings.providers.embed', _fake_embed()):
+        impatient = asyncio.create_task(service.embed_one("alpha", "retrieval_query"))
+        patient = asyncio.create_task(service.embed_one("alpha", "retrieval_query"))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        assert await patient == [5.0, 1.0]
+    assert impatient.cancelled()
+    await service.cache.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_flush_releases_waiters(tmp_path):
+    service = EmbeddingService(cache_path=str(tmp_path / "e.db"), window_ms=1)
+    started = asyncio.Event()
+
+    async def hang(texts, model, task_type):
+        started.set()
+        await asyncio.Event().wait()
+
+    with patch('core.memory.embeddings.providers.embed', AsyncMock(side_effect=hang)):
+        waiter = asyncio.create_task(service.embed_one("alpha"))
+        await started.wait()
+        flush = [t for t in asyncio.all_tasks() if t.get_coro().__qualname__ == "EmbeddingService._flush"][0]
+        flush.cancel()
+        with pytest.raises(RuntimeError, match="cancelled"):
+            await asyncio.wait_for(waiter, 1)
+    await service.cache.close()
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_skip_network_and_persist(tmp_path):
+    path = str(tmp_path / "e.db")
+    service = EmbeddingService(cache_path=path, window_ms=0)
+    fake = _fake_embed()
+    with patch('core.memory.embeddings.providers.embed', fake):
+        await service.embed_one("hello")
+        await service.embed_one("hello")
+        await service.embed_one("hello", "retrieval_query")  # different task type: new vector
+    assert fake.await_count == 2
+    assert service.stats()["cache_hits"] == 1
+    await service.cache.close()
+
+    reopened = EmbeddingService(cache_path=path, window_ms=0)
+    with patch('core.memory.embeddings.providers.embed', AsyncMock()) as network:
+        assert await reopened.embed_one("hello") == [5.0, 1.0]
+        network.assert_not_awaited()
+    await reopened.cache.close()
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction(tmp_path):
+    service = EmbeddingService(cache_path=str(tmp_path / "e.db"), max_entries=2, window_ms=0)
+    with patch('core.memory.embeddings.providers.embed', _fake_embed()):
+        await service.embed_one("a")
+        await service.embed_one("b")
+        await asyncio.sleep(0.01)
+        await service.embed_one("a")  # refresh "a"
+        await service.embed_one("c")  # evicts "b"
+    with patch('core.memory.embeddings.providers.embed', _fake_embed()) as network:
+        await service.embed_one("a")
+        network.assert_not_awaited()
+        await service.embed_one("b")
+        network.assert_awaited_once()
+    await service.cache.close()
+
+
+@pytest.mark.asyncio
+async def test_store_memories_single_batch_and_write(tmp_path):
+    chroma = ChromaManager(db_path=str(tmp_path / "chroma"))
+    chroma.collection = MagicMock()
+    service = EmbeddingService(cache_path=str(tmp_path / "e.db"), window_ms=0)
+    fake = _fake_embed()
+    with patch('core.memory.embeddings.embeddings', service), \
+         patch('core.memory.embeddings.providers.embed', fake):
+        await chroma.store_memories(1, [("question", {"role": "user"}), ("answer", {"role": "assistant"})])
+    fake.assert_awaited_once()
+    chroma.collection.add.assert_called_once()
+    assert chroma.collection.add.call_args.kwargs["documents"] == ["question", "answer"]
+    await service.cache.close()
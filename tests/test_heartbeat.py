@@ -0,0 +1,148 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock, patch
+from core.heartbeat import ActivityIndex, HeartbeatDispatcher
+from core.state import State
+from core.state_guard import guard
+
+
+def test_plan_spreads_users_one_per_jittered_slot():
+    plan = HeartbeatDispatcher.plan(list(range(100)), window=100.0)
+    assert sorted(user_id for _, user_id in plan) == list(range(100))
+    for slot, (delay, _) in enumerate(sorted(plan)):
+        assert slot <= delay <= slot + 1
+
+
+@pytest.mark.asyncio
+async def test_dispatch_caps_concurrency_and_skips_pending_users(tmp_path):
+    index = ActivityIndex(str(tmp_path / "hb.db"))
+    for user_id in range(7001, 7011):
+        index.touch(user_id)
+    running, peak, release = 0, 0, asyncio.Event()
+
+    async def process_event(event):
+        nonlocal running, peak
+        assert event["type"] == "heartbeat"
+        running += 1
+        peak = max(peak, running)
+        await release.wait()
+        running -= 1
+
+    dispatcher = HeartbeatDispatcher(index, process_event, concurrency=2)
+    guard._user_states[7010] = State.PLAN  # Busy: no heartbeat
+    first = dispatcher.dispatch(window=0)
+    await asyncio.sleep(0.01)
+
+    assert dispatcher.dispatch(window=0) is None  # Every user still pending from the first round
+    stats = dispatcher.stats()
+    assert stats["overlapped"] == 10 and stats["backlog"] == 10 and stats["waiting_for_slot"] == 8
+
+    release.set()
+    await first
+    guard.force_idle(7010)
+    stats = dispatcher.stats()
+    assert peak == 2
+    assert stats["completed"] == 9 and stats["skipped_busy"] == 1 and stats["backlog"] == 0
+
+
+@pytest.mark.asyncio
+async def test_activity_index_persists_and_forgets_inactive_users(tmp_path):
+    index = ActivityIndex(str(tmp_path / "hb.db"))
+    index.touch(1)
+    index.touch(2, ts=time.time() - 3 * 86400)
+    await index.sync(keep_seconds=86400)
+    assert index.active_since(0) == [1]
+
+    reloaded = ActivityIndex(str(tmp_path / "hb.db"))
+    await reloaded.sync(keep_seconds=86400)
+    assert reloaded.active_since(time.time() - 60) == [1]
+
+
+@pytest.mark.asyncio
+async def test_activity_index_picks_up_other_workers_on_every_sync(tmp_path):
+    leader, worker = ActivityIndex(str(tmp_path / "hb.db")), ActivityIndex(str(tmp_path / "hb.db"))
+    leader.touch(1)
+    await leader.sync(keep_seconds=86400)
+    await worker.sync(keep_seconds=86400)
+
+    worker.touch(2, ts=time.time() - 600)  # Seen before the leader's last sync, written after it
+    await worker.sync(keep_seconds=86400)
+    await leader.sync(keep_seconds=86400)
+    assert sorted(leader.active_since(0)) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_fsm_touches_index_for_user_events_only():
+    from core.fsm import FSMController
+    with patch('core.fsm.activity') as mock_activity:
+        await FSMController().process_event({"user_id": 7100, "type": "heartbeat"})
+        mock_activity.touch.assert_not_called()
+        await FSMController().process_event({"user_id": 7100, "text": "hi"})
+    mock_activity.touch.assert_called_once_with(7100)
+
+
+def _gate(tmp_path, mode, version=3):
+    from core.heartbeat import HeartbeatGate
+    gate = HeartbeatGate(ActivityIndex(str(tmp_path / "hb.db")), mode=mode)
+    gate._due_items = AsyncMock(return_value=False)
+    gate._profile_version = AsyncMock(return_value=version)
+    return gate
+
+
+@pytest.mark.asyncio
+async def test_gate_skips_llm_when_nothing_is_actionable(tmp_path):
+    gate = _gate(tmp_path, "on")
+    gate.index.touch(1, ts=time.time() - 3600)
+    assert await gate.should_skip(1, {}) is False  # No history yet: the model decides
+    for _ in range(5):
+        gate.record(1, True, {})
+
+    metadata = {}
+    assert await gate.should_skip(1, metadata) is True
+    assert metadata["heartbeat_gate"]["skip_rate"] == 1.0
+    assert gate.stats()["avoided_llm_calls"] == 1
+
+    gate.index.touch(1)  # The user wrote since the last LLM heartbeat
+    assert await gate.should_skip(1, {}) is False
+    gate._due_items.return_value = True
+    assert await gate.should_skip(1, {}) is False
+    gate._due_items.return_value = False
+    gate._profile_version.return_value = 4  # Profile changed
+    assert await gate.should_skip(1, {}) is False
+    assert await gate.should_skip(1, {}) is True
+
+
+@pytest.mark.asyncio
+async def test_gate_shadow_mode_only_measures_agreement(tmp_path):
+    gate = _gate(tmp_path, "shadow")
+    for _ in range(5):
+        gate.record(2, True, {})
+    for model_skipped in (True, False):
+        metadata = {}
+        assert await gate.should_skip(2, metadata) is False
+        assert metadata["heartbeat_gate"]["predicted_skip"] is True
+        gate.record(2, model_skipped, metadata)
+    stats = gate.stats()
+    assert stats["avoided_llm_calls"] == 0 and stats["shadow_agreement"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_gate_failing_signal_never_silences(tmp_path):
+    gate = _gate(tmp_path, "on")
+    for _ in range(5):
+        gate.record(3, True, {})
+    gate._profile_version.side_effect = RuntimeError("db locked")
+    assert await gate.should_skip(3, {}) is False
+    assert gate.stats()["signal_errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_observe_ends_gated_heartbeat_before_retrieve():
+    from core.context import ExecutionContext
+    from states.observe import ObserveState
+    ctx = ExecutionContext(user_id=4, event_type="heartbeat", raw_input="SYSTEM_HEARTBEAT")
+    with patch('states.observe.gate.should_skip', AsyncMock(return_value=True)), \
+         patch('states.observe.funnel.prefetch_context') as prefetch:
+        assert await ObserveState().execute(ctx) == State.IDLE
+    prefetch.assert_not_called()
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import patch
+from core.api_models import ChatRequest
+from core.context import ExecutionContext
+from core.jobs import JobManager, RedisJobStore, RemoteJob
+from scripts.stub_backends import StubRedis
+from core.streaming import RunEvents, run_events_var
+
+
+def _parse(frames):
+    events = []
+    for frame in frames:
+        if frame.startswith(":"):
+            continue
+        lines = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+        events.append((int(lines["id"]), lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def _fake_run(user_id, text, message_id=None, platform="api", metadata=None):
+    events = run_events_var.get()
+    for state in ("OBSERVE", "PLAN"):
+        events.emit("state", {"state": state})
+        await asyncio.sleep(0)
+    events.push_partial("Привіт")
+    events.push_partial("Привіт, світ")
+    events.push_partial('Привіт, світ {"tool')  # Tool-call prefix stays hidden
+    events.emit("state", {"state": "IDLE"})
+    return ExecutionContext(user_id=user_id, raw_input=text, sent_response="Привіт, світ")
+
+
+@pytest.mark.asyncio
+async def test_sse_streams_states_chunks_and_result():
+    manager = JobManager(process_request=_fake_run)
+    job = manager.submit(ChatRequest(user_id=1, message="hi"))
+
+    events = _parse([frame async for frame in job.sse()])
+    await job.task
+
+    names = [event for _, event, _ in events]
+    assert names == ["accepted", "state", "state", "chunk", "chunk", "state", "done"]
+    chunks = [data["delta"] for _, event, data in events if event == "chunk"]
+    assert "".join(chunks) == "Привіт, світ"
+    assert events[-1][2]["text"] == "Привіт, світ"
+    assert [i for i, _, _ in events] == list(range(len(events)))
+
+    status = job.to_status()
+    assert status.status == "complete" and status.states == ["OBSERVE", "PLAN", "IDLE"]
+    assert manager.stats()["completed"] == 1 and manager.running() == 0
+
+
+@pytest.mark.asyncio
+async def test_sse_resumes_after_last_event_id():
+    manager = JobManager(process_request=_fake_run)
+    job = manager.submit(ChatRequest(user_id=1, message="hi"))
+    await job.task
+
+    resumed = _parse([frame async for frame in job.sse(last_event_id=4)])
+    assert [event for _, event, _ in resumed] == ["state", "done"]
+
+
+@pytest.mark.asyncio
+async def test_failed_run_emits_error():
+    async def boom(**kwargs):
+        raise RuntimeError("kernel down")
+
+    manager = JobManager(process_request=boom)
+    job = manager.submit(ChatRequest(user_id=1, message="hi"))
+    events = _parse([frame async for frame in job.sse()])
+    await job.task
+
+    assert events[-1][1:] == ("error", {"detail": "kernel down"})
+    assert job.to_status().status == "error"
+
+
+@pytest.mark.asyncio
+async def test_keepalive_while_idle():
+    log = RunEvents()
+    stream = log.follow(keepalive=0.01)
+    assert await stream.__anext__() is None  # Nothing yet: keepalive
+    log.emit("state", {"state": "OBSERVE"})
+    assert await stream.__anext__() == (0, "state", {"state": "OBSERVE"})
+    log.close()
+    with pytest.raises(StopAsyncIteration):
+        await stream.__anext__()
+
+
+@pytest.mark.asyncio
+async def test_finished_jobs_are_pruned():
+    manager = JobManager(process_request=_fake_run)
+    with patch("config.JOBS_MAX", 2):
+        first = manager.submit(ChatRequest(user_id=1, message="a"))
+        await first.task
+        second = manager.submit(ChatRequest(user_id=2, message="b"))
+        await second.task
+        third = manager.submit(ChatRequest(user_id=3, message="c"))
+        await third.task
+
+    assert manager.get(first.id) is None and manager.get(second.id) is not None
+    assert manager.stats()["expired"] == 1
+
+
+@pytest.mark.asyncio
+async def test_job_of_another_worker_is_served_from_the_shared_store():
+    redis = StubRedis()
+    owner = JobManager(process_request=_fake_run, store=RedisJobStore(redis))
+    other = JobManager(process_request=_fake_run, store=RedisJobStore(redis))
+    job = owner.submit(ChatRequest(user_id=1, message="hi"))
+    while not redis.values:  # The mirror saves the job as soon as its task runs
+        await asyncio.sleep(0)
+
+    with patch("config.JOBS_REMOTE_POLL_SECONDS", 0.01):
+        remote = await other.lookup(job.id)
+        assert isinstance(remote, RemoteJob)
+        live = _parse([frame async for frame in remote.sse()])  # Follows the run to the end
+        await job.task
+        remote = await other.lookup(job.id)
+        resumed = _parse([frame async for frame in remote.sse(last_event_id=4)])
+
+    local = _parse([frame async for frame in job.sse()])
+    assert live == local
+    assert [event for _, event, _ in resumed] == ["state", "done"]
+    status = remote.to_status()
+    assert status.status == "complete" and status.states == ["OBSERVE", "PLAN", "IDLE"]
+    assert status.result.text == "Привіт, світ"
+    assert await other.lookup("missing") is None
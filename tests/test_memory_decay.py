@@ -0,0 +1,95 @@
+import pytest
+from datetime import datetime, timedelta
+from core.memory.structured import StructuredMemory
+
+NOW = datetime(2026, 6, 1, 3, 0, 0)
+
+
+def _legacy(confidence, days, ttl):
+    """legacy/memory_manager_v2.MemoryDecay.apply_decay rule"""
+    if days <= ttl:
+        return confidence
+    return max(0.1, confidence - min(0.3, (days / ttl) * 0.1))
+
+
+async def _seed(mem, rows):
+    db = await mem._get_conn()
+    await db.executemany('''
+        INSERT INTO user_memory_v2 (user_id, section, key, value, confidence, last_confirmed, ttl_days, created_at, updated_at)
+        VALUES (?, ?, ?, '{"value": 1}', ?, ?, ?, ?, ?)
+    ''', [
+        (uid, section, key, conf, (NOW - timedelta(days=days, hours=1)).isoformat(), ttl, "x", "x")
+        for uid, section, key, conf, days, ttl in rows
+    ])
+    await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_decay_matches_legacy_rule_across_chunks(tmp_path):
+    mem = StructuredMemory(str(tmp_path / "m.db"))
+    await mem.init_db()
+    rows = []
+    for i in range(40):
+        ttl = (14, 30, 90)[i % 3]
+        rows.append((i % 4, "goals", f"k{i}", 0.2 + (i % 8) / 10, i * 7, ttl))
+    await _seed(mem, rows)
+
+    stats = await mem.apply_decay(now=NOW, chunk_size=3)
+
+    expected = {(uid, key): _legacy(conf, days, ttl) for uid, _, key, conf, days, ttl in rows}
+    db = await mem._get_conn()
+    async with db.execute("SELECT user_id, key, confidence FROM user_memory_v2") as cursor:
+        actual = {(uid, key): conf for uid, key, conf in await cursor.fetchall()}
+    assert actual == pytest.approx(expected)
+    assert stats["decayed"] == sum(1 for (_, _, _, c, d, t) in rows if d > t and c > 0.1)
+    assert stats["chunks"] > 3 and stats["pruned"] == 0
+    await mem.close()
+
+
+@pytest.mark.asyncio
+async def test_prune_and_cache_invalidation(tmp_path):
+    mem = StructuredMemory(str(tmp_path / "m.db"))
+    await mem.init_db()
+    await _seed(mem, [
+        (1, "time_energy", "stale", 0.3, 100, 14),  # -> 0.1, pruned
+        (1, "goals", "fresh", 0.9, 1, 60),
+        (2, "goals", "old", 0.9, 70, 60),           # -> 0.783, kept
+    ])
+    before = await mem.get_all_memory(1)
+    assert "time_energy" in before
+
+    stats = await mem.apply_decay(now=NOW, prune_below=0.15)
+
+    assert stats == {**stats, "decayed": 2, "pruned": 1}
+    assert "time_energy" not in await mem.get_all_memory(1)  # cache saw the version bump
+    assert (await mem.get_all_memory(2))["goals"]["old"]["confidence"] == pytest.approx(0.9 - 70 / 60 * 0.1)
+    await mem.close()
+
+
+@pytest.mark.asyncio
+async def test_floor_rows_skipped_and_only_changed_users_bumped(tmp_path):
+    mem = StructuredMemory(str(tmp_path / "m.db"))
+    await mem.init_db()
+    await _seed(mem, [
+        (1, "goals", "floored", 0.1, 100, 14),  # already at the floor
+        (1, "goals", "fresh", 0.9, 1, 60),
+        (2, "goals", "old", 0.9, 70, 60),       # decays
+    ])
+    db = await mem._get_conn()
+
+    async def versions():
+        async with db.execute("SELECT user_id, version FROM user_memory_versions") as cursor:
+            return dict(await cursor.fetchall())
+
+    before = await versions()
+    stats = await mem.apply_decay(now=NOW)
+    after = await versions()
+    assert stats["candidates"] == 1 and stats["decayed"] == 1
+    assert after.get(1) == before.get(1)
+    assert after[2] == before.get(2, 0) + 1
+
+    # Below the floor-prune threshold the floored row is a candidate again
+    stats = await mem.apply_decay(now=NOW, prune_below=0.15)
+    assert stats["pruned"] == 1
+    assert (await versions())[1] == (before.get(1) or 0) + 1
+    await mem.close()
@@ -32,14 +32,14 @@ async def test_memory_write_execution():
         assert next_state == State.IDLE
         
         # 1. Redis History (User + Bot)
-        assert mock_writer.append_history.call_count == 2
-        mock_writer.append_history.assert_any_call(1, "user", "I live in London")
+        mock_writer.append_turn.assert_awaited_once()
+        assert mock_writer.append_turn.await_args.args[1][0] == ("user", "I live in London")
         
         # 2. Chroma
         mock_writer.save_semantic_memory.assert_awaited_once()
         
         # 3. Attributes
-        mock_llm.extract_attributes.assert_awaited_with("I live in London")
+        mock_llm.extract_attributes.assert_awaited_with("I live in London", raise_errors=False)
         # Check structured memory call
-        mock_writer.update_attribute.assert_awaited_with(1, "location", "London")
+        mock_writer.update_attributes.assert_awaited_with(1, {"location": "London"}, raise_errors=False)
 
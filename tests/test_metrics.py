@@ -0,0 +1,63 @@
+import pytest
+from unittest.mock import AsyncMock
+from core.metrics import MetricsRegistry, FSM_STATE_SECONDS, timed
+from core.state import State
+
+
+def test_histogram_buckets_outcomes_and_exposition():
+    registry = MetricsRegistry()
+    hist = registry.histogram("demo_seconds", "Demo", ("provider", "outcome"), buckets=(0.1, 1.0))
+    hist.observe(0.1, "gemini", "ok")  # le is inclusive
+    hist.observe(0.5, "gemini", "ok")
+    hist.observe(7.0, "gemini", "ok")
+    with pytest.raises(RuntimeError):
+        with hist.track("deepseek"):
+            raise RuntimeError("boom")
+
+    lines = hist.render()
+    assert 'demo_seconds_bucket{provider="gemini",outcome="ok",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{provider="gemini",outcome="ok",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{provider="gemini",outcome="ok",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{provider="gemini",outcome="ok"} 3' in lines
+    assert 'demo_seconds_sum{provider="gemini",outcome="ok"} 7.600000' in lines
+    assert hist.count("deepseek", "error") == 1
+    with pytest.raises(ValueError):
+        hist.observe(1.0, "missing-outcome")
+
+
+@pytest.mark.asyncio
+async def test_gauges_are_evaluated_at_scrape_time():
+    registry = MetricsRegistry()
+    depth = {"value": 0}
+    registry.gauge("demo_depth", "Depth", lambda: depth["value"])
+    registry.gauge("demo_async", "Async", AsyncMock(return_value={("a",): 2}), ("lane",))
+    registry.gauge("demo_broken", "Broken", lambda: 1 / 0)
+    hist = registry.histogram("demo_leg_seconds", "Leg", ("leg", "outcome"))
+    assert await timed(hist, AsyncMock(return_value=5)(), "redis") == 5
+
+    depth["value"] = 3
+    text = await registry.render()
+    assert "demo_depth 3\n" in text
+    assert 'demo_async{lane="a"} 2' in text
+    assert "demo_broken" not in text  # A failing gauge does not break the scrape
+    assert 'demo_leg_seconds_count{leg="redis",outcome="ok"} 1' in text
+
+
+@pytest.mark.asyncio
+async def test_fsm_records_state_durations():
+    from core.fsm import FSMController
+    fsm = FSMController()
+
+    async def observe(context):
+        return State.ERROR
+
+    async def error(context):
+        raise RuntimeError("handler crashed")
+
+    fsm.register_handler(State.OBSERVE, AsyncMock(execute=observe))
+    fsm.register_handler(State.ERROR, AsyncMock(execute=error))
+    before_ok, before_err = FSM_STATE_SECONDS.count("OBSERVE", "ok"), FSM_STATE_SECONDS.count("ERROR", "error")
+    await fsm.process_event({"user_id": 7300, "text": "hi"})
+    assert FSM_STATE_SECONDS.count("OBSERVE", "ok") == before_ok + 1
+    assert FSM_STATE_SECONDS.count("ERROR", "error") >= before_err + 1
+    assert fsm.active_sessions() == 0 and fsm.lock_waiters() == 0
@@ -0,0 +1,85 @@
+import os
+import chromadb
+import pytest
+from core.memory.obsidian_chunks import ChunkIndexer, split_note
+
+NOTE = """# Кав'ярня
+Ідея: кав'ярня біля парку.
+
+## Бюджет
+Оренда 20к, обладнання 300к.
+
+Ще абзац про бюджет.
+
+## Команда
+Бариста і менеджер.
+"""
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(len(texts))
+        return [[float(len(t)), 1.0, 0.5] for t in texts]
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _indexer(tmp_path, embedder, name="obsidian_knowledge"):
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    collection = client.get_or_create_collection(name)
+    return ChunkIndexer(collection, embedder, str(tmp_path / "vault"), str(tmp_path / "ckpt.json"), workers=2), collection
+
+
+def test_split_by_headings_with_stable_ids():
+    chunks = split_note("/v/Plan.md", NOTE)
+    assert [c.heading for c in chunks] == ["Plan > Кав'ярня", "Plan > Кав'ярня > Бюджет", "Plan > Кав'ярня > Команда"]
+    assert "Ще абзац" in chunks[1].text
+    assert [c.id for c in split_note("/v/Plan.md", NOTE)] == [c.id for c in chunks]
+    # Same file name in another folder does not collide
+    assert chunks[0].id != split_note("/w/Plan.md", NOTE)[0].id
+    # Long sections are windowed
+    long_chunks = split_note("/v/Long.md", "\n\n".join(["абзац " * 50] * 20), limit=800)
+    assert len(long_chunks) > 1 and all(len(c.text) <= 800 for c in long_chunks)
+
+
+def test_only_changed_chunks_reembedded_and_removed_files_cleaned(tmp_path):
+    embedder = CountingEmbedder()
+    indexer, collection = _indexer(tmp_path, embedder)
+    path = str(tmp_path / "vault" / "Plan.md")
+    _write(path, NOTE)
+
+    assert indexer.index_file(path) == (3, 0)
+    _write(path, NOTE.replace("Бариста і менеджер.", "Бариста, менеджер і кухар."))
+    assert indexer.index_file(path) == (1, 1)
+    assert collection.count() == 3
+
+    # Move to another folder: same title + text, so every chunk reuses its vector
+    moved = str(tmp_path / "vault" / "Archive" / "Plan.md")
+    _write(moved, open(path, encoding="utf-8").read())
+    os.remove(path)
+    indexer.move_file(path, moved)
+    assert embedder.calls == [3, 1]  # no new embedding calls for the move
+    assert set(m["path"] for m in collection.get()["metadatas"]) == {moved}
+
+
+def test_initial_scan_resumes_from_checkpoint(tmp_path):
+    embedder = CountingEmbedder()
+    for i in range(6):
+        _write(str(tmp_path / "vault" / f"n{i}.md"), f"# Note {i}\nText {i}")
+    indexer, collection = _indexer(tmp_path, embedder)
+    stats = indexer.initial_scan()
+    assert stats["embedded"] == 6 and collection.count() == 6
+
+    # Restart: nothing changed -> nothing embedded; one deleted -> its chunks removed
+    os.remove(str(tmp_path / "vault" / "n0.md"))
+    restarted, collection = _indexer(tmp_path, embedder)
+    stats = restarted.initial_scan()
+    assert stats["embedded"] == 0 and stats["deleted"] == 1
+    assert collection.count() == 5
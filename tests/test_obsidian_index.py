@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from core.memory.obsidian_index import ObsidianIndex, tokenize
+from core.memory.funnel import ContextFunnel
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_ukrainian_tokenization_and_stemming():
+    assert tokenize("Пам'ять") == tokenize("пам’яті")
+    assert tokenize("кав'ярня") == tokenize("кав'ярні")
+    assert tokenize("що це за план") == ["план"]
+    assert tokenize("running notes") == ["runn", "note"]
+
+
+def test_bm25_ranks_best_match_with_snippet(tmp_path):
+    vault = tmp_path / "vault"
+    _write(str(vault / "Кав'ярня.md"), "Бізнес-план кав'ярні. Оренда, обладнання, кав'ярня біля парку.")
+    _write(str(vault / "Спорт.md"), "Тренування у залі. Згадка про кав'ярню після тренування.")
+    _write(str(vault / "Нотатки" / "Фінанси.md"), "Бюджет на місяць. " + "Текст. " * 200 + "Витрати на каву в кав'ярні.")
+    _write(str(vault / ".obsidian" / "skip.md"), "кав'ярня кав'ярня кав'ярня")
+
+    index = ObsidianIndex(str(vault), str(tmp_path / "idx.db"))
+    assert index.refresh(force=True) == (3, 0)
+
+    results = index.search("відкрити кав'ярню", k=3)
+    assert os.path.basename(results[0][0]) == "Кав'ярня.md"
+    assert len(results) == 3
+    finance = next(r for r in results if r[0].endswith("Фінанси.md"))
+    assert "кав'ярні" in finance[2] and not finance[2].startswith("Бюджет")
+    index.close()
+
+
+def test_incremental_refresh(tmp_path):
+    vault = tmp_path / "vault"
+    _write(str(vault / "a.md"), "alpha note")
+    _write(str(vault / "b.md"), "beta note")
+    index = ObsidianIndex(str(vault), str(tmp_path / "idx.db"))
+    assert index.refresh(force=True) == (2, 0)
+    assert index.refresh(force=True) == (0, 0)
+
+    time.sleep(0.01)
+    _write(str(vault / "a.md"), "gamma note, rewritten")
+    os.remove(str(vault / "b.md"))
+    assert index.refresh(force=True) == (1, 1)
+    assert index.search("alpha") == []
+    assert index.search("gamma")[0][0].endswith("a.md")
+    index.close()
+
+    # Persistent: a new instance sees the same index without re-reading files
+    reopened = ObsidianIndex(str(vault), str(tmp_path / "idx.db"))
+    assert reopened.refresh(force=True) == (0, 0)
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_funnel_uses_index(tmp_path):
+    vault = tmp_path / "vault"
+    _write(str(vault / "Goals.md"), "Мета на рік: запустити кав'ярню")
+    funnel = ContextFunnel()
+    with patch('config.OBSIDIAN_ROOT', str(vault)), patch('config.OBSIDIAN_INDEX_PATH', str(tmp_path / "idx.db")):
+        await funnel.refresh_obsidian_index()
+        with patch.object(ObsidianIndex, 'refresh', side_effect=AssertionError("walk on search")):
+            hits = await funnel._search_obsidian("хочу свою кав'ярню")
+    path, _score, text = hits[0]
+    assert path.endswith("Goals.md") and text.startswith("Мета на рік")
+
+
+def test_refresh_waiting_on_the_lock_does_not_walk_again(tmp_path):
+    vault = tmp_path / "vault"
+    _write(str(vault / "a.md"), "one")
+    index = ObsidianIndex(str(vault), str(tmp_path / "idx.db"))
+    with patch('core.memory.obsidian_index.os.walk', wraps=os.walk) as walk:
+        with index._refresh_lock:
+            threads = [threading.Thread(target=index.refresh) for _ in range(3)]
+            for t in threads:
+                t.start()
+            time.sleep(0.1)  # All three passed the unlocked throttle check
+        for t in threads:
+            t.join()
+    assert walk.call_count == 1
+    index.close()
+
+
+def test_searches_are_not_blocked_by_the_vault_walk(tmp_path):
+    vault = tmp_path / "vault"
+    _write(str(vault / "a.md"), "кав'ярня")
+    index = ObsidianIndex(str(vault), str(tmp_path / "idx.db"))
+    index.refresh(force=True)
+    _write(str(vault / "b.md"), "марафон")
+    real_walk = os.walk
+
+    def walk(root):
+        # Mid-walk: the index lock is free, a search goes through
+        assert index._lock.acquire(blocking=False)
+        index._lock.release()
+        assert index.search("кав'ярня")[0][0].endswith("a.md")
+        yield from real_walk(root)
+
+    with patch('core.memory.obsidian_index.os.walk', side_effect=walk):
+        assert index.refresh(force=True) == (1, 0)
+    index.close()
@@ -0,0 +1,148 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+import core.llm_service as llm
+from core.state import State
+from core.context import ExecutionContext
+from states.plan import PlanState
+from states.reflect import ReflectState
+from states.memory_write import MemoryWriteState
+from states.error import CRITIC_REJECTION_TEXT
+
+
+def _context():
+    return ExecutionContext(
+        user_id=77, event_type="message", raw_input="Порівняй два тарифи",
+        intent="COMPLEX", metadata={"message_id": 5}
+    )
+
+
+@pytest.mark.asyncio
+async def test_plan_defers_critic_in_optimistic_mode():
+    context = _context()
+    critic = AsyncMock(return_value=("Краща відповідь", "♊+🐋"))
+    with patch('config.CRITIC_MODE', "optimistic"), patch('config.ENABLE_SYNERGY', True), \
+         patch('config.STREAM_RESPONSES', False), \
+         patch('core.llm_service.call_actor', AsyncMock(return_value=("Відповідь актора", "gemini"))), \
+         patch('core.llm_service.call_critic', critic):
+        assert await PlanState().execute(context) == State.DECIDE
+
+    assert context.response == "Відповідь актора"
+    assert context.metadata["critic_pending"] is True
+    assert context.pending["critic"]["actor_response"] == "Відповідь актора"
+    critic.assert_not_awaited()  # Reviewed after the lock is released, not during PLAN
+
+
+@pytest.mark.asyncio
+async def test_reflect_patches_only_material_changes():
+    bot = AsyncMock()
+    reflect = ReflectState(bot)
+    patched_before = llm.critic_counters["patched"]
+    critic = AsyncMock()
+
+    with patch('core.llm_service.evaluate_performance', AsyncMock(return_value=None)), \
+         patch('core.llm_service.call_critic', critic):
+        # Cosmetic change: not patched
+        context = _context()
+        context.response = "Тариф А дешевший за тариф Б."
+        context.pending["critic"] = {"actor_response": context.response, "instruction": ""}
+        critic.return_value = ("Тариф А дешевший за тариф Б!", "♊+🐋")
+        await reflect.execute(context)
+        bot.edit_message_text.assert_not_awaited()
+
+        # Material change: edited in place
+        context = _context()
+        context.response = "Тариф А дешевший за тариф Б."
+        context.pending["critic"] = {"actor_response": context.response, "instruction": ""}
+        critic.return_value = ("Тариф Б дешевший, якщо платити за рік.", "♊+🐋")
+        await reflect.execute(context)
+
+    bot.edit_message_text.assert_awaited_once()
+    assert bot.edit_message_text.await_args.kwargs["message_id"] == 5
+    assert context.response == "Тариф Б дешевший, якщо платити за рік."
+    assert llm.critic_counters["patched"] == patched_before + 1
+
+
+@pytest.mark.asyncio
+async def test_reflect_queues_critic_review_outside_the_session():
+    bot = AsyncMock()
+    reflect = ReflectState(bot)
+    queue = AsyncMock()
+    queue.running = True
+    critic = AsyncMock(return_value=("Тариф Б дешевший, якщо платити за рік.", "♊+🐋"))
+    context = _context()
+    context.response = "Тариф А дешевший за тариф Б."
+    context.pending["critic"] = {"actor_response": context.response, "instruction": ""}
+
+    with patch('states.reflect.postprocess', queue), patch('core.llm_service.call_critic', critic), \
+         patch('core.memory.writer.writer') as writer, \
+         patch('states.memory_write.MemoryWriteState.persist', AsyncMock()) as persist, \
+         patch.object(reflect, 'post_process', AsyncMock()) as post_process:
+        writer.append_turn = AsyncMock()
+        assert await reflect.execute(context) == State.MEMORY_WRITE
+        critic.assert_not_awaited()
+        kind, job_context = queue.submit.await_args.args
+        assert kind == "critic" and context.metadata["critic_queued"] is True
+
+        # MEMORY_WRITE leaves history and memory to the job: the answer is not final yet
+        with patch('states.memory_write.guard.assert_allowed', AsyncMock()):
+            assert await MemoryWriteState().execute(context) == State.IDLE
+        writer.append_turn.assert_not_awaited()
+
+        job_context.pending = dict(queue.submit.await_args.kwargs["pending"])
+        job_context.metadata["job_attempts"] = 0
+        await reflect.review(job_context)
+        # A retry (persist failed) does not append the turn twice
+        job_context.pending = dict(queue.submit.await_args.kwargs["pending"])
+        job_context.metadata["job_attempts"] = 1
+        await reflect.review(job_context)
+
+    queue.submit.assert_awaited_once()  # reflect + memory run inside the critic job, in lane order
+    final = "Тариф Б дешевший, якщо платити за рік."
+    writer.append_turn.assert_awaited_once()
+    assert writer.append_turn.await_args.args[1][1][1] == final
+    assert persist.await_count == 2 and persist.await_args.args[0].response == final
+    post_process.assert_awaited()
+
+
+@pytest.mark.asyncio
+async def test_deferred_critic_rejection_replaces_answer():
+    bot = AsyncMock()
+    queue = AsyncMock()
+    context = _context()
+    context.response = "Небезпечна порада"
+    context.pending["critic"] = {"actor_response": context.response, "instruction": ""}
+    rejected_before = llm.critic_counters["rejected"]
+
+    with patch('states.reflect.postprocess', queue), \
+         patch('core.llm_service.call_critic', AsyncMock(return_value=(context.response, "♊⚠️"))):
+        await ReflectState(bot).review(context)
+
+    assert bot.edit_message_text.await_args.kwargs["text"] == CRITIC_REJECTION_TEXT
+    assert llm.critic_counters["rejected"] == rejected_before + 1
+    queue.submit.assert_not_awaited()  # Nothing reflected or remembered, as on the blocking ERROR path
+
+
+@pytest.mark.asyncio
+async def test_failed_patch_edit_falls_back_and_is_not_recorded():
+    bot = AsyncMock()
+    reflect = ReflectState(bot)
+    critic = AsyncMock(return_value=("Тариф Б дешевший, якщо платити за рік.", "♊+🐋"))
+    patched_before = llm.critic_counters["patched"]
+
+    with patch('core.llm_service.call_critic', critic):
+        # HeadlessBot: Markdown edit fails (False), plain text goes through
+        bot.edit_message_text.side_effect = [False, True]
+        context = _context()
+        context.response = "Тариф А дешевший за тариф Б."
+        assert await reflect._apply_critic(context, {"actor_response": context.response, "instruction": ""})
+        assert bot.edit_message_text.await_args.kwargs["parse_mode"] is None
+        assert context.response == critic.return_value[0]
+        assert llm.critic_counters["patched"] == patched_before + 1
+
+        # Both edits fail: the user still sees the Actor answer, so nothing is recorded
+        bot.edit_message_text.side_effect = [False, RuntimeError("message to edit not found")]
+        context = _context()
+        context.response = "Тариф А дешевший за тариф Б."
+        assert await reflect._apply_critic(context, {"actor_response": context.response, "instruction": ""})
+        assert context.response == "Тариф А дешевший за тариф Б." and context.sent_response == ""
+        assert llm.critic_counters["patched"] == patched_before + 1
@@ -52,10 +52,14 @@ async def test_note_tool_ops(note_tool):
     guard.cleanup_user_lock(user_id)
 
 @pytest.mark.asyncio
-async def test_reminder_tool_parsing(reminder_tool):
+async def test_reminder_tool_parsing(reminder_tool, tmp_path):
     from core.state_guard import guard
     from core.state import State
+    from core.notifications import ReminderCenter
+    from scheduler import scheduler
     user_id = 888
+    center = ReminderCenter(str(tmp_path / "reminders.db"))
+    center.attach(scheduler)
     
     # Enter ACT state to allow NETWORK
     await guard.enter(user_id, State.OBSERVE)
@@ -65,13 +69,13 @@ async def test_reminder_tool_parsing(reminder_tool):
     await guard.enter(user_id, State.ACT)
     
     # Relative time
-    with patch('scheduler.scheduler.add_job') as mock_add:
+    with patch('core.tools.reminder_tool.reminders', center), patch('scheduler.scheduler.add_job') as mock_add:
         res = await reminder_tool.execute(text="Wake up", time_str="5 minutes", user_id=user_id)
         assert "встановлено" in res
         mock_add.assert_called_once()
     
     # ISO time
-    with patch('scheduler.scheduler.add_job') as mock_add:
+    with patch('core.tools.reminder_tool.reminders', center), patch('scheduler.scheduler.add_job') as mock_add:
         future_iso = "2029-01-01 10:00:00"
         res = await reminder_tool.execute(text="Launch", time_str=future_iso, user_id=user_id)
         assert "встановлено" in res
@@ -80,6 +84,7 @@ async def test_reminder_tool_parsing(reminder_tool):
         _, kwargs = mock_add.call_args
         assert kwargs['run_date'] == datetime.fromisoformat(future_iso)
     
+    await center.close()
     guard.cleanup_user_lock(user_id)
 
 @pytest.mark.asyncio
@@ -0,0 +1,137 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+from core.context import ExecutionContext
+from core.postprocess import PostProcessQueue
+from core.state import State
+from core.state_guard import guard
+from states.memory_write import MemoryWriteState
+
+
+async def _drain(queue: PostProcessQueue, timeout: float = 5.0):
+    async with asyncio.timeout(timeout):
+        while (await queue.stats())["depth"]:
+            await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_in_order_per_user(tmp_path):
+    queue = PostProcessQueue(db_path=str(tmp_path / "q.db"), workers=2)
+    seen = []
+
+    async def handler(ctx: ExecutionContext):
+        await asyncio.sleep(0.01 if ctx.raw_input.endswith("0") else 0)
+        seen.append((ctx.user_id, ctx.raw_input, ctx.metadata["n"]))
+
+    queue.register("memory_write", handler)
+    await queue.start()
+    try:
+        for n in range(5):
+            for user_id in (1, 2, 3):
+                ctx = ExecutionContext(user_id=user_id, raw_input=f"msg {n}", metadata={"n": n})
+                await queue.submit("memory_write", ctx)
+        await _drain(queue)
+        stats = await queue.stats()
+    finally:
+        await queue.stop()
+
+    for user_id in (1, 2, 3):
+        assert [n for uid, _, n in seen if uid == user_id] == list(range(5))
+    assert stats["processed"] == 15
+    assert stats["lag_seconds"] == 0.0
+
+
+@pytest.mark.asyncio
+async def test_interrupted_jobs_recovered_and_failures_parked(tmp_path):
+    db = str(tmp_path / "q.db")
+    queue = PostProcessQueue(db_path=db, workers=1)
+    queue.register("reflect", AsyncMock())
+    await queue.submit("reflect", ExecutionContext(user_id=5, raw_input="a"))
+    conn = await queue._get_conn()
+    await conn.execute("UPDATE post_jobs SET status = 'running'")  # simulate a crash mid-job
+    await conn.commit()
+    await queue.stop()
+
+    restarted = PostProcessQueue(db_path=db, workers=1)
+    handler = AsyncMock(side_effect=RuntimeError("chroma down"))
+    restarted.register("reflect", handler)
+    with patch('config.POSTPROCESS_MAX_ATTEMPTS', 1):
+        await restarted.start()
+        try:
+            await _drain(restarted)
+            stats = await restarted.stats()
+        finally:
+            await restarted.stop()
+
+    handler.assert_awaited_once()
+    assert handler.await_args.args[0].raw_input == "a"
+    assert stats["dead_letters"] == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_write_defers_long_term_writes(tmp_path):
+    queue = PostProcessQueue(db_path=str(tmp_path / "q.db"), workers=1)
+    persisted = asyncio.Event()
+
+    async def persist(ctx):
+        persisted.set()
+
+    queue.register("memory_write", persist)
+    await queue.start()
+    ctx = ExecutionContext(user_id=1, raw_input="I live in London", response="Nice")
+    mock_writer = AsyncMock()
+    try:
+        with patch('states.memory_write.postprocess', queue), \
+             patch('core.memory.writer.writer', mock_writer), \
+             patch.object(guard, 'assert_allowed', new_callable=AsyncMock):
+            assert await MemoryWriteState().execute(ctx) == State.IDLE
+        mock_writer.append_turn.assert_awaited_once()
+        mock_writer.save_semantic_memory.assert_not_awaited()
+        await asyncio.wait_for(persisted.wait(), 5)
+    finally:
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_memory_write_job_raises_and_retries_idempotently(tmp_path):
+    from core.memory.chroma_storage import ChromaManager
+    from scripts.stub_backends import StubCollection
+
+    chroma = ChromaManager(db_path=str(tmp_path / "chroma"))
+    chroma.collection = StubCollection()
+    ctx = ExecutionContext(user_id=1, raw_input="hi", response="hello")
+    embed = AsyncMock(side_effect=RuntimeError("gemini down"))
+    with patch('core.memory.funnel.funnel.chroma', chroma), \
+         patch('core.memory.embeddings.embeddings.embed', embed), \
+         patch('core.memory.writer.writer._init_done', True):
+        with pytest.raises(RuntimeError):
+            await MemoryWriteState().persist(ctx)  # Job path: the queue must see the failure
+        embed.side_effect = None
+        embed.return_value = [[0.1], [0.2]]
+        await MemoryWriteState().persist(ctx)
+        await MemoryWriteState().persist(ctx)  # Retry after a crash past the write
+
+    assert sorted(d["id"] for d in chroma.collection.docs) == [f"{ctx.trace_id}:assistant", f"{ctx.trace_id}:user"]
+
+
+@pytest.mark.asyncio
+async def test_hung_job_times_out_and_frees_the_lane(tmp_path):
+    queue = PostProcessQueue(db_path=str(tmp_path / "q.db"), workers=1)
+    done = asyncio.Event()
+
+    async def handler(ctx):
+        if ctx.raw_input == "hang":
+            await asyncio.Event().wait()
+        done.set()
+
+    queue.register("reflect", handler)
+    with patch('config.POSTPROCESS_JOB_TIMEOUT', 0.05), patch('config.POSTPROCESS_MAX_ATTEMPTS', 1):
+        await queue.start()
+        try:
+            await queue.submit("reflect", ExecutionContext(user_id=1, raw_input="hang"))
+            await queue.submit("reflect", ExecutionContext(user_id=1, raw_input="next"))
+            await asyncio.wait_for(done.wait(), 5)
+            stats = await queue.stats()
+        finally:
+            await queue.stop()
+    assert stats["dead"] == 1
@@ -0,0 +1,119 @@
+import pytest
+from unittest.mock import patch
+from core.memory.structured import StructuredMemory
+
+
+async def _memory(path, **kwargs):
+    mem = StructuredMemory(str(path), **kwargs)
+    await mem.init_db()
+    return mem
+
+
+@pytest.mark.asyncio
+async def test_profile_served_from_cache_and_patched_on_write(tmp_path):
+    mem = await _memory(tmp_path / "m.db")
+    await mem.set_memory(1, "goals", "main", "кав'ярня", confidence=0.9)
+    await mem.set_memory(1, "goals", "side", "марафон", confidence=0.3)
+
+    first = await mem.get_all_memory(1)
+    with patch.object(mem, '_load_profile', side_effect=AssertionError("table scan")):
+        assert await mem.get_all_memory(1) == first
+        assert await mem.get_all_memory(1, min_confidence=0.4) == {"goals": {"main": first["goals"]["main"]}}
+
+        await mem.set_memory(1, "skills_map", "python", {"level": "senior"}, confidence=0.8)
+        await mem.set_memory(1, "goals", "side", "марафон", confidence=0.95)
+        patched = await mem.get_all_memory(1)
+
+    # Patched cache equals a fresh read from the table
+    fresh = await (await _memory(tmp_path / "m.db")).get_all_memory(1)
+    assert patched == fresh
+    assert list(patched["goals"]) == ["side", "main"]
+    assert patched["skills_map"]["python"]["value"] == {"level": "senior"}
+    assert mem.cache.counters["patches"] == 2
+
+    # Callers cannot corrupt the cache
+    patched["goals"]["main"]["confidence"] = 0.0
+    assert (await mem.get_all_memory(1))["goals"]["main"]["confidence"] == 0.9
+    await mem.close()
+
+
+@pytest.mark.asyncio
+async def test_write_from_another_process_is_detected_by_version(tmp_path):
+    a = await _memory(tmp_path / "m.db")
+    b = await _memory(tmp_path / "m.db")
+    await a.set_memory(7, "goals", "main", "old")
+    assert (await a.get_all_memory(7))["goals"]["main"]["value"] == {"value": "old"}
+
+    await b.set_memory(7, "goals", "main", "new")
+    assert (await a.get_all_memory(7))["goals"]["main"]["value"] == {"value": "new"}
+
+    # A local write after a missed remote one drops the entry instead of patching it
+    await b.set_memory(7, "goals", "extra", "x")
+    await a.set_memory(7, "goals", "main", "newest")
+    profile = await a.get_all_memory(7)
+    assert set(profile["goals"]) == {"main", "extra"}
+    await a.close(); await b.close()
+
+
+@pytest.mark.asyncio
+async def test_lru_bounded_by_users_and_bytes(tmp_path):
+    mem = await _memory(tmp_path / "m.db", cache_max_users=2, cache_max_bytes=10_000)
+    for user in (1, 2, 3):
+        await mem.set_memory(user, "goals", "main", "x")
+        await mem.get_all_memory(user)
+    assert mem.cache.stats()["users"] == 2 and mem.cache.counters["evictions"] == 1
+
+    await mem.set_memory(4, "goals", "big", "y" * 20_000)
+    await mem.get_all_memory(4)
+    assert mem.cache.bytes <= 10_000
+    await mem.close()
+
+
+@pytest.mark.asyncio
+async def test_set_many_is_one_transaction(tmp_path):
+    mem = await _memory(tmp_path / "m.db")
+    await mem.get_all_memory(1)
+    with patch.object(mem._conn, 'commit', wraps=mem._conn.commit) as commit:
+        await mem.set_many(1, [
+            ("goals", "main", "кав'ярня", 0.9),
+            ("skills_map", "python", {"level": "senior"}, 0.8, {"source": "test"}),
+            ("goals", "side", "марафон"),
+        ])
+    assert commit.await_count == 1
+    assert await mem._get_version(1) == 1
+    profile = await mem.get_all_memory(1)
+    assert list(profile["goals"]) == ["main", "side"] and profile["goals"]["side"]["confidence"] == 0.5
+    assert mem.cache.counters["patches"] == 1
+    assert profile == await (await _memory(tmp_path / "m.db")).get_all_memory(1)
+    await mem.close()
+
+
+@pytest.mark.asyncio
+async def test_profile_tool_writes_batch(tmp_path):
+    from core.tools.profile_tool import ProfileTool
+    mem = await _memory(tmp_path / "m.db")
+    with patch('core.memory.funnel.funnel.structured', mem):
+        result = await ProfileTool().execute(user_id=5, updates=[
+            {"section": "goals", "key": "main", "value": "кав'ярня"},
+            {"section": "life_level", "key": "level", "value": "3", "confidence": 0.6},
+        ])
+    assert result.startswith("✅") and "life_level -> level" in result
+    assert set(await mem.get_all_memory(5)) == {"goals", "life_level"}
+    await mem.close()
+
+
+@pytest.mark.asyncio
+async def test_overwrites_keep_size_estimate_and_refresh_lru(tmp_path):
+    mem = await _memory(tmp_path / "m.db", cache_max_users=2)
+    for user in (1, 2):
+        await mem.set_memory(user, "goals", "main", "x")
+        await mem.get_all_memory(user)
+    for i in range(50):
+        await mem.set_memory(1, "goals", "main", f"value {i}")
+    assert mem.cache._entries[1][2] == (await mem._load_profile(1))[1]
+
+    # The patched user is the most recent one: a third user evicts user 2
+    await mem.set_memory(3, "goals", "main", "x")
+    await mem.get_all_memory(3)
+    assert set(mem.cache._entries) == {1, 3}
+    await mem.close()
@@ -0,0 +1,62 @@
+from unittest.mock import patch
+from core.context import ExecutionContext
+from core.prompt_compiler import PromptCompiler
+from core.tool_registry import ToolRegistry, BaseTool, ToolDefinition
+
+
+class _Tool(BaseTool):
+    def __init__(self, name):
+        self._name = name
+
+    @property
+    def definition(self):
+        return ToolDefinition(name=self._name, description="demo", parameters={"type": "object"})
+
+    async def execute(self, **kwargs):
+        return None
+
+
+def _context(**kwargs):
+    ctx = ExecutionContext(user_id=1, raw_input="привіт", **kwargs)
+    ctx.memory_context = {"long_term_memories": ["Любить каву"], "structured_profile": {}}
+    return ctx
+
+
+def test_prefix_is_memoized_and_dynamic_sections_come_after_it():
+    tools = ToolRegistry()
+    tools.register(_Tool("get_time"))
+    compiler = PromptCompiler()
+    with patch('core.prompt_compiler.registry', tools):
+        first = compiler.compile(_context())
+        second = compiler.compile(_context(tool_outputs=[{"name": "get_time", "output": "22:30"}]))
+
+    assert compiler.counters == {"compiles": 2, "prefix_builds": 1}
+    assert second.prefix_cached and second.prefix == first.prefix
+    assert second.text.startswith(first.prefix)
+    assert "get_time" in first.prefix and "Любить каву" not in first.prefix
+    assert "System Age" not in first.prefix  # changes daily, kept out of the cached prefix
+    assert second.text.index("Tool 'get_time': 22:30") > len(first.prefix)
+    assert {"rules", "tools", "persona", "style", "profile", "memories", "tool_outputs"} <= set(second.sections)
+    assert compiler.stats()["prefix_hit_ratio"] == 0.5
+
+
+def test_prefix_invalidated_by_tools_and_life_stage():
+    tools = ToolRegistry()
+    compiler = PromptCompiler()
+    with patch('core.prompt_compiler.registry', tools):
+        compiler.compile(_context())
+        tools.register(_Tool("new_tool"))
+        assert "new_tool" in compiler.compile(_context()).prefix
+
+        stage = {"name": "child", "age": 10, "data": {"traits": "curious"}}
+        with patch('core.prompt_compiler.AgeService.get_life_stage', return_value=stage), \
+             patch('core.prompt_compiler.AgeService.get_age_days', return_value=10):
+            assert "CHILD" in compiler.compile(_context()).prefix
+    assert compiler.counters["prefix_builds"] == 3
+
+
+def test_critic_view_keeps_user_context_within_truncation():
+    compiled = PromptCompiler().compile(_context())
+    view = compiled.critic_view()
+    assert "RULES OF ENGAGEMENT" in view and "Любить каву" in view
+    assert "ДОСТУПНІ ІНСТРУМЕНТИ" not in view and len(view) <= 2000
@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+import config
+from core.providers import ProviderRegistry, DEEPSEEK, GEMINI
+from scripts.stub_provider import StubProvider
+
+
+@pytest.mark.asyncio
+async def test_clients_are_reused():
+    registry = ProviderRegistry()
+    with patch('config.DEEPSEEK_KEY', "k"), patch('config.GEMINI_KEY', "k"):
+        assert registry.deepseek() is registry.deepseek()
+        assert registry.gemini() is registry.gemini()
+    await registry.close()
+
+
+@pytest.mark.asyncio
+async def test_slot_enforces_concurrency_limit():
+    registry = ProviderRegistry()
+    in_flight = 0
+    peak = 0
+
+    async def work():
+        nonlocal in_flight, peak
+        async with registry.slot(DEEPSEEK):
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    with patch('config.DEEPSEEK_MAX_CONCURRENCY', 3):
+        await asyncio.gather(*(work() for _ in range(10)))
+
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_pooled_calls_against_stub_keep_alive():
+    stub = StubProvider(reply="pong")
+    await stub.start()
+    registry = ProviderRegistry()
+    try:
+        with patch('config.DEEPSEEK_KEY', "k"), patch('config.GEMINI_KEY', "k"), \
+             patch('config.DEEPSEEK_BASE_URL', stub.url), patch('config.GEMINI_BASE_URL', stub.url):
+            for _ in range(5):
+                assert await registry.chat("ping") == "pong"
+                assert await registry.generate(model=config.MODEL_FAST, contents="ping") == "pong"
+
+        # Keep-alive: one connection per provider pool, not one per request
+        assert stub.requests == 10
+        assert stub.connections <= 2
+    finally:
+        await registry.close()
+        await stub.stop()
+
+
+def test_loop_change_closes_the_old_pools():
+    registry = ProviderRegistry()
+
+    async def build():
+        return registry._http_client(DEEPSEEK)
+
+    old = asyncio.run(build())
+    assert old.is_closed  # closed by the keeper when asyncio.run shut the loop down
+    new = asyncio.run(build())
+    assert new is not old and new.is_closed
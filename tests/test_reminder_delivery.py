@@ -0,0 +1,134 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+from core.notifications import ReminderCenter
+from core.state import State
+from core.state_guard import guard
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.jobs = {}
+
+    def add_job(self, func, trigger, run_date=None, args=None, id=None, **kwargs):
+        self.jobs[id] = (func, run_date, args)
+
+
+def _center(tmp_path):
+    center = ReminderCenter(str(tmp_path / "reminders.db"))
+    center.attach(FakeScheduler(), AsyncMock())
+    return center
+
+
+async def _rows(center):
+    conn = await center._get_conn()
+    async with conn.execute("SELECT id, status FROM reminders ORDER BY id") as cursor:
+        return await cursor.fetchall()
+
+
+@pytest.mark.asyncio
+async def test_busy_user_gets_reminder_when_fsm_returns_to_idle(tmp_path):
+    center = _center(tmp_path)
+    user_id = 4242
+    first = await center.add(user_id, "Зателефонувати", datetime.now() + timedelta(minutes=5))
+    second = await center.add(user_id, "Купити хліб", datetime.now() + timedelta(minutes=6))
+    assert set(center.scheduler.jobs) == {f"reminder_{first}", f"reminder_{second}"}
+
+    guard._user_states[user_id] = State.PLAN  # Mid-conversation
+    await center.fire(first)
+    await center.fire(second)
+    center.bot.send_message.assert_not_called()
+    assert await _rows(center) == [(first, "queued"), (second, "queued")]
+    assert center.scheduler.jobs.keys() == {f"reminder_{first}", f"reminder_{second}"}  # No retry jobs
+
+    guard.force_idle(user_id)
+    center.on_idle(user_id)
+    await asyncio.gather(*center._tasks)
+
+    texts = [call.args[1] for call in center.bot.send_message.call_args_list]
+    assert len(texts) == 2 and "Зателефонувати" in texts[0] and "Купити хліб" in texts[1]
+    assert await _rows(center) == []
+    assert guard.get_state(user_id) == State.IDLE
+    assert (await center.stats())["waiting_users"] == 0
+    await center.close()
+
+
+@pytest.mark.asyncio
+async def test_reminders_survive_restart(tmp_path):
+    center = _center(tmp_path)
+    future = await center.add(1, "Пізніше", datetime.now() + timedelta(hours=1))
+    overdue = await center.add(1, "Прострочене", datetime.now() + timedelta(seconds=1))
+    await center.close()
+
+    conn = await center._get_conn()  # Pretend the process was down past the due time
+    await conn.execute("UPDATE reminders SET run_at = run_at - 3600 WHERE id = ?", (overdue,))
+    await conn.commit()
+    await center.close()
+
+    restarted = _center(tmp_path)
+    await restarted.start()
+    await asyncio.gather(*restarted._tasks)
+
+    assert list(restarted.scheduler.jobs) == [f"reminder_{future}"]
+    restarted.bot.send_message.assert_awaited_once()
+    assert "Прострочене" in restarted.bot.send_message.call_args.args[1]
+    assert await _rows(restarted) == [(future, "scheduled")]
+    await restarted.close()
+
+
+@pytest.mark.asyncio
+async def test_queued_reminder_drained_by_the_worker_that_goes_idle(tmp_path):
+    fired_on, idle_on = _center(tmp_path), _center(tmp_path)  # Two workers, one shared table
+    user_id = 4244
+    reminder = await fired_on.add(user_id, "Випити воду", datetime.now() + timedelta(minutes=5))
+
+    guard._user_states[user_id] = State.PLAN
+    await fired_on.fire(reminder)
+    await fired_on.fire(reminder)  # Same timer on another worker: no-op
+    assert await _rows(fired_on) == [(reminder, "queued")]
+
+    guard.force_idle(user_id)
+    idle_on.on_idle(user_id)  # Not known on this worker yet: a set lookup, no SQLite
+    assert not idle_on._tasks
+    await idle_on.sweep()
+    await asyncio.gather(*idle_on._tasks)
+
+    fired_on.bot.send_message.assert_not_called()
+    idle_on.bot.send_message.assert_awaited_once()
+    assert await _rows(idle_on) == []
+    await fired_on.close()
+    await idle_on.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_send_keeps_the_reminder(tmp_path):
+    center = _center(tmp_path)
+    user_id = 4245
+    reminder = await center.add(user_id, "Оплатити рахунок", datetime.now() + timedelta(minutes=5))
+    center.bot.send_message.side_effect = RuntimeError("telegram 502")
+    await center.fire(reminder)
+    assert await _rows(center) == [(reminder, "queued")]
+    assert center.counters["failed"] == 1
+
+    center.bot.send_message.side_effect = None
+    center.on_idle(user_id)
+    await asyncio.gather(*center._tasks)
+    assert center.bot.send_message.await_count == 2
+    assert await _rows(center) == []
+    await center.close()
+
+
+@pytest.mark.asyncio
+async def test_fsm_finally_drains_notification_queue():
+    from core.fsm import FSMController
+    with patch('core.fsm.reminders') as mock_reminders:
+        await FSMController().process_event({"user_id": 4343, "text": "hi"})
+    mock_reminders.on_idle.assert_called_once_with(4343)
+
+
+@pytest.mark.asyncio
+async def test_on_idle_without_queued_reminders_does_not_touch_sqlite(tmp_path):
+    center = _center(tmp_path)
+    center.on_idle(4346)
+    assert not center._tasks and center._conn is None
@@ -0,0 +1,80 @@
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from core.memory.retrieval import RetrievalEngine, Candidate, rrf_merge, dedupe, fit_budget, estimate_tokens
+
+
+def _chroma(memories, chunks):
+    chroma = MagicMock()
+    chroma.collection, chroma.obsidian = "mem", "obs"
+
+    async def query(collection, emb, limit, where=None):
+        return memories if collection == "mem" else chunks
+    chroma.query = AsyncMock(side_effect=query)
+    return chroma
+
+
+def _hit(text, path=None):
+    return {"id": text, "text": text, "metadata": {"path": path} if path else {}, "distance": 0.1}
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    a, b, c = (Candidate(key=k, text=k, source="memory") for k in "abc")
+    fused = rrf_merge({
+        "vector": [a, b],
+        "keyword": [Candidate(key="c", text="c", source="memory"), Candidate(key="b", text="b", source="memory")],
+    }, k=60)
+    assert fused[0].key == "b"
+    assert fused[0].ranks == {"vector": 2, "keyword": 2}
+
+
+def test_dedupe_drops_near_identical_and_contained_text():
+    base = "Користувач планує відкрити кав'ярню у Львові наступного літа разом із братом"
+    items = [
+        Candidate(key="1", text=base, source="memory"),
+        Candidate(key="2", text=base + " і другом", source="memory"),
+        Candidate(key="3", text="відкрити кав'ярню у Львові", source="obsidian", path="x.md"),
+        Candidate(key="4", text="Любить чорну каву без цукру", source="memory"),
+    ]
+    assert [c.key for c in dedupe(items)] == ["1", "4"]
+
+
+def test_fit_budget_keeps_rank_order_and_truncates_last():
+    lines = ["a" * 300, "b" * 300, "c" * 3000]
+    kept = fit_budget(lines, budget=400)
+    assert kept[:2] == lines[:2]
+    assert kept[2].endswith("...") and sum(map(estimate_tokens, kept)) <= 400
+
+
+@pytest.mark.asyncio
+async def test_engine_embeds_once_and_fuses_all_sources():
+    chroma = _chroma(
+        memories=[_hit("Користувач любить каву")],
+        chunks=[_hit("Goals > 2025\n\nВідкрити кав'ярню", "/v/Goals.md"), _hit("Goals > інше", "/v/Goals.md")],
+    )
+    keyword = AsyncMock(return_value=[("/v/Goals.md", 7.5, "Мета: кав'ярня"), ("/v/Recipes.md", 2.0, "Рецепт лате")])
+    engine = RetrievalEngine(chroma, keyword_search=keyword)
+
+    with patch('core.memory.embeddings.embeddings.embed_one', AsyncMock(return_value=[0.1, 0.2])) as embed:
+        lines = await engine.retrieve(42, "кав'ярня", top_k=5, budget=1000)
+
+    embed.assert_awaited_once_with("кав'ярня", task_type="retrieval_query")
+    assert chroma.query.await_count == 2
+    assert chroma.query.await_args_list[0].kwargs == {"where": {"user_id": 42}}
+    # Vector chunk + keyword hit for the same note fuse into one, ranked first
+    assert lines[0] == "🕸️ [Obsidian] [[Goals.md]]: Goals > 2025\n\nВідкрити кав'ярню..."
+    assert sum("Goals.md" in line for line in lines) == 1
+    assert "Користувач любить каву" in lines
+    assert any("Recipes.md" in line for line in lines)
+
+
+@pytest.mark.asyncio
+async def test_engine_falls_back_to_keywords_without_embedding():
+    chroma = _chroma([], [])
+    keyword = AsyncMock(return_value=[("/v/Goals.md", 7.5, "Мета")])
+    engine = RetrievalEngine(chroma, keyword_search=keyword)
+
+    with patch('core.memory.embeddings.embeddings.embed_one', AsyncMock(side_effect=RuntimeError("quota"))):
+        lines = await engine.retrieve(1, "мета", budget=1000)
+
+    chroma.query.assert_not_awaited()
+    assert lines == ["🕸️ [Obsidian] [[Goals.md]]: Мета..."]
@@ -0,0 +1,86 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+from core.router import IntentRouter, LocalIntentClassifier, cache_key, normalize
+
+
+def test_local_classifier_confident_cases():
+    local = LocalIntentClassifier()
+    assert local.classify("привіт")[0] == "GREETING"
+    assert local.classify("Як справи?")[0] == "GREETING"
+    assert local.classify("/start")[0] == "UTILITY"
+    assert local.classify("Нагадай мені завтра о 9 подзвонити мамі")[0] == "COMPLEX"
+    assert local.classify("глянь https://example.com")[0] == "COMPLEX"
+    assert local.classify("ясно")[0] == "SIMPLE"
+
+
+def test_yes_no_answers_are_not_greetings_and_stems_match_whole_words():
+    local = LocalIntentClassifier()
+    for text in ("ні, це неправильно", "так, зроби це", "ok do it"):
+        assert local.classify(text)[0] != "GREETING"
+    assert local.classify("ок")[0] == "GREETING"
+    assert local.classify("так, дякую")[0] == "GREETING"
+    assert local.classify("note this")[0] == "COMPLEX"
+    assert local.classify("update my profile")[0] != "COMPLEX"
+    assert local.classify("my notebook is slow")[0] != "COMPLEX"
+
+
+def test_local_classifier_ambiguous_returns_none():
+    intent, confidence = LocalIntentClassifier().classify("Що ти думаєш про мою ідею з кав'ярнею?")
+    assert intent is None
+    assert confidence == 0.0
+
+
+@pytest.mark.asyncio
+async def test_router_skips_llm_for_confident_and_cached_input():
+    router = IntentRouter(cache_size=8)
+    with patch('core.router.providers.generate', new_callable=AsyncMock) as mock_generate:
+        mock_generate.return_value = "COMPLEX"
+
+        assert await router.classify("привіт") == "GREETING"
+        assert await router.classify("  Привіт!! ") == "GREETING"  # cache hit (normalized)
+        mock_generate.assert_not_awaited()
+
+        ambiguous = "Що ти думаєш про мою ідею з кав'ярнею?"
+        assert await router.classify(ambiguous) == "COMPLEX"
+        assert await router.classify(ambiguous) == "COMPLEX"
+        mock_generate.assert_awaited_once()
+
+    stats = router.stats()
+    assert stats["total"] == 4
+    assert stats["llm"] == 1
+    assert stats["avoided_ratio"] == 0.75
+
+
+@pytest.mark.asyncio
+async def test_router_llm_failure_not_cached():
+    router = IntentRouter()
+    with patch('core.router.providers.generate', new_callable=AsyncMock) as mock_generate:
+        mock_generate.side_effect = RuntimeError("boom")
+        text = "Що ти думаєш про мою ідею з кав'ярнею?"
+        assert await router.classify(text) == "COMPLEX"
+        assert cache_key(text) not in router._cache
+
+
+@pytest.mark.asyncio
+async def test_router_cache_key_keeps_question_marks():
+    assert cache_key("ok") != cache_key("ok?") != cache_key("ok??")
+    assert cache_key("ok???") == cache_key("ok??")
+    assert cache_key("  Привіт!! ") == cache_key("привіт")
+
+    router = IntentRouter()
+    await router.classify("ok")
+    await router.classify("ok?")
+    assert router.stats()["cache"] == 0
+
+
+def test_hai_is_not_a_greeting():
+    assert LocalIntentClassifier().classify("хай зробить звіт")[0] != "GREETING"
+
+
+def test_lru_eviction():
+    router = IntentRouter(cache_size=2)
+    router._cache_put("a", "SIMPLE")
+    router._cache_put("b", "SIMPLE")
+    router._cache_get("a")
+    router._cache_put("c", "COMPLEX")
+    assert list(router._cache) == ["a", "c"]
@@ -0,0 +1,161 @@
+import json
+import pytest
+from unittest.mock import patch
+from core.memory.redis_storage import RedisManager, encode_message, decode_message
+
+
+class FakeRedis:
+    """Minimal list store with MULTI/EXEC pipelines; `down` simulates an outage."""
+
+    def __init__(self):
+        self.lists = {}
+        self.values = {}
+        self.ttl = {}
+        self.down = False
+        self.round_trips = 0
+
+    def _check(self):
+        self.round_trips += 1
+        if self.down:
+            raise ConnectionError("Redis down")
+
+    async def lrange(self, key, start, end):
+        self._check()
+        items = self.lists.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    async def get(self, key):
+        self._check()
+        return self.values.get(key)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis, self.ops = redis, []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def rpush(self, key, *values): self.ops.append(("rpush", key, values))
+    def ltrim(self, key, start, end): self.ops.append(("ltrim", key, start))
+    def expire(self, key, seconds): self.ops.append(("expire", key, seconds))
+    def incr(self, key): self.ops.append(("incr", key, None))
+    def get(self, key): self.ops.append(("get", key, None))
+    def delete(self, key): self.ops.append(("delete", key, None))
+    def lrange(self, key, start, end): self.ops.append(("lrange", key, start))
+
+    async def execute(self):
+        self.redis._check()
+        results = []
+        for op, key, arg in self.ops:
+            if op == "rpush":
+                self.redis.lists.setdefault(key, []).extend(arg)
+            elif op == "ltrim":
+                self.redis.lists[key] = self.redis.lists[key][arg:]
+            elif op == "incr":
+                self.redis.values[key] = str(int(self.redis.values.get(key, 0)) + 1)
+            elif op == "get":
+                results.append(self.redis.values.get(key))
+                continue
+            elif op == "delete":
+                self.redis.lists.pop(key, None)
+            elif op == "lrange":
+                results.append(self.redis.lists.get(key, [])[arg:])
+                continue
+            else:
+                self.redis.ttl[key] = arg
+            results.append(int(self.redis.values[key]) if op == "incr" else True)
+        return results
+
+
+def _manager():
+    manager = RedisManager()
+    manager.client = FakeRedis()
+    return manager
+
+
+def test_codec_is_compact_and_reads_legacy_entries():
+    raw = encode_message("assistant", "Привіт", "♊")
+    assert raw == '{"r":"a","c":"Привіт","m":"♊"}'
+    assert decode_message(raw) == {"role": "assistant", "content": "Привіт", "model": "♊"}
+    legacy = json.dumps({"role": "user", "content": "hi", "model": None})
+    assert decode_message(legacy) == {"role": "user", "content": "hi", "model": None}
+
+
+@pytest.mark.asyncio
+async def test_turn_is_one_round_trip_and_reads_stay_local():
+    manager = _manager()
+    fake = manager.client
+    fake.lists["history:1"] = [json.dumps({"role": "user", "content": "old", "model": None})]
+
+    assert [m["content"] for m in await manager.get_history(1)] == ["old"]
+    await manager.append_turn(1, [("user", "Як справи?"), ("assistant", "Добре", "♊")])
+    assert fake.round_trips == 2  # one LRANGE + one MULTI/EXEC
+    assert len(fake.lists["history:1"]) == 3 and fake.ttl["history:1"] == 86400
+
+    history = await manager.get_history(1, limit=2)
+    assert fake.round_trips == 2
+    assert history == [
+        {"role": "user", "content": "Як справи?", "model": None},
+        {"role": "assistant", "content": "Добре", "model": "♊"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_trim_keeps_last_messages():
+    manager = _manager()
+    with patch.object(manager, 'max_messages', 4):
+        for i in range(3):
+            await manager.append_turn(2, [("user", f"q{i}"), ("assistant", f"a{i}")])
+    assert [decode_message(m)["content"] for m in manager.client.lists["history:2"]] == ["q1", "a1", "q2", "a2"]
+
+
+@pytest.mark.asyncio
+async def test_outage_degrades_to_ring_buffer_and_flushes_on_recovery():
+    manager = _manager()
+    fake = manager.client
+    await manager.get_history(3)
+    await manager.append_turn(3, [("user", "before"), ("assistant", "ok")])
+
+    fake.down = True
+    await manager.append_turn(3, [("user", "during"), ("assistant", "still here")])
+    assert [m["content"] for m in await manager.get_history(3)] == ["before", "ok", "during", "still here"]
+    trips = fake.round_trips
+    await manager.append_turn(3, [("user", "again"), ("assistant", "yes")])
+    assert fake.round_trips == trips  # backed off, no connect attempt per message
+
+    fake.down = False
+    with patch('config.REDIS_RETRY_SECONDS', 0):
+        manager._down_until = 0
+        await manager.append_turn(3, [("user", "after"), ("assistant", "back")])
+    stored = [decode_message(m)["content"] for m in fake.lists["history:3"]]
+    assert stored == ["before", "ok", "during", "still here", "again", "yes", "after", "back"]
+    assert manager.counters["resyncs"] == 1
+
+
+@pytest.mark.asyncio
+async def test_distributed_workers_see_each_others_writes():
+    a, b = _manager(), _manager()
+    b.client = a.client
+    await a.get_history(4)
+    await b.get_history(4)
+    with patch('core.coordination.coordinator.backend.distributed', True):
+        await a.append_turn(4, [("user", "from a"), ("assistant", "ok")])
+        trips = a.client.round_trips
+        assert [m["content"] for m in await a.get_history(4)] == ["from a", "ok"]
+        assert a.client.round_trips == trips + 1  # version GET only, ring served
+
+        await b.append_turn(4, [("user", "from b"), ("assistant", "ok")])
+        assert [m["content"] for m in await a.get_history(4)] == ["from a", "ok", "from b", "ok"]
+        assert [m["content"] for m in await b.get_history(4)] == ["from a", "ok", "from b", "ok"]
+
+    # Single worker: the ring is trusted without a round trip
+    trips = a.client.round_trips
+    await a.get_history(4)
+    assert a.client.round_trips == trips
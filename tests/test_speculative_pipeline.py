@@ -0,0 +1,60 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
+from core.state import State
+from core.context import ExecutionContext
+from core.state_guard import guard, Action
+from states.observe import ObserveState
+from states.retrieve import RetrieveState, join_speculative
+
+
+@pytest.mark.asyncio
+async def test_prefetch_sanctioned_only_in_observe():
+    user_id = 9101
+    guard.force_idle(user_id)
+    await guard.enter(user_id, State.OBSERVE)
+
+    await guard.assert_allowed(user_id, Action.MEM_RETRIEVE, prefetch=True)
+    with pytest.raises(PermissionError):
+        await guard.assert_allowed(user_id, Action.MEM_RETRIEVE)
+
+    await guard.enter(user_id, State.RETRIEVE)
+    await guard.enter(user_id, State.PLAN)
+    with pytest.raises(PermissionError):
+        await guard.assert_allowed(user_id, Action.MEM_RETRIEVE, prefetch=True)
+    guard.force_idle(user_id)
+
+
+@pytest.mark.asyncio
+async def test_classification_overlaps_retrieval():
+    user_id = 9102
+    profile = {"structured_profile": {"life_level": {"current": {"value": "3"}}}}
+
+    async def slow_fetch(uid, text):
+        await asyncio.sleep(0.2)
+        return profile
+
+    async def slow_classify():
+        await asyncio.sleep(0.2)
+        return "GREETING"
+
+    context = ExecutionContext(user_id=user_id, event_type="message", raw_input="привіт")
+    guard.force_idle(user_id)
+    start = time.perf_counter()
+    with patch('core.memory.funnel.funnel._fetch', side_effect=slow_fetch):
+        context.pending["intent"] = asyncio.create_task(slow_classify())
+        await guard.enter(user_id, State.OBSERVE)
+        assert await ObserveState().execute(context) == State.RETRIEVE
+        await guard.enter(user_id, State.RETRIEVE)
+        assert await RetrieveState().execute(context) == State.PLAN
+        await guard.enter(user_id, State.PLAN)
+        await join_speculative(context)
+    elapsed = time.perf_counter() - start
+    guard.force_idle(user_id)
+
+    assert context.intent == "GREETING"
+    assert context.memory_context == profile
+    assert context.metadata["life_level"] == "3"
+    assert not context.pending
+    assert elapsed < 0.35  # max(0.2, 0.2), not the sequential 0.4
@@ -0,0 +1,93 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+import config
+from core.providers import ProviderRegistry
+from core.streaming import StreamingEditor, visible_text, CURSOR
+from scripts.stub_provider import StubProvider
+
+
+class FakeBot:
+    def __init__(self):
+        self.edits = []
+
+    async def edit_message_text(self, text, chat_id, message_id, parse_mode=None):
+        self.edits.append(text)
+
+
+def test_visible_text_suppresses_tool_calls():
+    assert visible_text('Шукаю...\n```json\n{"tool_calls": []}\n```\nГотово') == "Шукаю...\n\nГотово"
+    assert visible_text("Шукаю...\n```js") == "Шукаю..."
+    assert visible_text('Зараз {"tool_calls": [{"name": "x"') == "Зараз"
+    assert visible_text('Зараз {"tool') == "Зараз"
+    assert visible_text("Код: ```print(1)``` ок") == "Код: ```print(1)``` ок"
+
+
+@pytest.mark.asyncio
+async def test_editor_rate_limits_and_hides_json():
+    bot = FakeBot()
+    editor = StreamingEditor(bot, chat_id=1, message_id=2, interval=0.05, min_delta=1)
+    await editor.push("Привіт")
+    await asyncio.sleep(0.01)
+    assert bot.edits == ["Привіт" + CURSOR]
+
+    await editor.push("Привіт, як справи?")  # within interval: coalesced, latest text wins
+    await editor.push('Привіт, як справи? Ось ```json\n{"tool_calls"')
+    await asyncio.sleep(0.1)
+    await editor.close()
+    assert bot.edits[-1] == "Привіт, як справи? Ось" + CURSOR
+    assert editor.edits == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_edits_do_not_block_the_token_loop():
+    class SlowBot(FakeBot):
+        async def edit_message_text(self, text, chat_id, message_id, parse_mode=None):
+            await asyncio.sleep(0.2)
+            self.edits.append(text)
+            return False  # HeadlessBot: the edit failed
+
+    bot = SlowBot()
+    editor = StreamingEditor(bot, chat_id=1, message_id=2, interval=0, min_delta=1)
+    t0 = time.perf_counter()
+    for i in range(50):
+        await editor.push("слово " * (i + 1))
+        await asyncio.sleep(0)  # Next chunk from the network
+    assert time.perf_counter() - t0 < 0.1
+    await editor.close()  # Waits for the edit in flight
+    assert len(bot.edits) == 1 and editor.edits == 0  # Failed edits are not counted
+
+
+@pytest.mark.asyncio
+async def test_headless_bot_reraises_flood_control():
+    from aiogram.exceptions import TelegramRetryAfter
+    from core.engine import HeadlessBot
+
+    real = AsyncMock()
+    real.edit_message_text.side_effect = TelegramRetryAfter(method=MagicMock(), message="flood", retry_after=3)
+    with pytest.raises(TelegramRetryAfter):
+        await HeadlessBot(real).edit_message_text("x", 1, 2)
+    real.edit_message_text.side_effect = RuntimeError("message is not modified")
+    assert await HeadlessBot(real).edit_message_text("x", 1, 2) is False
+
+    editor = StreamingEditor(HeadlessBot(AsyncMock(edit_message_text=AsyncMock(side_effect=TelegramRetryAfter(
+        method=MagicMock(), message="flood", retry_after=3)))), chat_id=1, message_id=2, interval=0, min_delta=1)
+    await editor.push("Привіт")
+    await asyncio.sleep(0.01)
+    await editor.close()
+    assert editor._next_edit_at - time.monotonic() > 2  # Backs off for retry_after
+
+
+@pytest.mark.asyncio
+async def test_generate_stream_against_stub():
+    stub = StubProvider(reply="one two three")
+    await stub.start()
+    registry = ProviderRegistry()
+    try:
+        with patch('config.GEMINI_KEY', "k"), patch('config.GEMINI_BASE_URL', stub.url):
+            deltas = [d async for d in registry.generate_stream(model=config.MODEL_FAST, contents="ping")]
+        assert deltas == ["one ", "two ", "three"]
+    finally:
+        await registry.close()
+        await stub.stop()
@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from core.coordination import SessionLocks
+from core.fsm import FSMController
+from core.state import State
+from core.state_guard import StateGuard, guard
+
+
+@pytest.mark.asyncio
+async def test_session_entry_lives_only_while_held_or_awaited():
+    sessions = SessionLocks()
+    order = []
+
+    async def session(tag, release=None):
+        async with sessions.hold(1):
+            order.append(tag)
+            if release:
+                await release.wait()
+
+    release = asyncio.Event()
+    first = asyncio.create_task(session("first", release))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(session("second"))
+    third = asyncio.create_task(session("third"))
+    await asyncio.sleep(0)
+    assert len(sessions) == 1 and sessions.locked(1)
+    assert sessions.active() == 1 and sessions.waiters() == 2
+
+    third.cancel()  # A cancelled waiter releases its reference
+    await asyncio.gather(third, return_exceptions=True)
+    assert sessions.waiters() == 1
+
+    release.set()
+    await asyncio.gather(first, second)
+    assert order == ["first", "second"]
+    assert len(sessions) == 0 and not sessions.locked(1)
+
+
+@pytest.mark.asyncio
+async def test_state_table_only_holds_non_idle_users():
+    states = StateGuard()
+    await states.enter(5, State.OBSERVE)
+    assert states._user_states == {5: State.OBSERVE}
+    await states.enter(5, State.IDLE)
+    assert states._user_states == {} and states.get_state(5) == State.IDLE
+
+    assert states.try_enter_notify(6)
+    assert states.get_state(6) == State.NOTIFY
+    states.force_idle(6)
+    assert states._user_states == {}
+
+
+@pytest.mark.asyncio
+async def test_many_distinct_users_leave_no_residue():
+    fsm = FSMController()
+
+    async def observe(context):
+        await asyncio.sleep(0)
+        return State.ERROR
+
+    async def error(context):
+        return State.IDLE
+
+    fsm.register_handler(State.OBSERVE, AsyncMock(execute=observe))
+    fsm.register_handler(State.ERROR, AsyncMock(execute=error))
+    users = range(8_000_000, 8_002_000)
+    await asyncio.gather(*(fsm.process_event({"user_id": u, "text": "hi"}) for u in users))
+
+    assert len(fsm.sessions) == 0
+    assert not set(users) & set(guard._user_states)